@@ -0,0 +1,162 @@
+# --- AGENDADOR DE ALERTAS (processo separado do Streamlit) ---
+# Uso:  python agendador_alertas.py [--uma-vez] [--intervalo 60] [--sincronizar] [--ics PASTA]
+# Lê os prazos do armazém local (o mesmo legaliza_local.db do app), avalia as REGRAS_ALERTA
+# a cada INTERVALO_CHECK_ROBO segundos e envia um resumo por nível: os de prioridade alta na hora
+# (enviar_agora), os demais pela fila do despachante. O controle de quais
+# documentos já foram avisados em cada nível fica em SQLite, então reiniciar o processo
+# ou abrir várias sessões do app não gera pushes duplicados. As métricas de entrega do
+# despachante também ficam lá, para a página Desempenho do app. Com --ics, cada rodada também mantém
+# na pasta os calendários de vencimentos (.ics) por unidade e por risco, para publicar e assinar.
+# Com --sincronizar, o envio à nuvem usa o mesmo lease do app (ArmazemLocal.tomar_envio): só um
+# processo empurra por vez.
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+from armazem_local import ArmazemLocal, Replicador
+from fragmentos import criar_fragmentacao
+from nucleo_dados import agregar_checklist
+from motor_prazos import REGRAS_ALERTA, INTERVALO_CHECK_ROBO, MAX_ITENS_PUSH, hoje_sp, calcular_prazos, alertas_pendentes, formatar_mensagens
+from notificacoes import get_despachante
+from vencimentos import IndiceVencimentos, gravar_feeds
+
+CAMINHO_DB_LOCAL = os.environ.get("LEGALIZA_DB_LOCAL", "legaliza_local.db")
+CAMINHO_ESTADO_ALERTAS = os.environ.get("LEGALIZA_ALERTAS_DB", "legaliza_alertas.db")
+SEPARADOR_PUSH = "\n----------------\n"
+PRIORIDADES_IMEDIATAS = {"high", "max", "urgent"}   # saem síncronas; as demais vão para a fila do despachante
+
+class EstadoAlertas:
+    # Guarda quando cada documento foi avisado em cada nível e quando saiu o último push do nível
+    def __init__(self, caminho):
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(caminho, check_same_thread=False)
+        self._con.executescript("""
+            CREATE TABLE IF NOT EXISTS avisos (id_unico TEXT, nivel TEXT, avisado_em REAL, PRIMARY KEY (id_unico, nivel));
+            CREATE TABLE IF NOT EXISTS ultimo_push (nivel TEXT PRIMARY KEY, enviado_em REAL);
+            CREATE TABLE IF NOT EXISTS metricas_push (id INTEGER PRIMARY KEY CHECK (id = 1), dados TEXT, atualizado_em REAL);
+        """)
+        self.na_fila = set()   # níveis com push esperando o worker do despachante
+
+    def ultimo_push(self, nivel):
+        with self._lock:
+            row = self._con.execute("SELECT enviado_em FROM ultimo_push WHERE nivel = ?", (nivel,)).fetchone()
+        return row[0] if row else None
+
+    def avisados(self, nivel):
+        with self._lock:
+            return dict(self._con.execute("SELECT id_unico, avisado_em FROM avisos WHERE nivel = ?", (nivel,)).fetchall())
+
+    def registrar_push(self, nivel, ids, agora):
+        with self._lock, self._con:
+            self._con.executemany("INSERT OR REPLACE INTO avisos (id_unico, nivel, avisado_em) VALUES (?, ?, ?)", [(i, nivel, agora) for i in ids])
+            self._con.execute("INSERT OR REPLACE INTO ultimo_push (nivel, enviado_em) VALUES (?, ?)", (nivel, agora))
+
+    def confirmar_fila(self, nivel, ids, agora, entregue):
+        # Chamado pelo worker do despachante; sem entrega o nível volta na próxima rodada
+        if entregue: self.registrar_push(nivel, ids, agora)
+        self.na_fila.discard(nivel)
+
+    def registrar_metricas(self, metricas, agora):
+        with self._lock, self._con:
+            self._con.execute("INSERT OR REPLACE INTO metricas_push (id, dados, atualizado_em) VALUES (1, ?, ?)", (json.dumps(metricas), agora))
+
+    def metricas_push(self):
+        # (métricas do despachante, instante da gravação) ou None se o agendador ainda não gravou
+        with self._lock:
+            row = self._con.execute("SELECT dados, atualizado_em FROM metricas_push WHERE id = 1").fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def esquecer_resolvidos(self, nivel, ids_ativos):
+        # Documento que saiu do nível (renovado, concluído, risco alterado) volta a ser avisado se entrar de novo
+        with self._lock, self._con:
+            atuais = [r[0] for r in self._con.execute("SELECT id_unico FROM avisos WHERE nivel = ?", (nivel,)).fetchall()]
+            self._con.executemany("DELETE FROM avisos WHERE id_unico = ? AND nivel = ?", [(i, nivel) for i in atuais if i not in ids_ativos])
+
+def verificar_alertas(df_prazos, estado, enviar=None, enfileirar=None, agora=None, hoje=None, regras=REGRAS_ALERTA):
+    # Uma rodada do robô; retorna {nivel: quantidade de documentos avisados ou postos na fila}. Prioridade alta
+    # sai síncrona (enviar_agora); as demais vão para a fila do despachante (enviar), e o worker confirma.
+    # Nos dois casos o aviso só fica registrado se o ntfy confirmou a entrega, senão volta na próxima rodada.
+    enviar = enviar or get_despachante().enviar_agora
+    enfileirar = enfileirar or get_despachante().enviar
+    agora = agora if agora is not None else time.time()
+    df_prazos = calcular_prazos(df_prazos, hoje or hoje_sp(), regras)
+    enviados = {}
+    for risco, regra in regras.items():
+        sel = alertas_pendentes(df_prazos, risco)
+        estado.esquecer_resolvidos(risco, set(sel['ID_UNICO'].astype(str)))
+        if risco in estado.na_fila: continue
+        ultimo = estado.ultimo_push(risco)
+        if sel.empty or (ultimo is not None and agora - ultimo < regra["intervalo_min"] * 60): continue
+
+        # Só entram no resumo os documentos novos no nível ou cujo último aviso já passou do prazo de lembrete
+        avisados = estado.avisados(risco)
+        limite_lembrete = agora - regra["lembrete_horas"] * 3600
+        novos = sel[[i not in avisados or avisados[i] <= limite_lembrete for i in sel['ID_UNICO'].astype(str)]]
+        if novos.empty: continue
+
+        lote = novos.head(MAX_ITENS_PUSH)
+        corpo = SEPARADOR_PUSH.join(formatar_mensagens(lote))
+        if len(novos) > len(lote): corpo += f"{SEPARADOR_PUSH}+{len(novos) - len(lote)} outros documentos"
+        ids = lote['ID_UNICO'].astype(str).tolist()
+        if regra["prioridade"] in PRIORIDADES_IMEDIATAS:
+            if enviar(regra["titulo"], corpo, regra["prioridade"]):
+                estado.registrar_push(risco, ids, agora)
+                enviados[risco] = len(lote)
+            continue
+        estado.na_fila.add(risco)
+        if enfileirar(regra["titulo"], corpo, regra["prioridade"], ao_entregar=partial(estado.confirmar_fila, risco, ids, agora)):
+            enviados[risco] = len(lote)
+        else:
+            estado.na_fila.discard(risco)   # fila cheia: tenta na próxima rodada
+    return enviados
+
+def camada_google_secrets():
+    # Mesmas credenciais do app (.streamlit/secrets.toml)
+    import streamlit as st
+    from clientes_google import get_camada_google
+    return get_camada_google(dict(st.secrets["gcp_service_account"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Agendador de alertas push do Legaliza Health")
+    parser.add_argument("--intervalo", type=int, default=INTERVALO_CHECK_ROBO, help="segundos entre verificações")
+    parser.add_argument("--uma-vez", action="store_true", help="roda uma verificação e sai")
+    parser.add_argument("--sincronizar", action="store_true", help="puxa a LegalizaHealth_DB antes de cada verificação")
+    parser.add_argument("--db", default=CAMINHO_DB_LOCAL)
+    parser.add_argument("--estado", default=CAMINHO_ESTADO_ALERTAS)
+    parser.add_argument("--ics", default="", help="pasta onde manter os calendários .ics por unidade e por risco")
+    args = parser.parse_args()
+
+    armazem = ArmazemLocal(args.db)
+    estado = EstadoAlertas(args.estado)
+    if args.sincronizar:
+        camada = camada_google_secrets()
+        replicador = Replicador(armazem, camada.planilha, operacao=camada.operacao, invalidar=camada.invalidar,
+                                fragmentacao=criar_fragmentacao(camada.propagar))
+    else:
+        replicador = None
+    ultimas_metricas = None
+    while True:
+        if replicador: replicador.reconciliar()
+        try:
+            df_prazos = agregar_checklist(*armazem.ler())
+            enviados = verificar_alertas(df_prazos, estado)
+            if enviados: print(time.strftime("%d/%m %H:%M"), "alertas enviados/na fila:", enviados, flush=True)
+            if args.ics:
+                feeds = gravar_feeds(args.ics, df_prazos, IndiceVencimentos(df_prazos), hoje_sp())
+                if feeds["gravados"]: print(time.strftime("%d/%m %H:%M"), "calendários atualizados:", feeds["gravados"], flush=True)
+        except Exception as e:
+            print(time.strftime("%d/%m %H:%M"), "erro na verificação:", e, flush=True)
+        if args.uma_vez: get_despachante().aguardar(timeout=30)   # a fila é deste processo: entrega antes de sair
+        metricas_push = get_despachante().metricas()
+        if metricas_push != ultimas_metricas:
+            estado.registrar_metricas(metricas_push, time.time())
+            print(time.strftime("%d/%m %H:%M"), "ntfy:", metricas_push, flush=True)
+            ultimas_metricas = metricas_push
+        if args.uma_vez: break
+        time.sleep(args.intervalo)
+
+if __name__ == "__main__":
+    main()
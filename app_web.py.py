@@ -1,37 +1,28 @@
+from partida import MedidorRerun, carregar, precarregar, PRECARREGAR, arquivo_bytes, registrar_rerun, relatorio_partida
+medidor = MedidorRerun()
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date, timedelta
+import numpy as np
+from datetime import datetime, date
 import time
-from fpdf import FPDF
-import tempfile
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
-import base64
-import requests
 import streamlit.components.v1 as components
-import pytz
-import io
-import unicodedata
 import os
-import zipfile
 from streamlit_option_menu import option_menu
-
-# --- TENTATIVA DE IMPORTAR BIBLIOTECA DE VOZ ---
-try:
-    import speech_recognition as sr
-    TEM_RECONHECIMENTO_VOZ = True
-except ImportError:
-    TEM_RECONHECIMENTO_VOZ = False
-
-# Tenta importar Plotly
-try:
-    import plotly.express as px
-    import plotly.graph_objects as go
-    TEM_PLOTLY = True
-except ImportError:
-    TEM_PLOTLY = False
+from nucleo_dados import safe_prog, adicionar_tarefas_sugeridas, progresso_tarefas, id_unico
+from armazem_local import ArmazemLocal, Replicador
+from fragmentos import criar_fragmentacao
+from busca import IndiceBusca
+from painel import COLUNAS_LISTA, TAMANHOS_PAGINA, JANELAS_VENCIMENTO, MAX_PROXIMOS, calcular_agregados, ordem_coluna, selecionar_pagina
+from vencimentos import pendentes, selecionar_feed, gerar_ics, nome_feed_unidade, nome_feed_risco
+from blobs import ArmazemBlobs, hash_blob
+from transcricao import ServicoTranscricao, criar_motor
+from metricas import METRICAS, medir, iniciar_perfil, texto_perfil
+from inteligencia_docs import LISTA_TIPOS_DOCUMENTOS, aplicar_inteligencia_doc
+from importador import previa_importacao, importar_arquivo
+from dados_compartilhados import RepositorioDados, Sobreposicao
+from contexto_vistoria import CONTEXT_DATA
+# Plotly (Painel), relatorio/FPDF (Vistoria), googleapiclient (Drive) e gspread: import tardio via carregar()
+medidor.marcar("importações")
 
 # --- 1. CONFIGURAÇÃO GERAL (MOBILE FIRST) ---
 st.set_page_config(
@@ -93,6 +84,9 @@ st.markdown("""
         border: 1px solid #374151;
     }
 
+    /* Logo animado do menu */
+    [data-testid="stSidebar"] img { border-radius: 10px; }
+
     /* Título do Menu Centralizado */
     .sidebar-title {
         text-align: center;
@@ -116,152 +110,32 @@ st.markdown("""
     }
 </style>
 """, unsafe_allow_html=True)
+medidor_anterior = st.session_state.get('medidor_partida')
+st.session_state['medidor_partida'] = medidor
+registrar_rerun(medidor)
+
+# --- MÉTRICAS POR RERUN E PERFIL SOB DEMANDA ---
+def fechar_rerun(m, pagina=None):
+    # Reruns interrompidos (st.stop/st.rerun) são fechados no início do seguinte
+    if m.registrado: return
+    m.registrado = True
+    METRICAS.registrar("rerun", m.total(), pagina=pagina, etapas={n: round(s * 1000, 1) for n, s in m.etapas})
+    if 'perfil_ativo' in st.session_state: st.session_state['ultimo_perfil'] = texto_perfil(st.session_state.pop('perfil_ativo'))
+
+if medidor_anterior is not None: fechar_rerun(medidor_anterior)
+if st.session_state.pop('perfilar_proximo', False):
+    perfil = iniciar_perfil()
+    if perfil is not None: st.session_state['perfil_ativo'] = perfil
 
-TOPICO_NOTIFICACAO = "legaliza_vida_alerta_hospital"
-INTERVALO_CHECK_ROBO = 60
 ID_PASTA_DRIVE = "1tGVSqvuy6D_FFz6nES90zYRKd0Tmd2wQ"
+CAMINHO_DB_LOCAL = os.environ.get("LEGALIZA_DB_LOCAL", "legaliza_local.db")
+INTERVALO_RECONCILIACAO = 60
+CAMINHO_BLOBS = os.environ.get("LEGALIZA_BLOBS", "legaliza_blobs")
+LIMITE_BLOBS_MB = int(os.environ.get("LEGALIZA_BLOBS_MB", "512"))
 
 # --- 2. CÉREBRO DE INTELIGÊNCIA DINÂMICA ---
-CONTEXT_DATA = {
-    "🏥 Hospital / Clínica / Laboratório": {
-        "setores": [
-            "Recepção/Acessibilidade", "Consultório Indiferenciado", "Consultório Gineco/Uro", 
-            "Sala de Procedimentos", "DML (Limpeza)", "Expurgo (Sujo)", "Esterilização (Limpo)", 
-            "Abrigo de Resíduos", "Cozinha/Copa", "Farmácia/CAF", "Raio-X/Imagem", "UTI", "Centro Cirúrgico"
-        ],
-        "sugestoes": {
-            "Recepção/Acessibilidade": [
-                "Balcão de atendimento sem rebaixo PNE (NBR 9050)",
-                "Sanitário PNE sem barras de apoio ou alarme de emergência",
-                "Área de giro 1.50m no sanitário PNE obstruída",
-                "Desnível de piso > 5mm sem rampa",
-                "Bebedouro não acessível (altura incorreta)"
-            ],
-            "Consultório Indiferenciado": [
-                "Ausência de lavatório para mãos (obrigatório)",
-                "Torneira com acionamento manual (exige comando não manual)",
-                "Piso/Parede com juntas ou rodapé não arredondado",
-                "Mobiliário com superfície porosa (madeira não tratada)",
-                "Lixeira sem acionamento por pedal"
-            ],
-            "DML (Limpeza)": [
-                "Tanque de lavagem único (necessário setorização)",
-                "Ausência de ralo sifonado",
-                "Armazenamento de saneantes sem estrado/pallet",
-                "Ventilação mecânica ineficiente/ausente"
-            ],
-            "Expurgo (Sujo)": [
-                "Cruzamento de fluxo limpo x sujo",
-                "Ausência de pia de lavagem profunda (vazia clínica)",
-                "Pistola de ar/água inoperante",
-                "Bancada de madeira ou material poroso"
-            ],
-            "Esterilização (Limpo)": [
-                "Autoclave sem registro de teste biológico/químico",
-                "Barreira física entre área suja/limpa inexistente",
-                "Ar condicionado sem controle de temperatura",
-                "Armazenamento de estéreis próximo ao teto/piso"
-            ],
-            "Abrigo de Resíduos": [
-                "Ausência de ponto de água e ralo",
-                "Área não telada (acesso de vetores)",
-                "Identificação de grupos (A, B, E) incorreta",
-                "Porta sem abertura para ventilação (veneziana)"
-            ],
-            "Farmácia/CAF": [
-                "Termohigrômetro não calibrado ou ausente",
-                "Armário de controlados (Port. 344) sem chave/segurança",
-                "Pallets de madeira (proibido em área limpa)",
-                "Medicamentos encostados na parede/teto"
-            ],
-            "Raio-X/Imagem": [
-                "Sinalização luminosa (luz vermelha) inoperante",
-                "Visor plumbífero com falha de vedação",
-                "Porta sem proteção radiológica (chumbo)",
-                "Ausência de sinalização 'Risco de Radiação' e 'Grávidas'"
-            ],
-            "DEFAULT": [
-                "Divergência entre Projeto (LTA) e Executado",
-                "Extintor vencido ou obstruído",
-                "Sinalização de rota de fuga fotoluminescente ausente",
-                "Iluminação de emergência inoperante",
-                "Certificado de dedetização vencido"
-            ]
-        }
-    },
-    "🏭 Indústria / Logística": {
-        "setores": ["Linha de Produção", "Estoque/Almoxarifado", "Vestiários", "Refeitório", "Caldeiras/Compressor", "Área Externa"],
-        "sugestoes": {
-            "Linha de Produção": ["Máquinas sem proteção (NR-12)", "Área de circulação obstruída", "Painel elétrico sem tranca (NR-10)", "Iluminação insuficiente"],
-            "Estoque/Almoxarifado": ["Empilhamento excessivo", "Extintores obstruídos", "Porta-pallets danificada", "Ausência de rota de fuga"],
-            "DEFAULT": ["AVCB vencido", "Ausência de SPDA", "Descarte de efluentes irregular"]
-        }
-    },
-    "🛒 Varejo de Alimentos": {
-        "setores": ["Área de Venda", "Cozinha/Manipulação", "Estoque Seco", "Câmara Fria", "Saneantes", "Lixo"],
-        "sugestoes": {
-            "Cozinha/Manipulação": ["Fluxo cruzado", "Ausência de pia exclusiva mãos", "Ausência de tela milimétrica", "Luminárias sem proteção"],
-            "Câmara Fria": ["Temperatura alta", "Gelo acumulado", "Alimentos no chão", "Porta não veda"],
-            "DEFAULT": ["Licença Sanitária vencida", "Manual de Boas Práticas desatualizado", "Caixa d'Água suja"]
-        }
-    }
-}
-
-# --- 2.1 BASE DE DOCUMENTOS ---
-DOC_INTELLIGENCE = {
-    "Alvará de Funcionamento": {"dias": 365, "risco": "CRÍTICO", "link": "https://www.google.com/search?q=consulta+alvara+funcionamento", "tarefas": ["Renovação", "Taxa"]},
-    "Licença Sanitária": {"dias": 365, "risco": "CRÍTICO", "link": "https://www.google.com/search?q=consulta+licenca+sanitaria", "tarefas": ["Protocolo VISA", "Manual Boas Práticas"]},
-    "DEFAULT": {"dias": 365, "risco": "NORMAL", "link": "", "tarefas": ["Verificar validade"]}
-}
-# ADICIONANDO A BASE DE CONHECIMENTO COMPLETA
-DOC_INTELLIGENCE.update({
-    "Licença de Publicidade": {"dias": 365, "risco": "NORMAL", "link": "", "tarefas": ["Medir fachada", "Pagar taxa TFA/Cadan", "Verificar padrão visual"]},
-    "Inscrição Municipal": {"dias": 0, "risco": "NORMAL", "link": "", "tarefas": ["Verificar cadastro mobiliário", "Atualizar dados fiscais"]},
-    "Habite-se": {"dias": 0, "risco": "CRÍTICO", "link": "", "tarefas": ["Verificar metragem construída", "Arquivar planta aprovada"]},
-    "Alvará de Obra": {"dias": 180, "risco": "ALTO", "link": "", "tarefas": ["Placa do engenheiro na obra", "ART de execução", "Manter no canteiro"]},
-    "Projeto Arquitetonico (Visa e Prefeitura)": {"dias": 0, "risco": "ALTO", "link": "", "tarefas": ["Aprovação LTA (Vigilância)", "Aprovação Prefeitura", "Memorial descritivo atualizado"]},
-    "SDR": {"dias": 365, "risco": "NORMAL", "link": "", "tarefas": ["Regularidade regional", "Taxas estaduais"]},
-    "SMOP": {"dias": 365, "risco": "NORMAL", "link": "", "tarefas": ["Regularidade de obras viárias", "Certificado de conclusão"]},
-    "Termo de aceite de sinalização de vaga para deficiente e idoso": {"dias": 0, "risco": "BAIXO", "link": "", "tarefas": ["Pintura de solo", "Placa vertical", "Medidas ABNT"]},
-    "Certificado de acessibilidade": {"dias": 0, "risco": "MÉDIO", "link": "", "tarefas": ["Laudo NBR 9050", "Rampas/Banheiros adaptados"]},
-    "Carta de anuência tombamento": {"dias": 0, "risco": "MÉDIO", "link": "", "tarefas": ["Verificar restrições de fachada", "Patrimônio histórico"]},
-    "Certificado de Manutenção do Sistema de Segurança": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Laudo câmeras/CFTV", "Teste alarme", "Manutenção cercas"]},
-    "Licença do Comando da Aeronáutica (COMAER)": {"dias": 1095, "risco": "ALTO", "link": "", "tarefas": ["Aprovação AGA", "Luz piloto topo prédio"]},
-    "Polícia Civil (Licença)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Relatório trimestral", "Taxa fiscalização", "Vistoria local"]},
-    "Polícia Civil (Termo de Vistoria)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Livro de registro", "Agendamento vistoria"]},
-    "Polícia Federal (Licença)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Mapas mensais (químicos)", "Renovação CRC/CLF", "Controle estoque"]},
-    "Licença Ambiental": {"dias": 1460, "risco": "MÉDIO", "link": "", "tarefas": ["Manifesto resíduos (MTR)", "PGRSS atualizado", "Renovação LO"]},
-    "Cadastro de tanques, bombas e equipamentos afins": {"dias": 1825, "risco": "ALTO", "link": "", "tarefas": ["Teste estanqueidade", "Limpeza tanques", "Licença ambiental"]},
-    "Conselho de Medicina (CRM)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Certificado Regularidade", "Lista corpo clínico", "Anuidade PJ", "Diretor Técnico"]},
-    "Conselho de Enfermagem (COREN)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["CRT (Certidão Resp. Técnica)", "Dimensionamento equipe", "Escalas assinadas"]},
-    "Conselho de Farmácia (CRF)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Certidão Regularidade", "Farmacêutico presente", "Baixa RT anterior"]},
-    "Conselho de Odontologia (CRO)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Inscrição EPAO", "Dentista RT"]},
-    "Conselho de Biomedicina (CRBM)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Registro PJ", "Biomédico RT"]},
-    "Conselho de Biologia (CRBio)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["Registro PJ", "TRT emitido"]},
-    "Conselho de Nutrição (CRN)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["CRQ (Quadro Técnico)", "Manual Boas Práticas"]},
-    "Conselho de Psicologia (CRP)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["Cadastro PJ", "Psicólogo RT"]},
-    "Conselho de Radiologia (CRTR)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Supervisor Proteção Radiológica", "Lista técnicos"]},
-    "Conselho de Fisioterapia e Terapia Ocupacional (CREFITO)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["DRF (Declaração Regularidade)", "Fisioterapeuta RT"]},
-    "Conselho de Fonoaudiologia (CREFONO)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["Registro PJ", "Fonoaudiólogo RT"]},
-    "CNES": {"dias": 180, "risco": "CRÍTICO", "link": "https://cnes.datasus.gov.br/", "tarefas": ["Atualizar RT", "Atualizar quadro RH", "Atualizar equipamentos"]},
-    "Licença Sanitária Serviço (Laboratório)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Controle Qualidade", "Pop's analíticos", "Gerenciamento resíduos"]},
-    "Conselho de Biomedicina (CRBM) Serviço - Laboratório": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["RT Biomédico", "PNCQ", "Calibração"]},
-    "Licença Sanitária Serviço (Farmácia)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Controle temperatura/umidade", "SNGPC (Controlados)", "Qualificação fornecedor"]},
-    "Licença Sanitária Serviço (Radiologia)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Levantamento Radiométrico", "Testes Constância", "Dosimetria"]},
-    "Licença Sanitária Serviço (Tomografia)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Programa Garantia Qualidade", "Testes aceitação", "Laudo físico"]},
-    "Licença Sanitária Serviço (Hemoterapia)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Validação Rede Frio", "Ciclo do sangue", "Comitê Transfusional"]},
-    "Licença Sanitária Serviço (Hemodiálise)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Análise água", "Manutenção máquinas", "Sorologia pacientes"]},
-    "Licença Sanitária Serviço (Oncologia)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Protocolos quimioterapia", "Registro câncer"]},
-    "Licença Sanitária Serviço (UTI Adulto)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Monitoramento 24h", "Equipamentos suporte", "CCIH"]},
-    "Licença Sanitária Serviço (UTI Neonatal)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Incubadoras", "Rede gases", "Área ordenha"]},
-    "Licença Sanitária Serviço (CME)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Testes autoclave", "Qualificação térmica", "Rastreabilidade"]},
-    "Licença Sanitária Serviço (Vacinas)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Rede de frio", "Gerador/Nobreak", "Registro doses"]},
-    "Licença Sanitária Serviço (Equipamento)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["Plano Manutenção", "Calibração", "Teste Segurança Elétrica", "Etiqueta Validade"]},
-})
-for i in range(1, 23):
-    DOC_INTELLIGENCE[f"Licença Sanitária Serviço (Equipamento {i})"] = DOC_INTELLIGENCE["Licença Sanitária Serviço (Equipamento)"]
-
-LISTA_TIPOS_DOCUMENTOS = sorted(list(DOC_INTELLIGENCE.keys()) + ["Outros"])
+# Setores e sugestões de NC (CONTEXT_DATA) ficam em contexto_vistoria.py
+# A base de documentos (DOC_INTELLIGENCE) e o classificador ficam em inteligencia_docs.py
 
 # --- AUTO-REFRESH ---
 components.html("""
@@ -273,292 +147,249 @@ components.html("""
 """, height=0)
 
 # --- FUNÇÕES BÁSICAS ---
-def get_img_as_base64(file):
-    try:
-        with open(file, "rb") as f: data = f.read()
-        return base64.b64encode(data).decode()
-    except: return ""
-
-img_loading = get_img_as_base64("loading.gif")
-
-def safe_prog(val):
-    try: return max(0, min(100, int(float(val))))
-    except: return 0
-
-def normalizar_texto(texto):
-    if texto is None: return ""
-    return ''.join(c for c in unicodedata.normalize('NFKD', str(texto)) if unicodedata.category(c) != 'Mn').lower()
-
-def limpar_texto_pdf(texto):
-    if texto is None: return ""
-    texto = str(texto)
-    # Limpa emojis para não quebrar PDF
-    texto = texto.replace("✅", "[OK]").replace("❌", "[NC]").replace("⚠️", "[!]")
-    texto = texto.replace("🏥", "").replace("🏭", "").replace("🛒", "").replace("🏫", "")
-    return texto.encode('latin-1', 'replace').decode('latin-1')
-
-def aplicar_inteligencia_doc(tipo_doc, data_base=None):
-    if not data_base: data_base = date.today()
-    info = DOC_INTELLIGENCE.get(tipo_doc)
-    if not info:
-        for chave, dados in DOC_INTELLIGENCE.items():
-            if chave in tipo_doc:
-                info = dados
-                break
-    if not info: info = DOC_INTELLIGENCE["DEFAULT"]
-    
-    novo_vencimento = data_base
-    if info["dias"] > 0: novo_vencimento = data_base + timedelta(days=info["dias"])
-    return info["risco"], novo_vencimento, info["link"], info["tarefas"]
-
-def adicionar_tarefas_sugeridas(df_checklist, id_doc, tarefas):
-    novas = []
-    existentes = []
-    if not df_checklist.empty:
-        existentes = df_checklist[df_checklist['Documento_Ref'] == str(id_doc)]['Tarefa'].tolist()
-    for t in tarefas:
-        if t not in existentes:
-            novas.append({"Documento_Ref": str(id_doc), "Tarefa": t, "Feito": False})
-    if novas: return pd.concat([df_checklist, pd.DataFrame(novas)], ignore_index=True)
-    return df_checklist
+# Lido uma vez por processo; servido pelo st.image como arquivo (URL em cache no navegador), não em base64 a cada rerun
+img_loading = arquivo_bytes("loading.gif")
+medidor.marcar("estilo e recursos")
 
 # --- FUNÇÕES DE CONEXÃO E DADOS ---
-def get_creds():
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds_dict = st.secrets["gcp_service_account"]
-    return ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-
-def conectar_gsheets():
-    creds = get_creds()
-    client = gspread.authorize(creds)
-    return client.open("LegalizaHealth_DB")
-
-@st.cache_data(ttl=60)
-def carregar_tudo_inicial():
-    try:
-        sh = conectar_gsheets()
-        ws_prazos = sh.worksheet("Prazos")
-        df_prazos = pd.DataFrame(ws_prazos.get_all_records())
-        try:
-            ws_check = sh.worksheet("Checklist_Itens")
-            df_check = pd.DataFrame(ws_check.get_all_records())
-        except:
-            ws_check = sh.add_worksheet("Checklist_Itens", 1000, 5)
-            ws_check.append_row(["Documento_Ref", "Tarefa", "Feito"])
-            df_check = pd.DataFrame(columns=["Documento_Ref", "Tarefa", "Feito"])
-
-        colunas = ["Unidade", "Setor", "Documento", "CNPJ", "Data_Recebimento", "Vencimento", "Status", "Progresso", "Concluido"]
-        for c in colunas:
-            if c not in df_prazos.columns: df_prazos[c] = ""
-            
-        if not df_prazos.empty:
-            df_prazos["Progresso"] = pd.to_numeric(df_prazos["Progresso"], errors='coerce').fillna(0).astype(int)
-            for col_txt in ['Unidade', 'Setor', 'Documento', 'Status', 'CNPJ']:
-                df_prazos[col_txt] = df_prazos[col_txt].astype(str).str.strip()
-            for c_date in ['Vencimento', 'Data_Recebimento']:
-                df_prazos[c_date] = pd.to_datetime(df_prazos[c_date], dayfirst=True, errors='coerce').dt.date
-            df_prazos = df_prazos[df_prazos['Unidade'] != ""]
-            df_prazos['ID_UNICO'] = df_prazos['Unidade'] + " - " + df_prazos['Documento']
-        
-        if df_check.empty: df_check = pd.DataFrame(columns=["Documento_Ref", "Tarefa", "Feito"])
-        else:
-            df_check['Documento_Ref'] = df_check['Documento_Ref'].astype(str)
-            df_check = df_check[df_check['Tarefa'] != ""]
-        return df_prazos, df_check
+def get_camada():
+    # Credenciais, cliente, planilha e abas em cache no processo; token renovado antes de expirar
+    return carregar("clientes_google").get_camada_google(dict(st.secrets["gcp_service_account"]))
+
+def modo_admin():
+    # Página de desempenho: ?admin=<LEGALIZA_ADMIN_TOKEN> (ou ?admin=1 se nenhum token foi definido)
+    valor, token = st.query_params.get("admin"), os.environ.get("LEGALIZA_ADMIN_TOKEN", "")
+    return bool(valor) and valor == (token or "1")
+
+def conectar_gsheets(nome=None):
+    # Planilha principal ou, com fragmentação em várias planilhas, a de um fragmento
+    return get_camada().planilha(nome)
+
+@st.cache_resource
+def get_armazem():
+    # Um armazém SQLite e um replicador por processo, compartilhados entre as sessões
+    armazem = ArmazemLocal(CAMINHO_DB_LOCAL)
+    replicador = Replicador(armazem, conectar_gsheets, intervalo=INTERVALO_RECONCILIACAO,
+                            operacao=lambda nome: get_camada().operacao(nome), invalidar=lambda: get_camada().invalidar(),
+                            fragmentacao=criar_fragmentacao(lambda funcao: get_camada().propagar(funcao)))
+    if armazem.vazio(): replicador.reconciliar()
+    return armazem, replicador.iniciar()
+
+@st.cache_resource
+def get_repositorio():
+    # Retrato imutável dos dados, compartilhado por todas as sessões do processo
+    armazem, _ = get_armazem()
+    return RepositorioDados(armazem.ler_com_diario, armazem.versao)
+
+def get_retrato():
+    # Falha na leitura: o erro aparece (uma vez por rerun) e a sessão segue com o último retrato bom; sem nenhum, o rerun para
+    try: retrato = get_repositorio().retrato()
     except Exception as e:
-        return pd.DataFrame(), pd.DataFrame()
+        if st.session_state.get('erro_retrato') is not medidor:
+            st.session_state['erro_retrato'] = medidor
+            st.error(f"Erro ao carregar os dados: {e}")
+        if 'ultimo_retrato' not in st.session_state: st.stop()
+        return st.session_state['ultimo_retrato']
+    st.session_state['ultimo_retrato'] = retrato
+    return retrato
+
+def registrar_edicao(tipo, dados):
+    # Cada mutação vai na hora para o diário local; aplicação e envio ficam com o replicador
+    armazem, replicador = get_armazem()
+    seq = armazem.registrar_operacao(tipo, dados, sessao=st.session_state.get('sessao_id', ""))
+    replicador.agendar()
+    return seq
+
+def get_sobreposicao():
+    # Só as edições desta sessão que o diário ainda não aplicou no retrato
+    if 'sobreposicao' not in st.session_state: st.session_state['sobreposicao'] = Sobreposicao()
+    sobreposicao = st.session_state['sobreposicao']
+    sobreposicao.registrar = registrar_edicao
+    sobreposicao.rebasear(get_retrato().seq_diario)
+    return sobreposicao
 
 def get_dados():
-    if 'dados_cache' not in st.session_state or st.session_state['dados_cache'] is None:
-        st.session_state['dados_cache'] = carregar_tudo_inicial()
-    return st.session_state['dados_cache']
-
-def update_dados_local(df_p, df_c):
-    st.session_state['dados_cache'] = (df_p, df_c)
-
-def salvar_alteracoes_completo(df_prazos, df_checklist):
+    # Visão da sessão: retrato compartilhado + edições locais (sem cópia quando não há edições)
+    return get_sobreposicao().aplicar(get_retrato())
+
+def derivado_sessao(nome, construir):
+    # Estruturas derivadas da visão desta sessão, válidas até a próxima edição/versão/dia
+    retrato, sobreposicao = get_retrato(), get_sobreposicao()
+    chave = (retrato.versao, retrato.hoje, sobreposicao.revisao)
+    cache = st.session_state.setdefault('derivados_sessao', {})
+    if cache.get('_chave') != chave:
+        cache.clear()
+        cache['_chave'] = chave
+    if nome not in cache:
+        with medir(f"sessao.{nome}"): cache[nome] = construir()
+    return cache[nome]
+
+def get_indice_busca():
+    # Índice do retrato é compartilhado; só uma sessão com documentos novos/renomeados monta o seu
+    if not get_sobreposicao().toca_busca(): return get_retrato().indice_busca()
+    return derivado_sessao("indice_busca", lambda: IndiceBusca(get_dados()[0]))
+
+def get_agregados():
+    if get_sobreposicao().vazia(): return get_retrato().agregados()
+    return derivado_sessao("agregados", lambda: calcular_agregados(get_dados()[0]))
+
+def get_ordem(coluna):
+    if get_sobreposicao().vazia(): return get_retrato().ordem(coluna)
+    return derivado_sessao(f"ordem_{coluna}", lambda: ordem_coluna(get_dados()[0], coluna))
+
+def get_indice_vencimentos():
+    # Índice do retrato; a sessão que criou/removeu documentos ou mudou vencimentos ajusta só essas linhas
+    sobreposicao = get_sobreposicao()
+    if not sobreposicao.toca_vencimentos(): return get_retrato().indice_vencimentos()
+    return derivado_sessao("indice_vencimentos", lambda: sobreposicao.indice_vencimentos(get_retrato(), get_dados()[0]))
+
+@st.cache_resource(max_entries=16)
+def figura_status(contagens):
+    # Mesmas contagens (tupla de pares) -> mesma figura, sem remontar a cada rerun
+    px = carregar("plotly.express")
+    if px is None or not contagens: return None
+    nomes, valores = zip(*contagens)
+    fig = px.pie(values=list(valores), names=list(nomes), hole=0.6, color=list(nomes), color_discrete_map={"CRÍTICO": "#ff4b4b", "ALTO": "#ffa726", "NORMAL": "#00c853"})
+    fig.update_layout(showlegend=True, margin=dict(t=0, b=0, l=0, r=0), paper_bgcolor='rgba(0,0,0,0)', legend=dict(orientation="h", y=-0.2))
+    return fig
+
+def _status_sincronizacao():
+    try: estado = get_armazem()[1].estado()
+    except Exception: return
+    if estado["diario_pendente"] or estado["pendente"]:
+        texto = f"⏳ {estado['diario_pendente']} edição(ões) salvas localmente" if estado["diario_pendente"] else "⏳ Enviando para a nuvem..."
+        if estado["proxima_tentativa"]: texto += f" | próximo envio em {estado['proxima_tentativa']:.0f}s"
+        if estado["ultimo_erro"]: texto += f" | ⚠️ {str(estado['ultimo_erro'])[:80]}"
+        st.caption(texto)
+    else:
+        st.caption("☁️ Tudo salvo na nuvem" + (f" ({datetime.fromtimestamp(estado['ultimo_envio']):%H:%M})" if estado["ultimo_envio"] else ""))
+
+def acompanhar_sincronizacao():
+    # Enquanto houver edição a caminho da nuvem, só este fragmento é reexecutado (a cada 2s)
+    try: estado = get_armazem()[1].estado()
+    except Exception: return
+    if estado["diario_pendente"] or estado["pendente"]: st.fragment(_status_sincronizacao, run_every=2)()
+    else: _status_sincronizacao()
+
+def sincronizar_unidade(df_unidade):
+    # Filtro numa unidade: pede já a carga só do(s) fragmento(s) dela, sem esperar o ciclo do replicador
+    try:
+        _, replicador = get_armazem()
+        if replicador.fragmentacao is not None and not df_unidade.empty:
+            replicador.agendar(fragmentos=replicador.fragmentacao.fragmentos_de(df_unidade))
+    except Exception: pass
+
+def anexar_importacao(df_novos):
+    # Importação em massa: só as linhas novas entram no armazém e sobem por append
+    if df_novos.empty: return True
     try:
-        sh = conectar_gsheets()
-        ws_prazos = sh.worksheet("Prazos")
-        ws_prazos.clear()
-        df_p = df_prazos.copy()
-        if 'ID_UNICO' in df_p.columns: df_p = df_p.drop(columns=['ID_UNICO'])
-        for c_date in ['Vencimento', 'Data_Recebimento']:
-            df_p[c_date] = df_p[c_date].apply(lambda x: x.strftime('%d/%m/%Y') if hasattr(x, 'strftime') else str(x))
-        df_p['Concluido'] = df_p['Concluido'].astype(str)
-        df_p['Progresso'] = df_p['Progresso'].apply(safe_prog)
-        colunas_ordem = ["Unidade", "Setor", "Documento", "CNPJ", "Data_Recebimento", "Vencimento", "Status", "Progresso", "Concluido"]
-        for c in colunas_ordem: 
-            if c not in df_p.columns: df_p[c] = ""
-        df_p = df_p[colunas_ordem]
-        ws_prazos.update([df_p.columns.values.tolist()] + df_p.values.tolist())
-        
-        ws_check = sh.worksheet("Checklist_Itens")
-        ws_check.clear()
-        df_c = df_checklist.copy()
-        df_c['Feito'] = df_c['Feito'].astype(str)
-        ws_check.update([df_c.columns.values.tolist()] + df_c.values.tolist())
-        st.cache_data.clear()
-        st.session_state['dados_cache'] = (df_prazos, df_checklist)
-        st.toast("✅ Dados Sincronizados com a Nuvem!", icon="☁️")
+        armazem, replicador = get_armazem()
+        armazem.aplicar_diario()   # edições anteriores entram antes das linhas importadas
+        armazem.anexar(df_novos)
+        replicador.agendar()
         return True
     except Exception as e:
-        st.error(f"Erro ao salvar: {e}")
+        st.error(f"Erro ao importar: {e}")
         return False
 
-def upload_foto_drive(foto_binaria, nome_arquivo):
-    if not ID_PASTA_DRIVE: return ""
+@st.cache_resource
+def get_uploader():
+    # Cada worker do pool constrói seu próprio cliente Drive com as credenciais da camada
+    return carregar("drive_uploader").ServicoUploadDrive(get_camada().servico_drive, ID_PASTA_DRIVE)
+
+@st.cache_resource
+def get_blobs():
+    # Fotos e áudios da Vistoria ficam em disco pelo hash; a sessão guarda só as referências
+    return ArmazemBlobs(CAMINHO_BLOBS, limite_bytes=LIMITE_BLOBS_MB * 1024 * 1024)
+
+class DonoBlobsSessao:
+    # Fica no session_state: quando o Streamlit descarta a sessão, as referências dela são liberadas
+    def __init__(self, sessao_id):
+        self.sessao_id = sessao_id
+        get_blobs().vincular_sessao(self, sessao_id)
+
+def guardar_blob(dados):
+    return get_blobs().guardar(dados, sessao=st.session_state['sessao_id'])
+
+def atualizar_refs_sessao():
+    # Depois de descartar fotos/itens: o que a sessão não usa mais vira órfão (removível por LRU)
+    refs = set(st.session_state['fotos_temp'])
+    for reg in st.session_state['sessao_vistoria']:
+        refs.update(reg['Fotos'])
+        if reg.get('Audio'): refs.add(reg['Audio'])
+    get_blobs().definir_refs(st.session_state['sessao_id'], refs)
+
+def upload_foto_drive(foto_binaria, nome_arquivo, grupo=None):
+    # Enfileira o envio e retorna o id da tarefa; o progresso sai de get_uploader().status/resumo.
+    # Foto guardada como blob vai com o hash como chave: clicar de novo não reenvia o que já subiu.
+    if not ID_PASTA_DRIVE: return None
     try:
-        creds = get_creds()
-        service = build('drive', 'v3', credentials=creds)
-        file_metadata = {'name': nome_arquivo, 'parents': [ID_PASTA_DRIVE]}
-        media = MediaIoBaseUpload(foto_binaria, mimetype='image/jpeg')
-        file = service.files().create(body=file_metadata, media_body=media, fields='id, webContentLink').execute()
-        return file.get('webContentLink', '')
+        if isinstance(foto_binaria, str): dados, chave = get_blobs().ler(foto_binaria), foto_binaria
+        else: dados, chave = (foto_binaria.getvalue() if hasattr(foto_binaria, 'getvalue') else foto_binaria), None
+        return get_uploader().enviar(dados, nome_arquivo, 'image/jpeg', grupo=grupo, chave=chave)
     except Exception as e:
         st.error(f"Erro Drive: {e}")
-        return ""
+        return None
 
 def salvar_vistoria_db(lista_itens):
     # Função mantida para compatibilidade futura, mas o foco agora é PDF local
     pass
 
-def enviar_notificacao_push(titulo, mensagem, prioridade="default"):
-    try:
-        requests.post(f"https://ntfy.sh/{TOPICO_NOTIFICACAO}",
-                      data=mensagem.encode('utf-8'),
-                      headers={"Title": titulo.encode('utf-8'), "Priority": prioridade, "Tags": "hospital"})
-        return True
-    except: return False
-
-def transcrever_audio(audio_file):
-    if not TEM_RECONHECIMENTO_VOZ: return "Erro: Biblioteca não instalada."
-    r = sr.Recognizer()
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_audio:
-            tmp_audio.write(audio_file.read())
-            tmp_audio_path = tmp_audio.name
-        with sr.AudioFile(tmp_audio_path) as source:
-            audio_data = r.record(source)
-            texto = r.recognize_google(audio_data, language="pt-BR")
-        os.unlink(tmp_audio_path)
-        return texto
-    except: return ""
-
-class RelatorioPDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 14)
-        self.cell(0, 10, 'Relatorio de Vistoria Tecnica - Legalizacao', 0, 1, 'C')
-        self.set_font('Arial', 'I', 10)
-        self.cell(0, 10, f'Data: {datetime.now().strftime("%d/%m/%Y %H:%M")}', 0, 1, 'C')
-        self.ln(5)
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
-
-def gerar_pacote_zip_completo(itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente):
-    pdf = RelatorioPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 12)
-    epw = pdf.w - 2*pdf.l_margin 
-    
-    pdf.set_fill_color(220, 220, 220)
-    pdf.cell(epw, 10, "DADOS DO CLIENTE / UNIDADE", 1, 1, 'L', fill=True)
-    pdf.set_font("Arial", "", 11)
-    pdf.multi_cell(epw, 6, f"Cliente: {limpar_texto_pdf(nome_cliente)}\nEndereco: {limpar_texto_pdf(endereco_cliente)}\nTipo: {limpar_texto_pdf(tipo_estabelecimento)}", 1)
-    pdf.ln(5)
-
-    total = len(itens_vistoria)
-    criticos = sum(1 for i in itens_vistoria if i['Gravidade'] == 'CRÍTICO')
-    pdf.set_font("Arial", "B", 12)
-    pdf.set_fill_color(240, 240, 240)
-    pdf.cell(epw, 10, "RESUMO EXECUTIVO", 1, 1, 'L', fill=True)
-    pdf.set_font("Arial", "", 11)
-    pdf.cell(epw, 8, f"Total de Apontamentos: {total} | Pontos Criticos: {criticos}", 1, 1)
-    pdf.ln(5)
-
-    audios_para_zip = []
-    for idx, item in enumerate(itens_vistoria):
-        if pdf.get_y() > 250: pdf.add_page()
-        
-        if item['Gravidade'] == 'CRÍTICO': pdf.set_fill_color(255, 200, 200)
-        elif item['Gravidade'] == 'Alto': pdf.set_fill_color(255, 230, 200)
-        else: pdf.set_fill_color(230, 255, 230)
-        
-        local_safe = limpar_texto_pdf(item['Local'])
-        item_safe = limpar_texto_pdf(item['Item'])
-        obs_safe = limpar_texto_pdf(item['Obs'])
-        
-        pdf.set_font("Arial", "B", 11)
-        pdf.multi_cell(epw, 8, f"#{idx+1} - {local_safe}", 1, 'L', fill=True)
-        pdf.set_font("Arial", "B", 10)
-        pdf.set_x(pdf.l_margin)
-        pdf.multi_cell(epw, 6, f"NC Identificada: {item_safe}", 1, 'L')
-        
-        pdf.set_font("Arial", "", 10)
-        pdf.set_x(pdf.l_margin) 
-        pdf.cell(epw/2, 6, f"Status: {limpar_texto_pdf(item['Situação'])}", 1, 0, 'L')
-        pdf.cell(epw/2, 6, f"Risco: {limpar_texto_pdf(item['Gravidade'])}", 1, 1, 'L')
-        
-        info_extra = ""
-        if item.get('Audio_Bytes'):
-            nome_audio = f"Audio_Item_{idx+1}.wav"
-            audios_para_zip.append((nome_audio, item['Audio_Bytes']))
-            info_extra = f" [AUDIO ANEXO: {nome_audio}]"
-            
-        pdf.set_x(pdf.l_margin)
-        pdf.multi_cell(epw, 6, f"Nota Tecnica: {obs_safe}{info_extra}", 1, 'L')
-        pdf.ln(2)
-        
-        if item['Fotos']:
-            x_start = 10; y_start = pdf.get_y(); img_w = 45; img_h = 45
-            for i, foto_bytes in enumerate(item['Fotos']):
-                try:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as t:
-                        t.write(foto_bytes); temp_path = t.name
-                    if x_start + img_w > 200:
-                        x_start = 10; y_start += img_h + 5
-                        if y_start > 250: pdf.add_page(); y_start = 20
-                    pdf.image(temp_path, x=x_start, y=y_start, w=img_w, h=img_h)
-                    x_start += img_w + 5; os.unlink(temp_path)
-                except: pass
-            pdf.set_y(y_start + img_h + 10)
-        else: pdf.ln(2)
-        pdf.line(10, pdf.get_y(), 200, pdf.get_y()); pdf.ln(5)
-        
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        pdf_bytes = pdf.output() 
-        zip_file.writestr(f"Relatorio_Vistoria_{datetime.now().strftime('%d-%m')}.pdf", pdf_bytes)
-        for nome_arq, dados_audio in audios_para_zip:
-            if hasattr(dados_audio, 'getvalue'): zip_file.writestr(nome_arq, dados_audio.getvalue())
-            else: zip_file.writestr(nome_arq, dados_audio)
-    return zip_buffer.getvalue()
+@st.cache_resource
+def get_transcricao():
+    # Motor escolhido por LEGALIZA_TRANSCRICAO (google/sphinx/fixo); None se a biblioteca de voz não existe
+    try: return ServicoTranscricao(criar_motor())
+    except ImportError: return None
+
+def _status_transcricao(chave, dados):
+    r = get_transcricao().resultado(chave)
+    if r is None: return
+    if r["estado"] == "concluido":
+        if chave in st.session_state['transcricoes_aplicadas']: return
+        st.session_state['transcricoes_aplicadas'].add(chave)
+        if r["texto"] and r["texto"] not in st.session_state['obs_atual']:
+            st.session_state['obs_atual'] += " " + r["texto"]
+            st.rerun()
+    elif r["estado"] == "erro":
+        # Falha não volta sozinha para a fila (um rerun não pode repetir em loop): só pelo botão
+        c_msg, c_repetir = st.columns([3, 1])
+        c_msg.caption("⚠️ Não foi possível transcrever a nota de voz.")
+        if c_repetir.button("🔄 Tentar novamente", key=f"repetir_transcricao_{chave}"):
+            get_transcricao().solicitar(dados, repetir_erro=True)
+            st.rerun()
+    else: st.caption("🎙️ Transcrevendo a nota de voz...")
+
+def acompanhar_transcricao(dados):
+    # Enquanto a transcrição não termina, só este fragmento é reexecutado (a cada 1s)
+    chave = get_transcricao().solicitar(dados)
+    r = get_transcricao().resultado(chave)
+    if r is not None and r["estado"] in ("na_fila", "transcrevendo"): st.fragment(_status_transcricao, run_every=1)(chave, dados)
+    else: _status_transcricao(chave, dados)
 
 # --- INTERFACE ---
 if 'vistorias' not in st.session_state: st.session_state['vistorias'] = []
 if 'sessao_vistoria' not in st.session_state: st.session_state['sessao_vistoria'] = []
 if 'fotos_temp' not in st.session_state: st.session_state['fotos_temp'] = []
+if 'transcricoes_aplicadas' not in st.session_state: st.session_state['transcricoes_aplicadas'] = set()
 if 'obs_atual' not in st.session_state: st.session_state['obs_atual'] = ""
 if 'tipo_estabelecimento_atual' not in st.session_state: st.session_state['tipo_estabelecimento_atual'] = "🏥 Hospital / Clínica / Laboratório"
 if 'checks_temp' not in st.session_state: st.session_state['checks_temp'] = {}
-if 'last_notify_critico' not in st.session_state: st.session_state['last_notify_critico'] = datetime.min
-if 'last_notify_alto' not in st.session_state: st.session_state['last_notify_alto'] = datetime.min
 if 'doc_focado_id' not in st.session_state: st.session_state['doc_focado_id'] = None
 if 'filtro_dash' not in st.session_state: st.session_state['filtro_dash'] = "TODOS"
 if 'cliente_nome' not in st.session_state: st.session_state['cliente_nome'] = ""
 if 'cliente_endereco' not in st.session_state: st.session_state['cliente_endereco'] = ""
+if 'sessao_id' not in st.session_state: st.session_state['sessao_id'] = datetime.now().strftime("%Y%m%d%H%M%S%f")
+if 'dono_blobs' not in st.session_state: st.session_state['dono_blobs'] = DonoBlobsSessao(st.session_state['sessao_id'])
 
 with st.sidebar:
-    if img_loading: st.markdown(f"""<div style="text-align: center;"><img src="data:image/gif;base64,{img_loading}" width="100%" style="border-radius:10px;"></div>""", unsafe_allow_html=True)
+    if img_loading: st.image(img_loading, use_container_width=True)
     
     st.markdown("<h1 class='sidebar-title'>Legaliza Health</h1>", unsafe_allow_html=True)
     
     menu = option_menu(
         menu_title=None, 
-        options=["Painel Geral", "Gestão de Docs", "Vistoria Mobile"], 
-        icons=["speedometer2", "folder-check", "camera-fill"], 
+        options=["Painel Geral", "Gestão de Docs", "Vistoria Mobile"] + (["Desempenho"] if modo_admin() else []), 
+        icons=["speedometer2", "folder-check", "camera-fill", "activity"], 
         default_index=0,
         styles={
             "container": {"padding": "0!important", "background-color": "transparent"},
@@ -568,38 +399,13 @@ with st.sidebar:
         }
     )
     st.caption("v66.0 - Versão Final Premium")
+    if st.query_params.get("partida") == "1" or os.environ.get("LEGALIZA_RELATORIO_PARTIDA") == "1":
+        with st.expander("⏱️ Relatório de partida"):
+            st.dataframe(pd.DataFrame(relatorio_partida(medidor_anterior)), hide_index=True, use_container_width=True)
+medidor.marcar("estado e menu")
 
 # --- ROBÔ ---
-try:
-    agora = datetime.now()
-    diff_crit = (agora - st.session_state['last_notify_critico']).total_seconds() / 60
-    diff_alto = (agora - st.session_state['last_notify_alto']).total_seconds() / 60
-    df_alertas = get_dados()[0]
-    if df_alertas is not None:
-        msgs_crit = []
-        msgs_alto = []
-        hoje = datetime.now(pytz.timezone('America/Sao_Paulo')).date()
-        for index, row in df_alertas.iterrows():
-            try:
-                doc_nome = str(row['Documento'])
-                if "SELECIONE" in doc_nome or "PENDENTE" in doc_nome: continue
-                if row['Status'] == "NORMAL": continue
-                prog = safe_prog(row['Progresso'])
-                if prog >= 100: continue
-                dias = (row['Vencimento'] - hoje).days
-                unidade = row['Unidade']
-                risco = row['Status']
-                msg = f"🏥 {unidade}\n📄 {doc_nome}\n⏳ Vence em {dias} dias"
-                if risco == "CRÍTICO" and (dias <= 5 or dias < 0): msgs_crit.append(msg)
-                elif risco == "ALTO" and (dias <= 5 or dias < 0): msgs_alto.append(msg)
-            except: pass
-        if msgs_crit and diff_crit >= 60:
-            corpo = "\n----------------\n".join(msgs_crit[:10])
-            if enviar_notificacao_push("🚨 ALERTA CRÍTICO (1h)", corpo, "high"): st.session_state['last_notify_critico'] = agora
-        if msgs_alto and diff_alto >= 180:
-            corpo = "\n----------------\n".join(msgs_alto[:10])
-            if enviar_notificacao_push("🟠 ALERTA ALTO (3h)", corpo, "default"): st.session_state['last_notify_alto'] = agora
-except Exception as e: pass
+# Os alertas push rodam no processo agendador_alertas.py, fora do ciclo de renderização.
 
 # --- TELAS ---
 if menu == "Painel Geral":
@@ -609,54 +415,109 @@ if menu == "Painel Geral":
         st.warning("Ainda não há documentos cadastrados. Adicione na aba 'Gestão de Docs'.")
         st.stop()
     
-    # KPIS
-    n_crit = len(df_p[df_p['Status'] == 'CRÍTICO'])
-    n_alto = len(df_p[df_p['Status'] == 'ALTO'])
-    n_norm = len(df_p[df_p['Status'] == 'NORMAL'])
+    # KPIS (agregados materializados por versão dos dados)
+    resumo = get_agregados()
+    n_crit = resumo["por_status"].get('CRÍTICO', 0)
+    n_alto = resumo["por_status"].get('ALTO', 0)
+    n_norm = resumo["por_status"].get('NORMAL', 0)
     c1, c2, c3, c4 = st.columns(4)
     if c1.button(f"🔴 CRÍTICO: {n_crit}", use_container_width=True): st.session_state['filtro_dash'] = "CRÍTICO"
     if c2.button(f"🟠 ALTO: {n_alto}", use_container_width=True): st.session_state['filtro_dash'] = "ALTO"
     if c3.button(f"🟢 NORMAL: {n_norm}", use_container_width=True): st.session_state['filtro_dash'] = "NORMAL"
-    if c4.button(f"📋 TOTAL: {len(df_p)}", use_container_width=True): st.session_state['filtro_dash'] = "TODOS"
+    if c4.button(f"📋 TOTAL: {resumo['total']}", use_container_width=True): st.session_state['filtro_dash'] = "TODOS"
+    st.caption(f"⏰ Vencidos: {resumo['vencidos']} | 🔔 Em alerta: {resumo['em_alerta']}")
+    config_lista = {"Vencimento": st.column_config.DateColumn("Prazo", format="DD/MM/YYYY"), "dias_para_vencer": st.column_config.NumberColumn("Dias", format="%d"), "Progresso": st.column_config.ProgressColumn("Progressão", format="%d%%"), "Status": st.column_config.TextColumn("Risco", width="small")}
+    hoje_painel, indice_venc = get_retrato().hoje, get_indice_vencimentos()
+    with st.expander(f"⏳ Próximos {MAX_PROXIMOS} vencimentos"):
+        # Busca binária a partir de hoje; só os blocos necessários do índice passam pelo filtro de pendentes
+        proximos = indice_venc.proximos(MAX_PROXIMOS, hoje_painel, filtro=lambda bloco: pendentes(df_p, bloco))
+        if len(proximos): st.dataframe(df_p.loc[proximos, COLUNAS_LISTA], use_container_width=True, hide_index=True, column_config=config_lista)
+        else: st.info("Nenhum vencimento pendente.")
     st.markdown("---")
-    busca_painel = st.text_input("🔎 Buscar Unidade/Documento", placeholder="Ex: gravatai, crm, alvara...")
+    c_busca, c_venc = st.columns([3, 1])
+    busca_painel = c_busca.text_input("🔎 Buscar Unidade/Documento", placeholder="Ex: gravatai, crm, alvara...")
+    janela_venc = c_venc.selectbox("📅 Vencimento", list(JANELAS_VENCIMENTO))
     f_atual = st.session_state['filtro_dash']
     st.subheader(f"Lista de Processos: {f_atual}")
-    df_show = df_p.copy()
-    if f_atual != "TODOS": df_show = df_show[df_show['Status'] == f_atual]
+    # Filtro vira máscara posicional; ordenação usa posições pré-calculadas; só a página vai para o navegador
+    mascara = (df_p['Status'] == f_atual).to_numpy() if f_atual != "TODOS" else None
     if busca_painel:
-        termo = normalizar_texto(busca_painel)
-        df_show = df_show[df_show.apply(lambda row: termo in normalizar_texto(str(row.values)), axis=1)]
+        pos_busca = df_p.index.get_indexer(get_indice_busca().buscar(busca_painel))
+        pos_busca = pos_busca[pos_busca >= 0]
+        achados = np.zeros(len(df_p), dtype=bool); achados[pos_busca] = True
+        mascara = achados if mascara is None else mascara & achados
+    if JANELAS_VENCIMENTO[janela_venc] is not None:
+        dias_janela = JANELAS_VENCIMENTO[janela_venc]
+        rot_venc = indice_venc.vencidos(hoje_painel) if dias_janela < 0 else indice_venc.vencendo(hoje_painel, dias_janela)
+        pos_venc = df_p.index.get_indexer(rot_venc[pendentes(df_p, rot_venc)])
+        na_janela = np.zeros(len(df_p), dtype=bool); na_janela[pos_venc[pos_venc >= 0]] = True
+        mascara = na_janela if mascara is None else mascara & na_janela
+    rotulos_ordem = {"Relevância": "Relevância", "Vencimento": "Prazo", "dias_para_vencer": "Dias", "Unidade": "Unidade", "Documento": "Documento", "Setor": "Setor", "Progresso": "Progressão", "Status": "Risco"}
+    c_ord, c_dir, c_tam, c_pag = st.columns([2, 1, 1, 1])
+    coluna_ordem = c_ord.selectbox("Ordenar por", (["Relevância"] if busca_painel else []) + list(rotulos_ordem)[1:], format_func=rotulos_ordem.get)
+    crescente = c_dir.toggle("Crescente", value=True)
+    tamanho_pag = c_tam.selectbox("Por página", TAMANHOS_PAGINA, index=1)
+    pagina = c_pag.number_input("Página", min_value=1, value=1, step=1)
+    if coluna_ordem == "Relevância": ordem, n_validos, crescente = pos_busca, len(pos_busca), True
+    else: ordem, n_validos = get_ordem(coluna_ordem)
+    df_show, total_filtrado, n_paginas, pagina = selecionar_pagina(df_p, ordem, n_validos, crescente, mascara, int(pagina), tamanho_pag)
     if not df_show.empty:
-        st.dataframe(df_show[['Unidade', 'Setor', 'Documento', 'Vencimento', 'Progresso', 'Status']], use_container_width=True, hide_index=True, column_config={"Vencimento": st.column_config.DateColumn("Prazo", format="DD/MM/YYYY"), "Progresso": st.column_config.ProgressColumn("Progressão", format="%d%%"), "Status": st.column_config.TextColumn("Risco", width="small")})
+        st.caption(f"{total_filtrado} processos | página {pagina} de {n_paginas}")
+        st.dataframe(df_show[COLUNAS_LISTA], use_container_width=True, hide_index=True, column_config=config_lista)
     else: st.info("Nenhum item encontrado.")
     st.markdown("---")
     st.subheader("Panorama")
-    if not df_p.empty and TEM_PLOTLY:
-        status_counts = df_p['Status'].value_counts()
-        fig = px.pie(values=status_counts.values, names=status_counts.index, hole=0.6, color=status_counts.index, color_discrete_map={"CRÍTICO": "#ff4b4b", "ALTO": "#ffa726", "NORMAL": "#00c853"})
-        fig.update_layout(showlegend=True, margin=dict(t=0, b=0, l=0, r=0), paper_bgcolor='rgba(0,0,0,0)', legend=dict(orientation="h", y=-0.2))
+    fig = figura_status(tuple(resumo["por_status"].items()))
+    if fig is not None:
         st.plotly_chart(fig, use_container_width=True)
-        media = int(df_p['Progresso'].mean()) if not df_p.empty else 0
+        media = resumo["progresso_medio"]
         st.metric("Progressão Geral", f"{media}%")
         st.progress(media)
+    st.markdown("---")
+    with st.expander("📅 Calendário de vencimentos (.ics)"):
+        st.caption("Importe no Google Agenda/Outlook. Para uma assinatura que se atualiza sozinha, o agendador publica os mesmos calendários com --ics <pasta>.")
+        c_tipo, c_escolha = st.columns([1, 2])
+        por_risco = c_tipo.radio("Calendário", ["Por unidade", "Por risco"], horizontal=True) == "Por risco"
+        escolha = c_escolha.selectbox("Risco" if por_risco else "Unidade", sorted(resumo["por_status" if por_risco else "por_unidade"]))
+        if escolha:
+            filtro_feed = {"risco": escolha} if por_risco else {"unidade": escolha}
+            st.download_button("📥 BAIXAR CALENDÁRIO (.ics)", data=lambda: gerar_ics(selecionar_feed(df_p, indice_venc, hoje_painel, **filtro_feed), f"Vencimentos - {escolha}"),
+                               file_name=nome_feed_risco(escolha) if por_risco else nome_feed_unidade(escolha), mime="text/calendar", use_container_width=True)
+    with st.expander("📑 Relatórios de conformidade por unidade"):
+        st.caption("Um PDF por unidade em um único ZIP. Só as unidades com dados alterados desde o último lote são geradas de novo.")
+        if st.button("GERAR RELATÓRIOS DAS UNIDADES", use_container_width=True):
+            lote = carregar("relatorio_unidades")  # FPDF e o pool de processos só quando alguém pede o lote
+            with st.spinner("Gerando relatórios..."):
+                arquivo_lote, resumo_lote = lote.gerar_relatorios_unidades_arquivo(df_p, get_dados()[1])
+            anterior = st.session_state.get('lote_unidades')
+            if anterior: anterior[0].descartar()
+            # O ZIP vai junto com o session_state: sessão encerrada, arquivo apagado
+            st.session_state['lote_unidades'] = (arquivo_lote, resumo_lote, datetime.now().strftime('%d-%m-%H%M'))
+        if 'lote_unidades' in st.session_state:
+            arquivo_lote, resumo_lote, carimbo = st.session_state['lote_unidades']
+            st.caption(f"{resumo_lote['unidades']} unidades | {resumo_lote['gerados']} geradas | {resumo_lote['reaproveitados']} sem alteração")
+            if arquivo_lote.existe():
+                st.download_button("📥 BAIXAR RELATÓRIOS (ZIP)", data=arquivo_lote.ler, file_name=f"Conformidade_Unidades_{carimbo}.zip", mime="application/zip", type="primary", use_container_width=True)
 
 elif menu == "Gestão de Docs":
     st.title("Gestão de Documentos")
+    acompanhar_sincronizacao()
     df_prazos, df_checklist = get_dados()
     with st.expander("🔍 FILTROS", expanded=True):
         f1, f2, f3 = st.columns(3)
-        lista_uni = ["Todas"] + sorted(list(df_prazos['Unidade'].unique())) if 'Unidade' in df_prazos.columns else ["Todas"]
+        lista_uni = ["Todas"] + sorted(df_prazos['Unidade'].astype(str).unique()) if 'Unidade' in df_prazos.columns else ["Todas"]
         f_uni = f1.selectbox("Unidade:", lista_uni)
         f_stt = f2.multiselect("Status:", ["CRÍTICO", "ALTO", "NORMAL"])
         f_txt = f3.text_input("Buscar Inteligente (Nome/CNPJ/Setor):")
         if st.button("Limpar"): st.rerun()
-    df_show = df_prazos.copy()
-    if f_uni != "Todas": df_show = df_show[df_show['Unidade'] == f_uni]
+    df_show = df_prazos
+    if f_uni != "Todas":
+        df_show = df_show[df_show['Unidade'] == f_uni]
+        if st.session_state.get('unidade_sincronizada') != f_uni:
+            st.session_state['unidade_sincronizada'] = f_uni
+            sincronizar_unidade(df_show)
     if f_stt: df_show = df_show[df_show['Status'].isin(f_stt)]
-    if f_txt:
-        termo = normalizar_texto(f_txt)
-        df_show = df_show[df_show.apply(lambda row: termo in normalizar_texto(str(row.values)), axis=1)]
+    if f_txt: df_show = get_indice_busca().filtrar(df_show, f_txt)
     col_l, col_d = st.columns([1.2, 2])
     with col_l:
         st.info(f"Lista ({len(df_show)})")
@@ -673,11 +534,9 @@ elif menu == "Gestão de Docs":
                 if st.form_submit_button("ADICIONAR"):
                     if n_u and n_d and n_c:
                         risco_sug, venc_sug, link_sug, tarefas_sug = aplicar_inteligencia_doc(n_d)
-                        novo = {"Unidade": n_u, "Setor": n_s, "Documento": n_d, "CNPJ": n_c, "Data_Recebimento": date.today(), "Vencimento": venc_sug, "Status": risco_sug, "Progresso": 0, "Concluido": "False"}
-                        df_temp = pd.concat([pd.DataFrame([novo]), df_prazos], ignore_index=True)
-                        df_temp['ID_UNICO'] = df_temp['Unidade'] + " - " + df_temp['Documento']
-                        if tarefas_sug: df_checklist = adicionar_tarefas_sugeridas(df_checklist, df_temp['ID_UNICO'].iloc[0], tarefas_sug)
-                        update_dados_local(df_temp, df_checklist)
+                        novo = {"Unidade": n_u, "Setor": n_s, "Documento": n_d, "CNPJ": n_c, "Data_Recebimento": date.today(), "Vencimento": venc_sug, "Status": risco_sug, "Progresso": 0, "Concluido": "False", "ID_UNICO": id_unico(n_u, n_d)}
+                        get_sobreposicao().adicionar(novo)
+                        if tarefas_sug: get_sobreposicao().definir_tarefas(novo["ID_UNICO"], adicionar_tarefas_sugeridas(df_checklist[df_checklist['Documento_Ref'] == novo["ID_UNICO"]], novo["ID_UNICO"], tarefas_sug))
                         st.toast(f"Criado! Checklist sugerido carregado.", icon="✅")
                         st.rerun()
                     else: st.error("Preencha Unidade, Documento e CNPJ.")
@@ -685,40 +544,19 @@ elif menu == "Gestão de Docs":
         with st.expander("⬆️ Importar Unidades/CNPJ (Excel/CSV)"):
             import_file = st.file_uploader("Carregar arquivo (.xlsx ou .csv)", type=['xlsx', 'csv'], key="uploader_import_mass")
             if import_file:
-                df_novo = pd.DataFrame()
                 try:
-                    try: df_novo = pd.read_excel(import_file)
-                    except:
-                        import_file.seek(0)
-                        try: df_novo = pd.read_csv(import_file, sep=';', encoding='latin-1')
-                        except: 
-                            import_file.seek(0)
-                            df_novo = pd.read_csv(import_file, sep=',', encoding='utf-8')
-                    if not df_novo.empty:
-                        df_novo.columns = df_novo.columns.str.strip()
-                        if 'Nome da unidade' in df_novo.columns and 'CNPJ' in df_novo.columns:
-                            df_import = df_novo[['Nome da unidade', 'CNPJ']].copy()
-                            df_import = df_import.rename(columns={'Nome da unidade': 'Unidade'})
+                    df_previa = previa_importacao(import_file)
+                    if not df_previa.empty:
+                        if 'Nome da unidade' in df_previa.columns and 'CNPJ' in df_previa.columns:
                             st.write("### 🔎 Pré-visualização:")
-                            st.dataframe(df_import.head(5), use_container_width=True)
+                            st.dataframe(df_previa.rename(columns={'Nome da unidade': 'Unidade'}), use_container_width=True)
                             if st.button(f"✅ Confirmar Importação", type="primary"):
-                                df_import['Setor'] = ""
-                                df_import['Documento'] = "⚠️ SELECIONE O TIPO"
-                                df_import['Data_Recebimento'] = date.today()
-                                df_import['Vencimento'] = date.today()
-                                df_import['Status'] = "NORMAL"
-                                df_import['Progresso'] = 0
-                                df_import['Concluido'] = "False"
-                                df_import['Unidade'] = df_import['Unidade'].astype(str)
-                                df_import['CNPJ'] = df_import['CNPJ'].astype(str)
-                                df_import['ID_UNICO'] = df_import['Unidade'] + " - " + df_import['CNPJ'] + " - " + df_import['Documento']
-                                df_combinado = pd.concat([df_prazos, df_import], ignore_index=True)
-                                df_combinado = df_combinado.drop_duplicates(subset=['ID_UNICO'], keep='last').reset_index(drop=True)
-                                salvar_alteracoes_completo(df_combinado, df_checklist)
-                                st.success(f"✅ {len(df_import)} importados!")
-                                st.balloons()
-                                time.sleep(1)
-                                st.rerun()
+                                df_novos, resumo_imp = importar_arquivo(import_file, df_prazos)
+                                if anexar_importacao(df_novos):
+                                    st.success(f"✅ {resumo_imp['novas']} importados! ({resumo_imp['duplicadas']} já existiam)")
+                                    st.balloons()
+                                    time.sleep(1)
+                                    st.rerun()
                         else: st.error(f"Necessário colunas 'Nome da unidade' e 'CNPJ'.")
                 except Exception as e: st.error(f"Erro: {e}")
         st.markdown("---")
@@ -727,9 +565,7 @@ elif menu == "Gestão de Docs":
             confirm = st.checkbox("Sim, quero excluir tudo")
             if confirm:
                 if st.button("❌ EXCLUIR TODA A LISTA", type="primary"):
-                    df_prazos = pd.DataFrame(columns=["Unidade", "Setor", "Documento", "CNPJ", "Data_Recebimento", "Vencimento", "Status", "Progresso", "Concluido", "ID_UNICO"])
-                    df_checklist = pd.DataFrame(columns=["Documento_Ref", "Tarefa", "Feito"])
-                    salvar_alteracoes_completo(df_prazos, df_checklist)
+                    get_sobreposicao().excluir_tudo()
                     st.session_state['doc_focado_id'] = None
                     st.success("Tudo excluído!")
                     time.sleep(1)
@@ -751,15 +587,10 @@ elif menu == "Gestão de Docs":
                      if c_edit_btn.button("Salvar Tipo"):
                         antigo_id = doc_ativo_id
                         nova_unidade = df_prazos.at[idx, 'Unidade']
-                        cnpj_atual = df_prazos.at[idx, 'CNPJ']
                         risco_sug, venc_sug, _, _ = aplicar_inteligencia_doc(novo_nome_doc, df_prazos.at[idx, 'Data_Recebimento'])
-                        df_prazos.at[idx, 'Status'] = risco_sug
-                        df_prazos.at[idx, 'Vencimento'] = venc_sug
-                        novo_id = nova_unidade + " - " + cnpj_atual + " - " + novo_nome_doc
-                        df_prazos.at[idx, 'Documento'] = novo_nome_doc
-                        df_prazos.at[idx, 'ID_UNICO'] = novo_id
-                        df_checklist.loc[df_checklist['Documento_Ref'] == antigo_id, 'Documento_Ref'] = novo_id
-                        update_dados_local(df_prazos, df_checklist)
+                        novo_id = id_unico(nova_unidade, novo_nome_doc)
+                        get_sobreposicao().editar(antigo_id, Status=risco_sug, Vencimento=venc_sug, Documento=novo_nome_doc, ID_UNICO=novo_id)
+                        get_sobreposicao().mover_tarefas(antigo_id, novo_id, df_checklist)
                         st.session_state['doc_focado_id'] = novo_id
                         st.toast(f"Atualizado! Risco sugerido: {risco_sug}", icon="🧠")
                         st.rerun()
@@ -767,9 +598,7 @@ elif menu == "Gestão de Docs":
                 if link_inteligente: st.link_button(f"🌎 Pesquisar {novo_nome_doc}", link_inteligente)
                 c_del, _ = st.columns([1, 4])
                 if c_del.button("🗑️ Excluir"):
-                    df_prazos = df_prazos.drop(idx).reset_index(drop=True)
-                    df_checklist = df_checklist[df_checklist['Documento_Ref'] != doc_ativo_id]
-                    update_dados_local(df_prazos, df_checklist)
+                    get_sobreposicao().remover(doc_ativo_id)
                     st.session_state['doc_focado_id'] = None
                     st.rerun()
                 with st.container(border=True):
@@ -779,73 +608,64 @@ elif menu == "Gestão de Docs":
                     if st_curr not in opcoes: st_curr = "NORMAL"
                     novo_risco = c1.selectbox("Risco", opcoes, index=opcoes.index(st_curr), key=f"sel_r_{doc_ativo_id}")
                     if novo_risco != st_curr:
-                         df_prazos.at[idx, 'Status'] = novo_risco
-                         update_dados_local(df_prazos, df_checklist)
+                         get_sobreposicao().editar(doc_ativo_id, Status=novo_risco)
                     cor_badge = "#ff4b4b" if st_curr == "CRÍTICO" else "#ffa726" if st_curr == "ALTO" else "#00c853"
                     c1.markdown(f'<span style="background-color:{cor_badge}; padding: 2px 8px; border-radius: 4px; font-size: 0.8em; color: white;">Status: {st_curr}</span>', unsafe_allow_html=True)
                     novo_setor = st.text_input("Editar Setor", value=df_prazos.at[idx, 'Setor'], key=f"edit_sector_{doc_ativo_id}")
                     if novo_setor != df_prazos.at[idx, 'Setor']:
-                        df_prazos.at[idx, 'Setor'] = novo_setor
-                        update_dados_local(df_prazos, df_checklist)
+                        get_sobreposicao().editar(doc_ativo_id, Setor=novo_setor)
                     try: d_rec = pd.to_datetime(df_prazos.at[idx, 'Data_Recebimento'], dayfirst=True).date()
                     except: d_rec = date.today()
                     nova_d_rec = c2.date_input("Recebido", value=d_rec, format="DD/MM/YYYY", key=f"dt_rec_{doc_ativo_id}")
                     if nova_d_rec != d_rec:
-                        df_prazos.at[idx, 'Data_Recebimento'] = nova_d_rec
-                        update_dados_local(df_prazos, df_checklist)
+                        get_sobreposicao().editar(doc_ativo_id, Data_Recebimento=nova_d_rec)
                     try: d_venc = pd.to_datetime(df_prazos.at[idx, 'Vencimento'], dayfirst=True).date()
                     except: d_venc = date.today()
                     nova_d_venc = c3.date_input("Vence", value=d_venc, format="DD/MM/YYYY", key=f"dt_venc_{doc_ativo_id}")
                     if nova_d_venc != d_venc:
-                        df_prazos.at[idx, 'Vencimento'] = nova_d_venc
-                        update_dados_local(df_prazos, df_checklist)
+                        get_sobreposicao().editar(doc_ativo_id, Vencimento=nova_d_venc)
                     prog_atual = safe_prog(df_prazos.at[idx, 'Progresso'])
                     prog_bar_placeholder = st.empty()
                     prog_bar_placeholder.progress(prog_atual, text=f"Progressão: {prog_atual}%")
                 st.write("✅ **Tarefas (Edição Rápida)**")
-                df_checklist['Feito'] = df_checklist['Feito'].replace({'TRUE': True, 'FALSE': False, 'True': True, 'False': False, 'nan': False})
-                df_checklist['Feito'] = df_checklist['Feito'].fillna(False).astype(bool)
-                df_checklist['Documento_Ref'] = df_checklist['Documento_Ref'].astype(str)
                 mask = df_checklist['Documento_Ref'] == str(doc_ativo_id)
-                df_t = df_checklist[mask].copy().reset_index(drop=True)
+                df_t = df_checklist[mask].reset_index(drop=True)
                 tarefas_existentes = df_t['Tarefa'].tolist()
                 ha_novas_sugestoes = any(t for t in tarefas_inteligentes if t not in tarefas_existentes)
                 if ha_novas_sugestoes:
                     if st.button("📥 Carregar Checklist Sugerido", key=f"load_tasks_{doc_ativo_id}"):
-                        df_checklist = adicionar_tarefas_sugeridas(df_checklist, doc_ativo_id, tarefas_inteligentes)
-                        update_dados_local(df_prazos, df_checklist)
+                        get_sobreposicao().definir_tarefas(doc_ativo_id, adicionar_tarefas_sugeridas(df_t, doc_ativo_id, tarefas_inteligentes))
                         st.rerun()
                 c_add, c_btn = st.columns([3, 1])
                 new_t = c_add.text_input("Nova tarefa...", label_visibility="collapsed", key=f"new_t_{doc_ativo_id}")
                 if c_btn.button("ADICIONAR", key=f"btn_add_{doc_ativo_id}"):
                     if new_t:
                         line = pd.DataFrame([{"Documento_Ref": doc_ativo_id, "Tarefa": new_t, "Feito": False}])
-                        df_checklist = pd.concat([df_checklist, line], ignore_index=True)
-                        update_dados_local(df_prazos, df_checklist)
+                        get_sobreposicao().definir_tarefas(doc_ativo_id, pd.concat([df_t, line], ignore_index=True))
                         st.rerun()
                 if not df_t.empty:
                     # DICA: Para excluir tarefas, adicionei uma instrução clara
                     st.caption("ℹ️ Para excluir: Selecione a linha e pressione Delete no teclado.")
                     edited = st.data_editor(df_t, num_rows="dynamic", use_container_width=True, hide_index=True, column_config={"Documento_Ref": None, "Tarefa": st.column_config.TextColumn("Descrição", width="medium"), "Feito": st.column_config.CheckboxColumn("OK", width="small")}, key=f"ed_{doc_ativo_id}")
-                    tot = len(edited); done = edited['Feito'].sum(); new_p = int((done/tot)*100) if tot > 0 else 0
+                    tot = len(edited); done = edited['Feito'].sum(); new_p = int(progresso_tarefas(int(done), tot)) if tot > 0 else 0
                     prog_bar_placeholder.progress(new_p, text=f"Progressão: {new_p}%")
                     if not edited.equals(df_t) or new_p != prog_atual:
-                        df_prazos.at[idx, 'Progresso'] = new_p
-                        df_checklist = df_checklist[~mask]
-                        edited['Documento_Ref'] = str(doc_ativo_id)
-                        df_checklist = pd.concat([df_checklist, edited], ignore_index=True)
-                        update_dados_local(df_prazos, df_checklist)
+                        get_sobreposicao().definir_tarefas(doc_ativo_id, edited)
                         st.rerun()
                 else: st.info("Adicione tarefas acima.")
                 st.markdown("---")
-                if st.button("💾 SALVAR TUDO NA NUVEM", type="primary"):
-                    if salvar_alteracoes_completo(df_prazos, df_checklist): time.sleep(0.5); st.rerun()
+                # Edições já estão no diário local; o botão só antecipa o envio
+                if st.button("☁️ SINCRONIZAR AGORA", type="primary"):
+                    try: get_armazem()[1].agendar()
+                    except Exception as e: st.error(f"Erro ao sincronizar: {e}")
+                    else: st.toast("Enviando as edições para a nuvem...", icon="☁️")
             else:
                 st.warning("Documento não encontrado.")
                 if st.button("Voltar"): st.session_state['doc_focado_id'] = None; st.rerun()
         else: st.info("👈 Selecione um documento na lista.")
 
 elif menu == "Vistoria Mobile":
+    relatorio = carregar("relatorio")  # FPDF/PIL só entram no processo quando alguém abre a Vistoria
     st.title("📋 Vistoria Técnica")
     st.write("📍 **Cabeçalho do Relatório**")
     with st.container(border=True):
@@ -895,26 +715,27 @@ elif menu == "Vistoria Mobile":
             st.markdown("---")
             st.write("3. Evidências (Voz e Foto)")
             audio_input = st.audio_input("🎙️ Gravar Nota", key="mic_input")
-            if audio_input and TEM_RECONHECIMENTO_VOZ:
-                txt = transcrever_audio(audio_input)
-                if txt and txt not in st.session_state['obs_atual']:
-                    st.session_state['obs_atual'] += " " + txt
+            if audio_input and get_transcricao() is not None:
+                acompanhar_transcricao(audio_input.getvalue())
             obs = st.text_area("Detalhes Adicionais", value=st.session_state['obs_atual'], height=100, placeholder="Ex: Piso quebrado próximo à porta...")
             if obs != st.session_state['obs_atual']: st.session_state['obs_atual'] = obs
             foto_input = st.camera_input("📸 Capturar Foto")
             if foto_input:
-                if not st.session_state['fotos_temp'] or foto_input.getvalue() != st.session_state['fotos_temp'][-1]:
-                    st.session_state['fotos_temp'].append(foto_input.getvalue())
+                # O widget devolve a mesma foto a cada rerun: compara pelo hash com todas as já capturadas
+                dados_foto = foto_input.getvalue()
+                if hash_blob(dados_foto) not in st.session_state['fotos_temp']:
+                    st.session_state['fotos_temp'].append(guardar_blob(dados_foto))
+            else: get_blobs().tocar(st.session_state['sessao_id'])
             if st.session_state['fotos_temp']:
-                st.image([x for x in st.session_state['fotos_temp']], width=100, caption=[f"Foto {i+1}" for i in range(len(st.session_state['fotos_temp']))])
+                st.image([get_blobs().caminho(ref) for ref in st.session_state['fotos_temp']], width=100, caption=[f"Foto {i+1}" for i in range(len(st.session_state['fotos_temp']))])
                 if st.button("Limpar Fotos", type="secondary", use_container_width=True): 
-                    st.session_state['fotos_temp'] = []; st.rerun()
+                    st.session_state['fotos_temp'] = []; atualizar_refs_sessao(); st.rerun()
             st.markdown("---")
             if st.button("💾 SALVAR APONTAMENTO", type="primary", use_container_width=True):
                 if not item_nome: st.error("Descrição obrigatória.")
                 else:
-                    audio_blob = audio_input.getvalue() if audio_input else None
-                    novo = {"Local": local, "Item": item_nome, "Situação": situacao, "Gravidade": gravidade, "Obs": st.session_state['obs_atual'], "Fotos": st.session_state['fotos_temp'].copy(), "Audio_Bytes": audio_blob, "Hora": datetime.now().strftime("%H:%M")}
+                    ref_audio = guardar_blob(audio_input.getvalue()) if audio_input else None
+                    novo = {"Local": local, "Item": item_nome, "Situação": situacao, "Gravidade": gravidade, "Obs": st.session_state['obs_atual'], "Fotos": st.session_state['fotos_temp'].copy(), "Audio": ref_audio, "Hora": datetime.now().strftime("%H:%M")}
                     st.session_state['sessao_vistoria'].append(novo)
                     st.session_state['fotos_temp'] = []
                     st.session_state['obs_atual'] = ""
@@ -930,10 +751,66 @@ elif menu == "Vistoria Mobile":
                     c_a.markdown(f"**{i+1}. {reg['Local']}**")
                     c_a.caption(f"{reg['Item'][:100]}...")
                     if c_b.button("🗑️", key=f"del_{i}"):
-                        st.session_state['sessao_vistoria'].pop(i); st.rerun()
+                        st.session_state['sessao_vistoria'].pop(i); atualizar_refs_sessao(); st.rerun()
             st.markdown("---")
-            zip_data = gerar_pacote_zip_completo(st.session_state['sessao_vistoria'], st.session_state['tipo_estabelecimento_atual'], st.session_state['cliente_nome'], st.session_state['cliente_endereco'])
-            nome_zip = f"Relatorio_Legalizacao_{limpar_texto_pdf(st.session_state['tipo_estabelecimento_atual'])}_{datetime.now().strftime('%d-%m-%H%M')}.zip"
-            st.download_button(label="📥 BAIXAR RELATÓRIO FINAL (ZIP)", data=zip_data, file_name=nome_zip, mime="application/zip", type="primary", use_container_width=True)
+            # O ZIP só é gerado no clique (e reaproveitado se a vistoria não mudou)
+            itens_snapshot = list(st.session_state['sessao_vistoria'])
+            args_zip = (itens_snapshot, st.session_state['tipo_estabelecimento_atual'], st.session_state['cliente_nome'], st.session_state['cliente_endereco'])
+            nome_zip = f"Relatorio_Legalizacao_{relatorio.limpar_texto_pdf(st.session_state['tipo_estabelecimento_atual'])}_{datetime.now().strftime('%d-%m-%H%M')}.zip"
+            st.download_button(label="📥 BAIXAR RELATÓRIO FINAL (ZIP)", data=lambda: relatorio.gerar_pacote_zip_cacheado(*args_zip, blobs=get_blobs()), file_name=nome_zip, mime="application/zip", type="primary", use_container_width=True)
+            # Backup das evidências no Drive em segundo plano: a coleta continua enquanto sobe
+            c_drive, c_status = st.columns([1, 2])
+            if c_drive.button("☁️ Enviar fotos ao Drive", use_container_width=True):
+                carimbo = datetime.now().strftime('%d-%m-%H%M')
+                for i, reg in enumerate(st.session_state['sessao_vistoria']):
+                    for j, foto in enumerate(reg['Fotos']):
+                        upload_foto_drive(foto, f"Vistoria_{relatorio.limpar_texto_pdf(st.session_state['cliente_nome'])}_{carimbo}_Item{i+1}_Foto{j+1}.jpg", grupo=st.session_state['sessao_id'])
+            try: resumo_drive = get_uploader().resumo(st.session_state['sessao_id']) if ID_PASTA_DRIVE else None
+            except Exception: resumo_drive = None
+            if resumo_drive and resumo_drive['total']:
+                estados = resumo_drive['por_estado']
+                c_status.progress(resumo_drive['progresso'], text=f"Drive: {estados.get('concluido', 0)}/{resumo_drive['total']} enviadas" + (f" | {estados['erro']} com erro" if estados.get('erro') else ""))
             if st.button("Limpar Tudo e Começar Novo", type="secondary", use_container_width=True):
-                st.session_state['sessao_vistoria'] = []; st.rerun()
+                if resumo_drive: get_uploader().limpar_concluidas(st.session_state['sessao_id'])
+                st.session_state['sessao_vistoria'] = []; atualizar_refs_sessao(); st.rerun()
+
+elif menu == "Desempenho":
+    # Página oculta: só aparece no menu com ?admin=<LEGALIZA_ADMIN_TOKEN>
+    st.title("⚙️ Desempenho")
+    c1, c2, c3 = st.columns(3)
+    METRICAS.ativo = c1.toggle("Coletar métricas", value=METRICAS.ativo)
+    if c2.button("🧪 Perfilar próximo rerun (cProfile)", use_container_width=True):
+        st.session_state['perfilar_proximo'] = True
+        st.toast("O próximo rerun desta sessão será perfilado.")
+    if c3.button("Zerar métricas", use_container_width=True): METRICAS.limpar()
+    st.subheader("Etapas")
+    resumo_etapas = METRICAS.resumo()
+    if resumo_etapas: st.dataframe(pd.DataFrame(resumo_etapas), hide_index=True, use_container_width=True)
+    else: st.info("Nenhuma etapa medida ainda.")
+    if METRICAS.contadores(): st.dataframe(pd.DataFrame([{"contador": k, "valor": v} for k, v in sorted(METRICAS.contadores().items())]), hide_index=True)
+    try: estat_google = get_camada().estatisticas()
+    except Exception: estat_google = {}
+    if estat_google:
+        st.subheader("Google (por operação)")
+        st.dataframe(pd.DataFrame([{"operacao": k, **v} for k, v in estat_google.items()]), hide_index=True, use_container_width=True)
+    # O despachante de push roda no agendador_alertas.py, que grava as métricas dele no banco de alertas
+    agendador = carregar("agendador_alertas")
+    push = agendador.EstadoAlertas(agendador.CAMINHO_ESTADO_ALERTAS).metricas_push() if os.path.exists(agendador.CAMINHO_ESTADO_ALERTAS) else None
+    if push:
+        st.subheader("Notificações push (agendador)")
+        st.caption(f"Atualizado em {datetime.fromtimestamp(push[1]).strftime('%d/%m/%Y %H:%M:%S')}")
+        st.dataframe(pd.DataFrame([{"metrica": k, "valor": v} for k, v in push[0].items()]), hide_index=True)
+    st.subheader("Recursos")
+    c_a, c_b, c_c = st.columns(3)
+    c_a.json(get_blobs().uso())
+    c_b.json(get_transcricao().estatisticas() if get_transcricao() else {})
+    try: c_c.json(get_armazem()[0].status())
+    except Exception: pass
+    st.download_button("📤 Exportar eventos (JSON lines)", data=METRICAS.exportar_jsonl(), file_name=f"metricas_{datetime.now().strftime('%Y%m%d_%H%M')}.jsonl", mime="application/x-ndjson")
+    if st.session_state.get('ultimo_perfil'):
+        st.subheader("Último perfil (cProfile, tempo acumulado)")
+        st.code(st.session_state['ultimo_perfil'])
+
+medidor.marcar(f"página {menu}")
+fechar_rerun(medidor, menu)
+if PRECARREGAR: precarregar()
@@ -0,0 +1,407 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+import pandas as pd
+from nucleo_dados import COLUNAS_PRAZOS, COLUNAS_CHECKLIST, normalizar_feito
+from sync_delta import baixar_planilhas, enviar_planilhas, erro_cota
+from diario import codificar, decodificar, compactar
+from metricas import METRICAS, medir
+
+# --- ARMAZÉM LOCAL (SQLite) ---
+# Cópia persistente das abas Prazos e Checklist_Itens. O app lê e grava aqui;
+# o Replicador reconcilia com a LegalizaHealth_DB em segundo plano. As edições da
+# Gestão de Docs entram primeiro no diário (diario.py) e são aplicadas em lote.
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS prazos (
+    ordem INTEGER PRIMARY KEY,
+    Unidade TEXT, Setor TEXT, Documento TEXT, CNPJ TEXT,
+    Data_Recebimento TEXT, Vencimento TEXT, Status TEXT,
+    Progresso INTEGER, Concluido TEXT, ID_UNICO TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_prazos_unidade ON prazos (Unidade);
+CREATE INDEX IF NOT EXISTS idx_prazos_status ON prazos (Status);
+CREATE INDEX IF NOT EXISTS idx_prazos_vencimento ON prazos (Vencimento);
+CREATE INDEX IF NOT EXISTS idx_prazos_id_unico ON prazos (ID_UNICO);
+CREATE TABLE IF NOT EXISTS checklist (
+    ordem INTEGER PRIMARY KEY,
+    Documento_Ref TEXT, Tarefa TEXT, Feito INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_checklist_ref ON checklist (Documento_Ref);
+CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT);
+CREATE TABLE IF NOT EXISTS diario (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL, sessao TEXT, tipo TEXT, dados TEXT
+);
+"""
+
+COLUNAS_TABELA_PRAZOS = COLUNAS_PRAZOS + ["ID_UNICO"]
+RETENCAO_DIARIO = 7 * 24 * 3600   # operações já aplicadas ficam no diário por 7 dias
+PRIMEIRA_LINHA = "(SELECT MIN(ordem) FROM prazos WHERE ID_UNICO = ?)"   # a sessão edita a primeira linha com o ID
+DURACAO_LEASE_ENVIO = 600   # segundos; lease de um processo que morreu no meio do envio expira sozinho
+
+def _data_iso(x):
+    if x is None or (not isinstance(x, str) and pd.isna(x)): return None
+    if isinstance(x, datetime): x = x.date()  # Timestamp das colunas datetime64 do retrato
+    return x.isoformat() if hasattr(x, 'isoformat') else str(x)
+
+class ArmazemLocal:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+        self._con = sqlite3.connect(caminho, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript(ESQUEMA)
+
+    # --- META ---
+    def _meta(self, chave, padrao=None):
+        row = self._con.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(row[0]) if row else padrao
+
+    def _set_meta(self, chave, valor):
+        self._con.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)", (chave, json.dumps(valor)))
+
+    def versao(self):
+        with self._lock: return self._meta("versao", 0)
+
+    def pendente(self):
+        with self._lock: return self._meta("pendente", False)
+
+    def vazio(self):
+        with self._lock: return self._meta("ultima_carga") is None
+
+    def bases(self):
+        with self._lock: return self._meta("bases")
+
+    def status(self):
+        with self._lock:
+            return {"versao": self._meta("versao", 0), "pendente": self._meta("pendente", False),
+                    "ultima_carga": self._meta("ultima_carga"), "ultimo_envio": self._meta("ultimo_envio"),
+                    "ultimo_erro": self._meta("ultimo_erro"), "diario_pendente": self._diario_pendente()}
+
+    # --- LEITURA ---
+    def ler(self):
+        with self._lock:
+            df_p = pd.read_sql_query(f"SELECT {', '.join(COLUNAS_TABELA_PRAZOS)} FROM prazos ORDER BY ordem", self._con)
+            df_c = pd.read_sql_query(f"SELECT {', '.join(COLUNAS_CHECKLIST)} FROM checklist ORDER BY ordem", self._con)
+        for c_date in ['Vencimento', 'Data_Recebimento']:
+            df_p[c_date] = pd.to_datetime(df_p[c_date], format='%Y-%m-%d', errors='coerce').dt.date
+        df_p['Progresso'] = df_p['Progresso'].fillna(0).astype(int)
+        df_c['Feito'] = df_c['Feito'].fillna(0).astype(bool)
+        return df_p, df_c
+
+    def ler_com_diario(self):
+        # (prazos, checklist, última operação do diário já refletida neles), lidos juntos
+        with self._lock:
+            df_p, df_c = self.ler()
+            return df_p, df_c, self._meta("diario_aplicado", 0)
+
+    # --- ESCRITA ---
+    def _linhas_prazos(self, df_prazos):
+        df_p = df_prazos.copy()
+        for c in COLUNAS_TABELA_PRAZOS:
+            if c not in df_p.columns: df_p[c] = ""
+        for c_date in ['Vencimento', 'Data_Recebimento']:
+            df_p[c_date] = df_p[c_date].apply(_data_iso)
+        df_p['Progresso'] = pd.to_numeric(df_p['Progresso'], errors='coerce').fillna(0).astype(int)
+        df_p['Concluido'] = df_p['Concluido'].astype(str)
+        return df_p[COLUNAS_TABELA_PRAZOS].astype(object).where(df_p[COLUNAS_TABELA_PRAZOS].notna(), None).values.tolist()
+
+    def _linhas_checklist(self, df_checklist):
+        df_c = df_checklist.copy()
+        for c in COLUNAS_CHECKLIST:
+            if c not in df_c.columns: df_c[c] = ""
+        df_c['Documento_Ref'] = df_c['Documento_Ref'].astype(str)
+        df_c['Feito'] = normalizar_feito(df_c['Feito']).astype(int)
+        return df_c[COLUNAS_CHECKLIST].astype(object).where(df_c[COLUNAS_CHECKLIST].notna(), None).values.tolist()
+
+    def _inserir(self, tabela, colunas, linhas, inicio=0):
+        self._con.executemany(f"INSERT INTO {tabela} (ordem, {', '.join(colunas)}) VALUES ({', '.join(['?'] * (len(colunas) + 1))})",
+                              [[inicio + i] + l for i, l in enumerate(linhas)])
+
+    def _substituir(self, df_prazos, df_checklist):
+        linhas_p = self._linhas_prazos(df_prazos)
+        linhas_c = self._linhas_checklist(df_checklist)
+        self._con.execute("DELETE FROM prazos")
+        self._inserir("prazos", COLUNAS_TABELA_PRAZOS, linhas_p)
+        self._con.execute("DELETE FROM checklist")
+        self._inserir("checklist", COLUNAS_CHECKLIST, linhas_c)
+        self._set_meta("versao", self._meta("versao", 0) + 1)
+
+    def gravar(self, df_prazos, df_checklist):
+        # Escrita do usuário: entra primeiro aqui e fica pendente de replicação
+        with self._lock, self._con:
+            self._substituir(df_prazos, df_checklist)
+            self._set_meta("pendente", True)
+            return self._meta("versao")
+
+    def anexar(self, df_prazos_novos, df_checklist_novo=None):
+        # Inclui linhas no fim sem regravar as existentes (importação em massa)
+        with self._lock, self._con:
+            for tabela, colunas, linhas in (("prazos", COLUNAS_TABELA_PRAZOS, self._linhas_prazos(df_prazos_novos)),
+                                            ("checklist", COLUNAS_CHECKLIST, self._linhas_checklist(df_checklist_novo) if df_checklist_novo is not None else [])):
+                if not linhas: continue
+                inicio = self._con.execute(f"SELECT COALESCE(MAX(ordem), -1) + 1 FROM {tabela}").fetchone()[0]
+                self._inserir(tabela, colunas, linhas, inicio)
+            self._set_meta("versao", self._meta("versao", 0) + 1)
+            self._set_meta("pendente", True)
+            return self._meta("versao")
+
+    def aplicar_nuvem(self, df_prazos, df_checklist, bases, versao_esperada=None):
+        # Dados vindos da nuvem só entram se ninguém gravou localmente enquanto baixávamos
+        with self._lock, self._con:
+            if versao_esperada is not None and self._meta("versao", 0) != versao_esperada: return False
+            if self._meta("pendente", False): return False
+            self._substituir(df_prazos, df_checklist)
+            self._set_meta("bases", bases)
+            self._set_meta("ultima_carga", time.time())
+            return True
+
+    def confirmar_envio(self, bases, versao_enviada):
+        with self._lock, self._con:
+            self._set_meta("bases", bases)
+            self._set_meta("ultimo_envio", time.time())
+            self._set_meta("ultimo_erro", None)
+            if self._meta("versao", 0) == versao_enviada: self._set_meta("pendente", False)
+
+    # --- DIÁRIO DE EDIÇÕES ---
+    def registrar_operacao(self, tipo, dados, sessao=""):
+        # Anexa e devolve o seq; a aplicação nas tabelas fica para o replicador
+        with self._lock, self._con:
+            return self._con.execute("INSERT INTO diario (ts, sessao, tipo, dados) VALUES (?, ?, ?, ?)",
+                                     (time.time(), sessao, tipo, codificar(dados))).lastrowid
+
+    def _diario_pendente(self):
+        return self._con.execute("SELECT COUNT(*) FROM diario WHERE seq > ?", (self._meta("diario_aplicado", 0),)).fetchone()[0]
+
+    def diario_pendente(self):
+        with self._lock: return self._diario_pendente()
+
+    def _aplicar_operacao(self, tipo, dados, tocados):
+        if tipo == "excluir_tudo":
+            self._con.execute("DELETE FROM prazos")
+            self._con.execute("DELETE FROM checklist")
+        elif tipo == "adicionar":
+            # Documento novo entra no topo, como aparece na sessão que o criou
+            inicio = self._con.execute("SELECT COALESCE(MIN(ordem), 0) - 1 FROM prazos").fetchone()[0]
+            self._inserir("prazos", COLUNAS_TABELA_PRAZOS, self._linhas_prazos(pd.DataFrame([dados["linha"]])), inicio)
+            tocados.add(dados["linha"].get("ID_UNICO"))
+        elif tipo == "editar":
+            campos = {c: v for c, v in dados["campos"].items() if c in COLUNAS_TABELA_PRAZOS}
+            if not campos: return
+            valores = self._linhas_prazos(pd.DataFrame([campos]))[0]
+            valores = [v for c, v in zip(COLUNAS_TABELA_PRAZOS, valores) if c in campos]
+            self._con.execute(f"UPDATE prazos SET {', '.join(f'{c} = ?' for c in COLUNAS_TABELA_PRAZOS if c in campos)} WHERE ordem = {PRIMEIRA_LINHA}", valores + [dados["id"]])
+            tocados.add(campos.get("ID_UNICO", dados["id"]))
+        elif tipo == "remover":
+            self._con.execute(f"DELETE FROM prazos WHERE ordem = {PRIMEIRA_LINHA}", (dados["id"],))
+            self._con.execute("DELETE FROM checklist WHERE Documento_Ref = ?", (dados["id"],))
+        elif tipo == "definir_tarefas":
+            self._con.execute("DELETE FROM checklist WHERE Documento_Ref = ?", (dados["ref"],))
+            inicio = self._con.execute("SELECT COALESCE(MAX(ordem), -1) + 1 FROM checklist").fetchone()[0]
+            self._inserir("checklist", COLUNAS_CHECKLIST, [[dados["ref"], t, int(bool(f))] for t, f in dados["tarefas"]], inicio)
+            tocados.add(dados["ref"])
+
+    def aplicar_diario(self):
+        # Aplica as operações pendentes (compactadas) numa transação; retorna quantas foram consumidas
+        with self._lock, self._con:
+            self._con.execute("BEGIN IMMEDIATE")   # outro processo (agendador) pode estar aplicando também
+            aplicado = self._meta("diario_aplicado", 0)
+            linhas = self._con.execute("SELECT seq, tipo, dados FROM diario WHERE seq > ? ORDER BY seq", (aplicado,)).fetchall()
+            if not linhas: return 0
+            operacoes = compactar([(seq, tipo, decodificar(dados)) for seq, tipo, dados in linhas])
+            tocados = set()
+            for _, tipo, dados in operacoes: self._aplicar_operacao(tipo, dados, tocados)
+            # Progresso gravado acompanha o checklist dos documentos tocados (como no salvamento completo)
+            self._con.executemany("UPDATE prazos SET Progresso = (SELECT SUM(Feito) * 100 / COUNT(*) FROM checklist WHERE Documento_Ref = ?) "
+                                  "WHERE ID_UNICO = ? AND EXISTS (SELECT 1 FROM checklist WHERE Documento_Ref = ?)",
+                                  [(i, i, i) for i in tocados if i])
+            self._set_meta("diario_aplicado", linhas[-1][0])
+            self._set_meta("versao", self._meta("versao", 0) + 1)
+            self._set_meta("pendente", True)
+            self._con.execute("DELETE FROM diario WHERE seq <= ? AND ts < ?", (linhas[-1][0], time.time() - RETENCAO_DIARIO))
+        METRICAS.contar("diario.operacoes", len(linhas))
+        METRICAS.contar("diario.compactadas", len(linhas) - len(operacoes))
+        return len(linhas)
+
+    # --- ENVIO (um processo por vez) ---
+    # O app e o agendador (--sincronizar) usam o mesmo banco; dois envios ao mesmo tempo partiriam da
+    # mesma base e aplicariam o mesmo delta duas vezes. Quem vai empurrar toma o lease na meta.
+    def tomar_envio(self, dono, duracao=DURACAO_LEASE_ENVIO):
+        with self._lock, self._con:
+            self._con.execute("BEGIN IMMEDIATE")
+            lease = self._meta("lease_envio")
+            agora = time.time()
+            if lease and lease["dono"] != dono and lease["expira"] > agora: return False
+            self._set_meta("lease_envio", {"dono": dono, "expira": agora + duracao})
+            return True
+
+    def liberar_envio(self, dono):
+        with self._lock, self._con:
+            self._con.execute("BEGIN IMMEDIATE")
+            lease = self._meta("lease_envio")
+            if lease and lease["dono"] == dono: self._set_meta("lease_envio", None)
+
+    def registrar_erro(self, erro, bases=None):
+        with self._lock, self._con:
+            self._set_meta("ultimo_erro", str(erro))
+            # Envio que falhou no meio: guarda as bases das abas que terminaram (a que ficou pela metade já saiu)
+            if bases is not None: self._set_meta("bases", bases)
+
+# --- COTA DE ESCRITA DO SHEETS ---
+# A API limita as requisições de escrita por minuto (60 por usuário). Guardamos as do último
+# minuto e, se o próximo envio não cabe, ele espera; um 429 abre um backoff exponencial com jitter.
+COTA_ESCRITAS_MINUTO = 60
+RESERVA_COTA = 5            # requisições deixadas livres para o resto do app (importação, agendador)
+BACKOFF_COTA = 5.0
+MAX_BACKOFF_COTA = 300.0
+
+class CotaSheets:
+    def __init__(self, por_minuto=COTA_ESCRITAS_MINUTO, reserva=RESERVA_COTA, backoff=BACKOFF_COTA, max_backoff=MAX_BACKOFF_COTA):
+        self.limite = max(por_minuto - reserva, 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.falhas = 0
+        self.bloqueado_ate = 0.0
+        self._chamadas = deque()
+        self._lock = threading.Lock()
+
+    def registrar(self, n, agora=None):
+        agora = agora or time.monotonic()
+        with self._lock:
+            self._chamadas.extend([agora] * n)
+            self.falhas = 0
+
+    def estourou(self, agora=None):
+        agora = agora or time.monotonic()
+        with self._lock:
+            self.bloqueado_ate = agora + min(self.max_backoff, self.backoff * 2 ** self.falhas) + random.uniform(0, self.backoff)
+            self.falhas += 1
+
+    def espera(self, n=1, agora=None):
+        # Segundos até caberem mais `n` escritas (0 = pode enviar já)
+        agora = agora or time.monotonic()
+        with self._lock:
+            while self._chamadas and self._chamadas[0] <= agora - 60: self._chamadas.popleft()
+            excesso = len(self._chamadas) + n - self.limite
+            # Envio maior que a cota inteira espera a janela esvaziar
+            livre = self._chamadas[min(excesso, len(self._chamadas)) - 1] + 60 - agora if excesso > 0 and self._chamadas else 0.0
+            return max(livre, self.bloqueado_ate - agora, 0.0)
+
+# --- REPLICAÇÃO EM SEGUNDO PLANO ---
+# Com `fragmentacao` (fragmentos.py) a nuvem é lida e escrita por fragmento de unidades:
+# `abrir_planilha(nome)` abre a planilha de cada fragmento e só os alterados trafegam.
+# Cada ciclo aplica primeiro o diário de edições; depois de um agendar() espera `janela`
+# segundos para juntar as edições seguintes no mesmo envio.
+JANELA_ENVIO = 2.0
+
+class Replicador:
+    def __init__(self, armazem, abrir_planilha, intervalo=60, operacao=None, invalidar=None, fragmentacao=None,
+                 cota=None, janela=JANELA_ENVIO):
+        self.armazem = armazem
+        self.abrir_planilha = abrir_planilha
+        self.intervalo = intervalo
+        self.operacao = operacao or (lambda nome: nullcontext())   # ex: CamadaGoogle.operacao, para contar chamadas
+        self.invalidar = invalidar                                    # descarta handles em cache após uma falha
+        self.fragmentacao = fragmentacao
+        self.cota = cota or CotaSheets()
+        self.janela = janela
+        self._acordar = threading.Event()
+        self._lock = threading.Lock()
+        self._pedidos = set()       # fragmentos pedidos por agendar(fragmentos=...)
+        self._lock_pedidos = threading.Lock()
+        self._chamadas_envio = 1    # escritas do último envio, estimativa para o próximo
+        self._erro = None
+        self._thread = None
+        self._dono = uuid.uuid4().hex   # identifica este replicador no lease de envio
+
+    def puxar(self, fragmentos=None):
+        versao = self.armazem.versao()
+        with self.operacao("puxar") as op, medir("sheets.puxar") as m:
+            if self.fragmentacao is None: lido = baixar_planilhas(self.abrir_planilha())
+            else: lido = self.fragmentacao.baixar(self.abrir_planilha, self.armazem.bases(), self.armazem.ler, fragmentos)
+            if op: m.update(chamadas=op["chamadas"], bytes=op["bytes"])
+            if lido is None: return True   # nenhum fragmento mudou desde o último retrato
+            df_p, df_c, bases = lido
+            m["linhas"] = len(df_p) + len(df_c)
+        return self.armazem.aplicar_nuvem(df_p, df_c, bases, versao_esperada=versao)
+
+    def empurrar(self):
+        # None se outro processo está empurrando agora; o loop tenta de novo na próxima rodada
+        if not self.armazem.tomar_envio(self._dono):
+            METRICAS.contar("sheets.envio_ocupado")
+            return None
+        try:
+            if not self.armazem.pendente(): return {}   # o outro processo já enviou estas edições
+            versao = self.armazem.versao()
+            df_p, df_c = self.armazem.ler()
+            bases = self.armazem.bases() or {}
+            try:
+                with self.operacao("empurrar") as op, medir("sheets.empurrar") as m:
+                    if self.fragmentacao is None: resumos = enviar_planilhas(self.abrir_planilha(), df_p, df_c, bases)
+                    else: resumos = self.fragmentacao.enviar(self.abrir_planilha, df_p, df_c, bases)
+                    if op: m.update(chamadas=op["chamadas"], bytes=op["bytes"])
+            except Exception as e:
+                if erro_cota(e): self.cota.estourou()
+                self.armazem.registrar_erro(e, bases=bases)
+                raise
+            self._chamadas_envio = max(sum(r["chamadas_api"] for r in resumos.values()), 1)
+            self.cota.registrar(self._chamadas_envio)
+            self.armazem.confirmar_envio(bases, versao)
+            return resumos
+        finally:
+            self.armazem.liberar_envio(self._dono)
+
+    def reconciliar(self, fragmentos=None):
+        with self._lock:
+            self._erro = None
+            try:
+                if self.armazem.diario_pendente():
+                    with medir("diario.aplicar") as m: m["operacoes"] = self.armazem.aplicar_diario()
+                if self.armazem.pendente():
+                    if self.cota.espera(self._chamadas_envio) > 0: return None   # o loop volta quando a cota permitir
+                    return self.empurrar()
+                return self.puxar(fragmentos)
+            except Exception as e:
+                self._erro = e
+                self.armazem.registrar_erro(e)
+                if self.invalidar:
+                    try: self.invalidar()
+                    except Exception: pass  # sem credenciais/camada: a thread não pode morrer por isso
+                return None
+
+    def estado(self):
+        # Para a interface: o que ainda não chegou à nuvem e quando é a próxima tentativa
+        status = self.armazem.status()
+        espera = self.cota.espera(self._chamadas_envio) if status["pendente"] or status["diario_pendente"] else 0.0
+        return {**status, "proxima_tentativa": round(espera, 1)}
+
+    def agendar(self, fragmentos=None):
+        # Pede uma reconciliação imediata (ex: logo após uma gravação local). Com `fragmentos`,
+        # a carga olha só esses (ex: a unidade que o usuário acabou de filtrar).
+        with self._lock_pedidos: self._pedidos.update(fragmentos or ["*"])
+        self._acordar.set()
+
+    def _proxima_espera(self):
+        if not (self.armazem.pendente() or self.armazem.diario_pendente()): return self.intervalo
+        if self._erro is not None and not erro_cota(self._erro): return self.intervalo   # falha comum: ritmo normal
+        return min(max(self.cota.espera(self._chamadas_envio), 1.0), self.intervalo)
+
+    def _loop(self):
+        while True:
+            if self._acordar.wait(self._proxima_espera()) and self.janela: time.sleep(self.janela)
+            self._acordar.clear()
+            with self._lock_pedidos: pedidos, self._pedidos = self._pedidos, set()
+            self.reconciliar(None if not pedidos or "*" in pedidos else pedidos)
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="replicador-sheets", daemon=True)
+            self._thread.start()
+        return self
@@ -0,0 +1,260 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import pandas as pd
+from nucleo_dados import (ABA_PRAZOS, ABA_CHECKLIST, COLUNAS_PRAZOS, COLUNAS_CHECKLIST, normalizar_prazos, normalizar_checklist,
+                          serializar_prazos, serializar_checklist, adicionar_tarefas_sugeridas, agregar_checklist)
+from motor_prazos import REGRAS_ALERTA, calcular_prazos, mensagens_alerta
+from busca import IndiceBusca
+from inteligencia_docs import aplicar_inteligencia_doc
+from dados_sinteticos import gerar_carteira, gerar_vistoria
+
+# --- BENCHMARKS DOS CAMINHOS DE DADOS ---
+# Mede carga/normalização, busca, índice de vencimentos, alertas, tarefas sugeridas, serialização +
+# envio delta (contra o fake do gspread, com e sem fragmentação), o lote de relatórios por unidade (completo e incremental) e
+# o pacote ZIP da vistoria sobre carteiras sintéticas de 1k/10k/100k documentos. Cada execução é
+# anexada como uma linha JSON em --saida e comparada com a anterior.
+#   python benchmark.py --tamanhos 1000,10000 --repeticoes 5
+
+TAMANHOS_PADRAO = [1000, 10000, 100000]
+REPETICOES_PADRAO = 5
+SAIDA_PADRAO = "resultados_benchmark.jsonl"
+LIMITE_REGRESSAO = 0.20   # mediana 20% pior que a execução anterior conta como regressão
+TERMOS_BUSCA = ["gravatai", "alvara", "crm", "licenca sanitaria", "hospital canoas", "12345"]
+
+# --- CASOS ---
+# Cada caso recebe o contexto do tamanho e devolve (preparar, executar[, finalizar]): `preparar()` roda fora da
+# medição antes de cada repetição e o que retorna é passado para `executar` e depois para `finalizar`
+# (também fora da medição), que apaga as pastas temporárias da repetição.
+def caso_normalizacao(ctx):
+    return None, lambda _: (normalizar_prazos(ctx["bruto_p"]), normalizar_checklist(ctx["bruto_c"]))
+
+def caso_progresso_e_prazos(ctx):
+    return None, lambda _: calcular_prazos(agregar_checklist(ctx["df_p"], ctx["df_c"]))
+
+def caso_indice_busca(ctx):
+    return None, lambda _: IndiceBusca(ctx["df_p"])
+
+def caso_busca(ctx):
+    indice = IndiceBusca(ctx["df_p"])
+    return None, lambda _: [indice.filtrar(ctx["df_p"], termo) for termo in TERMOS_BUSCA]
+
+def caso_indice_vencimentos(ctx):
+    from vencimentos import IndiceVencimentos
+    return None, lambda _: IndiceVencimentos(ctx["df_p"])
+
+def caso_consulta_vencimentos(ctx):
+    # "Vence nos próximos N dias" para várias janelas + os 10 próximos pendentes, sobre o índice pronto
+    from vencimentos import IndiceVencimentos, pendentes
+    from motor_prazos import hoje_sp
+    indice, hoje, df_p = IndiceVencimentos(ctx["df_p"]), hoje_sp(), ctx["df_p"]
+    return None, lambda _: ([indice.vencendo(hoje, dias) for dias in (7, 30, 60, 90)], indice.proximos(10, hoje, filtro=lambda bloco: pendentes(df_p, bloco)))
+
+def caso_alertas(ctx):
+    return None, lambda _: [mensagens_alerta(calcular_prazos(ctx["df_p"]), risco) for risco in REGRAS_ALERTA]
+
+def caso_tarefas_sugeridas(ctx):
+    # Como na Gestão de Docs: sugere as tarefas da regra para 50 documentos contra o checklist inteiro
+    ids = ctx["df_p"]['ID_UNICO'].head(50).tolist()
+    docs = ctx["df_p"]['Documento'].head(50).tolist()
+    def executar(_):
+        df_c = ctx["df_c"]
+        for id_doc, doc in zip(ids, docs): df_c = adicionar_tarefas_sugeridas(df_c, id_doc, aplicar_inteligencia_doc(doc)[3] + ["Tarefa extra"])
+        return df_c
+    return None, executar
+
+def caso_serializacao(ctx):
+    return None, lambda _: (serializar_prazos(ctx["df_p"]), serializar_checklist(ctx["df_c"]))
+
+def caso_envio_delta(ctx):
+    # Salvar com 1% das linhas alteradas: serialização + delta + chamadas ao fake
+    from fakes_gspread import PlanilhaFake
+    from sync_delta import baixar_planilhas, enviar_planilhas
+    def preparar():
+        sh = PlanilhaFake()
+        sh.add_worksheet(ABA_PRAZOS).linhas = [COLUNAS_PRAZOS] + ctx["bruto_p"].values.tolist()
+        sh.add_worksheet(ABA_CHECKLIST).linhas = [COLUNAS_CHECKLIST] + ctx["bruto_c"].values.tolist()
+        df_p, df_c, bases = baixar_planilhas(sh)
+        passo = max(len(df_p) // max(len(df_p) // 100, 1), 1)
+        df_p.loc[df_p.index[::passo], 'Status'] = "CRÍTICO"
+        return sh, df_p, df_c, bases
+    return preparar, lambda estado: enviar_planilhas(*estado)
+
+def caso_envio_fragmentado(ctx):
+    # Mesmo salvamento com as abas em 16 fragmentos por unidade: só os fragmentos tocados sobem
+    from fakes_gspread import PlanilhaFake, ClienteFake
+    from fragmentos import Fragmentacao
+    def preparar():
+        cliente = ClienteFake(PlanilhaFake())
+        abrir = lambda nome=None: cliente.open(nome or "LegalizaHealth_DB")
+        fragmentacao, bases = Fragmentacao(16), {}
+        fragmentacao.enviar(abrir, ctx["df_p"], ctx["df_c"], bases)
+        df_p = ctx["df_p"].copy()
+        passo = max(len(df_p) // max(len(df_p) // 100, 1), 1)
+        df_p.loc[df_p.index[::passo], 'Status'] = "CRÍTICO"
+        return fragmentacao, abrir, df_p, bases
+    return preparar, lambda estado: estado[0].enviar(estado[1], estado[2], ctx["df_c"], estado[3])
+
+def _pasta_temporaria(prefixo):
+    return tempfile.TemporaryDirectory(prefix=prefixo, ignore_cleanup_errors=True)
+
+def _apagar_pasta(estado):
+    estado[0].cleanup()
+
+def caso_armazem_gravar(ctx):
+    from armazem_local import ArmazemLocal
+    def preparar():
+        pasta = _pasta_temporaria("bench_")
+        return pasta, ArmazemLocal(os.path.join(pasta.name, "db.sqlite"))
+    return preparar, lambda estado: estado[1].gravar(ctx["df_p"], ctx["df_c"]), _apagar_pasta
+
+def caso_pacote_zip(ctx):
+    from relatorio import gerar_pacote_zip_completo
+    itens = ctx["vistoria"]
+    return None, lambda _: gerar_pacote_zip_completo(itens, "Hospital", "Cliente Sintético", "Rua de Teste, 100")
+
+def caso_pacote_zip_blobs(ctx):
+    # Mesmo pacote com a mídia por referência no armazém de blobs (caminho atual da Vistoria)
+    from relatorio import gerar_pacote_zip_arquivo
+    from blobs import ArmazemBlobs
+    def preparar():
+        pasta = _pasta_temporaria("bench_blobs_")
+        blobs = ArmazemBlobs(pasta.name)
+        itens = [dict(item, Fotos=[blobs.guardar(f) for f in item["Fotos"]], Audio=blobs.guardar(item["Audio_Bytes"]) if item["Audio_Bytes"] else None, Audio_Bytes=None)
+                 for item in ctx["vistoria"]]
+        return pasta, blobs, itens
+    def executar(estado):
+        with gerar_pacote_zip_arquivo(estado[2], "Hospital", "Cliente Sintético", "Rua de Teste, 100", blobs=estado[1]) as f: f.seek(0, 2)
+    return preparar, executar, _apagar_pasta
+
+def caso_relatorios_unidades(ctx):
+    # Lote completo de relatórios por unidade, com a pasta de PDFs vazia a cada repetição
+    from relatorio_unidades import gerar_relatorios_unidades
+    def preparar(): return (_pasta_temporaria("bench_lote_"),)
+    def executar(estado):
+        pasta = estado[0].name
+        gerar_relatorios_unidades(os.path.join(pasta, "lote.zip"), ctx["df_p"], ctx["df_c"], pasta=pasta)
+    return preparar, executar, _apagar_pasta
+
+def caso_relatorios_incremental(ctx):
+    # Mesmo lote depois de alterar 1% dos documentos: só as unidades tocadas são renderizadas
+    from relatorio_unidades import gerar_relatorios_unidades
+    def preparar():
+        pasta = _pasta_temporaria("bench_lote_")
+        gerar_relatorios_unidades(os.path.join(pasta.name, "lote.zip"), ctx["df_p"], ctx["df_c"], pasta=pasta.name)
+        df_p = ctx["df_p"].copy()
+        passo = max(len(df_p) // max(len(df_p) // 100, 1), 1)
+        df_p.loc[df_p.index[::passo], 'Status'] = "CRÍTICO"
+        return pasta, df_p
+    def executar(estado):
+        pasta = estado[0].name
+        gerar_relatorios_unidades(os.path.join(pasta, "lote.zip"), estado[1], ctx["df_c"], pasta=pasta)
+    return preparar, executar, _apagar_pasta
+
+CASOS_CARTEIRA = {
+    "normalizacao_carga": caso_normalizacao,
+    "progresso_e_prazos": caso_progresso_e_prazos,
+    "indice_busca": caso_indice_busca,
+    "busca_filtro": caso_busca,
+    "indice_vencimentos": caso_indice_vencimentos,
+    "consulta_vencimentos": caso_consulta_vencimentos,
+    "alertas": caso_alertas,
+    "tarefas_sugeridas": caso_tarefas_sugeridas,
+    "serializacao_salvar": caso_serializacao,
+    "envio_delta_fake": caso_envio_delta,
+    "envio_fragmentado_fake": caso_envio_fragmentado,
+    "armazem_gravar": caso_armazem_gravar,
+    "relatorios_unidades": caso_relatorios_unidades,
+    "relatorios_incremental": caso_relatorios_incremental,
+}
+CASOS_VISTORIA = {"pacote_zip": caso_pacote_zip, "pacote_zip_blobs": caso_pacote_zip_blobs}
+
+# --- EXECUÇÃO ---
+def medir(preparar, executar, repeticoes, finalizar=None):
+    tempos = []
+    for _ in range(repeticoes):
+        estado = preparar() if preparar else None
+        try:
+            inicio = time.perf_counter()
+            executar(estado)
+            tempos.append(time.perf_counter() - inicio)
+        finally:
+            if finalizar: finalizar(estado)
+    return {"repeticoes": repeticoes, "min_ms": round(min(tempos) * 1000, 2), "mediana_ms": round(statistics.median(tempos) * 1000, 2),
+            "media_ms": round(statistics.mean(tempos) * 1000, 2), "max_ms": round(max(tempos) * 1000, 2)}
+
+def contexto_carteira(n_documentos, semente):
+    bruto_p, bruto_c = gerar_carteira(n_documentos, semente=semente)
+    df_p = normalizar_prazos(bruto_p)
+    return {"bruto_p": bruto_p, "bruto_c": bruto_c, "df_p": df_p[df_p['Unidade'] != ""].reset_index(drop=True), "df_c": normalizar_checklist(bruto_c)}
+
+def commit_atual():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception: return ""
+
+def ultima_execucao(caminho):
+    if not os.path.exists(caminho): return None
+    ultima = None
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            if linha.strip(): ultima = linha
+    return json.loads(ultima) if ultima else None
+
+def comparar(anterior, resultados, limite=LIMITE_REGRESSAO):
+    # Variação da mediana em relação à execução anterior, por (caso, tamanho)
+    antes = {(r["caso"], r["tamanho"]): r["mediana_ms"] for r in (anterior or {}).get("resultados", [])}
+    regressoes = []
+    for r in resultados:
+        base = antes.get((r["caso"], r["tamanho"]))
+        r["variacao"] = round(r["mediana_ms"] / base - 1, 3) if base else None
+        if r["variacao"] is not None and r["variacao"] > limite: regressoes.append(r)
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos de dados do Legaliza Health")
+    parser.add_argument("--tamanhos", default=",".join(map(str, TAMANHOS_PADRAO)), help="documentos por carteira, separados por vírgula")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES_PADRAO)
+    parser.add_argument("--casos", default="", help="só os casos listados (separados por vírgula)")
+    parser.add_argument("--itens-vistoria", type=int, default=20)
+    parser.add_argument("--fotos-por-item", type=int, default=3)
+    parser.add_argument("--segundos-audio", type=int, default=10)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default=SAIDA_PADRAO)
+    parser.add_argument("--limite-regressao", type=float, default=LIMITE_REGRESSAO)
+    parser.add_argument("--falhar-regressao", action="store_true", help="sai com código 1 se alguma mediana piorar além do limite")
+    args = parser.parse_args()
+
+    filtro = set(filter(None, args.casos.split(",")))
+    resultados = []
+    def registrar(caso, tamanho, funcoes):
+        preparar, executar, *finalizar = funcoes
+        r = {"caso": caso, "tamanho": tamanho, **medir(preparar, executar, args.repeticoes, *finalizar)}
+        resultados.append(r)
+        print(f"{caso:<22} {tamanho:>8}  mediana {r['mediana_ms']:>10.2f} ms  (min {r['min_ms']:.2f})", flush=True)
+
+    for tamanho in [int(t) for t in args.tamanhos.split(",") if t.strip()]:
+        casos = {k: v for k, v in CASOS_CARTEIRA.items() if not filtro or k in filtro}
+        if not casos: continue
+        ctx = contexto_carteira(tamanho, args.semente)
+        for nome, caso in casos.items(): registrar(nome, tamanho, caso(ctx))
+    casos = {k: v for k, v in CASOS_VISTORIA.items() if not filtro or k in filtro}
+    if casos:
+        ctx = {"vistoria": gerar_vistoria(args.itens_vistoria, args.fotos_por_item, args.segundos_audio, semente=args.semente)}
+        for nome, caso in casos.items(): registrar(nome, args.itens_vistoria * args.fotos_por_item, caso(ctx))
+
+    regressoes = comparar(ultima_execucao(args.saida), resultados, args.limite_regressao)
+    execucao = {"data": datetime.now().isoformat(timespec="seconds"), "commit": commit_atual(), "python": platform.python_version(),
+                "pandas": pd.__version__, "maquina": platform.node(), "argumentos": vars(args), "resultados": resultados}
+    with open(args.saida, "a", encoding="utf-8") as f: f.write(json.dumps(execucao, ensure_ascii=False) + "\n")
+    for r in regressoes: print(f"REGRESSÃO {r['caso']} ({r['tamanho']}): {r['variacao']:+.0%}", flush=True)
+    if regressoes and args.falhar_regressao: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from metricas import METRICAS
+
+# --- ARMAZÉM DE BLOBS (fotos e áudios da Vistoria) ---
+# Conteúdo gravado em disco pelo sha256 (o próprio hash é a referência), então a mesma foto
+# capturada duas vezes ocupa espaço uma vez só. As sessões guardam apenas as referências e
+# registram aqui quais estão em uso; blobs sem nenhuma sessão viram órfãos e são removidos
+# do menos usado para o mais usado quando o total passa de `limite_bytes`.
+
+LIMITE_BLOBS = 512 * 1024 * 1024
+TTL_SESSAO_BLOBS = 12 * 3600     # sessão sem atividade por esse tempo tem as referências liberadas
+
+def hash_blob(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+class ArmazemBlobs:
+    def __init__(self, diretorio, limite_bytes=LIMITE_BLOBS, ttl_sessao=TTL_SESSAO_BLOBS):
+        self.diretorio = diretorio
+        self.limite_bytes = limite_bytes
+        self.ttl_sessao = ttl_sessao
+        self._lock = threading.RLock()
+        self._tamanhos = OrderedDict()   # ref -> bytes, do menos para o mais recentemente usado
+        self._sessoes = {}               # sessão -> set de refs em uso
+        self._atividade = {}             # sessão -> último uso (time.time)
+        self.total_bytes = 0
+        self.removidos = 0
+        os.makedirs(diretorio, exist_ok=True)
+        # Blobs de um processo anterior entram como órfãos, na ordem de modificação
+        existentes = []
+        for raiz, _, arquivos in os.walk(diretorio):
+            for nome in arquivos:
+                if len(nome) == 64:
+                    st = os.stat(os.path.join(raiz, nome))
+                    existentes.append((st.st_mtime, nome, st.st_size))
+        for _, ref, tamanho in sorted(existentes):
+            self._tamanhos[ref] = tamanho
+            self.total_bytes += tamanho
+
+    def caminho(self, ref):
+        return os.path.join(self.diretorio, ref[:2], ref)
+
+    # --- CONTEÚDO ---
+    def guardar(self, dados, sessao=None):
+        ref = hash_blob(dados)
+        with self._lock:
+            if ref in self._tamanhos:
+                self._tamanhos.move_to_end(ref)
+                METRICAS.contar("blobs.deduplicados")
+            else:
+                caminho = self.caminho(ref)
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                with tempfile.NamedTemporaryFile(dir=os.path.dirname(caminho), delete=False) as tmp:
+                    tmp.write(dados)
+                os.replace(tmp.name, caminho)  # leitores nunca veem um blob pela metade
+                self._tamanhos[ref] = len(dados)
+                self.total_bytes += len(dados)
+            if sessao is not None: self.referenciar(sessao, [ref])
+            self._expirar_sessoes()
+            self._liberar_espaco()
+        return ref
+
+    def ler(self, ref):
+        with self._lock:
+            if ref in self._tamanhos: self._tamanhos.move_to_end(ref)
+        with open(self.caminho(ref), 'rb') as f: return f.read()
+
+    def abrir(self, ref):
+        with self._lock:
+            if ref in self._tamanhos: self._tamanhos.move_to_end(ref)
+        return open(self.caminho(ref), 'rb')
+
+    def existe(self, ref):
+        with self._lock: return ref in self._tamanhos
+
+    def tamanho(self, ref):
+        with self._lock: return self._tamanhos.get(ref, 0)
+
+    # --- REFERÊNCIAS POR SESSÃO ---
+    def referenciar(self, sessao, refs):
+        with self._lock:
+            self._sessoes.setdefault(sessao, set()).update(refs)
+            self._atividade[sessao] = time.time()
+
+    def definir_refs(self, sessao, refs):
+        # Substitui o conjunto em uso pela sessão (ex: depois de apagar itens ou limpar fotos)
+        with self._lock:
+            self._sessoes[sessao] = set(refs)
+            self._atividade[sessao] = time.time()
+            self._liberar_espaco()
+
+    def tocar(self, sessao):
+        with self._lock:
+            if sessao in self._sessoes: self._atividade[sessao] = time.time()
+
+    def soltar_sessao(self, sessao):
+        with self._lock:
+            self._sessoes.pop(sessao, None)
+            self._atividade.pop(sessao, None)
+            self._liberar_espaco()
+
+    def vincular_sessao(self, dono, sessao):
+        # Libera as referências quando o objeto `dono` (guardado no session_state) for coletado
+        weakref.finalize(dono, self.soltar_sessao, sessao)
+
+    def _expirar_sessoes(self):
+        limite = time.time() - self.ttl_sessao
+        for sessao in [s for s, t in self._atividade.items() if t < limite]:
+            self._sessoes.pop(sessao, None)
+            self._atividade.pop(sessao, None)
+
+    # --- ESPAÇO ---
+    def _em_uso(self):
+        return set().union(*self._sessoes.values()) if self._sessoes else set()
+
+    def _liberar_espaco(self):
+        if self.total_bytes <= self.limite_bytes: return
+        em_uso = self._em_uso()
+        for ref in [r for r in self._tamanhos if r not in em_uso]:
+            if self.total_bytes <= self.limite_bytes: break
+            try: os.unlink(self.caminho(ref))
+            except FileNotFoundError: pass
+            self.total_bytes -= self._tamanhos.pop(ref)
+            self.removidos += 1
+            METRICAS.contar("blobs.removidos")
+
+    def uso(self):
+        with self._lock:
+            em_uso = self._em_uso()
+            orfaos = [r for r in self._tamanhos if r not in em_uso]
+            return {"blobs": len(self._tamanhos), "bytes": self.total_bytes, "limite_bytes": self.limite_bytes,
+                    "orfaos": len(orfaos), "bytes_orfaos": sum(self._tamanhos[r] for r in orfaos),
+                    "sessoes": len(self._sessoes), "removidos": self.removidos}
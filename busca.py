@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from nucleo_dados import normalizar_texto
+from metricas import medir
+
+# --- ÍNDICE DE BUSCA (montado uma vez por carga de dados) ---
+# Normaliza (sem acento, minúsculo) cada valor distinto de Unidade/Documento/Setor/CNPJ
+# uma única vez e indexa esses valores por trigramas. A busca trabalha sobre o
+# vocabulário de valores distintos e projeta o resultado nas linhas com numpy.
+
+CAMPOS_BUSCA = ["Unidade", "Documento", "Setor", "CNPJ"]
+LIMIAR_APROXIMADO = 0.6   # fração dos trigramas do termo que precisa aparecer no valor
+PESO_APROXIMADO = 0.5     # acerto aproximado vale menos que substring exata no ranking
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class IndiceBusca:
+    def __init__(self, df, campos=CAMPOS_BUSCA):
+        self.campos = [c for c in campos if c in df.columns]
+        self.rotulos = df.index
+        vocab = {}
+        colunas = []
+        for campo in self.campos:
+            codigos, distintos = pd.factorize(df[campo].astype(str), use_na_sentinel=False)
+            ids = np.array([vocab.setdefault(normalizar_texto(v), len(vocab)) for v in distintos], dtype=np.int64)
+            colunas.append(ids[codigos] if len(ids) else np.zeros(0, dtype=np.int64))
+        self.vocab = list(vocab.keys())
+        self.tamanhos = np.array([max(len(v), 1) for v in self.vocab], dtype=float)
+        self.matriz = np.column_stack(colunas) if colunas else np.zeros((len(df), 0), dtype=np.int64)
+
+        # Coluna concatenada normalizada (busca por frase inteira)
+        vocab_arr = np.array(self.vocab, dtype=object)
+        self.texto = pd.Series([""] * len(df), index=df.index, dtype=object)
+        if len(self.campos):
+            self.texto = pd.Series(vocab_arr[self.matriz[:, 0]], index=df.index, dtype=object)
+            for j in range(1, len(self.campos)):
+                self.texto = self.texto + " | " + vocab_arr[self.matriz[:, j]]
+
+        postings = {}
+        for i, v in enumerate(self.vocab):
+            for t in trigramas(v): postings.setdefault(t, []).append(i)
+        self.trigramas = {t: np.array(ids, dtype=np.int64) for t, ids in postings.items()}
+
+    def _pontuar_vocab(self, palavra):
+        n = len(self.vocab)
+        exato = np.fromiter((palavra in v for v in self.vocab), dtype=bool, count=n)
+        # Substring exata vale 1 + um bônus para valores mais "justos" ao termo (Canoas 12 antes de Canoas 123)
+        pontos = np.where(exato, 1.0 + 0.5 * len(palavra) / self.tamanhos, 0.0)
+        tri = trigramas(palavra)
+        # Números (CNPJ) e termos curtos só casam por substring: trigramas repetidos geram falsos positivos
+        if len(tri) >= 4 and not palavra.isdigit():
+            listas = [self.trigramas[t] for t in tri if t in self.trigramas]
+            if listas:
+                sim = np.bincount(np.concatenate(listas), minlength=n) / len(tri)
+                aprox = np.where(sim >= LIMIAR_APROXIMADO, sim * PESO_APROXIMADO, 0.0)
+                pontos = np.maximum(pontos, aprox)
+        return pontos
+
+    def pontuar(self, termo):
+        # Pontuação por linha (0 = não encontrado); todas as palavras do termo precisam aparecer
+        termo = normalizar_texto(termo).strip()
+        total = np.zeros(len(self.rotulos))
+        if not termo: return total + 1.0
+        if not self.campos: return total
+        ok = np.ones(len(self.rotulos), dtype=bool)
+        palavras = termo.split()
+        for palavra in palavras:
+            por_linha = self._pontuar_vocab(palavra)[self.matriz].max(axis=1)
+            ok &= por_linha > 0
+            total += por_linha
+        if len(palavras) == 1: return np.where(ok, total, 0.0)
+        frase = self.texto.str.contains(termo, regex=False).to_numpy(dtype=bool)
+        total = np.where(frase, total + 1.0, total)
+        return np.where(ok | frase, total, 0.0)
+
+    def buscar(self, termo, limite=None):
+        # Rótulos do índice do DataFrame, do mais relevante para o menos relevante
+        pontos = self.pontuar(termo)
+        achados = np.flatnonzero(pontos > 0)
+        ordem = achados[np.argsort(-pontos[achados], kind="stable")]
+        if limite: ordem = ordem[:limite]
+        return self.rotulos[ordem]
+
+    def filtrar(self, df, termo):
+        # Aplica a busca a um recorte (mesmos rótulos) do DataFrame indexado, já ordenado por relevância
+        with medir("busca.filtrar", linhas=len(df)) as m:
+            rotulos = self.buscar(termo)
+            resultado = df.loc[rotulos[rotulos.isin(df.index)]]
+            m["achados"] = len(resultado)
+        return resultado
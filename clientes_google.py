@@ -0,0 +1,148 @@
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import gspread
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+from nucleo_dados import NOME_PLANILHA
+
+# --- CAMADA DE CLIENTES GOOGLE (um por processo) ---
+# Guarda credenciais, cliente gspread autorizado, planilhas abertas e handles das abas, e
+# renova o token OAuth antes de expirar. Conta as chamadas HTTP (e bytes) feitas por
+# cada operação nomeada, ex: `with camada.operacao("salvar"): ...`, inclusive nas threads
+# que a operação dispara via `camada.propagar(funcao)`.
+
+ESCOPOS = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+MARGEM_RENOVACAO = timedelta(minutes=5)
+
+class PlanilhaCacheada:
+    # Repassa tudo para a Spreadsheet do gspread, mas só busca cada aba uma vez
+    def __init__(self, planilha):
+        self._planilha = planilha
+        self._abas = {}
+        self._lock = threading.Lock()
+
+    def worksheet(self, titulo):
+        with self._lock:
+            if titulo not in self._abas: self._abas[titulo] = self._planilha.worksheet(titulo)
+            return self._abas[titulo]
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        aba = self._planilha.add_worksheet(title, rows, cols, **kwargs)
+        with self._lock: self._abas[title] = aba
+        return aba
+
+    def __getattr__(self, nome):
+        return getattr(self._planilha, nome)
+
+class CamadaGoogle:
+    def __init__(self, credenciais, autorizar=gspread.authorize, nome_planilha=NOME_PLANILHA):
+        self.credenciais = credenciais
+        self.autorizar = autorizar
+        self.nome_planilha = nome_planilha
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._cliente = None
+        self._planilhas = {}
+        self._estatisticas = {}
+
+    @classmethod
+    def da_conta_servico(cls, info_conta, **kwargs):
+        return cls(service_account.Credentials.from_service_account_info(dict(info_conta), scopes=ESCOPOS), **kwargs)
+
+    # --- TOKEN ---
+    def garantir_token(self):
+        # Renova antes de expirar para que nenhuma requisição pague o refresh no caminho crítico
+        creds = self.credenciais
+        if creds is None or not hasattr(creds, 'refresh'): return
+        with self._lock:
+            expira = getattr(creds, 'expiry', None)
+            agora = datetime.now(timezone.utc).replace(tzinfo=None)
+            if creds.token is None or expira is None or expira - agora < MARGEM_RENOVACAO:
+                creds.refresh(Request())
+                self._contar(0, renovacao=True)
+
+    # --- CLIENTES ---
+    def cliente(self):
+        with self._lock:
+            if self._cliente is None:
+                self._cliente = self.autorizar(self.credenciais)
+                self._instrumentar(self._cliente)
+        self.garantir_token()
+        return self._cliente
+
+    def planilha(self, nome=None):
+        # Planilha principal por padrão; fragmentos podem viver em outras planilhas
+        nome = nome or self.nome_planilha
+        cliente = self.cliente()
+        with self._lock:
+            if nome not in self._planilhas: self._planilhas[nome] = PlanilhaCacheada(cliente.open(nome))
+            return self._planilhas[nome]
+
+    def servico_drive(self):
+        # Cliente Drive novo (não é thread-safe): quem usa em threads guarda um por thread
+        from googleapiclient.discovery import build
+        self.garantir_token()
+        return build('drive', 'v3', credentials=self.credenciais, cache_discovery=False)
+
+    def invalidar(self):
+        # Descarta planilha/abas em cache (ex: aba recriada por fora ou erro 404)
+        with self._lock: self._planilhas = {}
+
+    # --- MEDIÇÃO DE CHAMADAS ---
+    def _instrumentar(self, cliente):
+        sessao = getattr(getattr(cliente, 'http_client', None), 'session', None)
+        if sessao is None: return
+        original = sessao.request
+        def request(method, url, *args, **kwargs):
+            resp = original(method, url, *args, **kwargs)
+            enviado = kwargs.get('data') or kwargs.get('json') or b""
+            self._contar(len(resp.content or b"") + len(enviado if isinstance(enviado, (bytes, str)) else str(enviado)))
+            return resp
+        sessao.request = request
+
+    def _contar(self, n_bytes, renovacao=False):
+        nome = getattr(self._local, 'operacao', None) or "sem_operacao"
+        with self._lock:
+            est = self._estatisticas.setdefault(nome, {"execucoes": 0, "chamadas": 0, "bytes": 0, "renovacoes_token": 0})
+            if renovacao: est["renovacoes_token"] += 1
+            else:
+                est["chamadas"] += 1
+                est["bytes"] += n_bytes
+            op = getattr(self._local, 'atual', None)
+            if op is not None and not renovacao:
+                op["chamadas"] += 1
+                op["bytes"] += n_bytes
+
+    @contextmanager
+    def operacao(self, nome):
+        anterior_nome, anterior = getattr(self._local, 'operacao', None), getattr(self._local, 'atual', None)
+        atual = {"operacao": nome, "chamadas": 0, "bytes": 0}
+        self._local.operacao, self._local.atual = nome, atual
+        with self._lock: self._estatisticas.setdefault(nome, {"execucoes": 0, "chamadas": 0, "bytes": 0, "renovacoes_token": 0})["execucoes"] += 1
+        try:
+            yield atual
+        finally:
+            self._local.operacao, self._local.atual = anterior_nome, anterior
+
+    def propagar(self, funcao):
+        # Envolve `funcao` para rodar em outra thread contando as chamadas na operação atual desta
+        nome, atual = getattr(self._local, 'operacao', None), getattr(self._local, 'atual', None)
+        def executar(*args, **kwargs):
+            self._local.operacao, self._local.atual = nome, atual
+            try: return funcao(*args, **kwargs)
+            finally: self._local.operacao = self._local.atual = None
+        return executar
+
+    def estatisticas(self):
+        with self._lock: return {k: dict(v) for k, v in self._estatisticas.items()}
+
+_camadas = {}
+_lock_camadas = threading.Lock()
+
+def get_camada_google(info_conta):
+    # Uma camada por conta de serviço no processo (compartilhada entre sessões e threads)
+    chave = info_conta.get("client_email", "")
+    with _lock_camadas:
+        if chave not in _camadas: _camadas[chave] = CamadaGoogle.da_conta_servico(info_conta)
+        return _camadas[chave]
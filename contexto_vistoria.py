@@ -0,0 +1,86 @@
+# --- CONTEXTO DA VISTORIA (setores e NCs sugeridas por tipo de estabelecimento) ---
+# Montado uma vez por processo na importação, não a cada rerun do app.
+CONTEXT_DATA = {
+    "🏥 Hospital / Clínica / Laboratório": {
+        "setores": [
+            "Recepção/Acessibilidade", "Consultório Indiferenciado", "Consultório Gineco/Uro", 
+            "Sala de Procedimentos", "DML (Limpeza)", "Expurgo (Sujo)", "Esterilização (Limpo)", 
+            "Abrigo de Resíduos", "Cozinha/Copa", "Farmácia/CAF", "Raio-X/Imagem", "UTI", "Centro Cirúrgico"
+        ],
+        "sugestoes": {
+            "Recepção/Acessibilidade": [
+                "Balcão de atendimento sem rebaixo PNE (NBR 9050)",
+                "Sanitário PNE sem barras de apoio ou alarme de emergência",
+                "Área de giro 1.50m no sanitário PNE obstruída",
+                "Desnível de piso > 5mm sem rampa",
+                "Bebedouro não acessível (altura incorreta)"
+            ],
+            "Consultório Indiferenciado": [
+                "Ausência de lavatório para mãos (obrigatório)",
+                "Torneira com acionamento manual (exige comando não manual)",
+                "Piso/Parede com juntas ou rodapé não arredondado",
+                "Mobiliário com superfície porosa (madeira não tratada)",
+                "Lixeira sem acionamento por pedal"
+            ],
+            "DML (Limpeza)": [
+                "Tanque de lavagem único (necessário setorização)",
+                "Ausência de ralo sifonado",
+                "Armazenamento de saneantes sem estrado/pallet",
+                "Ventilação mecânica ineficiente/ausente"
+            ],
+            "Expurgo (Sujo)": [
+                "Cruzamento de fluxo limpo x sujo",
+                "Ausência de pia de lavagem profunda (vazia clínica)",
+                "Pistola de ar/água inoperante",
+                "Bancada de madeira ou material poroso"
+            ],
+            "Esterilização (Limpo)": [
+                "Autoclave sem registro de teste biológico/químico",
+                "Barreira física entre área suja/limpa inexistente",
+                "Ar condicionado sem controle de temperatura",
+                "Armazenamento de estéreis próximo ao teto/piso"
+            ],
+            "Abrigo de Resíduos": [
+                "Ausência de ponto de água e ralo",
+                "Área não telada (acesso de vetores)",
+                "Identificação de grupos (A, B, E) incorreta",
+                "Porta sem abertura para ventilação (veneziana)"
+            ],
+            "Farmácia/CAF": [
+                "Termohigrômetro não calibrado ou ausente",
+                "Armário de controlados (Port. 344) sem chave/segurança",
+                "Pallets de madeira (proibido em área limpa)",
+                "Medicamentos encostados na parede/teto"
+            ],
+            "Raio-X/Imagem": [
+                "Sinalização luminosa (luz vermelha) inoperante",
+                "Visor plumbífero com falha de vedação",
+                "Porta sem proteção radiológica (chumbo)",
+                "Ausência de sinalização 'Risco de Radiação' e 'Grávidas'"
+            ],
+            "DEFAULT": [
+                "Divergência entre Projeto (LTA) e Executado",
+                "Extintor vencido ou obstruído",
+                "Sinalização de rota de fuga fotoluminescente ausente",
+                "Iluminação de emergência inoperante",
+                "Certificado de dedetização vencido"
+            ]
+        }
+    },
+    "🏭 Indústria / Logística": {
+        "setores": ["Linha de Produção", "Estoque/Almoxarifado", "Vestiários", "Refeitório", "Caldeiras/Compressor", "Área Externa"],
+        "sugestoes": {
+            "Linha de Produção": ["Máquinas sem proteção (NR-12)", "Área de circulação obstruída", "Painel elétrico sem tranca (NR-10)", "Iluminação insuficiente"],
+            "Estoque/Almoxarifado": ["Empilhamento excessivo", "Extintores obstruídos", "Porta-pallets danificada", "Ausência de rota de fuga"],
+            "DEFAULT": ["AVCB vencido", "Ausência de SPDA", "Descarte de efluentes irregular"]
+        }
+    },
+    "🛒 Varejo de Alimentos": {
+        "setores": ["Área de Venda", "Cozinha/Manipulação", "Estoque Seco", "Câmara Fria", "Saneantes", "Lixo"],
+        "sugestoes": {
+            "Cozinha/Manipulação": ["Fluxo cruzado", "Ausência de pia exclusiva mãos", "Ausência de tela milimétrica", "Luminárias sem proteção"],
+            "Câmara Fria": ["Temperatura alta", "Gelo acumulado", "Alimentos no chão", "Porta não veda"],
+            "DEFAULT": ["Licença Sanitária vencida", "Manual de Boas Práticas desatualizado", "Caixa d'Água suja"]
+        }
+    }
+}
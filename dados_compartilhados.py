@@ -0,0 +1,270 @@
+import threading
+import pandas as pd
+from nucleo_dados import COLUNAS_PRAZOS, COLUNAS_CHECKLIST, agregar_checklist, normalizar_feito
+from motor_prazos import hoje_sp, calcular_prazos
+from busca import IndiceBusca
+from vencimentos import IndiceVencimentos
+from metricas import medir
+from painel import calcular_agregados, ordem_coluna
+from diario import lista_tarefas
+
+# --- DADOS COMPARTILHADOS ENTRE SESSÕES ---
+# Um Retrato imutável por processo (uma versão do armazém + o dia de referência), com colunas
+# categóricas e datas em datetime64, já com progresso e prazos calculados. Cada sessão guarda só
+# uma Sobreposicao com as próprias edições que o diário ainda não aplicou, por cima do retrato. A visão
+# da sessão parte de uma cópia rasa do retrato e só as colunas que vai escrever ganham cópia própria
+# (`_colunas_proprias`), então o retrato não é alterado e o resto da memória continua compartilhado.
+# Agregados do painel, ordenações por coluna e os índices de busca e de vencimentos também vivem no retrato.
+
+COLUNAS_CATEGORICAS = ["Unidade", "Status", "Documento", "Setor"]
+COLUNAS_DATA = ["Data_Recebimento", "Vencimento"]
+COLUNAS_DERIVADAS = ["Progresso", "tarefas_total", "tarefas_feitas", "dias_para_vencer", "vencido", "nivel_alerta"]
+
+def tipar_prazos(df_prazos):
+    df = df_prazos
+    for c in COLUNAS_PRAZOS + ["ID_UNICO"]:
+        if c not in df.columns: df = df.assign(**{c: ""})
+    return df.assign(**{c: df[c].fillna("").astype(str).astype("category") for c in COLUNAS_CATEGORICAS},
+                     **{c: pd.to_datetime(df[c], errors='coerce').astype("datetime64[ns]") for c in COLUNAS_DATA})
+
+def tipar_checklist(df_checklist):
+    df = df_checklist
+    for c in COLUNAS_CHECKLIST:
+        if c not in df.columns: df = df.assign(**{c: ""})
+    feito = df['Feito'] if df['Feito'].dtype == bool else normalizar_feito(df['Feito'])
+    return df.assign(Documento_Ref=df['Documento_Ref'].astype(str), Feito=feito)
+
+def derivar(df_prazos, df_checklist, hoje):
+    return calcular_prazos(agregar_checklist(df_prazos, df_checklist), hoje)
+
+def _atribuir(df, rotulos, coluna, valores):
+    # df.loc com cuidado de tipo: categoria nova é incluída, datas viram datetime64
+    valores = list(valores)
+    if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+        valores = ["" if v is None else str(v) for v in valores]
+        novas = [v for v in dict.fromkeys(valores) if v not in df[coluna].cat.categories]
+        if novas: df = df.assign(**{coluna: df[coluna].cat.add_categories(novas)})
+    elif coluna in COLUNAS_DATA:
+        valores = pd.to_datetime(pd.Series(valores, dtype=object), errors='coerce').astype("datetime64[ns]").tolist()
+    df.loc[list(rotulos), coluna] = valores
+    return df
+
+def _colunas_proprias(df, colunas):
+    # Cópia rasa em que `colunas` deixam de apontar para os arrays do retrato
+    df = df.copy(deep=False)
+    for c in colunas:
+        if c in df.columns: df[c] = df[c].copy()
+    return df
+
+def _concatenar(frames):
+    # Mantém as colunas categóricas categóricas (concat de categorias diferentes viraria object)
+    frames = [f for f in frames if not f.empty]
+    if len(frames) < 2: return frames[0] if frames else pd.DataFrame()
+    ajuste = {}
+    for c in COLUNAS_CATEGORICAS:
+        if all(c in f.columns and isinstance(f[c].dtype, pd.CategoricalDtype) for f in frames):
+            ajuste[c] = pd.Index(dict.fromkeys(v for f in frames for v in f[c].cat.categories))
+    return pd.concat([f.assign(**{c: f[c].cat.set_categories(cats) for c, cats in ajuste.items()}) for f in frames])
+
+class Retrato:
+    def __init__(self, df_prazos, df_checklist, versao, hoje, seq_diario=0):
+        self.versao = versao
+        self.hoje = hoje
+        self.seq_diario = seq_diario   # última operação do diário já contida nos dados
+        self.checklist = tipar_checklist(df_checklist).reset_index(drop=True)
+        self.prazos = derivar(tipar_prazos(df_prazos).reset_index(drop=True), self.checklist, hoje)
+        ids = self.prazos['ID_UNICO'].astype(str).tolist()
+        self.posicoes = dict(zip(reversed(ids), reversed(range(len(ids)))))  # ID -> primeira linha com ele
+        self._indice = None
+        self._vencimentos = None
+        self._agregados = None
+        self._ordens = {}
+        self._lock = threading.Lock()
+
+    def agregados(self):
+        with self._lock:
+            if self._agregados is None:
+                with medir("painel.agregados", linhas=len(self.prazos)): self._agregados = calcular_agregados(self.prazos)
+            return self._agregados
+
+    def ordem(self, coluna):
+        with self._lock:
+            if coluna not in self._ordens: self._ordens[coluna] = ordem_coluna(self.prazos, coluna)
+            return self._ordens[coluna]
+
+    def indice_busca(self):
+        with self._lock:
+            if self._indice is None:
+                with medir("busca.indice", linhas=len(self.prazos)): self._indice = IndiceBusca(self.prazos)
+            return self._indice
+
+    def indice_vencimentos(self):
+        with self._lock:
+            if self._vencimentos is None:
+                with medir("vencimentos.indice", linhas=len(self.prazos)): self._vencimentos = IndiceVencimentos(self.prazos)
+            return self._vencimentos
+
+class RepositorioDados:
+    # Guarda o retrato atual; remonta quando a versão do armazém ou o dia mudam.
+    # `ler` devolve (prazos, checklist) ou (prazos, checklist, seq do diário aplicado).
+    def __init__(self, ler, versao):
+        self.ler = ler
+        self.versao = versao
+        self._retrato = None
+        self._lock = threading.Lock()
+
+    def retrato(self):
+        versao, hoje = self.versao(), hoje_sp()
+        atual = self._retrato
+        if atual is not None and atual.versao == versao and atual.hoje == hoje: return atual
+        with self._lock:
+            atual = self._retrato
+            if atual is None or atual.versao != versao or atual.hoje != hoje:
+                with medir("dados.retrato") as m:
+                    df_p, df_c, *seq = self.ler()
+                    self._retrato = atual = Retrato(df_p, df_c, versao, hoje, *seq)
+                    m["linhas"] = len(df_p)
+            return atual
+
+class Sobreposicao:
+    # Edições da sessão que o diário ainda não aplicou, por ID_UNICO (do retrato) e Documento_Ref.
+    # `registrar(tipo, dados)` grava cada operação no diário e devolve o seq dela.
+    def __init__(self, registrar=None):
+        self.registrar = registrar
+        self.operacoes = []    # (seq, tipo, dados) desta sessão ainda fora do retrato
+        self.seq_base = 0
+        self.limpar()
+
+    def limpar(self):
+        self.alteracoes = {}   # ID no retrato -> {coluna: valor}
+        self.removidos = set()
+        self.novos = {}        # ID -> linha completa dos documentos criados nesta sessão (mais recente primeiro)
+        self.tarefas = {}      # Documento_Ref -> DataFrame com todas as tarefas do documento
+        self.apelidos = {}     # ID novo -> ID no retrato (documentos renomeados)
+        self.tudo_excluido = False
+        self.revisao = getattr(self, 'revisao', 0) + 1
+
+    def vazia(self):
+        return not (self.alteracoes or self.removidos or self.novos or self.tarefas or self.tudo_excluido)
+
+    def toca_busca(self):
+        # Busca compartilhada só serve enquanto a sessão não criou nem editou campos pesquisáveis
+        return bool(self.novos) or self.tudo_excluido or any(c in campos for campos in self.alteracoes.values() for c in ("Unidade", "Documento", "Setor", "CNPJ"))
+
+    def toca_vencimentos(self):
+        return bool(self.novos or self.removidos) or self.tudo_excluido or any("Vencimento" in campos for campos in self.alteracoes.values())
+
+    def indice_vencimentos(self, retrato, df_prazos):
+        # Índice do retrato ajustado só nas linhas que a sessão criou, removeu ou cujo vencimento mudou
+        if self.tudo_excluido: return IndiceVencimentos(df_prazos)
+        removidos = [retrato.posicoes[i] for i in self.removidos if i in retrato.posicoes]
+        datas = [retrato.posicoes[i] for i, c in self.alteracoes.items() if "Vencimento" in c and i in retrato.posicoes and i not in self.removidos]
+        novos = df_prazos.index[df_prazos.index >= len(retrato.prazos)]
+        return retrato.indice_vencimentos().atualizado(df_prazos, remover=removidos + datas, inserir=datas + list(novos))
+
+    # --- DIÁRIO ---
+    def _operacao(self, tipo, **dados):
+        seq = self.registrar(tipo, dados) if self.registrar else None
+        self.operacoes.append((seq, tipo, dados))
+        getattr(self, f"_{tipo}")(**dados)
+        self.revisao += 1
+
+    def rebasear(self, seq_aplicada):
+        # Retrato novo: o que ele já contém sai da sobreposição e o resto é reaplicado por cima
+        if seq_aplicada == self.seq_base: return
+        self.seq_base = seq_aplicada
+        restantes = [op for op in self.operacoes if op[0] is None or op[0] > seq_aplicada]
+        if len(restantes) == len(self.operacoes): return
+        self.limpar()
+        self.operacoes = restantes
+        for _, tipo, dados in restantes: getattr(self, f"_{tipo}")(**dados)
+
+    # --- EDIÇÃO ---
+    def adicionar(self, linha):
+        self._operacao("adicionar", linha=dict(linha))
+
+    def editar(self, id_unico, **campos):
+        self._operacao("editar", id=id_unico, campos=campos)
+
+    def remover(self, id_unico):
+        self._operacao("remover", id=id_unico)
+
+    def definir_tarefas(self, ref, df_tarefas):
+        self._operacao("definir_tarefas", ref=str(ref), tarefas=lista_tarefas(df_tarefas))
+
+    def excluir_tudo(self):
+        self._operacao("excluir_tudo")
+
+    def mover_tarefas(self, ref_antiga, ref_nova, df_checklist):
+        self.definir_tarefas(ref_nova, df_checklist[df_checklist['Documento_Ref'] == str(ref_antiga)])
+        self.definir_tarefas(ref_antiga, pd.DataFrame(columns=COLUNAS_CHECKLIST))
+
+    def _adicionar(self, linha):
+        self.novos = {linha["ID_UNICO"]: dict(linha), **self.novos}
+
+    def _editar(self, id, campos):
+        id_unico = id
+        novo_id = campos.get("ID_UNICO", id_unico)
+        if id_unico in self.novos:
+            self.novos[id_unico].update(campos)
+            if novo_id != id_unico: self.novos = {(novo_id if k == id_unico else k): v for k, v in self.novos.items()}
+        else:
+            origem = self.apelidos.pop(id_unico, id_unico)
+            self.alteracoes.setdefault(origem, {}).update(campos)
+            if novo_id != origem: self.apelidos[novo_id] = origem
+
+    def _remover(self, id):
+        if id in self.novos: del self.novos[id]
+        else:
+            origem = self.apelidos.pop(id, id)
+            self.alteracoes.pop(origem, None)
+            self.removidos.add(origem)
+        self.tarefas[id] = pd.DataFrame(columns=COLUNAS_CHECKLIST)
+
+    def _definir_tarefas(self, ref, tarefas):
+        df = pd.DataFrame([[ref, t, bool(f)] for t, f in tarefas], columns=COLUNAS_CHECKLIST)
+        self.tarefas[ref] = tipar_checklist(df).reset_index(drop=True)
+
+    def _excluir_tudo(self):
+        self.limpar()
+        self.tudo_excluido = True
+
+    # --- LEITURA ---
+    def _tarefas_de(self, df_c, df_p):
+        # Só as tarefas das linhas recalculadas entram no groupby
+        return df_c[df_c['Documento_Ref'].isin(df_p['ID_UNICO'].astype(str))]
+
+    def aplicar(self, retrato):
+        # Visão da sessão = retrato + edições. Sem edições devolve o próprio retrato (sem cópia).
+        if self.vazia(): return retrato.prazos, retrato.checklist
+
+        df_c = retrato.checklist.iloc[0:0] if self.tudo_excluido else retrato.checklist
+        if self.tarefas:
+            df_c = _concatenar([df_c[~df_c['Documento_Ref'].isin(list(self.tarefas))]] + list(self.tarefas.values()))
+            if df_c.empty: df_c = retrato.checklist.iloc[0:0]
+            df_c = df_c.reset_index(drop=True)
+
+        df_p = retrato.prazos.iloc[0:0] if self.tudo_excluido else retrato.prazos
+        removidos = [retrato.posicoes[i] for i in self.removidos if i in retrato.posicoes]
+        if removidos: df_p = df_p.drop(removidos, errors="ignore")
+        alteracoes = {retrato.posicoes[i]: c for i, c in self.alteracoes.items() if i in retrato.posicoes and i not in self.removidos and retrato.posicoes[i] in df_p.index}
+        editadas = list(dict.fromkeys(c for campos in alteracoes.values() for c in campos))
+        df_p = _colunas_proprias(df_p, editadas + (COLUNAS_DERIVADAS if alteracoes or self.tarefas else []))
+        for coluna in editadas:
+            rotulos = [r for r, campos in alteracoes.items() if coluna in campos]
+            df_p = _atribuir(df_p, rotulos, coluna, [alteracoes[r][coluna] for r in rotulos])
+        tocados = list(alteracoes)
+        if self.tarefas:
+            tocados += df_p.index[df_p['ID_UNICO'].astype(str).isin(list(self.tarefas))].tolist()
+        if self.novos:
+            inicio = len(retrato.prazos)
+            df_novos = tipar_prazos(pd.DataFrame(list(self.novos.values()), index=range(inicio, inicio + len(self.novos))))
+            df_p = _concatenar([derivar(df_novos, self._tarefas_de(df_c, df_novos), retrato.hoje), df_p])
+
+        # Progresso e prazos recalculados só nas linhas tocadas
+        tocados = list(dict.fromkeys(tocados))
+        if tocados:
+            sub = df_p.loc[tocados]
+            sub = derivar(sub, self._tarefas_de(df_c, sub), retrato.hoje)
+            for coluna in COLUNAS_DERIVADAS: df_p.loc[tocados, coluna] = sub[coluna].tolist()
+        return df_p, df_c
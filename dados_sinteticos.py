@@ -0,0 +1,73 @@
+import io
+import random
+import struct
+from datetime import date, timedelta
+import pandas as pd
+from nucleo_dados import COLUNAS_PRAZOS, COLUNAS_CHECKLIST
+from inteligencia_docs import DOC_INTELLIGENCE
+
+# --- DADOS SINTÉTICOS (benchmarks e testes de carga) ---
+# Carteiras no formato das abas Prazos/Checklist_Itens como vêm do get_all_records (tudo texto,
+# datas dd/mm/aaaa). Poucos tipos de documento concentram a maior parte das linhas (distribuição
+# tipo Zipf sobre a DOC_INTELLIGENCE), cada unidade tem um CNPJ e carrega de 5 a 40 documentos,
+# e as tarefas do checklist são as sugeridas pela regra do documento.
+
+CIDADES = ["Porto Alegre", "Gravataí", "Canoas", "Caxias do Sul", "Pelotas", "São Paulo", "Campinas", "Curitiba",
+           "Florianópolis", "Joinville", "Belo Horizonte", "Uberlândia", "Goiânia", "Salvador", "Recife", "Fortaleza"]
+TIPOS_UNIDADE = ["Hospital", "Clínica", "Laboratório", "Farmácia", "UBS", "Centro de Imagem", "Hemocentro", "Policlínica"]
+SETORES = ["Administrativo", "Assistencial", "Farmácia", "Laboratório", "Imagem", "Engenharia", "Qualidade", ""]
+TAREFA_LIVRE = ["Cobrar prestador", "Anexar comprovante", "Agendar vistoria", "Conferir taxa"]
+
+def _cnpj(rng):
+    return "".join(str(rng.randint(0, 9)) for _ in range(14))
+
+def gerar_carteira(n_documentos, semente=42, hoje=None, fracao_feito=0.4):
+    # Retorna (df_prazos, df_checklist) como registros crus da planilha
+    rng = random.Random(semente)
+    hoje = hoje or date.today()
+    tipos = [k for k in DOC_INTELLIGENCE if k != "DEFAULT"]
+    pesos = [1 / (i + 1) for i in range(len(tipos))]
+    prazos, checklist = [], []
+    n_unidade = 0
+    while len(prazos) < n_documentos:
+        n_unidade += 1
+        unidade = f"{rng.choice(TIPOS_UNIDADE)} {rng.choice(CIDADES)} {n_unidade}"
+        cnpj = _cnpj(rng)
+        docs = set(rng.choices(tipos, weights=pesos, k=min(rng.randint(5, 40), n_documentos - len(prazos))))
+        for doc in docs:
+            info = DOC_INTELLIGENCE[doc]
+            recebido = hoje - timedelta(days=rng.randint(0, 720))
+            vencimento = recebido + timedelta(days=info["dias"] or rng.randint(30, 720)) + timedelta(days=rng.randint(-60, 60))
+            tarefas = info["tarefas"] + rng.sample(TAREFA_LIVRE, rng.randint(0, 2))
+            feitas = [rng.random() < fracao_feito for _ in tarefas]
+            prazos.append([unidade, rng.choice(SETORES), doc, cnpj, recebido.strftime('%d/%m/%Y'), vencimento.strftime('%d/%m/%Y'),
+                           info["risco"], str(100 * sum(feitas) // len(feitas)), str(all(feitas))])
+            checklist += [[f"{unidade} - {doc}", t, "TRUE" if f else "FALSE"] for t, f in zip(tarefas, feitas)]
+    return pd.DataFrame(prazos, columns=COLUNAS_PRAZOS), pd.DataFrame(checklist, columns=COLUNAS_CHECKLIST)
+
+def _jpeg(rng, largura, altura):
+    from PIL import Image
+    # Ruído em blocos: comprime como foto de verdade (nem trivial, nem incompressível)
+    img = Image.frombytes('RGB', (largura // 8, altura // 8), rng.randbytes(largura // 8 * altura // 8 * 3))
+    saida = io.BytesIO()
+    img.resize((largura, altura), Image.BILINEAR).save(saida, format='JPEG', quality=85)
+    return saida.getvalue()
+
+def _wav(rng, segundos, taxa=16000):
+    amostras = rng.randbytes(segundos * taxa * 2)
+    cabecalho = b"RIFF" + struct.pack("<I", 36 + len(amostras)) + b"WAVEfmt " + struct.pack("<IHHIIHH", 16, 1, 1, taxa, taxa * 2, 2, 16)
+    return cabecalho + b"data" + struct.pack("<I", len(amostras)) + amostras
+
+def gerar_vistoria(n_itens, fotos_por_item=3, segundos_audio=10, semente=42, largura=1600, altura=1200, fotos_distintas=None):
+    # Itens no formato de st.session_state['sessao_vistoria'] com mídia em bytes.
+    # `fotos_distintas` limita quantas fotos diferentes existem (repetições exercitam a deduplicação).
+    rng = random.Random(semente)
+    total = n_itens * fotos_por_item
+    banco = [_jpeg(rng, largura, altura) for _ in range(min(total, fotos_distintas or total))]
+    itens = []
+    for i in range(n_itens):
+        fotos = [banco[(i * fotos_por_item + j) % len(banco)] for j in range(fotos_por_item)] if banco else []
+        itens.append({"Local": rng.choice(SETORES) or "Recepção", "Item": f"Não conformidade sintética {i + 1}", "Situação": "❌ Não Conforme",
+                      "Gravidade": rng.choice(["Baixo", "Médio", "Alto", "CRÍTICO"]), "Obs": "Observação de teste " * 5,
+                      "Fotos": fotos, "Audio_Bytes": _wav(rng, segundos_audio) if segundos_audio else None, "Hora": "10:00"})
+    return itens
@@ -0,0 +1,67 @@
+import json
+from datetime import date, datetime
+import pandas as pd
+
+# --- DIÁRIO DE EDIÇÕES (write-behind) ---
+# Cada mutação da Gestão de Docs vira uma operação anexada ao diário (tabela `diario` do armazém
+# local) no momento em que acontece. O replicador aplica as pendentes às tabelas em segundo plano,
+# compactando antes as que se sobrepõem (várias edições da mesma linha viram uma, tarefas
+# redefinidas só valem pela última), e a nuvem recebe só o delta resultante. Enquanto não são
+# aplicadas, a sessão mostra as próprias operações por cima do retrato (Sobreposicao.rebasear):
+# fechar a aba antes do envio não perde nada.
+#   adicionar       {"linha": {...}}
+#   editar          {"id": ID_UNICO, "campos": {coluna: valor}}
+#   remover         {"id": ID_UNICO}                       (leva junto as tarefas do documento)
+#   definir_tarefas {"ref": Documento_Ref, "tarefas": [[Tarefa, Feito], ...]}
+#   excluir_tudo    {}
+
+TIPOS_OPERACAO = ("adicionar", "editar", "remover", "definir_tarefas", "excluir_tudo")
+
+def _json_padrao(v):
+    if v is None or pd.isna(v): return None
+    if isinstance(v, datetime): return v.date().isoformat()
+    if isinstance(v, date): return v.isoformat()
+    if hasattr(v, 'item'): return v.item()  # escalares numpy
+    return str(v)
+
+def codificar(dados):
+    return json.dumps(dados, ensure_ascii=False, default=_json_padrao)
+
+def decodificar(texto):
+    return json.loads(texto)
+
+def lista_tarefas(df_tarefas):
+    # DataFrame do checklist de um documento -> [[Tarefa, Feito], ...] como vai para o diário
+    if df_tarefas.empty: return []
+    feito = df_tarefas['Feito'] if 'Feito' in df_tarefas.columns else pd.Series(False, index=df_tarefas.index)
+    feito = feito.map(lambda v: str(v).strip() in ("True", "TRUE", "true", "1")).astype(bool) if feito.dtype != bool else feito
+    return [[("" if t is None or (not isinstance(t, str) and pd.isna(t)) else str(t)), bool(f)] for t, f in zip(df_tarefas['Tarefa'], feito)]
+
+def compactar(operacoes):
+    # [(seq, tipo, dados)] na ordem do diário -> lista equivalente com menos operações
+    saida = []
+    edicao = {}     # ID_UNICO -> posição em `saida` de um 'editar' que ainda pode absorver os seguintes
+    tarefas = {}    # Documento_Ref -> posição do último 'definir_tarefas'
+    for seq, tipo, dados in operacoes:
+        if tipo == "excluir_tudo":
+            saida, edicao, tarefas = [], {}, {}
+        elif tipo == "editar":
+            i = edicao.pop(dados["id"], None)
+            if i is not None:
+                saida[i][2]["campos"].update(dados["campos"])
+                edicao[dados["campos"].get("ID_UNICO", dados["id"])] = i
+                continue
+            edicao[dados["campos"].get("ID_UNICO", dados["id"])] = len(saida)
+            dados = {"id": dados["id"], "campos": dict(dados["campos"])}
+        elif tipo == "definir_tarefas":
+            i = tarefas.get(dados["ref"])
+            if i is not None: saida[i] = None
+            tarefas[dados["ref"]] = len(saida)
+        elif tipo in ("remover", "adicionar"):
+            id_doc = dados["id"] if tipo == "remover" else dados["linha"].get("ID_UNICO")
+            edicao.pop(id_doc, None)
+            if tipo == "remover":
+                i = tarefas.pop(id_doc, None)
+                if i is not None: saida[i] = None
+        saida.append((seq, tipo, dados))
+    return [op for op in saida if op is not None]
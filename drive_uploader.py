@@ -0,0 +1,153 @@
+import io
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
+from metricas import medir
+
+# --- SERVIÇO DE UPLOAD PARA O GOOGLE DRIVE ---
+# Os objetos de serviço do googleapiclient (httplib2) não são thread-safe, então cada worker
+# do pool monta o seu uma única vez a partir da fábrica (que reaproveita as credenciais).
+# Arquivos grandes sobem em upload resumable por partes; erros de cota e 5xx são repetidos
+# com backoff exponencial. O status de cada envio pode ser consultado sem bloquear a página.
+# Com uma `chave` (o hash do blob), o mesmo arquivo não é enfileirado de novo no mesmo grupo;
+# tarefas terminadas são podadas a cada envio/resumo, e o registro de que a chave já subiu
+# sobrevive à poda por RETENCAO_ENVIADOS.
+
+MAX_WORKERS_UPLOAD = 4
+LIMITE_RESUMABLE = 5 * 1024 * 1024      # acima disso usa upload resumable
+TAMANHO_PARTE = 1024 * 1024             # múltiplo de 256 KB, exigência da API
+MAX_TENTATIVAS_UPLOAD = 5
+BACKOFF_UPLOAD = 1.0
+RETENCAO_TAREFAS = 3600                 # tarefas terminadas saem do status depois disso (segundos)
+RETENCAO_ENVIADOS = 24 * 3600           # e o registro das chaves já enviadas, depois disso
+MOTIVOS_COTA = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded")
+
+def erro_transitorio(e):
+    if isinstance(e, HttpError):
+        status = getattr(e.resp, 'status', 0)
+        if status in (429, 500, 502, 503, 504): return True
+        return status == 403 and any(m in str(e.content) for m in MOTIVOS_COTA)
+    return isinstance(e, (TimeoutError, ConnectionError, OSError))
+
+class ServicoUploadDrive:
+    def __init__(self, fabrica_servico, pasta_id, max_workers=MAX_WORKERS_UPLOAD, limite_resumable=LIMITE_RESUMABLE,
+                 tamanho_parte=TAMANHO_PARTE, max_tentativas=MAX_TENTATIVAS_UPLOAD, backoff=BACKOFF_UPLOAD,
+                 retencao_tarefas=RETENCAO_TAREFAS, retencao_enviados=RETENCAO_ENVIADOS):
+        self.fabrica_servico = fabrica_servico
+        self.pasta_id = pasta_id
+        self.limite_resumable = limite_resumable
+        self.tamanho_parte = tamanho_parte
+        self.max_tentativas = max_tentativas
+        self.backoff = backoff
+        self.retencao_tarefas = retencao_tarefas
+        self.retencao_enviados = retencao_enviados
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-drive")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._tarefas = {}
+        self._chaves = {}   # (grupo, chave) -> (id da tarefa, ou None se já concluída e podada; instante)
+
+    def _servico(self):
+        if getattr(self._local, 'servico', None) is None: self._local.servico = self.fabrica_servico()
+        return self._local.servico
+
+    def _atualizar(self, id_tarefa, **campos):
+        with self._lock: self._tarefas[id_tarefa].update(campos)
+
+    # --- API ---
+    def enviar(self, dados, nome_arquivo, mimetype='image/jpeg', grupo=None, chave=None):
+        # Enfileira e retorna na hora o id da tarefa. Se a chave já está na fila, subindo ou enviada
+        # neste grupo, não enfileira de novo e retorna o id existente (None se já foi podado).
+        self._podar()
+        with self._lock:
+            if chave is not None and (grupo, chave) in self._chaves:
+                anterior = self._chaves[(grupo, chave)][0]
+                if anterior is None or self._tarefas[anterior]["estado"] != "erro": return anterior
+            id_tarefa = next(self._ids)
+            self._tarefas[id_tarefa] = {"id": id_tarefa, "nome": nome_arquivo, "grupo": grupo, "chave": chave, "bytes": len(dados),
+                                        "estado": "na_fila", "progresso": 0.0, "tentativas": 0, "link": "", "erro": "", "fim": None}
+            if chave is not None: self._chaves[(grupo, chave)] = (id_tarefa, time.time())
+        future = self._pool.submit(self._executar, id_tarefa, dados, nome_arquivo, mimetype)
+        with self._lock: self._tarefas[id_tarefa]["_future"] = future
+        return id_tarefa
+
+    def status(self, id_tarefa):
+        with self._lock:
+            return {k: v for k, v in self._tarefas[id_tarefa].items() if not k.startswith("_")}
+
+    def listar(self, grupo=None):
+        with self._lock:
+            return [{k: v for k, v in t.items() if not k.startswith("_")} for t in self._tarefas.values() if grupo is None or t["grupo"] == grupo]
+
+    def resumo(self, grupo=None):
+        self._podar()
+        tarefas = self.listar(grupo)
+        por_estado = {}
+        for t in tarefas: por_estado[t["estado"]] = por_estado.get(t["estado"], 0) + 1
+        total_bytes = sum(t["bytes"] for t in tarefas)
+        enviados = sum(t["bytes"] * t["progresso"] for t in tarefas)
+        return {"total": len(tarefas), "por_estado": por_estado, "progresso": (enviados / total_bytes) if total_bytes else 1.0}
+
+    def aguardar(self, id_tarefa, timeout=None):
+        with self._lock: future = self._tarefas[id_tarefa]["_future"]
+        future.result(timeout=timeout)
+        return self.status(id_tarefa)
+
+    def limpar_concluidas(self, grupo=None, antes_de=None):
+        # Tira do status as tarefas terminadas (com `antes_de`, só as que terminaram antes desse instante).
+        # Chave concluída continua registrada para o arquivo não subir de novo; chave com erro pode ser reenviada.
+        with self._lock:
+            for i, t in list(self._tarefas.items()):
+                if t["estado"] not in ("concluido", "erro") or (grupo is not None and t["grupo"] != grupo): continue
+                if antes_de is not None and t["fim"] > antes_de: continue
+                del self._tarefas[i]
+                k = (t["grupo"], t["chave"])
+                if t["chave"] is None or self._chaves.get(k, (None,))[0] != i: continue
+                if t["estado"] == "concluido": self._chaves[k] = (None, t["fim"])
+                else: del self._chaves[k]
+
+    def _podar(self, agora=None):
+        agora = agora or time.time()
+        self.limpar_concluidas(antes_de=agora - self.retencao_tarefas)
+        with self._lock:
+            for k in [k for k, (i, instante) in self._chaves.items() if i is None and instante < agora - self.retencao_enviados]:
+                del self._chaves[k]
+
+    # --- WORKER ---
+    def _executar(self, id_tarefa, dados, nome_arquivo, mimetype):
+        resumable = len(dados) > self.limite_resumable
+        metadados = {'name': nome_arquivo, 'parents': [self.pasta_id]}
+        media = MediaIoBaseUpload(io.BytesIO(dados), mimetype=mimetype, chunksize=self.tamanho_parte, resumable=resumable)
+        self._atualizar(id_tarefa, estado="enviando")
+        with medir("drive.upload", bytes=len(dados), resumable=resumable) as m:
+            resposta = self._enviar(id_tarefa, metadados, media, resumable)
+            m.update(tentativas=self.status(id_tarefa)["tentativas"], ok=resposta is not None)
+        return resposta
+
+    def _enviar(self, id_tarefa, metadados, media, resumable):
+        requisicao = None
+        for tentativa in range(self.max_tentativas):
+            self._atualizar(id_tarefa, tentativas=tentativa + 1)
+            try:
+                if requisicao is None:
+                    requisicao = self._servico().files().create(body=metadados, media_body=media, fields='id, webContentLink')
+                if not resumable:
+                    resposta = requisicao.execute()
+                else:
+                    resposta = None
+                    while resposta is None:
+                        progresso, resposta = requisicao.next_chunk()  # continua de onde parou após uma falha
+                        if progresso: self._atualizar(id_tarefa, progresso=progresso.progress())
+                self._atualizar(id_tarefa, estado="concluido", progresso=1.0, link=resposta.get('webContentLink', ''), id_drive=resposta.get('id', ''), fim=time.time())
+                return resposta
+            except Exception as e:
+                if not erro_transitorio(e) or tentativa == self.max_tentativas - 1:
+                    self._atualizar(id_tarefa, estado="erro", erro=str(e), fim=time.time())
+                    return None
+                if not resumable: requisicao = None
+                time.sleep(self.backoff * (2 ** tentativa) + random.uniform(0, self.backoff))
@@ -0,0 +1,73 @@
+import itertools
+import threading
+import time
+import httplib2
+from googleapiclient.errors import HttpError
+
+# --- FAKE DO SERVIÇO DRIVE v3 (files().create) ---
+# `falhas` é uma lista de status HTTP devolvidos em sequência antes de começar a aceitar
+# (ex: [429, 503]); `latencia` atrasa cada chamada. Envios resumable lêem a mídia por partes.
+
+def erro_http(status, motivo=""):
+    return HttpError(httplib2.Response({'status': status}), f'{{"error": {{"errors": [{{"reason": "{motivo}"}}]}}}}'.encode())
+
+class _ProgressoFake:
+    def __init__(self, enviado, total):
+        self.resumable_progress = enviado
+        self.total_size = total
+
+    def progress(self):
+        return self.resumable_progress / self.total_size if self.total_size else 1.0
+
+class _RequisicaoFake:
+    def __init__(self, servico, body, media):
+        self.servico = servico
+        self.body = body
+        self.media = media
+        self.enviado = 0
+
+    def _talvez_falhar(self):
+        self.servico._registrar()
+        with self.servico._lock:
+            status = self.servico.falhas.pop(0) if self.servico.falhas else None
+        if status: raise erro_http(status, "rateLimitExceeded" if status == 403 else "")
+
+    def _concluir(self, conteudo):
+        with self.servico._lock:
+            id_arq = f"fake{next(self.servico._ids)}"
+            self.servico.arquivos[id_arq] = {"nome": self.body["name"], "pastas": self.body.get("parents", []), "conteudo": conteudo}
+        return {"id": id_arq, "webContentLink": f"https://drive.fake/{id_arq}"}
+
+    def execute(self):
+        self._talvez_falhar()
+        return self._concluir(self.media.getbytes(0, self.media.size()))
+
+    def next_chunk(self):
+        self._talvez_falhar()
+        total = self.media.size()
+        self.enviado += len(self.media.getbytes(self.enviado, self.media.chunksize()))
+        if self.enviado >= total: return None, self._concluir(self.media.getbytes(0, total))
+        return _ProgressoFake(self.enviado, total), None
+
+class _ArquivosFake:
+    def __init__(self, servico):
+        self.servico = servico
+
+    def create(self, body=None, media_body=None, fields=None):
+        return _RequisicaoFake(self.servico, body or {}, media_body)
+
+class ServicoDriveFake:
+    def __init__(self, falhas=None, latencia=0.0):
+        self.falhas = list(falhas or [])
+        self.latencia = latencia
+        self.arquivos = {}
+        self.chamadas = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _registrar(self):
+        with self._lock: self.chamadas += 1
+        if self.latencia: time.sleep(self.latencia)
+
+    def files(self):
+        return _ArquivosFake(self)
@@ -0,0 +1,143 @@
+import re
+import time
+import threading
+
+# --- FAKE EM MEMÓRIA DA API DO GSPREAD ---
+# Implementa só o subconjunto que o app usa (open/worksheet/add_worksheet, get_all_records,
+# clear, update, batch_update, append_row(s), values_get e deleteDimension via Spreadsheet.batch_update),
+# contando as chamadas e, opcionalmente, simulando a latência da rede.
+
+class WorksheetNotFound(Exception):
+    pass
+
+def _coluna_numero(letras):
+    n = 0
+    for c in letras: n = n * 26 + ord(c) - 64
+    return n
+
+def _linha_a1(faixa):
+    m = re.match(r"[A-Z]+(\d+)", faixa.split("!")[-1])
+    return int(m.group(1)) if m else 1
+
+class AbaFake:
+    def __init__(self, planilha, titulo, linhas=None, id_aba=0):
+        self.spreadsheet = planilha
+        self.title = titulo
+        self.id = id_aba
+        self.linhas = [list(l) for l in (linhas or [])]
+
+    def _chamada(self, nome):
+        self.spreadsheet._registrar(nome)
+
+    @property
+    def row_count(self):
+        return len(self.linhas)
+
+    def get_all_values(self):
+        self._chamada("get_all_values")
+        return [list(l) for l in self.linhas]
+
+    def get_all_records(self):
+        self._chamada("get_all_records")
+        if not self.linhas: return []
+        cab = self.linhas[0]
+        return [dict(zip(cab, list(l) + [""] * (len(cab) - len(l)))) for l in self.linhas[1:]]
+
+    def row_values(self, n):
+        self._chamada("row_values")
+        return list(self.linhas[n - 1]) if n <= len(self.linhas) else []
+
+    def clear(self):
+        self._chamada("clear")
+        self.linhas = []
+
+    def update(self, values, range_name=None, **kwargs):
+        self._chamada("update")
+        inicio = _linha_a1(range_name) if range_name else 1
+        for i, l in enumerate(values):
+            pos = inicio - 1 + i
+            while len(self.linhas) <= pos: self.linhas.append([])
+            self.linhas[pos] = list(l)
+
+    def batch_update(self, data, **kwargs):
+        self._chamada("batch_update")
+        for item in data:
+            inicio = _linha_a1(item["range"])
+            for i, l in enumerate(item["values"]):
+                self.linhas[inicio - 1 + i] = list(l)
+
+    def append_row(self, values, **kwargs):
+        self._chamada("append_row")
+        self.linhas.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self._chamada("append_rows")
+        self.linhas.extend(list(l) for l in values)
+
+    def delete_rows(self, start_index, end_index=None):
+        self._chamada("delete_rows")
+        del self.linhas[start_index - 1:(end_index or start_index)]
+
+class PlanilhaFake:
+    def __init__(self, titulo="LegalizaHealth_DB", latencia=0.0):
+        self.title = titulo
+        self.latencia = latencia
+        self.abas = {}
+        self.chamadas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, nome):
+        with self._lock:
+            self.chamadas[nome] = self.chamadas.get(nome, 0) + 1
+        if self.latencia: time.sleep(self.latencia)
+
+    def total_chamadas(self):
+        return sum(self.chamadas.values())
+
+    def worksheet(self, titulo):
+        self._registrar("worksheet")
+        if titulo not in self.abas: raise WorksheetNotFound(titulo)
+        return self.abas[titulo]
+
+    def worksheets(self):
+        self._registrar("worksheets")
+        return list(self.abas.values())
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self._registrar("add_worksheet")
+        aba = AbaFake(self, title, id_aba=len(self.abas))
+        self.abas[title] = aba
+        return aba
+
+    def batch_update(self, body):
+        self._registrar("batch_update")
+        por_id = {a.id: a for a in self.abas.values()}
+        for pedido in body.get("requests", []):
+            if "deleteDimension" in pedido:
+                faixa = pedido["deleteDimension"]["range"]
+                del por_id[faixa["sheetId"]].linhas[faixa["startIndex"]:faixa["endIndex"]]
+        return {}
+
+    def values_get(self, faixa):
+        # "'Aba'!A2:C" -> {"values": [...]}, sem as células e linhas vazias do fim, como a API
+        self._registrar("values_get")
+        aba, celulas = faixa.rsplit("!", 1)
+        m = re.match(r"([A-Z]+)(\d+):([A-Z]+)(\d*)$", celulas)
+        col_ini, col_fim = _coluna_numero(m.group(1)), _coluna_numero(m.group(3))
+        linhas = self.abas[aba.strip("'")].linhas[int(m.group(2)) - 1:int(m.group(4)) if m.group(4) else None]
+        valores = []
+        for l in linhas:
+            corte = [str(v) for v in l[col_ini - 1:col_fim]]
+            while corte and corte[-1] == "": corte.pop()
+            valores.append(corte)
+        while valores and not valores[-1]: valores.pop()
+        return {"range": faixa, "majorDimension": "ROWS", "values": valores}
+
+class ClienteFake:
+    # Substitui o retorno de gspread.authorize
+    def __init__(self, *planilhas):
+        self.planilhas = {p.title: p for p in planilhas}
+
+    def open(self, titulo):
+        if titulo not in self.planilhas: self.planilhas[titulo] = PlanilhaFake(titulo)
+        return self.planilhas[titulo]
@@ -0,0 +1,40 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- SERVIDOR LOCAL NO LUGAR DO ntfy.sh ---
+# Registra cada POST recebido; `respostas` define os status devolvidos em sequência
+# (o último se repete) e `atraso` simula um endpoint lento.
+
+class ServidorNtfyFake:
+    def __init__(self, respostas=(200,), atraso=0.0):
+        self.respostas = list(respostas)
+        self.atraso = atraso
+        self.recebidas = []
+        self._n = 0
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode('utf-8')
+                if servidor.atraso: threading.Event().wait(servidor.atraso)
+                status = servidor.respostas[min(servidor._n, len(servidor.respostas) - 1)]
+                servidor._n += 1
+                servidor.recebidas.append({"topico": self.path.strip("/"), "titulo": self.headers.get("Title", ""),
+                                           "prioridade": self.headers.get("Priority", ""), "corpo": corpo, "status": status})
+                self.send_response(status)
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._http.server_address[1]}"
+
+    def iniciar(self):
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        return self
+
+    def parar(self):
+        self._http.shutdown()
+        self._http.server_close()
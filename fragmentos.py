@@ -0,0 +1,247 @@
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from nucleo_dados import (NOME_PLANILHA, ABA_PRAZOS, ABA_CHECKLIST, COLUNAS_PRAZOS, COLUNAS_CHECKLIST, normalizar_texto,
+                          chaves_prazos, chaves_checklist, serializar_prazos, serializar_checklist)
+from sync_delta import sincronizar_na_base, preparar_abas, baixar_planilhas, _coluna_a1
+from metricas import METRICAS
+
+# --- FRAGMENTAÇÃO DAS ABAS POR UNIDADE ---
+# Com LEGALIZA_FRAGMENTOS=N (>0) Prazos e Checklist_Itens são divididas em N fragmentos pelo hash
+# da Unidade (ou do CNPJ, LEGALIZA_CHAVE_FRAGMENTO=cnpj): abas "Prazos_F07"/"Checklist_Itens_F07",
+# e com LEGALIZA_FRAGMENTOS_POR_PLANILHA=K cada K fragmentos vão para uma planilha própria
+# (LegalizaHealth_DB_1, _2...), longe do limite de células da planilha principal. A aba Manifesto
+# da planilha principal lista cada fragmento, onde ele está e uma revisão incrementada a cada
+# escrita: a carga lê o manifesto e baixa em paralelo só os fragmentos cuja revisão mudou, e o
+# envio só escreve os fragmentos alterados. O checklist segue o fragmento do seu documento.
+
+N_FRAGMENTOS = int(os.environ.get("LEGALIZA_FRAGMENTOS", "0"))
+CHAVE_FRAGMENTO = os.environ.get("LEGALIZA_CHAVE_FRAGMENTO", "unidade")   # unidade | cnpj
+FRAGMENTOS_POR_PLANILHA = int(os.environ.get("LEGALIZA_FRAGMENTOS_POR_PLANILHA", "0"))
+MAX_WORKERS_FRAGMENTOS = 4
+ABA_MANIFESTO = "Manifesto"
+COLUNAS_MANIFESTO = ["Fragmento", "Planilha", "Chave", "Revisao", "Linhas_Prazos", "Linhas_Checklist", "Atualizado"]
+BASE_MANIFESTO = "__manifesto__"   # nas bases do armazém: revisão de cada fragmento no último retrato
+BASE_PUBLICAR = "__publicar__"     # fragmentos já escritos cuja revisão ainda não subiu no manifesto
+
+def aba_inexistente(e):
+    # gspread.WorksheetNotFound (ou o do fake): qualquer outro erro não pode virar "fragmento vazio"
+    return type(e).__name__ == "WorksheetNotFound"
+
+def nome_aba(aba, fragmento):
+    return f"{aba}_{fragmento}"
+
+@lru_cache(maxsize=65536)
+def _posicao(texto, n):
+    return zlib.crc32(texto.encode("utf-8")) % n
+
+class Fragmentacao:
+    def __init__(self, n, chave=CHAVE_FRAGMENTO, por_planilha=FRAGMENTOS_POR_PLANILHA, nome_planilha=NOME_PLANILHA,
+                 max_workers=MAX_WORKERS_FRAGMENTOS, propagar=None):
+        self.n = n
+        self.chave = chave
+        self.por_planilha = por_planilha
+        self.nome_planilha = nome_planilha
+        self.max_workers = max_workers
+        self.propagar = propagar or (lambda funcao: funcao)   # ex: CamadaGoogle.propagar, para contar chamadas nas threads
+        self._largura = len(str(max(n - 1, 0)))
+
+    # --- ONDE CADA LINHA MORA ---
+    def nomes(self):
+        return [f"F{i:0{self._largura}d}" for i in range(self.n)]
+
+    def fragmento(self, unidade, cnpj=""):
+        texto = re.sub(r"\D", "", str(cnpj)) if self.chave == "cnpj" else ""
+        return f"F{_posicao(texto or normalizar_texto(unidade).strip(), self.n):0{self._largura}d}"
+
+    def planilha_de(self, fragmento):
+        grupo = int(fragmento[1:]) // self.por_planilha if self.por_planilha else 0
+        return self.nome_planilha if grupo == 0 else f"{self.nome_planilha}_{grupo}"
+
+    def fragmentos_de(self, df_prazos):
+        # Fragmentos onde moram estas linhas (ex: as de uma unidade filtrada)
+        return sorted({self.fragmento(u, c) for u, c in zip(df_prazos['Unidade'].astype(str), df_prazos['CNPJ'].astype(str))})
+
+    def particionar(self, df_prazos, df_checklist):
+        # {fragmento: (prazos, checklist)} para todos os fragmentos, inclusive os vazios
+        frag_p = np.array([self.fragmento(u, c) for u, c in zip(df_prazos['Unidade'].astype(str), df_prazos['CNPJ'].astype(str))]
+                          if not df_prazos.empty else [], dtype=object)
+        do_doc = dict(zip(df_prazos['ID_UNICO'].astype(str), frag_p)) if not df_prazos.empty else {}
+        refs = df_checklist['Documento_Ref'].astype(str) if not df_checklist.empty else []
+        frag_c = np.array([do_doc.get(r) or self.fragmento(r.split(" - ")[0]) for r in refs], dtype=object)
+        grupos_p = dict(tuple(df_prazos.groupby(frag_p, sort=False))) if len(frag_p) else {}
+        grupos_c = dict(tuple(df_checklist.groupby(frag_c, sort=False))) if len(frag_c) else {}
+        return {f: (grupos_p.get(f, df_prazos.iloc[0:0]), grupos_c.get(f, df_checklist.iloc[0:0])) for f in self.nomes()}
+
+    # --- MANIFESTO ---
+    def ler_manifesto(self, sh):
+        # {fragmento: linha}; None se a planilha ainda está no formato de duas abas
+        try: registros = sh.worksheet(ABA_MANIFESTO).get_all_records()
+        except Exception as e:
+            if aba_inexistente(e): return None
+            raise
+        manifesto = {}
+        for r in registros:
+            if str(r.get("Fragmento", "")).strip() == "": continue
+            manifesto[str(r["Fragmento"])] = dict(r, Revisao=int(r.get("Revisao") or 0))
+        return manifesto
+
+    def _compativel(self, manifesto):
+        return manifesto is not None and list(manifesto) == self.nomes() and all(m.get("Chave") == self.chave for m in manifesto.values())
+
+    def _gravar_manifesto(self, sh, manifesto, alterados, reescrever):
+        linhas = [[f, m["Planilha"], m["Chave"], m["Revisao"], m["Linhas_Prazos"], m["Linhas_Checklist"], m["Atualizado"]] for f, m in manifesto.items()]
+        try: ws = sh.worksheet(ABA_MANIFESTO)
+        except Exception as e:
+            if not aba_inexistente(e): raise
+            ws = sh.add_worksheet(ABA_MANIFESTO, len(linhas) + 1, len(COLUNAS_MANIFESTO))
+            reescrever = True
+        if reescrever:
+            ws.clear()
+            ws.update([COLUNAS_MANIFESTO] + linhas, value_input_option="RAW")
+        elif alterados:
+            # Só as linhas dos fragmentos escritos: outro processo pode estar atualizando as demais
+            ultima = _coluna_a1(len(COLUNAS_MANIFESTO))
+            posicao = {f: i + 2 for i, f in enumerate(manifesto)}
+            ws.batch_update([{"range": f"A{posicao[f]}:{ultima}{posicao[f]}", "values": [linhas[posicao[f] - 2]]} for f in alterados],
+                            value_input_option="RAW")
+
+    # --- CARGA ---
+    def _em_paralelo(self, funcao, itens):
+        tarefa = self.propagar(funcao)
+        if len(itens) <= 1: return [tarefa(*i) for i in itens]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(itens)), thread_name_prefix="fragmentos") as pool:
+            return list(pool.map(lambda i: tarefa(*i), itens))
+
+    def _baixar_fragmento(self, abrir_planilha, fragmento, planilha):
+        sh = abrir_planilha(planilha)
+        crus = []
+        for aba, colunas in ((ABA_PRAZOS, COLUNAS_PRAZOS), (ABA_CHECKLIST, COLUNAS_CHECKLIST)):
+            try: registros = sh.worksheet(nome_aba(aba, fragmento)).get_all_records()
+            except Exception as e:
+                if not aba_inexistente(e): raise
+                registros = None
+            crus.append(pd.DataFrame(registros) if registros else pd.DataFrame(columns=colunas if registros is not None else []))
+        return preparar_abas(*crus)
+
+    def baixar(self, abrir_planilha, bases, ler_local, fragmentos=None):
+        # Retorna (df_prazos, df_checklist, bases) com os fragmentos que mudaram desde o último
+        # retrato trocados pelos da nuvem (só os pedidos, se `fragmentos` vier), ou None se nada mudou
+        principal = abrir_planilha()
+        manifesto = self.ler_manifesto(principal)
+        if manifesto is None: return self._migrar(abrir_planilha, principal)
+        bases = bases or {}
+        vistos = bases.get(BASE_MANIFESTO) or {}
+        if self._compativel(manifesto):
+            alvo = [f for f, m in manifesto.items() if (fragmentos is None or f in fragmentos)
+                    and (vistos.get(f) != m["Revisao"] or nome_aba(ABA_PRAZOS, f) not in bases)]
+        else:
+            alvo = list(manifesto)   # fragmentado de outro jeito: as linhas locais não se encaixam, baixa tudo
+        METRICAS.contar("fragmentos.pulados", len(manifesto) - len(alvo))
+        if not alvo: return None
+        baixados = self._em_paralelo(lambda f: self._baixar_fragmento(abrir_planilha, f, manifesto[f]["Planilha"]), [(f,) for f in alvo])
+        METRICAS.contar("fragmentos.baixados", len(alvo))
+
+        validas = {nome_aba(a, f) for f in manifesto for a in (ABA_PRAZOS, ABA_CHECKLIST)}
+        bases = {k: v for k, v in bases.items() if k in validas}
+        bases[BASE_MANIFESTO] = {f: r for f, r in vistos.items() if f in manifesto}
+        # Fragmentos que não mudaram continuam vindo do armazém local
+        locais = self.particionar(*ler_local()) if len(alvo) < len(manifesto) else {}
+        partes = [locais[f] for f in manifesto if f not in alvo]
+        for f, (df_p, df_c, base_p, base_c) in zip(alvo, baixados):
+            partes.append((df_p, df_c))
+            bases[nome_aba(ABA_PRAZOS, f)], bases[nome_aba(ABA_CHECKLIST, f)] = base_p, base_c
+            bases[BASE_MANIFESTO][f] = manifesto[f]["Revisao"]
+        df_prazos = pd.concat([p for p, _ in partes if not p.empty] or [partes[0][0]], ignore_index=True)
+        df_check = pd.concat([c for _, c in partes if not c.empty] or [partes[0][1]], ignore_index=True)
+        return df_prazos, df_check, bases
+
+    def _migrar(self, abrir_planilha, principal):
+        # Planilha ainda com Prazos/Checklist_Itens únicas: lê o formato antigo e escreve os fragmentos
+        try: df_prazos, df_check, _ = baixar_planilhas(principal)
+        except Exception as e:
+            if not aba_inexistente(e): raise
+            df_prazos, df_check = pd.DataFrame(columns=COLUNAS_PRAZOS + ["ID_UNICO"]), pd.DataFrame(columns=COLUNAS_CHECKLIST)
+        bases = {}
+        self.enviar(abrir_planilha, df_prazos, df_check, bases)
+        return df_prazos, df_check, bases
+
+    # --- ENVIO ---
+    def _enviar_fragmento(self, abrir_planilha, fragmento, abas, bases, resumos, escritos):
+        # Cada aba que termina já vai para `bases`: uma falha na seguinte (ou em outro fragmento) não a perde
+        sh = abrir_planilha(self.planilha_de(fragmento))
+        for aba, colunas, chaves, linhas in abas:
+            chave = nome_aba(aba, fragmento)
+            try: ws = sh.worksheet(chave)
+            except Exception as e:
+                if not aba_inexistente(e): raise
+                ws = sh.add_worksheet(chave, len(linhas) + 1, len(colunas))
+                bases.pop(chave, None)
+            try: resumos[chave] = sincronizar_na_base(bases, chave, ws, colunas, chaves, linhas)
+            except Exception as e:
+                if getattr(e, "escrita_parcial", False): escritos.add(fragmento)
+                raise
+            escritos.add(fragmento)
+
+    def enviar(self, abrir_planilha, df_prazos, df_checklist, bases):
+        # Atualiza `bases` no lugar; fragmentos sem diferença para a base não geram nenhuma chamada.
+        # Fragmento escrito por outro processo desde o nosso retrato (revisão diferente) segue em delta:
+        # sincronizar_aba relê as chaves vivas da aba, então as linhas do outro processo ficam, e a
+        # revisão vista desse fragmento não avança, para a próxima carga trazê-las.
+        # Fragmentos escritos num envio que falhou antes de chegar ao manifesto ficam em
+        # bases[BASE_PUBLICAR], e o próximo envio incrementa a revisão deles.
+        principal = abrir_planilha()
+        manifesto = self.ler_manifesto(principal)
+        reescrever = not self._compativel(manifesto)
+        if reescrever:
+            # Fragmentado de outro jeito: as abas existentes não correspondem às bases, tudo é reescrito
+            manifesto = {}
+            for f in self.nomes():
+                for aba in (ABA_PRAZOS, ABA_CHECKLIST): bases.pop(nome_aba(aba, f), None)
+        vistos = bases.get(BASE_MANIFESTO) or {}
+        desatualizados = {f for f, m in manifesto.items() if vistos.get(f) != m["Revisao"]}
+        publicar = set() if reescrever else set(bases.get(BASE_PUBLICAR) or [])
+        trabalho = []
+        linhas_por_fragmento = {}
+        for f, (df_p, df_c) in self.particionar(df_prazos, df_checklist).items():
+            linhas_por_fragmento[f] = (len(df_p), len(df_c))
+            abas = []
+            for aba, colunas, chaves, linhas in ((ABA_PRAZOS, COLUNAS_PRAZOS, chaves_prazos(df_p), serializar_prazos(df_p)),
+                                                 (ABA_CHECKLIST, COLUNAS_CHECKLIST, chaves_checklist(df_c), serializar_checklist(df_c))):
+                base = bases.get(nome_aba(aba, f))
+                igual = base is not None and base["chaves"] == chaves and base["linhas"] == linhas and list(base["cabecalho"]) == colunas
+                # Sem alteração local o fragmento fica como está (mesmo que outro processo o tenha mudado: a carga traz)
+                if igual and not reescrever: continue
+                abas.append((aba, colunas, chaves, linhas))
+            if abas: trabalho.append((f, abas))
+        METRICAS.contar("fragmentos.enviados", len(trabalho))
+
+        resumos = {}
+        escritos = set()
+        try:
+            self._em_paralelo(lambda f, abas: self._enviar_fragmento(abrir_planilha, f, abas, bases, resumos, escritos), trabalho)
+        finally:
+            if escritos | publicar: bases[BASE_PUBLICAR] = sorted(escritos | publicar)
+        publicar |= escritos
+        agora = datetime.now().isoformat(timespec="seconds")
+        for f in publicar:
+            revisao = (manifesto.get(f) or {}).get("Revisao", 0) + 1
+            n_p, n_c = linhas_por_fragmento[f]
+            manifesto[f] = {"Planilha": self.planilha_de(f), "Chave": self.chave, "Revisao": revisao,
+                            "Linhas_Prazos": n_p, "Linhas_Checklist": n_c, "Atualizado": agora}
+        if reescrever or publicar:
+            manifesto = {f: manifesto[f] for f in self.nomes()}
+            self._gravar_manifesto(principal, manifesto, sorted(publicar), reescrever)
+            bases[BASE_MANIFESTO] = {**({} if reescrever else vistos),
+                                     **{f: manifesto[f]["Revisao"] for f in publicar if f not in desatualizados}}
+            bases.pop(BASE_PUBLICAR, None)
+        return resumos
+
+def criar_fragmentacao(propagar=None):
+    # None mantém o formato de duas abas (LEGALIZA_FRAGMENTOS=0)
+    return Fragmentacao(N_FRAGMENTOS, propagar=propagar) if N_FRAGMENTOS > 0 else None
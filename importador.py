@@ -0,0 +1,146 @@
+import codecs
+import csv
+import io
+from datetime import date
+import pandas as pd
+from nucleo_dados import COLUNAS_PRAZOS, normalizar_texto, id_unico
+from inteligencia_docs import aplicar_inteligencia_lote
+
+# --- IMPORTAÇÃO EM MASSA (Unidades/CNPJ via Excel ou CSV) ---
+# O arquivo é lido em blocos (openpyxl read-only / read_csv com chunksize) depois de detectar
+# formato, encoding e separador numa amostra do início. Cada bloco é normalizado, classificado
+# em lote pela inteligência de documentos e deduplicado contra um índice de chaves
+# Unidade+CNPJ+Documento; só as linhas realmente novas seguem para o armazém (anexar).
+
+COLUNA_UNIDADE_ARQUIVO = "Nome da unidade"
+COLUNAS_OBRIGATORIAS = [COLUNA_UNIDADE_ARQUIVO, "CNPJ"]
+DOCUMENTO_PENDENTE = "⚠️ SELECIONE O TIPO"
+TAMANHO_BLOCO_IMPORTACAO = 5000
+TAMANHO_AMOSTRA = 64 * 1024
+SEPARADORES_CSV = ";,\t|"
+
+def detectar_formato(arquivo):
+    # Retorna ("xlsx", None, None) ou ("csv", encoding, separador) olhando só o começo do arquivo
+    arquivo.seek(0)
+    amostra = arquivo.read(TAMANHO_AMOSTRA)
+    arquivo.seek(0)
+    if amostra[:4] == b"PK\x03\x04": return "xlsx", None, None
+    try:
+        texto = codecs.getincrementaldecoder('utf-8-sig')().decode(amostra, final=False)
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError:
+        texto = amostra.decode('latin-1')
+        encoding = 'latin-1'
+    try:
+        separador = csv.Sniffer().sniff("\n".join(texto.splitlines()[:20]), delimiters=SEPARADORES_CSV).delimiter
+    except csv.Error:
+        cabecalho = texto.splitlines()[0] if texto else ""
+        separador = max(SEPARADORES_CSV, key=cabecalho.count)
+    return "csv", encoding, separador
+
+def _valor_celula(v):
+    if v is None: return ""
+    if isinstance(v, float) and v.is_integer(): v = int(v)  # CNPJ numérico não vira "1.2e+13"
+    return str(v).strip()
+
+def _blocos_xlsx(arquivo, tamanho_bloco):
+    from openpyxl import load_workbook
+    wb = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = wb.worksheets[0].iter_rows(values_only=True)
+        cabecalho = None
+        bloco = []
+        for linha in linhas:
+            if cabecalho is None:
+                if any(v is not None for v in linha): cabecalho = [_valor_celula(v) for v in linha]
+                continue
+            linha = list(linha[:len(cabecalho)]) + [None] * (len(cabecalho) - len(linha))
+            bloco.append([_valor_celula(v) for v in linha])
+            if len(bloco) >= tamanho_bloco:
+                yield pd.DataFrame(bloco, columns=cabecalho)
+                bloco = []
+        if bloco: yield pd.DataFrame(bloco, columns=cabecalho)
+    finally:
+        wb.close()
+
+def _blocos_csv(arquivo, encoding, separador, tamanho_bloco):
+    # O wrapper de texto é nosso: soltamos no fim para não fechar o arquivo de quem chamou
+    texto = io.TextIOWrapper(arquivo, encoding=encoding, newline='')
+    try:
+        yield from pd.read_csv(texto, sep=separador, dtype=str, keep_default_na=False, chunksize=tamanho_bloco)
+    finally:
+        texto.detach()
+
+def ler_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO_IMPORTACAO):
+    formato, encoding, separador = detectar_formato(arquivo)
+    if formato == "xlsx": blocos = _blocos_xlsx(arquivo, tamanho_bloco)
+    else: blocos = _blocos_csv(arquivo, encoding, separador, tamanho_bloco)
+    for bloco in blocos:
+        bloco.columns = [str(c).strip() for c in bloco.columns]
+        yield bloco
+
+def previa_importacao(arquivo, n=5):
+    # Só o primeiro bloco é lido para a pré-visualização
+    for bloco in ler_em_blocos(arquivo, tamanho_bloco=max(n, 1)):
+        arquivo.seek(0)
+        return bloco
+    arquivo.seek(0)
+    return pd.DataFrame()
+
+def chaves_importacao(unidades, cnpjs, documentos):
+    # Unidade/Documento sem acento e caixa, CNPJ só com dígitos
+    u = pd.Series(unidades).astype(str).map(normalizar_texto).str.strip()
+    c = pd.Series(cnpjs).astype(str).str.replace(r"\D", "", regex=True)
+    d = pd.Series(documentos).astype(str).map(normalizar_texto).str.strip()
+    return (u + "\x1f" + c + "\x1f" + d).tolist()
+
+def indice_existentes(df_prazos):
+    if df_prazos is None or df_prazos.empty: return set()
+    return set(chaves_importacao(df_prazos['Unidade'], df_prazos.get('CNPJ', pd.Series("", index=df_prazos.index)), df_prazos['Documento']))
+
+def preparar_bloco(bloco, hoje=None):
+    # Converte um bloco do arquivo para o esquema da aba Prazos
+    hoje = hoje or date.today()
+    df = pd.DataFrame(index=bloco.index)
+    df['Unidade'] = bloco[COLUNA_UNIDADE_ARQUIVO].astype(str).str.strip()
+    df['Setor'] = bloco['Setor'].astype(str).str.strip() if 'Setor' in bloco.columns else ""
+    documentos = bloco['Documento'].astype(str).str.strip() if 'Documento' in bloco.columns else pd.Series("", index=bloco.index)
+    df['Documento'] = documentos.where(documentos != "", DOCUMENTO_PENDENTE)
+    df['CNPJ'] = bloco['CNPJ'].astype(str).str.strip()
+    df['Data_Recebimento'] = hoje
+    df['Vencimento'] = hoje
+    df['Status'] = "NORMAL"
+    df['Progresso'] = 0
+    df['Concluido'] = "False"
+    com_tipo = df['Documento'] != DOCUMENTO_PENDENTE
+    if com_tipo.any():
+        sugestao = aplicar_inteligencia_lote(df.loc[com_tipo, 'Documento'], hoje)
+        df.loc[com_tipo, 'Status'] = sugestao['Status']
+        df.loc[com_tipo, 'Vencimento'] = sugestao['Vencimento']
+    df['ID_UNICO'] = id_unico(df['Unidade'], df['Documento'])
+    return df[COLUNAS_PRAZOS + ['ID_UNICO']]
+
+def importar_arquivo(arquivo, df_existente, tamanho_bloco=TAMANHO_BLOCO_IMPORTACAO, hoje=None):
+    # Retorna (df_novos, resumo). Linhas já existentes (ou repetidas no arquivo) são ignoradas.
+    vistos = indice_existentes(df_existente)
+    novos = []
+    resumo = {"lidas": 0, "novas": 0, "duplicadas": 0, "invalidas": 0, "blocos": 0}
+    for bloco in ler_em_blocos(arquivo, tamanho_bloco):
+        faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in bloco.columns]
+        if faltando: raise ValueError("Necessário colunas 'Nome da unidade' e 'CNPJ'.")
+        resumo["blocos"] += 1
+        resumo["lidas"] += len(bloco)
+        df = preparar_bloco(bloco, hoje)
+        validas = (df['Unidade'] != "") & (df['Unidade'].str.lower() != "nan")
+        resumo["invalidas"] += int((~validas).sum())
+        df = df[validas]
+        manter = []
+        for chave in chaves_importacao(df['Unidade'], df['CNPJ'], df['Documento']):
+            manter.append(chave not in vistos)
+            vistos.add(chave)
+        df = df[manter]
+        resumo["duplicadas"] += len(manter) - len(df)
+        if not df.empty: novos.append(df)
+    df_novos = pd.concat(novos, ignore_index=True) if novos else pd.DataFrame(columns=COLUNAS_PRAZOS + ['ID_UNICO'])
+    resumo["novas"] = len(df_novos)
+    return df_novos, resumo
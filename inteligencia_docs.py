@@ -0,0 +1,143 @@
+from collections import deque
+from datetime import date, timedelta
+from functools import lru_cache
+import pandas as pd
+
+# --- INTELIGÊNCIA DE DOCUMENTOS ---
+# Base de regras por tipo de documento (risco, validade em dias, link e tarefas sugeridas) e
+# o classificador que decide qual regra vale para um nome digitado/importado: primeiro o nome
+# exato, depois a MAIOR chave contida no nome (autômato Aho-Corasick montado uma vez), senão DEFAULT.
+
+# --- 2.1 BASE DE DOCUMENTOS ---
+DOC_INTELLIGENCE = {
+    "Alvará de Funcionamento": {"dias": 365, "risco": "CRÍTICO", "link": "https://www.google.com/search?q=consulta+alvara+funcionamento", "tarefas": ["Renovação", "Taxa"]},
+    "Licença Sanitária": {"dias": 365, "risco": "CRÍTICO", "link": "https://www.google.com/search?q=consulta+licenca+sanitaria", "tarefas": ["Protocolo VISA", "Manual Boas Práticas"]},
+    "DEFAULT": {"dias": 365, "risco": "NORMAL", "link": "", "tarefas": ["Verificar validade"]}
+}
+# ADICIONANDO A BASE DE CONHECIMENTO COMPLETA
+DOC_INTELLIGENCE.update({
+    "Licença de Publicidade": {"dias": 365, "risco": "NORMAL", "link": "", "tarefas": ["Medir fachada", "Pagar taxa TFA/Cadan", "Verificar padrão visual"]},
+    "Inscrição Municipal": {"dias": 0, "risco": "NORMAL", "link": "", "tarefas": ["Verificar cadastro mobiliário", "Atualizar dados fiscais"]},
+    "Habite-se": {"dias": 0, "risco": "CRÍTICO", "link": "", "tarefas": ["Verificar metragem construída", "Arquivar planta aprovada"]},
+    "Alvará de Obra": {"dias": 180, "risco": "ALTO", "link": "", "tarefas": ["Placa do engenheiro na obra", "ART de execução", "Manter no canteiro"]},
+    "Projeto Arquitetonico (Visa e Prefeitura)": {"dias": 0, "risco": "ALTO", "link": "", "tarefas": ["Aprovação LTA (Vigilância)", "Aprovação Prefeitura", "Memorial descritivo atualizado"]},
+    "SDR": {"dias": 365, "risco": "NORMAL", "link": "", "tarefas": ["Regularidade regional", "Taxas estaduais"]},
+    "SMOP": {"dias": 365, "risco": "NORMAL", "link": "", "tarefas": ["Regularidade de obras viárias", "Certificado de conclusão"]},
+    "Termo de aceite de sinalização de vaga para deficiente e idoso": {"dias": 0, "risco": "BAIXO", "link": "", "tarefas": ["Pintura de solo", "Placa vertical", "Medidas ABNT"]},
+    "Certificado de acessibilidade": {"dias": 0, "risco": "MÉDIO", "link": "", "tarefas": ["Laudo NBR 9050", "Rampas/Banheiros adaptados"]},
+    "Carta de anuência tombamento": {"dias": 0, "risco": "MÉDIO", "link": "", "tarefas": ["Verificar restrições de fachada", "Patrimônio histórico"]},
+    "Certificado de Manutenção do Sistema de Segurança": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Laudo câmeras/CFTV", "Teste alarme", "Manutenção cercas"]},
+    "Licença do Comando da Aeronáutica (COMAER)": {"dias": 1095, "risco": "ALTO", "link": "", "tarefas": ["Aprovação AGA", "Luz piloto topo prédio"]},
+    "Polícia Civil (Licença)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Relatório trimestral", "Taxa fiscalização", "Vistoria local"]},
+    "Polícia Civil (Termo de Vistoria)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Livro de registro", "Agendamento vistoria"]},
+    "Polícia Federal (Licença)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Mapas mensais (químicos)", "Renovação CRC/CLF", "Controle estoque"]},
+    "Licença Ambiental": {"dias": 1460, "risco": "MÉDIO", "link": "", "tarefas": ["Manifesto resíduos (MTR)", "PGRSS atualizado", "Renovação LO"]},
+    "Cadastro de tanques, bombas e equipamentos afins": {"dias": 1825, "risco": "ALTO", "link": "", "tarefas": ["Teste estanqueidade", "Limpeza tanques", "Licença ambiental"]},
+    "Conselho de Medicina (CRM)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Certificado Regularidade", "Lista corpo clínico", "Anuidade PJ", "Diretor Técnico"]},
+    "Conselho de Enfermagem (COREN)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["CRT (Certidão Resp. Técnica)", "Dimensionamento equipe", "Escalas assinadas"]},
+    "Conselho de Farmácia (CRF)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Certidão Regularidade", "Farmacêutico presente", "Baixa RT anterior"]},
+    "Conselho de Odontologia (CRO)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Inscrição EPAO", "Dentista RT"]},
+    "Conselho de Biomedicina (CRBM)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Registro PJ", "Biomédico RT"]},
+    "Conselho de Biologia (CRBio)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["Registro PJ", "TRT emitido"]},
+    "Conselho de Nutrição (CRN)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["CRQ (Quadro Técnico)", "Manual Boas Práticas"]},
+    "Conselho de Psicologia (CRP)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["Cadastro PJ", "Psicólogo RT"]},
+    "Conselho de Radiologia (CRTR)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Supervisor Proteção Radiológica", "Lista técnicos"]},
+    "Conselho de Fisioterapia e Terapia Ocupacional (CREFITO)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["DRF (Declaração Regularidade)", "Fisioterapeuta RT"]},
+    "Conselho de Fonoaudiologia (CREFONO)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["Registro PJ", "Fonoaudiólogo RT"]},
+    "CNES": {"dias": 180, "risco": "CRÍTICO", "link": "https://cnes.datasus.gov.br/", "tarefas": ["Atualizar RT", "Atualizar quadro RH", "Atualizar equipamentos"]},
+    "Licença Sanitária Serviço (Laboratório)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Controle Qualidade", "Pop's analíticos", "Gerenciamento resíduos"]},
+    "Conselho de Biomedicina (CRBM) Serviço - Laboratório": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["RT Biomédico", "PNCQ", "Calibração"]},
+    "Licença Sanitária Serviço (Farmácia)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Controle temperatura/umidade", "SNGPC (Controlados)", "Qualificação fornecedor"]},
+    "Licença Sanitária Serviço (Radiologia)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Levantamento Radiométrico", "Testes Constância", "Dosimetria"]},
+    "Licença Sanitária Serviço (Tomografia)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Programa Garantia Qualidade", "Testes aceitação", "Laudo físico"]},
+    "Licença Sanitária Serviço (Hemoterapia)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Validação Rede Frio", "Ciclo do sangue", "Comitê Transfusional"]},
+    "Licença Sanitária Serviço (Hemodiálise)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Análise água", "Manutenção máquinas", "Sorologia pacientes"]},
+    "Licença Sanitária Serviço (Oncologia)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Protocolos quimioterapia", "Registro câncer"]},
+    "Licença Sanitária Serviço (UTI Adulto)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Monitoramento 24h", "Equipamentos suporte", "CCIH"]},
+    "Licença Sanitária Serviço (UTI Neonatal)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Incubadoras", "Rede gases", "Área ordenha"]},
+    "Licença Sanitária Serviço (CME)": {"dias": 365, "risco": "CRÍTICO", "link": "", "tarefas": ["Testes autoclave", "Qualificação térmica", "Rastreabilidade"]},
+    "Licença Sanitária Serviço (Vacinas)": {"dias": 365, "risco": "ALTO", "link": "", "tarefas": ["Rede de frio", "Gerador/Nobreak", "Registro doses"]},
+    "Licença Sanitária Serviço (Equipamento)": {"dias": 365, "risco": "MÉDIO", "link": "", "tarefas": ["Plano Manutenção", "Calibração", "Teste Segurança Elétrica", "Etiqueta Validade"]},
+})
+for i in range(1, 23):
+    DOC_INTELLIGENCE[f"Licença Sanitária Serviço (Equipamento {i})"] = DOC_INTELLIGENCE["Licença Sanitária Serviço (Equipamento)"]
+
+LISTA_TIPOS_DOCUMENTOS = sorted(list(DOC_INTELLIGENCE.keys()) + ["Outros"])
+MAX_CACHE_CLASSIFICACAO = 4096
+
+class ClassificadorDocumentos:
+    def __init__(self, regras):
+        self.regras = regras
+        self._filhos = [{}]   # nó -> {caractere: nó}
+        self._falha = [0]
+        self._maior = [None]  # nó -> maior chave que termina aqui (incluindo via links de falha)
+        for chave in regras:
+            if chave != "DEFAULT": self._inserir(chave)
+        self._ligar_falhas()
+
+    def _inserir(self, chave):
+        no = 0
+        for c in chave:
+            if c not in self._filhos[no]:
+                self._filhos.append({}); self._falha.append(0); self._maior.append(None)
+                self._filhos[no][c] = len(self._filhos) - 1
+            no = self._filhos[no][c]
+        self._maior[no] = chave
+
+    def _ligar_falhas(self):
+        fila = deque(self._filhos[0].values())
+        while fila:
+            no = fila.popleft()
+            for c, filho in self._filhos[no].items():
+                f = self._falha[no]
+                while f and c not in self._filhos[f]: f = self._falha[f]
+                self._falha[filho] = self._filhos[f][c] if c in self._filhos[f] and self._filhos[f][c] != filho else 0
+                herdada = self._maior[self._falha[filho]]
+                if herdada and (self._maior[filho] is None or len(herdada) > len(self._maior[filho])): self._maior[filho] = herdada
+                fila.append(filho)
+
+    def chave_para(self, tipo_doc):
+        # Nome exato > maior chave contida (empate: a que aparece primeiro no texto) > DEFAULT
+        tipo_doc = str(tipo_doc)
+        if tipo_doc in self.regras: return tipo_doc
+        no, melhor = 0, None
+        for c in tipo_doc:
+            while no and c not in self._filhos[no]: no = self._falha[no]
+            no = self._filhos[no].get(c, 0)
+            achada = self._maior[no]
+            if achada and (melhor is None or len(achada) > len(melhor)): melhor = achada
+        return melhor or "DEFAULT"
+
+CLASSIFICADOR = ClassificadorDocumentos(DOC_INTELLIGENCE)
+
+@lru_cache(maxsize=MAX_CACHE_CLASSIFICACAO)
+def classificar_documento(tipo_doc):
+    return CLASSIFICADOR.chave_para(tipo_doc)
+
+def aplicar_inteligencia_doc(tipo_doc, data_base=None):
+    if not data_base or pd.isna(data_base): data_base = date.today()
+    info = DOC_INTELLIGENCE[classificar_documento(str(tipo_doc))]
+    
+    novo_vencimento = data_base
+    if info["dias"] > 0: novo_vencimento = data_base + timedelta(days=info["dias"])
+    return info["risco"], novo_vencimento, info["link"], info["tarefas"]
+
+def aplicar_inteligencia_lote(documentos, datas_base=None):
+    # Versão em lote para uma coluna Documento inteira (importação, reclassificação em massa):
+    # classifica cada nome distinto uma vez e devolve Regra, Status, Vencimento, Link e Tarefas
+    # alinhados ao índice de `documentos`. `datas_base` pode ser uma data única ou uma série.
+    documentos = pd.Series(documentos).astype(str)
+    regra = documentos.map({d: classificar_documento(d) for d in documentos.unique()})
+    regras = {k: DOC_INTELLIGENCE[k] for k in regra.unique()}
+    dias = regra.map({k: max(info["dias"], 0) for k, info in regras.items()})
+    # Data base vazia/inválida conta a partir de hoje, como em aplicar_inteligencia_doc
+    hoje = pd.Timestamp(date.today())
+    if isinstance(datas_base, pd.Series): base = pd.to_datetime(datas_base, errors='coerce').fillna(hoje)
+    else: base = pd.Series(hoje if datas_base is None or pd.isna(datas_base) else pd.Timestamp(datas_base), index=documentos.index)
+    return pd.DataFrame({
+        "Regra": regra,
+        "Status": regra.map({k: info["risco"] for k, info in regras.items()}),
+        "Vencimento": (base + pd.to_timedelta(dias, unit='D')).dt.date,
+        "Link": regra.map({k: info["link"] for k, info in regras.items()}),
+        "Tarefas": regra.map({k: info["tarefas"] for k, info in regras.items()}),
+    }, index=documentos.index)
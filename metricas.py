@@ -0,0 +1,124 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- MÉTRICAS DE DESEMPENHO (uma instância por processo) ---
+# `with medir("sheets.puxar") as m: ...; m["chamadas"] = 3` registra a duração e os atributos da
+# etapa. Cada etapa guarda as últimas durações para percentis e todos os eventos recentes vão para
+# um buffer exportável em JSON lines. Com LEGALIZA_LOG_METRICAS=<arquivo> cada evento também é
+# gravado no log estruturado (logger "legaliza.metricas").
+
+MAX_AMOSTRAS_ETAPA = 1000
+MAX_EVENTOS = 5000
+PERCENTIS = (50, 90, 99)
+LOG_METRICAS = os.environ.get("LEGALIZA_LOG_METRICAS", "")
+
+logger = logging.getLogger("legaliza.metricas")
+if LOG_METRICAS and not logger.handlers:
+    _handler = logging.FileHandler(LOG_METRICAS, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+def percentil(ordenados, p):
+    if not ordenados: return 0.0
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    return ordenados[i] + (ordenados[min(i + 1, len(ordenados) - 1)] - ordenados[i]) * (k - i)
+
+class Metricas:
+    def __init__(self, max_amostras=MAX_AMOSTRAS_ETAPA, max_eventos=MAX_EVENTOS):
+        self.ativo = True
+        self.max_amostras = max_amostras
+        self._lock = threading.Lock()
+        self._etapas = {}       # nome -> {"amostras": deque, "n": int, "total": float, "erros": int}
+        self._contadores = {}
+        self._eventos = deque(maxlen=max_eventos)
+
+    # --- REGISTRO ---
+    def registrar(self, nome, segundos, erro=False, **atributos):
+        if not self.ativo: return
+        evento = {"ts": datetime.now().isoformat(timespec="milliseconds"), "etapa": nome, "ms": round(segundos * 1000, 3), **atributos}
+        if erro: evento["erro"] = True
+        with self._lock:
+            etapa = self._etapas.get(nome)
+            if etapa is None: etapa = self._etapas[nome] = {"amostras": deque(maxlen=self.max_amostras), "n": 0, "total": 0.0, "erros": 0}
+            etapa["amostras"].append(segundos)
+            etapa["n"] += 1
+            etapa["total"] += segundos
+            etapa["erros"] += bool(erro)
+            for chave in ("chamadas", "bytes"):
+                if isinstance(atributos.get(chave), (int, float)): etapa[chave] = etapa.get(chave, 0) + atributos[chave]
+            self._eventos.append(evento)
+        if LOG_METRICAS: logger.info(json.dumps(evento, ensure_ascii=False, default=str))
+
+    @contextmanager
+    def medir(self, nome, **atributos):
+        # O dict entregue pode receber atributos durante a etapa (ex: chamadas de API, bytes)
+        inicio = time.perf_counter()
+        erro = False
+        try:
+            yield atributos
+        except BaseException:
+            erro = True
+            raise
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio, erro=erro, **atributos)
+
+    def contar(self, nome, n=1):
+        if not self.ativo: return
+        with self._lock: self._contadores[nome] = self._contadores.get(nome, 0) + n
+
+    # --- CONSULTA ---
+    def resumo(self):
+        # Uma linha por etapa: execuções, percentis (ms) das últimas amostras, total e erros
+        with self._lock: etapas = {k: (sorted(v["amostras"]), dict(v)) for k, v in self._etapas.items()}
+        linhas = []
+        for nome, (ordenados, etapa) in sorted(etapas.items()):
+            linha = {"etapa": nome, "n": etapa["n"], **{f"p{p}_ms": round(percentil(ordenados, p) * 1000, 2) for p in PERCENTIS},
+                     "max_ms": round(ordenados[-1] * 1000, 2) if ordenados else 0.0, "total_s": round(etapa["total"], 3), "erros": etapa["erros"]}
+            for chave in ("chamadas", "bytes"):
+                if chave in etapa: linha[chave] = etapa[chave]
+            linhas.append(linha)
+        return linhas
+
+    def contadores(self):
+        with self._lock: return dict(self._contadores)
+
+    def eventos(self, etapa=None):
+        with self._lock: return [e for e in self._eventos if etapa is None or e["etapa"] == etapa]
+
+    def exportar_jsonl(self):
+        return "\n".join(json.dumps(e, ensure_ascii=False, default=str) for e in self.eventos()) + "\n"
+
+    def limpar(self):
+        with self._lock:
+            self._etapas.clear()
+            self._contadores.clear()
+            self._eventos.clear()
+
+# --- PERFIL SOB DEMANDA (cProfile de um rerun) ---
+def iniciar_perfil():
+    # None se outro perfil já está ativo (no Python 3.12+ só pode haver um por processo)
+    perfil = cProfile.Profile()
+    try: perfil.enable()
+    except ValueError: return None
+    return perfil
+
+def texto_perfil(perfil, ordem="cumulative", linhas=40):
+    perfil.disable()
+    saida = io.StringIO()
+    pstats.Stats(perfil, stream=saida).strip_dirs().sort_stats(ordem).print_stats(linhas)
+    return saida.getvalue()
+
+METRICAS = Metricas()
+medir = METRICAS.medir
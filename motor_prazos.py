@@ -0,0 +1,66 @@
+from datetime import datetime
+import pandas as pd
+import pytz
+
+# --- MOTOR DE PRAZOS E ALERTAS ---
+# Calcula, de forma vetorizada e uma vez por carga/edição dos dados, os dias para
+# vencer, o atraso e o nível de alerta de cada documento. Robô, KPIs e painel leem
+# essas colunas em vez de percorrer o DataFrame linha a linha.
+
+FUSO = pytz.timezone('America/Sao_Paulo')
+
+# Regras de alerta: um único lugar para ajustar antecedência, intervalo entre pushes do nível,
+# intervalo para relembrar o mesmo documento e texto do push
+REGRAS_ALERTA = {
+    "CRÍTICO": {"id": "critico", "dias_antecedencia": 5, "intervalo_min": 60, "lembrete_horas": 24, "titulo": "🚨 ALERTA CRÍTICO (1h)", "prioridade": "high"},
+    "ALTO": {"id": "alto", "dias_antecedencia": 5, "intervalo_min": 180, "lembrete_horas": 72, "titulo": "🟠 ALERTA ALTO (3h)", "prioridade": "default"},
+}
+DOCUMENTOS_IGNORADOS = ["SELECIONE", "PENDENTE"]  # placeholders de importação ainda sem tipo
+MAX_ITENS_PUSH = 10
+INTERVALO_CHECK_ROBO = 60  # segundos entre verificações do agendador_alertas.py
+COLUNAS_MOTOR = ["dias_para_vencer", "vencido", "nivel_alerta"]
+
+def hoje_sp():
+    return datetime.now(FUSO).date()
+
+def calcular_prazos(df_prazos, hoje=None, regras=REGRAS_ALERTA):
+    if hoje is None: hoje = hoje_sp()
+    if df_prazos.empty or 'Vencimento' not in df_prazos.columns:
+        return df_prazos.assign(**{"dias_para_vencer": pd.Series(dtype="Int64"), "vencido": pd.Series(dtype=bool), "nivel_alerta": pd.Series(dtype=object)})
+
+    venc = pd.to_datetime(df_prazos['Vencimento'], errors='coerce')
+    dias = (venc - pd.Timestamp(hoje)).dt.days.astype("Int64")
+    prog = pd.to_numeric(df_prazos['Progresso'], errors='coerce').fillna(0)
+    status = df_prazos['Status'].astype(str)
+    doc = df_prazos['Documento'].astype(str)
+
+    elegivel = (prog < 100) & dias.notna().to_numpy(dtype=bool)
+    for marcador in DOCUMENTOS_IGNORADOS:
+        elegivel &= ~doc.str.contains(marcador, regex=False)
+
+    nivel = pd.Series("", index=df_prazos.index, dtype=object)
+    dias_num = dias.fillna(10**9).astype("int64")
+    for risco, regra in regras.items():
+        nivel = nivel.mask(elegivel & (status == risco) & (dias_num <= regra["dias_antecedencia"]), risco)
+
+    vencido = (dias_num < 0) & (prog < 100)
+    return df_prazos.assign(dias_para_vencer=dias, vencido=vencido, nivel_alerta=nivel)
+
+def garantir_prazos(df_prazos, hoje=None):
+    # Recalcula apenas se as colunas faltam (ex: DataFrame recém editado fora do fluxo normal)
+    if all(c in df_prazos.columns for c in COLUNAS_MOTOR): return df_prazos
+    return calcular_prazos(df_prazos, hoje)
+
+def alertas_pendentes(df_prazos, risco):
+    # Documentos no nível de alerta, do mais urgente para o menos urgente
+    df_prazos = garantir_prazos(df_prazos)
+    return df_prazos[df_prazos['nivel_alerta'] == risco].sort_values('dias_para_vencer', kind="stable")
+
+def formatar_mensagens(sel):
+    return ("🏥 " + sel['Unidade'].astype(str) + "\n📄 " + sel['Documento'].astype(str) +
+            "\n⏳ Vence em " + sel['dias_para_vencer'].astype(str) + " dias").tolist()
+
+def mensagens_alerta(df_prazos, risco, limite=MAX_ITENS_PUSH):
+    sel = alertas_pendentes(df_prazos, risco)
+    if limite: sel = sel.head(limite)
+    return formatar_mensagens(sel)
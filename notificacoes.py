@@ -0,0 +1,155 @@
+import queue
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from metricas import medir
+
+# --- NOTIFICAÇÕES PUSH (ntfy.sh) ---
+# Despachante com sessão HTTP persistente (keep-alive), timeouts explícitos e fila limitada
+# processada em segundo plano. Mensagens para o mesmo tópico que chegam enquanto outra
+# ainda espera na fila são agrupadas em um único push. Quem precisa saber se a mensagem da fila
+# chegou passa `ao_entregar`, chamado pelo worker com True/False depois das tentativas.
+
+TOPICO_NOTIFICACAO = "legaliza_vida_alerta_hospital"
+URL_NTFY = "https://ntfy.sh"
+TIMEOUT_NTFY = (3, 10)        # (conexão, leitura) em segundos
+MAX_FILA_PUSH = 100
+MAX_TENTATIVAS_PUSH = 3
+BACKOFF_PUSH = 1.0            # segundos, dobra a cada nova tentativa
+SEPARADOR_AGRUPADO = "\n================\n"
+ORDEM_PRIORIDADE = ["min", "low", "default", "high", "max", "urgent"]
+
+def _maior_prioridade(prioridades):
+    return max(prioridades, key=lambda p: ORDEM_PRIORIDADE.index(p) if p in ORDEM_PRIORIDADE else 2)
+
+class DespachanteNotificacoes:
+    def __init__(self, url_base=URL_NTFY, timeout=TIMEOUT_NTFY, max_fila=MAX_FILA_PUSH,
+                 max_tentativas=MAX_TENTATIVAS_PUSH, backoff=BACKOFF_PUSH):
+        self.url_base = url_base.rstrip("/")
+        self.timeout = timeout
+        self.max_tentativas = max_tentativas
+        self.backoff = backoff
+        self.sessao = requests.Session()
+        self.sessao.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+        self.sessao.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._pendentes = {}   # tópico -> lista de (titulo, mensagem, prioridade, ao_entregar) ainda não retirada pelo worker
+        self._lock = threading.Lock()
+        self._thread = None
+        self._latencias = []
+        self._metricas = {"enfileiradas": 0, "agrupadas": 0, "descartadas": 0, "enviadas": 0,
+                          "mensagens_entregues": 0, "falhas": 0, "tentativas_extras": 0}
+
+    # --- API ---
+    def enviar(self, titulo, mensagem, prioridade="default", topico=TOPICO_NOTIFICACAO, ao_entregar=None):
+        # Não bloqueia: retorna True se a mensagem foi aceita na fila (ou agrupada a uma já pendente)
+        self._iniciar()
+        with self._lock:
+            if topico in self._pendentes:
+                self._pendentes[topico].append((titulo, mensagem, prioridade, ao_entregar))
+                self._metricas["agrupadas"] += 1
+                return True
+            try:
+                self._fila.put_nowait(topico)
+            except queue.Full:
+                self._metricas["descartadas"] += 1
+                return False
+            self._pendentes[topico] = [(titulo, mensagem, prioridade, ao_entregar)]
+            self._metricas["enfileiradas"] += 1
+            return True
+
+    def enviar_agora(self, titulo, mensagem, prioridade="default", topico=TOPICO_NOTIFICACAO):
+        # Envio síncrono (com retentativas) para quem precisa saber se entregou
+        return self._postar(topico, titulo, mensagem, prioridade)
+
+    def aguardar(self, timeout=None):
+        # Espera a fila esvaziar (ex: antes de encerrar um processo)
+        limite = time.time() + timeout if timeout else None
+        while self._fila.unfinished_tasks:
+            if limite and time.time() > limite: return False
+            time.sleep(0.05)
+        return True
+
+    def metricas(self):
+        with self._lock:
+            m = dict(self._metricas)
+            lat = sorted(self._latencias)
+        m["na_fila"] = self._fila.qsize()
+        if lat:
+            m["latencia_p50_ms"] = round(lat[len(lat) // 2] * 1000, 1)
+            m["latencia_p95_ms"] = round(lat[min(len(lat) - 1, int(len(lat) * 0.95))] * 1000, 1)
+        return m
+
+    # --- WORKER ---
+    def _iniciar(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="despachante-ntfy", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            topico = self._fila.get()
+            try:
+                with self._lock:
+                    lote = self._pendentes.pop(topico, [])
+                if not lote: continue
+                if len(lote) == 1:
+                    titulo, mensagem, prioridade, _ = lote[0]
+                else:
+                    titulo = f"{lote[0][0]} (+{len(lote) - 1})"
+                    mensagem = SEPARADOR_AGRUPADO.join(m for _, m, _, _ in lote)
+                    prioridade = _maior_prioridade([p for _, _, p, _ in lote])
+                entregue = self._postar(topico, titulo, mensagem, prioridade)
+                if entregue:
+                    with self._lock: self._metricas["mensagens_entregues"] += len(lote)
+                for *_, ao_entregar in lote:
+                    if ao_entregar is None: continue
+                    try: ao_entregar(entregue)
+                    except Exception: pass  # o worker não pode morrer por causa de quem enviou
+            finally:
+                self._fila.task_done()
+
+    def _postar(self, topico, titulo, mensagem, prioridade):
+        with medir("ntfy.push", topico=topico) as m:
+            m["entregue"] = self._postar_com_tentativas(topico, titulo, mensagem, prioridade)
+            return m["entregue"]
+
+    def _postar_com_tentativas(self, topico, titulo, mensagem, prioridade):
+        for tentativa in range(self.max_tentativas):
+            if tentativa:
+                with self._lock: self._metricas["tentativas_extras"] += 1
+            inicio = time.time()
+            espera = self.backoff * (2 ** tentativa)
+            try:
+                resp = self.sessao.post(f"{self.url_base}/{topico}", data=mensagem.encode('utf-8'), timeout=self.timeout,
+                                        headers={"Title": titulo.encode('utf-8'), "Priority": prioridade, "Tags": "hospital"})
+                if resp.status_code < 400:
+                    with self._lock:
+                        self._metricas["enviadas"] += 1
+                        self._latencias = (self._latencias + [time.time() - inicio])[-200:]
+                    return True
+                if resp.status_code == 429:
+                    try: espera = max(espera, float(resp.headers.get("Retry-After", 0)))
+                    except ValueError: pass
+                elif resp.status_code < 500:
+                    break  # erro do cliente: repetir não adianta
+            except requests.RequestException:
+                pass
+            if tentativa < self.max_tentativas - 1: time.sleep(espera)
+        with self._lock: self._metricas["falhas"] += 1
+        return False
+
+_despachante = None
+_lock_despachante = threading.Lock()
+
+def get_despachante():
+    global _despachante
+    with _lock_despachante:
+        if _despachante is None: _despachante = DespachanteNotificacoes()
+        return _despachante
+
+def enviar_notificacao_push(titulo, mensagem, prioridade="default", topico=TOPICO_NOTIFICACAO, ao_entregar=None):
+    return get_despachante().enviar(titulo, mensagem, prioridade, topico, ao_entregar)
@@ -0,0 +1,133 @@
+import re
+import unicodedata
+import pandas as pd
+
+# --- ESQUEMA DAS PLANILHAS (LegalizaHealth_DB) ---
+NOME_PLANILHA = "LegalizaHealth_DB"
+ABA_PRAZOS = "Prazos"
+ABA_CHECKLIST = "Checklist_Itens"
+COLUNAS_PRAZOS = ["Unidade", "Setor", "Documento", "CNPJ", "Data_Recebimento", "Vencimento", "Status", "Progresso", "Concluido"]
+COLUNAS_CHECKLIST = ["Documento_Ref", "Tarefa", "Feito"]
+MAPA_FEITO = {'TRUE': True, 'FALSE': False, 'True': True, 'False': False, 'true': True, 'false': False, 'nan': False, '': False}
+
+# --- FUNÇÕES BÁSICAS ---
+def safe_prog(val):
+    try: return max(0, min(100, int(float(val))))
+    except: return 0
+
+def normalizar_texto(texto):
+    if texto is None: return ""
+    return ''.join(c for c in unicodedata.normalize('NFKD', str(texto)) if unicodedata.category(c) != 'Mn').lower()
+
+def texto_arquivo(texto, limite=60):
+    # Trecho seguro para nome de arquivo: sem acentos, só letras, dígitos e "_"
+    ascii_ = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r"[^A-Za-z0-9]+", "_", ascii_).strip("_")[:limite]
+
+def formatar_data_br(x):
+    if x is None or (not isinstance(x, str) and pd.isna(x)): return ""
+    return x.strftime('%d/%m/%Y') if hasattr(x, 'strftime') else str(x)
+
+def id_unico(unidade, documento):
+    # Identidade de um documento: "Unidade - Documento" (escalar ou Series)
+    return unidade + " - " + documento
+
+def normalizar_feito(serie):
+    return serie.map(lambda v: MAPA_FEITO.get(str(v).strip(), False)).astype(bool)
+
+# --- NORMALIZAÇÃO NA CARGA ---
+def normalizar_prazos(df_prazos):
+    # Não filtra linhas sem Unidade: a sincronização precisa saber a posição de todas na aba
+    df_prazos = df_prazos.copy()
+    for c in COLUNAS_PRAZOS:
+        if c not in df_prazos.columns: df_prazos[c] = ""
+    if not df_prazos.empty:
+        df_prazos["Progresso"] = pd.to_numeric(df_prazos["Progresso"], errors='coerce').fillna(0).astype(int)
+        for col_txt in ['Unidade', 'Setor', 'Documento', 'Status', 'CNPJ']:
+            df_prazos[col_txt] = df_prazos[col_txt].astype(str).str.strip()
+        for c_date in ['Vencimento', 'Data_Recebimento']:
+            df_prazos[c_date] = pd.to_datetime(df_prazos[c_date], dayfirst=True, errors='coerce').dt.date
+        df_prazos['ID_UNICO'] = id_unico(df_prazos['Unidade'], df_prazos['Documento'])
+    return df_prazos
+
+def normalizar_checklist(df_check):
+    if df_check.empty: return pd.DataFrame(columns=COLUNAS_CHECKLIST)
+    df_check = df_check.copy()
+    for c in COLUNAS_CHECKLIST:
+        if c not in df_check.columns: df_check[c] = ""
+    df_check['Documento_Ref'] = df_check['Documento_Ref'].astype(str)
+    return df_check
+
+# --- TAREFAS SUGERIDAS ---
+def adicionar_tarefas_sugeridas(df_checklist, id_doc, tarefas):
+    novas = []
+    existentes = []
+    if not df_checklist.empty:
+        existentes = df_checklist[df_checklist['Documento_Ref'] == str(id_doc)]['Tarefa'].tolist()
+    for t in tarefas:
+        if t not in existentes:
+            novas.append({"Documento_Ref": str(id_doc), "Tarefa": t, "Feito": False})
+    if novas: return pd.concat([df_checklist, pd.DataFrame(novas)], ignore_index=True)
+    return df_checklist
+
+# --- SERIALIZAÇÃO PARA A NUVEM ---
+def serializar_prazos(df_prazos):
+    df_p = df_prazos.copy()
+    for c in COLUNAS_PRAZOS:
+        if c not in df_p.columns: df_p[c] = ""
+    df_p = df_p[COLUNAS_PRAZOS]
+    for c_date in ['Vencimento', 'Data_Recebimento']:
+        df_p[c_date] = df_p[c_date].apply(formatar_data_br)
+    df_p['Concluido'] = df_p['Concluido'].astype(str)
+    df_p['Progresso'] = df_p['Progresso'].apply(safe_prog)
+    for c in ['Unidade', 'Setor', 'Documento', 'CNPJ', 'Status']:
+        df_p[c] = df_p[c].fillna("").astype(str)
+    return df_p.astype(object).values.tolist()
+
+def serializar_checklist(df_checklist):
+    df_c = df_checklist.copy()
+    for c in COLUNAS_CHECKLIST:
+        if c not in df_c.columns: df_c[c] = ""
+    df_c = df_c[COLUNAS_CHECKLIST]
+    df_c['Documento_Ref'] = df_c['Documento_Ref'].fillna("").astype(str)
+    df_c['Tarefa'] = df_c['Tarefa'].fillna("").astype(str)
+    df_c['Feito'] = normalizar_feito(df_c['Feito']).astype(str)
+    return df_c.astype(object).values.tolist()
+
+# --- CHAVES DE IDENTIDADE (ID_UNICO / Documento_Ref) ---
+def chaves_prazos(df_prazos):
+    if df_prazos.empty: return []
+    if 'ID_UNICO' in df_prazos.columns:
+        ids = df_prazos['ID_UNICO'].astype(str)
+    else:
+        ids = id_unico(df_prazos['Unidade'].astype(str), df_prazos['Documento'].astype(str))
+    # Linhas sem Unidade são descartadas na carga, então não têm identidade
+    return [i if u != "" else None for i, u in zip(ids.tolist(), df_prazos['Unidade'].astype(str).str.strip().tolist())]
+
+def chaves_checklist(df_checklist):
+    if df_checklist.empty: return []
+    refs = df_checklist['Documento_Ref'].astype(str).tolist()
+    tarefas = df_checklist['Tarefa'].fillna("").astype(str).tolist()
+    return [f"{r}\x1f{t}" if t != "" else None for r, t in zip(refs, tarefas)]
+
+# --- PROGRESSO A PARTIR DO CHECKLIST ---
+def progresso_tarefas(feitas, total):
+    # Percentual inteiro, arredondado para baixo (escalar ou Series); total > 0
+    return feitas * 100 // total
+
+def agregar_checklist(df_prazos, df_checklist):
+    # Feitas/total por Documento_Ref em um único groupby, juntado aos prazos pelo ID_UNICO.
+    # Documentos sem tarefas mantêm o Progresso gravado.
+    if df_prazos.empty or 'ID_UNICO' not in df_prazos.columns:
+        return df_prazos.assign(tarefas_total=pd.Series(dtype=int), tarefas_feitas=pd.Series(dtype=int))
+    if df_checklist.empty:
+        grupos = pd.DataFrame(columns=['total', 'feitas'], dtype=int)
+    else:
+        feito = df_checklist['Feito'] if df_checklist['Feito'].dtype == bool else normalizar_feito(df_checklist['Feito'])
+        grupos = feito.groupby(df_checklist['Documento_Ref'].astype(str)).agg(total='size', feitas='sum')
+    ids = df_prazos['ID_UNICO'].astype(str)
+    total = ids.map(grupos['total']).fillna(0).astype(int)
+    feitas = ids.map(grupos['feitas']).fillna(0).astype(int)
+    gravado = pd.to_numeric(df_prazos['Progresso'], errors='coerce').fillna(0).astype(int)
+    progresso = progresso_tarefas(feitas, total.where(total > 0, 1)).where(total > 0, gravado)
+    return df_prazos.assign(Progresso=progresso, tarefas_total=total, tarefas_feitas=feitas)
@@ -0,0 +1,51 @@
+import math
+import numpy as np
+import pandas as pd
+from motor_prazos import garantir_prazos
+
+# --- PAINEL GERAL: AGREGADOS E PAGINAÇÃO NO SERVIDOR ---
+# Os contadores do painel (por Status/Unidade/Setor, progresso médio, vencidos, em alerta) saem de
+# uma passada sobre os dados e ficam no Retrato, ou seja, só são recalculados quando a versão dos
+# dados muda. A lista de processos é ordenada por posições pré-calculadas por coluna (também no
+# Retrato) e só a página visível é enviada ao navegador.
+
+COLUNAS_LISTA = ['Unidade', 'Setor', 'Documento', 'Vencimento', 'dias_para_vencer', 'Progresso', 'Status']
+TAMANHOS_PAGINA = [25, 50, 100, 200]
+STATUS_PAINEL = ["CRÍTICO", "ALTO", "NORMAL"]
+# Filtro de vencimento da lista (dias a partir de hoje; -1 = já vencidos), respondido pelo índice de vencimentos
+JANELAS_VENCIMENTO = {"Qualquer prazo": None, "Vencidos": -1, "Próximos 7 dias": 7, "Próximos 30 dias": 30, "Próximos 60 dias": 60, "Próximos 90 dias": 90}
+MAX_PROXIMOS = 10
+
+def calcular_agregados(df_prazos):
+    if df_prazos.empty:
+        return {"total": 0, "por_status": {}, "por_unidade": {}, "por_setor": {}, "progresso_medio": 0, "vencidos": 0, "em_alerta": 0}
+    df = garantir_prazos(df_prazos)
+    contagem = lambda c: {k: int(v) for k, v in df[c].astype(str).value_counts().items() if v > 0}
+    return {
+        "total": len(df),
+        "por_status": contagem('Status'),
+        "por_unidade": contagem('Unidade'),
+        "por_setor": contagem('Setor'),
+        "progresso_medio": int(pd.to_numeric(df['Progresso'], errors='coerce').fillna(0).mean()),
+        "vencidos": int(df['vencido'].sum()),
+        "em_alerta": int((df['nivel_alerta'] != "").sum()),
+    }
+
+def ordem_coluna(df, coluna):
+    # (posições em ordem crescente com vazios no fim, quantidade de valores não vazios)
+    valores = df[coluna].reset_index(drop=True)
+    if isinstance(valores.dtype, pd.CategoricalDtype):
+        valores = valores.cat.reorder_categories(sorted(valores.cat.categories, key=str), ordered=True)
+    elif valores.dtype == object or isinstance(valores.dtype, pd.StringDtype):   # texto: "" também conta como vazio
+        valores = valores.where(valores.notna(), None).map(lambda v: None if v is None or v == "" else v)
+    ordenados = valores.sort_values(kind="stable", na_position="last")
+    return ordenados.index.to_numpy(), int(valores.notna().sum())
+
+def selecionar_pagina(df, ordem, n_validos, crescente=True, mascara=None, pagina=1, tamanho=50):
+    # Aplica sentido, filtro (máscara posicional) e recorte; retorna (página, total filtrado, nº de páginas, página efetiva)
+    if not crescente: ordem = np.concatenate([ordem[:n_validos][::-1], ordem[n_validos:]])
+    if mascara is not None: ordem = ordem[mascara[ordem]]
+    total = len(ordem)
+    n_paginas = max(1, math.ceil(total / tamanho))
+    pagina = min(max(1, pagina), n_paginas)
+    return df.iloc[ordem[(pagina - 1) * tamanho:pagina * tamanho]], total, n_paginas, pagina
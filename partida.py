@@ -0,0 +1,80 @@
+import importlib
+import os
+import sys
+import threading
+import time
+from functools import lru_cache
+
+# --- PARTIDA RÁPIDA ---
+# Bibliotecas pesadas (plotly, fpdf/PIL, googleapiclient) são importadas só na página que as usa,
+# via carregar(), que também mede o custo da primeira importação. Arquivos estáticos são lidos uma
+# vez por processo. Cada rerun cria um MedidorRerun e marca o fim de cada etapa do script, para o
+# relatório de partida (?partida=1 na URL ou LEGALIZA_RELATORIO_PARTIDA=1).
+
+PRECARREGAR = os.environ.get("LEGALIZA_PRECARREGAR", "1") == "1"
+MODULOS_PESADOS = ["plotly.express", "relatorio", "drive_uploader", "clientes_google"]
+
+_importacoes = {}   # módulo -> segundos gastos na primeira importação
+_lock = threading.Lock()
+_primeiro_rerun = None
+_precarregado = False
+
+def carregar(nome_modulo):
+    # Import tardio e medido; None se a biblioteca não estiver instalada
+    novo = nome_modulo not in sys.modules
+    inicio = time.perf_counter()
+    try: modulo = importlib.import_module(nome_modulo)  # espera se outra thread ainda está importando
+    except ImportError: return None
+    if novo:
+        with _lock: _importacoes.setdefault(nome_modulo, time.perf_counter() - inicio)
+    return modulo
+
+def precarregar(nomes=MODULOS_PESADOS):
+    # Depois da primeira página, aquece o resto em segundo plano para a troca de aba não pagar o import
+    global _precarregado
+    with _lock:
+        if _precarregado: return
+        _precarregado = True
+    def aquecer():
+        for nome in nomes: carregar(nome)
+    threading.Thread(target=aquecer, name="precarregar", daemon=True).start()
+
+@lru_cache(maxsize=None)
+def arquivo_bytes(caminho):
+    try:
+        with open(caminho, "rb") as f: return f.read()
+    except OSError: return b""
+
+class MedidorRerun:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self._ultimo = self.inicio
+        self.etapas = []   # [(nome, segundos)]
+        self.registrado = False   # já entrou nas métricas de rerun
+
+    def marcar(self, nome):
+        agora = time.perf_counter()
+        self.etapas.append((nome, agora - self._ultimo))
+        self._ultimo = agora
+
+    def total(self):
+        return self._ultimo - self.inicio
+
+def registrar_rerun(medidor):
+    # Guarda o primeiro rerun do processo (o que pagou os imports de topo)
+    global _primeiro_rerun
+    with _lock:
+        if _primeiro_rerun is None: _primeiro_rerun = medidor
+
+def relatorio_partida(medidor=None):
+    with _lock:
+        importacoes = sorted(_importacoes.items(), key=lambda x: -x[1])
+        primeiro = _primeiro_rerun
+    linhas = []
+    if primeiro is not None:
+        linhas += [{"Grupo": "primeiro rerun", "Etapa": n, "ms": round(s * 1000, 1)} for n, s in primeiro.etapas]
+    if medidor is not None:
+        linhas += [{"Grupo": "último rerun", "Etapa": n, "ms": round(s * 1000, 1)} for n, s in medidor.etapas]
+        linhas.append({"Grupo": "último rerun", "Etapa": "TOTAL", "ms": round(medidor.total() * 1000, 1)})
+    linhas += [{"Grupo": "import tardio", "Etapa": n, "ms": round(s * 1000, 1)} for n, s in importacoes]
+    return linhas
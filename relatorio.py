@@ -0,0 +1,255 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from fpdf import FPDF
+from PIL import Image, ImageOps
+from metricas import medir
+
+# --- RELATÓRIO DE VISTORIA (PDF + ÁUDIOS EM ZIP) ---
+MAX_RELATORIOS_CACHE = 4
+MM_MINIATURA = 45            # lado da célula da foto no PDF
+DPI_MINIATURA = 150          # resolução de impressão da miniatura
+QUALIDADE_MINIATURA = 70     # qualidade JPEG da recompressão
+MAX_WORKERS_IMAGENS = 4
+LIMITE_ZIP_MEMORIA = 16 * 1024 * 1024   # acima disso o ZIP em montagem vai para disco
+BLOCO_COPIA = 1024 * 1024
+FORMATO_DATA_RELATORIO = "%d/%m/%Y %H:%M"   # "Data:" do cabeçalho; também entra na chave do cache
+# Mídia já comprimida entra no ZIP sem recompressão (o PDF do fpdf2 já vem com streams/JPEG comprimidos)
+EXTENSOES_SEM_COMPRESSAO = {'.pdf', '.jpg', '.jpeg', '.png', '.mp3', '.ogg', '.webm', '.m4a', '.mp4', '.zip'}
+
+def limpar_texto_pdf(texto):
+    if texto is None: return ""
+    texto = str(texto)
+    # Limpa emojis para não quebrar PDF
+    texto = texto.replace("✅", "[OK]").replace("❌", "[NC]").replace("⚠️", "[!]")
+    texto = texto.replace("🏥", "").replace("🏭", "").replace("🛒", "").replace("🏫", "")
+    return texto.encode('latin-1', 'replace').decode('latin-1')
+
+class RelatorioPDF(FPDF):
+    gerado_em = None   # data impressa no cabeçalho (padrão: agora)
+
+    def header(self):
+        self.set_font('Arial', 'B', 14)
+        self.cell(0, 10, 'Relatorio de Vistoria Tecnica - Legalizacao', 0, 1, 'C')
+        self.set_font('Arial', 'I', 10)
+        self.cell(0, 10, f'Data: {(self.gerado_em or datetime.now()).strftime(FORMATO_DATA_RELATORIO)}', 0, 1, 'C')
+        self.ln(5)
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
+
+# --- PIPELINE DE IMAGENS ---
+# Cada foto distinta (por hash do conteúdo) é decodificada uma vez, reduzida ao tamanho
+# que a célula de 45x45 mm realmente ocupa na impressão e recomprimida em memória.
+# Fotos e áudios podem vir como bytes ou como referência (str) do armazém de blobs; a
+# referência já é o hash do conteúdo e só é lida do disco na hora de reduzir/gravar.
+def hash_foto(foto_bytes):
+    return hashlib.sha1(foto_bytes).hexdigest()
+
+def chave_midia(midia):
+    return midia if isinstance(midia, str) else hash_foto(midia)
+
+def ler_midia(midia, blobs=None):
+    if not isinstance(midia, str): return midia
+    try: return blobs.ler(midia)
+    except (OSError, AttributeError): return None  # blob removido ou sem armazém: item sai sem a mídia
+
+def audio_do_item(item):
+    return item.get('Audio') or item.get('Audio_Bytes')
+
+def reduzir_foto(foto_bytes, lado_px, qualidade=QUALIDADE_MINIATURA):
+    try:
+        img = Image.open(io.BytesIO(foto_bytes))
+        img.draft('RGB', (lado_px, lado_px))  # JPEG: decodifica já em 1/2, 1/4 ou 1/8 da resolução
+        img = ImageOps.exif_transpose(img).convert('RGB')
+        img = img.resize((lado_px, lado_px), Image.LANCZOS)  # mesma proporção em que o PDF desenha a célula
+        saida = io.BytesIO()
+        img.save(saida, format='JPEG', quality=qualidade, optimize=True)
+        return saida.getvalue()
+    except Exception:
+        return None
+
+def preparar_miniaturas(itens_vistoria, mm=MM_MINIATURA, dpi=DPI_MINIATURA, qualidade=QUALIDADE_MINIATURA, max_workers=MAX_WORKERS_IMAGENS, blobs=None):
+    # Retorna {chave da foto original: bytes da miniatura ou None se não decodificou}
+    distintas = {}
+    for item in itens_vistoria:
+        for foto in item.get('Fotos') or []: distintas.setdefault(chave_midia(foto), foto)
+    if not distintas: return {}
+    with medir("relatorio.miniaturas", fotos=len(distintas)):
+        return _reduzir_todas(distintas, blobs, mm, dpi, qualidade, max_workers)
+
+def _reduzir_todas(distintas, blobs, mm, dpi, qualidade, max_workers):
+    lado_px = max(1, round(mm / 25.4 * dpi))
+    def reduzir(foto):
+        # Cada worker lê o original do disco só enquanto reduz: no máximo max_workers fotos inteiras em memória
+        dados = ler_midia(foto, blobs)
+        return reduzir_foto(dados, lado_px, qualidade) if dados else None
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        reduzidas = pool.map(reduzir, distintas.values())
+        return dict(zip(distintas.keys(), reduzidas))
+
+def compressao_para(nome_arquivo):
+    return zipfile.ZIP_STORED if os.path.splitext(nome_arquivo)[1].lower() in EXTENSOES_SEM_COMPRESSAO else zipfile.ZIP_DEFLATED
+
+def _gravar_entrada(zip_file, nome_arq, dados):
+    # Copia em blocos direto para a entrada do ZIP, sem montar outra cópia inteira em memória
+    info = zipfile.ZipInfo(nome_arq, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = compressao_para(nome_arq)
+    fonte = io.BytesIO(dados) if isinstance(dados, (bytes, bytearray, memoryview)) else dados
+    if hasattr(fonte, 'seek'): fonte.seek(0)
+    with zip_file.open(info, 'w', force_zip64=True) as destino:
+        shutil.copyfileobj(fonte, destino, BLOCO_COPIA)
+
+def escrever_pacote_zip(destino, itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente, qualidade_fotos=QUALIDADE_MINIATURA, dpi_fotos=DPI_MINIATURA, blobs=None, gerado_em=None):
+    with medir("relatorio.pacote_zip", itens=len(itens_vistoria)):
+        return _escrever_pacote_zip(destino, itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente, qualidade_fotos, dpi_fotos, blobs, gerado_em or datetime.now())
+
+def _escrever_pacote_zip(destino, itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente, qualidade_fotos, dpi_fotos, blobs, gerado_em):
+    miniaturas = preparar_miniaturas(itens_vistoria, dpi=dpi_fotos, qualidade=qualidade_fotos, blobs=blobs)
+    pdf = RelatorioPDF()
+    pdf.gerado_em = gerado_em
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 12)
+    epw = pdf.w - 2*pdf.l_margin 
+    
+    pdf.set_fill_color(220, 220, 220)
+    pdf.cell(epw, 10, "DADOS DO CLIENTE / UNIDADE", 1, 1, 'L', fill=True)
+    pdf.set_font("Arial", "", 11)
+    pdf.multi_cell(epw, 6, f"Cliente: {limpar_texto_pdf(nome_cliente)}\nEndereco: {limpar_texto_pdf(endereco_cliente)}\nTipo: {limpar_texto_pdf(tipo_estabelecimento)}", 1)
+    pdf.ln(5)
+
+    total = len(itens_vistoria)
+    criticos = sum(1 for i in itens_vistoria if i['Gravidade'] == 'CRÍTICO')
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_fill_color(240, 240, 240)
+    pdf.cell(epw, 10, "RESUMO EXECUTIVO", 1, 1, 'L', fill=True)
+    pdf.set_font("Arial", "", 11)
+    pdf.cell(epw, 8, f"Total de Apontamentos: {total} | Pontos Criticos: {criticos}", 1, 1)
+    pdf.ln(5)
+
+    audios_para_zip = []
+    for idx, item in enumerate(itens_vistoria):
+        if pdf.get_y() > 250: pdf.add_page()
+        
+        if item['Gravidade'] == 'CRÍTICO': pdf.set_fill_color(255, 200, 200)
+        elif item['Gravidade'] == 'Alto': pdf.set_fill_color(255, 230, 200)
+        else: pdf.set_fill_color(230, 255, 230)
+        
+        local_safe = limpar_texto_pdf(item['Local'])
+        item_safe = limpar_texto_pdf(item['Item'])
+        obs_safe = limpar_texto_pdf(item['Obs'])
+        
+        pdf.set_font("Arial", "B", 11)
+        pdf.multi_cell(epw, 8, f"#{idx+1} - {local_safe}", 1, 'L', fill=True)
+        pdf.set_font("Arial", "B", 10)
+        pdf.set_x(pdf.l_margin)
+        pdf.multi_cell(epw, 6, f"NC Identificada: {item_safe}", 1, 'L')
+        
+        pdf.set_font("Arial", "", 10)
+        pdf.set_x(pdf.l_margin) 
+        pdf.cell(epw/2, 6, f"Status: {limpar_texto_pdf(item['Situação'])}", 1, 0, 'L')
+        pdf.cell(epw/2, 6, f"Risco: {limpar_texto_pdf(item['Gravidade'])}", 1, 1, 'L')
+        
+        info_extra = ""
+        audio = audio_do_item(item)
+        if audio:
+            nome_audio = f"Audio_Item_{idx+1}.wav"
+            audios_para_zip.append((nome_audio, audio))
+            info_extra = f" [AUDIO ANEXO: {nome_audio}]"
+            
+        pdf.set_x(pdf.l_margin)
+        pdf.multi_cell(epw, 6, f"Nota Tecnica: {obs_safe}{info_extra}", 1, 'L')
+        pdf.ln(2)
+        
+        if item['Fotos']:
+            x_start = 10; y_start = pdf.get_y(); img_w = MM_MINIATURA; img_h = MM_MINIATURA
+            for i, foto_bytes in enumerate(item['Fotos']):
+                try:
+                    mini = miniaturas.get(chave_midia(foto_bytes))
+                    if not mini: continue
+                    if x_start + img_w > 200:
+                        x_start = 10; y_start += img_h + 5
+                        if y_start > 250: pdf.add_page(); y_start = 20
+                    pdf.image(io.BytesIO(mini), x=x_start, y=y_start, w=img_w, h=img_h)
+                    x_start += img_w + 5
+                except: pass
+            pdf.set_y(y_start + img_h + 10)
+        else: pdf.ln(2)
+        pdf.line(10, pdf.get_y(), 200, pdf.get_y()); pdf.ln(5)
+        
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED, True) as zip_file:
+        _gravar_entrada(zip_file, f"Relatorio_Vistoria_{gerado_em.strftime('%d-%m')}.pdf", pdf.output())
+        del pdf
+        for nome_arq, audio in audios_para_zip:
+            if not isinstance(audio, str):
+                _gravar_entrada(zip_file, nome_arq, audio)
+                continue
+            try: fonte = blobs.abrir(audio)  # o áudio vai do disco para o ZIP em blocos
+            except (OSError, AttributeError): continue
+            with fonte: _gravar_entrada(zip_file, nome_arq, fonte)
+    return destino
+
+def gerar_pacote_zip_arquivo(itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente, **kwargs):
+    # ZIP em arquivo temporário "spooled": fica em memória até LIMITE_ZIP_MEMORIA e depois vai para disco
+    destino = tempfile.SpooledTemporaryFile(max_size=LIMITE_ZIP_MEMORIA, suffix=".zip")
+    escrever_pacote_zip(destino, itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente, **kwargs)
+    destino.seek(0)
+    return destino
+
+def gerar_pacote_zip_completo(itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente, **kwargs):
+    with gerar_pacote_zip_arquivo(itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente, **kwargs) as f:
+        return f.read()
+
+# --- CACHE DE RELATÓRIOS POR CONTEÚDO ---
+# O ZIP só é montado quando o usuário pede o download, e o resultado fica guardado em disco
+# pelo hash do conteúdo da vistoria e pela data impressa no cabeçalho: baixar de novo sem mudanças
+# (no mesmo minuto) não renderiza o PDF outra vez, e um download mais tarde não sai com a data antiga.
+_cache_relatorios = OrderedDict()   # chave -> caminho do ZIP em disco
+_lock_cache = threading.Lock()
+
+def hash_vistoria(itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente):
+    h = hashlib.sha256()
+    def campo(valor):
+        if hasattr(valor, 'getvalue'): valor = valor.getvalue()
+        if not isinstance(valor, bytes): valor = str(valor).encode('utf-8')
+        h.update(len(valor).to_bytes(8, 'little')); h.update(valor)
+    for valor in (tipo_estabelecimento, nome_cliente, endereco_cliente, len(itens_vistoria)): campo(valor)
+    for item in itens_vistoria:
+        for chave in ('Local', 'Item', 'Situação', 'Gravidade', 'Obs'): campo(item.get(chave, ""))
+        campo(audio_do_item(item) or b"")  # referência de blob já é o hash do conteúdo
+        fotos = item.get('Fotos') or []
+        campo(len(fotos))
+        for foto in fotos: campo(foto)
+    return h.hexdigest()
+
+def gerar_pacote_zip_cacheado(itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente, blobs=None, agora=None):
+    # Retorna os bytes do ZIP (o download do Streamlit lê tudo de qualquer forma); o arquivo fica no cache
+    gerado_em = agora or datetime.now()
+    chave = f"{hash_vistoria(itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente)}|{gerado_em.strftime(FORMATO_DATA_RELATORIO)}"
+    with _lock_cache:
+        caminho = _cache_relatorios.get(chave)
+        if caminho and os.path.exists(caminho):
+            _cache_relatorios.move_to_end(chave)
+            with open(caminho, 'rb') as f: return f.read()
+    with tempfile.NamedTemporaryFile(prefix="relatorio_", suffix=".zip", delete=False) as destino:
+        try: escrever_pacote_zip(destino, itens_vistoria, tipo_estabelecimento, nome_cliente, endereco_cliente, blobs=blobs, gerado_em=gerado_em)
+        except Exception:
+            destino.close()
+            os.unlink(destino.name)
+            raise
+    with open(destino.name, 'rb') as f: dados = f.read()
+    with _lock_cache:
+        _cache_relatorios[chave] = destino.name
+        while len(_cache_relatorios) > MAX_RELATORIOS_CACHE:
+            _, antigo = _cache_relatorios.popitem(last=False)
+            try: os.unlink(antigo)
+            except OSError: pass
+    return dados
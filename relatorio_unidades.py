@@ -0,0 +1,290 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import get_context
+import pandas as pd
+from nucleo_dados import agregar_checklist, normalizar_feito, texto_arquivo
+from motor_prazos import hoje_sp, calcular_prazos
+from metricas import medir, METRICAS
+
+# --- RELATÓRIOS DE CONFORMIDADE POR UNIDADE (LOTE) ---
+# Uso:  python relatorio_unidades.py [--saida Conformidade.zip] [--pasta legaliza_relatorios] [--workers 4]
+# Um PDF por Unidade (documentos, vencimentos, risco, situação e progresso do checklist), todos
+# em um único ZIP. Os dados de cada unidade viram um resumo simples (só texto e números) e o hash
+# dele é o nome do PDF na pasta de relatórios: na execução seguinte só as unidades cujo resumo
+# mudou são renderizadas de novo, em um pool de processos (o FPDF é Python puro e não solta o GIL).
+# Cada worker grava o PDF direto na pasta e o ZIP é montado a partir dos arquivos, à medida que
+# ficam prontos. O resumo usa a situação do documento (vencido / em alerta) e não os dias para
+# vencer, então a simples passagem do dia não invalida os relatórios.
+
+PASTA_RELATORIOS = os.environ.get("LEGALIZA_RELATORIOS", "legaliza_relatorios")
+MAX_WORKERS_RELATORIOS = int(os.environ.get("LEGALIZA_WORKERS_RELATORIOS", "0")) or min(4, os.cpu_count() or 1)
+VERSAO_LAYOUT = 1            # mudar invalida todos os PDFs já gerados
+ARQUIVO_MANIFESTO = "manifesto.json"
+MIN_PENDENTES_POOL = 4       # abaixo disso renderiza no próprio processo (subir o pool custa mais)
+CORES_RISCO = {"CRÍTICO": (255, 200, 200), "ALTO": (255, 230, 200)}
+COR_NORMAL = (230, 255, 230)
+
+_lock_lote = threading.Lock()   # uma geração por vez por processo (a pasta e o manifesto são compartilhados)
+
+# --- RESUMO POR UNIDADE ---
+def _data_br(valor):
+    return valor.strftime("%d/%m/%Y") if pd.notna(valor) else ""
+
+def _situacao(vencido, nivel):
+    if vencido: return "VENCIDO"
+    return f"ALERTA {nivel}" if nivel else ""
+
+def dados_unidades(df_prazos, df_checklist, hoje=None):
+    # {Unidade: {"cnpjs": [...], "documentos": [[Documento, Setor, Vencimento, Status, Situação, Progresso, feitas, total], ...],
+    #            "pendentes": [[Documento, [tarefas não feitas]], ...]}}, documentos ordenados por vencimento
+    if df_prazos.empty: return {}
+    df = df_prazos
+    if 'tarefas_total' not in df.columns: df = agregar_checklist(df, df_checklist)
+    df = calcular_prazos(df, hoje or hoje_sp())
+    df = df.assign(_venc=pd.to_datetime(df['Vencimento'], errors='coerce')).sort_values('_venc', kind="stable", na_position="last")
+
+    pendentes = {}
+    if not df_checklist.empty:
+        feito = df_checklist['Feito'] if df_checklist['Feito'].dtype == bool else normalizar_feito(df_checklist['Feito'])
+        for ref, tarefa, ok in zip(df_checklist['Documento_Ref'].astype(str), df_checklist['Tarefa'].fillna("").astype(str), feito):
+            if not ok and tarefa: pendentes.setdefault(ref, []).append(tarefa)
+
+    unidades = {}
+    colunas = [df[c].astype(str) for c in ('Unidade', 'CNPJ', 'Documento', 'Setor', 'Status', 'ID_UNICO')]
+    for unidade, cnpj, doc, setor, status, id_doc, venc, vencido, nivel, prog, feitas, total in zip(
+            *colunas, df['_venc'], df['vencido'], df['nivel_alerta'], df['Progresso'], df['tarefas_feitas'], df['tarefas_total']):
+        u = unidades.get(unidade)
+        if u is None: u = unidades[unidade] = {"cnpjs": [], "documentos": [], "pendentes": []}
+        if cnpj and cnpj not in u["cnpjs"]: u["cnpjs"].append(cnpj)
+        u["documentos"].append([doc, setor, _data_br(venc), status, _situacao(bool(vencido), nivel), int(prog), int(feitas), int(total)])
+        if id_doc in pendentes: u["pendentes"].append([doc, pendentes[id_doc]])
+    return unidades
+
+def hash_unidade(unidade, dados):
+    texto = json.dumps([VERSAO_LAYOUT, unidade, dados], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def nome_arquivo_unidade(unidade):
+    # Nome legível + sufixo do nome original: unidades que só diferem em acentos/pontuação não colidem
+    return f"Conformidade_{texto_arquivo(unidade) or 'Unidade'}_{hashlib.sha1(unidade.encode('utf-8')).hexdigest()[:6]}.pdf"
+
+# --- PDF DE UMA UNIDADE ---
+def _cortar(pdf, texto, largura):
+    if pdf.get_string_width(texto) <= largura - 2: return texto
+    while texto and pdf.get_string_width(texto + "...") > largura - 2: texto = texto[:-1]
+    return texto + "..."
+
+def gerar_pdf_unidade(unidade, dados, gerado_em):
+    from fpdf import FPDF
+    from relatorio import limpar_texto_pdf
+
+    class RelatorioConformidadePDF(FPDF):
+        def header(self):
+            self.set_font('Arial', 'B', 14)
+            self.cell(0, 10, 'Relatorio de Conformidade - Legalizacao', 0, 1, 'C')
+            self.set_font('Arial', 'I', 10)
+            self.cell(0, 8, f'Situacao em: {gerado_em}', 0, 1, 'C')
+            self.ln(3)
+        def footer(self):
+            self.set_y(-15)
+            self.set_font('Arial', 'I', 8)
+            self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
+
+    pdf = RelatorioConformidadePDF()
+    pdf.add_page()
+    epw = pdf.w - 2*pdf.l_margin
+    docs = dados["documentos"]
+
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_fill_color(220, 220, 220)
+    pdf.cell(epw, 10, "UNIDADE", 1, 1, 'L', fill=True)
+    pdf.set_font("Arial", "", 11)
+    pdf.multi_cell(epw, 6, f"Unidade: {limpar_texto_pdf(unidade)}\nCNPJ: {limpar_texto_pdf(', '.join(dados['cnpjs']) or '-')}", 1)
+    pdf.ln(4)
+
+    feitas, total = sum(d[6] for d in docs), sum(d[7] for d in docs)
+    vencidos = sum(1 for d in docs if d[4] == "VENCIDO")
+    alerta = sum(1 for d in docs if d[4].startswith("ALERTA"))
+    criticos = sum(1 for d in docs if d[3] == "CRÍTICO")
+    media = sum(d[5] for d in docs) // len(docs) if docs else 0
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_fill_color(240, 240, 240)
+    pdf.cell(epw, 10, "RESUMO DE CONFORMIDADE", 1, 1, 'L', fill=True)
+    pdf.set_font("Arial", "", 11)
+    pdf.cell(epw, 8, f"Documentos: {len(docs)} | Vencidos: {vencidos} | Em alerta: {alerta} | Risco critico: {criticos}", 1, 1)
+    pdf.cell(epw, 8, f"Progresso medio: {media}% | Tarefas do checklist: {feitas}/{total} concluidas", 1, 1)
+    pdf.ln(4)
+
+    # Tabela de documentos (largura das colunas em fração da área útil)
+    colunas = [("Documento", .34), ("Setor", .16), ("Vencimento", .13), ("Risco", .10), ("Situacao", .15), ("Progresso", .12)]
+    larguras = [epw * f for _, f in colunas]
+    def cabecalho_tabela():
+        pdf.set_font("Arial", "B", 9)
+        pdf.set_fill_color(200, 200, 200)
+        for (titulo, _), w in zip(colunas, larguras): pdf.cell(w, 7, titulo, 1, 0, 'C', fill=True)
+        pdf.ln()
+        pdf.set_font("Arial", "", 9)
+    cabecalho_tabela()
+    for doc, setor, venc, status, situacao, prog, f, t in docs:
+        if pdf.get_y() > 270:
+            pdf.add_page()
+            cabecalho_tabela()
+        pdf.set_fill_color(*CORES_RISCO.get(status, COR_NORMAL))
+        checklist = f" ({f}/{t})" if t else ""
+        valores = [doc, setor, venc, status, situacao, f"{prog}%{checklist}"]
+        for valor, w in zip(valores, larguras):
+            pdf.cell(w, 6, _cortar(pdf, limpar_texto_pdf(valor), w), 1, 0, 'L', fill=True)
+        pdf.ln()
+
+    if dados["pendentes"]:
+        pdf.ln(4)
+        pdf.set_font("Arial", "B", 12)
+        pdf.set_fill_color(240, 240, 240)
+        pdf.cell(epw, 10, "TAREFAS PENDENTES DO CHECKLIST", 1, 1, 'L', fill=True)
+        for doc, tarefas in dados["pendentes"]:
+            if pdf.get_y() > 260: pdf.add_page()
+            pdf.set_font("Arial", "B", 10)
+            pdf.set_x(pdf.l_margin)
+            pdf.multi_cell(epw, 6, limpar_texto_pdf(doc), 0, 'L')
+            pdf.set_font("Arial", "", 9)
+            for tarefa in tarefas:
+                pdf.set_x(pdf.l_margin + 5)
+                pdf.multi_cell(epw - 5, 5, f"- {limpar_texto_pdf(tarefa)}", 0, 'L')
+    return bytes(pdf.output())
+
+def _renderizar(unidade, dados, caminho, gerado_em):
+    # Roda no worker: grava o PDF na pasta (troca atômica) e devolve só o caminho, não os bytes
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "wb") as f: f.write(gerar_pdf_unidade(unidade, dados, gerado_em))
+    os.replace(temporario, caminho)
+    return unidade, caminho
+
+# --- MANIFESTO DA ÚLTIMA EXECUÇÃO ---
+def ler_manifesto(pasta):
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MANIFESTO), encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError): return {}
+
+def _gravar_manifesto(pasta, manifesto):
+    caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f: json.dump(manifesto, f, ensure_ascii=False)
+    os.replace(caminho + ".tmp", caminho)
+
+def _indice_csv(unidades, manifesto):
+    linhas = []
+    for unidade, dados in unidades.items():
+        docs = dados["documentos"]
+        linhas.append({"Unidade": unidade, "Arquivo": manifesto[unidade]["arquivo"], "Situacao_em": manifesto[unidade]["gerado_em"],
+                       "Documentos": len(docs), "Vencidos": sum(1 for d in docs if d[4] == "VENCIDO"),
+                       "Em_alerta": sum(1 for d in docs if d[4].startswith("ALERTA")),
+                       "Progresso_medio": sum(d[5] for d in docs) // len(docs) if docs else 0})
+    return pd.DataFrame(linhas).to_csv(index=False).encode("utf-8-sig")
+
+# --- LOTE ---
+def gerar_relatorios_unidades(destino, df_prazos, df_checklist, pasta=PASTA_RELATORIOS, hoje=None, max_workers=MAX_WORKERS_RELATORIOS, unidades=None):
+    # Escreve o ZIP em `destino` (caminho ou arquivo aberto); retorna {"unidades", "gerados", "reaproveitados", "removidos"}
+    with _lock_lote, medir("relatorio.unidades", linhas=len(df_prazos)) as m:
+        resumo = _gerar_relatorios_unidades(destino, df_prazos, df_checklist, pasta, hoje, max_workers, unidades)
+        m.update(resumo)
+        return resumo
+
+def _gerar_relatorios_unidades(destino, df_prazos, df_checklist, pasta, hoje, max_workers, filtro_unidades):
+    from relatorio import _gravar_entrada
+    os.makedirs(pasta, exist_ok=True)
+    todas = dados_unidades(df_prazos, df_checklist, hoje)
+    if filtro_unidades is not None:
+        filtro_unidades = set(filtro_unidades)
+        todas = {u: d for u, d in todas.items() if u in filtro_unidades}
+    anterior = ler_manifesto(pasta).get("unidades", {})
+    gerado_em = (hoje or hoje_sp()).strftime("%d/%m/%Y")
+
+    manifesto, prontos, pendentes = {}, [], []
+    for unidade, dados in todas.items():
+        h = hash_unidade(unidade, dados)
+        caminho = os.path.join(pasta, f"{h}.pdf")
+        antes = anterior.get(unidade, {})
+        if antes.get("hash") == h and os.path.exists(caminho):
+            manifesto[unidade] = antes
+            prontos.append((unidade, caminho))
+        else:
+            manifesto[unidade] = {"hash": h, "arquivo": nome_arquivo_unidade(unidade), "gerado_em": gerado_em}
+            pendentes.append((unidade, dados, caminho, gerado_em))
+    METRICAS.contar("relatorio.unidades_reaproveitadas", len(prontos))
+    METRICAS.contar("relatorio.unidades_geradas", len(pendentes))
+
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED, True) as zip_file:
+        def gravar(unidade, caminho):
+            with open(caminho, "rb") as fonte: _gravar_entrada(zip_file, manifesto[unidade]["arquivo"], fonte)
+        for unidade, caminho in prontos: gravar(unidade, caminho)
+        if len(pendentes) < MIN_PENDENTES_POOL or max_workers <= 1:
+            for tarefa in pendentes: gravar(*_renderizar(*tarefa))
+        else:
+            # spawn: o app tem threads (replicador, Streamlit) e um fork herdaria locks em estado indefinido
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(pendentes)), mp_context=get_context("spawn")) as pool:
+                for futuro in as_completed([pool.submit(_renderizar, *tarefa) for tarefa in pendentes]): gravar(*futuro.result())
+        _gravar_entrada(zip_file, "Indice_Conformidade.csv", _indice_csv(todas, manifesto))
+
+    # Só um lote completo substitui o manifesto e apaga os PDFs que nenhuma unidade usa mais
+    removidos = 0
+    if filtro_unidades is None:
+        _gravar_manifesto(pasta, {"layout": VERSAO_LAYOUT, "atualizado": datetime.now().isoformat(timespec="seconds"), "unidades": manifesto})
+        em_uso = {f"{v['hash']}.pdf" for v in manifesto.values()}
+        for nome in os.listdir(pasta):
+            if nome.endswith(".pdf") and nome not in em_uso:
+                try: os.unlink(os.path.join(pasta, nome)); removidos += 1
+                except OSError: pass
+    else:
+        _gravar_manifesto(pasta, {"layout": VERSAO_LAYOUT, "atualizado": datetime.now().isoformat(timespec="seconds"), "unidades": {**anterior, **manifesto}})
+    return {"unidades": len(todas), "gerados": len(pendentes), "reaproveitados": len(prontos), "removidos": removidos}
+
+def _apagar_arquivo(caminho):
+    try: os.unlink(caminho)
+    except OSError: pass
+
+class ArquivoLote:
+    # ZIP temporário de um lote. Apagado por descartar(), quando o dono (ex: o session_state da sessão)
+    # é coletado, ou no fim do processo, o que vier primeiro
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.descartar = weakref.finalize(self, _apagar_arquivo, caminho)
+
+    def existe(self):
+        return os.path.exists(self.caminho)
+
+    def ler(self):
+        with open(self.caminho, "rb") as f: return f.read()
+
+def gerar_relatorios_unidades_arquivo(df_prazos, df_checklist, **kwargs):
+    # ZIP em arquivo temporário no disco (um lote da carteira inteira não cabe bem em memória); devolve (ArquivoLote, resumo)
+    with tempfile.NamedTemporaryFile(prefix="conformidade_", suffix=".zip", delete=False) as destino:
+        try: resumo = gerar_relatorios_unidades(destino, df_prazos, df_checklist, **kwargs)
+        except Exception:
+            os.unlink(destino.name)
+            raise
+    return ArquivoLote(destino.name), resumo
+
+def main():
+    from armazem_local import ArmazemLocal
+    parser = argparse.ArgumentParser(description="Relatórios de conformidade por unidade do Legaliza Health")
+    parser.add_argument("--db", default=os.environ.get("LEGALIZA_DB_LOCAL", "legaliza_local.db"))
+    parser.add_argument("--saida", default=f"Conformidade_{datetime.now().strftime('%Y%m%d')}.zip")
+    parser.add_argument("--pasta", default=PASTA_RELATORIOS, help="PDFs da execução anterior (regeneração incremental)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS_RELATORIOS)
+    parser.add_argument("--unidades", default="", help="só as unidades listadas (separadas por ';')")
+    args = parser.parse_args()
+
+    df_p, df_c, _ = ArmazemLocal(args.db).ler_com_diario()
+    filtro = [u.strip() for u in args.unidades.split(";") if u.strip()] or None
+    resumo = gerar_relatorios_unidades(args.saida, df_p, df_c, pasta=args.pasta, max_workers=args.workers, unidades=filtro)
+    print(f"{args.saida}: {resumo['unidades']} unidades, {resumo['gerados']} geradas, {resumo['reaproveitados']} reaproveitadas", flush=True)
+
+if __name__ == "__main__":
+    main()
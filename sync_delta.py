@@ -0,0 +1,200 @@
+from nucleo_dados import (ABA_PRAZOS, ABA_CHECKLIST, COLUNAS_PRAZOS, COLUNAS_CHECKLIST,
+                          normalizar_prazos, normalizar_checklist, serializar_prazos, serializar_checklist,
+                          chaves_prazos, chaves_checklist)
+import pandas as pd
+
+# --- SINCRONIZAÇÃO DELTA COM O GOOGLE SHEETS ---
+# A "base" é o retrato da aba no momento da carga: cabeçalho real da planilha e,
+# na ordem física das linhas, a chave (ID_UNICO / Documento_Ref+Tarefa) e os valores
+# serializados de cada linha. No salvamento comparamos a base com o estado novo e
+# enviamos apenas as linhas inseridas, alteradas ou removidas. Antes de alterar ou remover
+# por número de linha, as colunas da chave são relidas da aba (um values_get): se alguém inseriu
+# ou ordenou linhas desde a carga, cada chave é levada à linha em que está agora; se alguma linha
+# da base não existe mais na aba, a aba é reescrita inteira.
+
+# Uma falha no meio deixa só aquela aba incerta: o erro sai marcado com escrita_parcial=True quando
+# alguma escrita da aba já foi aceita (ou a que falhou pode ter sido aplicada), e quem chama descarta
+# só a base dessa aba. Um 429 na primeira escrita não mudou nada, e a base continua valendo.
+
+LOTE_APPEND = 5000  # linhas por append_rows (mantém cada requisição bem abaixo do limite de payload)
+
+def erro_cota(e):
+    resposta = getattr(e, 'response', None) or getattr(e, 'resp', None)
+    status = getattr(resposta, 'status_code', None) or getattr(resposta, 'status', None)
+    return status == 429 or "RATE_LIMIT_EXCEEDED" in str(e) or "Quota exceeded" in str(e)
+
+def montar_base(cabecalho, chaves, linhas):
+    return {"cabecalho": list(cabecalho), "chaves": list(chaves), "linhas": [list(l) for l in linhas]}
+
+def _chaves_ocorrencia(chaves, origem="novo"):
+    # Chaves repetidas (ex: mesmo documento duas vezes na unidade) viram (chave, n-ésima ocorrência)
+    vistos = {}
+    saida = []
+    for i, chave in enumerate(chaves):
+        if chave is None:
+            saida.append((f"__sem_chave_{origem}__", i))
+            continue
+        n = vistos.get(chave, 0)
+        vistos[chave] = n + 1
+        saida.append((chave, n))
+    return saida
+
+def _coluna_a1(n):
+    letras = ""
+    while n > 0:
+        n, resto = divmod(n - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+def _faixas_contiguas(numeros):
+    # [9, 8, 7, 4, 3] -> [(7, 9), (3, 4)] em ordem decrescente, para remover de baixo para cima
+    faixas = []
+    for n in sorted(numeros, reverse=True):
+        if faixas and faixas[-1][0] == n + 1: faixas[-1] = (n, faixas[-1][1])
+        else: faixas.append((n, n))
+    return faixas
+
+def calcular_delta(base, chaves, linhas):
+    chaves_base = _chaves_ocorrencia(base["chaves"], "base")
+    chaves_novas = _chaves_ocorrencia(chaves)
+    posicao_base = {k: i for i, k in enumerate(chaves_base)}
+    posicao_nova = {k: i for i, k in enumerate(chaves_novas)}
+
+    atualizadas = []  # (linha na aba, valores)
+    for k, i_novo in posicao_nova.items():
+        i_base = posicao_base.get(k)
+        if i_base is not None and base["linhas"][i_base] != linhas[i_novo]:
+            atualizadas.append((i_base + 2, linhas[i_novo]))
+    removidas = [i + 2 for k, i in posicao_base.items() if k not in posicao_nova]
+    # Linhas sem chave seriam descartadas na próxima carga, então não sobem
+    inseridas = [i for k, i in posicao_nova.items() if k not in posicao_base and chaves[i] is not None]
+    return atualizadas, removidas, inseridas
+
+def ler_chaves_vivas(ws, cabecalho):
+    # Chaves das linhas como estão agora na aba, lendo só as colunas até a última que compõe a chave
+    colunas = ["Documento_Ref", "Tarefa"] if "Documento_Ref" in cabecalho else ["Unidade", "Documento"]
+    n = max(cabecalho.index(c) for c in colunas) + 1
+    valores = ws.spreadsheet.values_get(f"'{ws.title}'!A2:{_coluna_a1(n)}").get("values", [])
+    df = pd.DataFrame([list(l)[:n] + [""] * (n - len(l)) for l in valores], columns=list(cabecalho[:n]))
+    if "Documento_Ref" in cabecalho: return chaves_checklist(normalizar_checklist(df))
+    return chaves_prazos(normalizar_prazos(df))
+
+def _linhas_vivas(base, vivas):
+    # Linha atual na aba de cada linha da base (pela chave), ou None se alguma linha da base sumiu da aba
+    posicao_viva = {k: i + 2 for i, k in enumerate(_chaves_ocorrencia(vivas, "base"))}
+    numeros = [posicao_viva.get(k) for k in _chaves_ocorrencia(base["chaves"], "base")]
+    return None if any(n is None for n in numeros) else numeros
+
+class _Escritas:
+    # Executa as escritas de uma aba e marca o erro de uma delas se a aba pode ter ficado pela metade
+    def __init__(self):
+        self.aceitas = 0
+
+    def __call__(self, chamada, *args, **kwargs):
+        try: resultado = chamada(*args, **kwargs)
+        except Exception as e:
+            if self.aceitas or not erro_cota(e): e.escrita_parcial = True
+            raise
+        self.aceitas += 1
+        return resultado
+
+def _reescrever_tudo(ws, cabecalho, linhas, escrever):
+    escrever(ws.clear)
+    escrever(ws.update, [list(cabecalho)] + [list(l) for l in linhas])
+    return 2
+
+def sincronizar_aba(ws, base, cabecalho, chaves, linhas):
+    # Retorna (nova base, resumo). Sem base ou com esquema diferente, cai na reescrita completa.
+    escrever = _Escritas()
+    if base is None or list(base["cabecalho"]) != list(cabecalho):
+        chamadas = _reescrever_tudo(ws, cabecalho, linhas, escrever)
+        resumo = {"modo": "completo", "atualizadas": 0, "inseridas": len(linhas), "removidas": 0, "chamadas_api": chamadas}
+        return montar_base(cabecalho, chaves, linhas), resumo
+
+    atualizadas, removidas, inseridas = calcular_delta(base, chaves, linhas)
+    chamadas = 0
+    n_colunas = len(cabecalho)
+    linha_viva = None
+
+    if atualizadas or removidas:
+        # Linhas inseridas/ordenadas por outro processo: cada linha da base vai para onde está agora.
+        # Linhas da base removidas por fora: não dá para saber o que a aba tem, então reescreve tudo.
+        vivas = ler_chaves_vivas(ws, list(cabecalho))
+        chamadas += 1
+        if vivas != base["chaves"]:
+            linha_viva = _linhas_vivas(base, vivas)
+            if linha_viva is None:
+                chamadas += _reescrever_tudo(ws, cabecalho, linhas, escrever)
+                resumo = {"modo": "completo", "atualizadas": 0, "inseridas": len(linhas), "removidas": 0, "chamadas_api": chamadas}
+                return montar_base(cabecalho, chaves, linhas), resumo
+            atualizadas = [(linha_viva[n - 2], valores) for n, valores in atualizadas]
+            removidas = [linha_viva[n - 2] for n in removidas]
+
+    if atualizadas:
+        escrever(ws.batch_update, [{"range": f"A{n}:{_coluna_a1(n_colunas)}{n}", "values": [valores]} for n, valores in atualizadas])
+        chamadas += 1
+
+    if removidas:
+        pedidos = [{"deleteDimension": {"range": {"sheetId": ws.id, "dimension": "ROWS", "startIndex": ini - 1, "endIndex": fim}}}
+                   for ini, fim in _faixas_contiguas(removidas)]
+        escrever(ws.spreadsheet.batch_update, {"requests": pedidos})
+        chamadas += 1
+
+    for ini in range(0, len(inseridas), LOTE_APPEND):
+        escrever(ws.append_rows, [linhas[i] for i in inseridas[ini:ini + LOTE_APPEND]], value_input_option="RAW")
+        chamadas += 1
+
+    # Nova base: linhas que ficaram (na ordem física, já atualizadas) + inseridas no fim
+    chaves_base = _chaves_ocorrencia(base["chaves"], "base")
+    posicao_nova = {k: i for i, k in enumerate(_chaves_ocorrencia(chaves))}
+    ficaram = [i for i, k in enumerate(chaves_base) if k in posicao_nova]
+    if linha_viva is not None: ficaram.sort(key=lambda i: linha_viva[i])
+    ordem = [posicao_nova[chaves_base[i]] for i in ficaram] + inseridas
+    nova_base = montar_base(cabecalho, [chaves[i] for i in ordem], [linhas[i] for i in ordem])
+    resumo = {"modo": "delta", "atualizadas": len(atualizadas), "inseridas": len(inseridas), "removidas": len(removidas), "chamadas_api": chamadas}
+    return nova_base, resumo
+
+# --- LEITURA / ESCRITA DAS DUAS ABAS ---
+def baixar_planilhas(sh):
+    # Retorna (df_prazos, df_checklist, bases) já normalizados e sem linhas vazias
+    ws_prazos = sh.worksheet(ABA_PRAZOS)
+    df_prazos = pd.DataFrame(ws_prazos.get_all_records())
+    try:
+        ws_check = sh.worksheet(ABA_CHECKLIST)
+        df_check = pd.DataFrame(ws_check.get_all_records())
+    except Exception:
+        ws_check = sh.add_worksheet(ABA_CHECKLIST, 1000, 5)
+        ws_check.append_row(COLUNAS_CHECKLIST)
+        df_check = pd.DataFrame(columns=COLUNAS_CHECKLIST)
+
+    df_prazos, df_check, base_prazos, base_check = preparar_abas(df_prazos, df_check)
+    return df_prazos, df_check, {ABA_PRAZOS: base_prazos, ABA_CHECKLIST: base_check}
+
+def preparar_abas(df_prazos, df_check):
+    # Registros crus das duas abas -> (df_prazos, df_checklist, base_prazos, base_checklist)
+    # Retrato das abas como estão na nuvem, base para a sincronização delta
+    cab_prazos = list(df_prazos.columns)
+    cab_check = list(df_check.columns) if len(df_check.columns) else COLUNAS_CHECKLIST
+    df_prazos = normalizar_prazos(df_prazos)
+    df_check = normalizar_checklist(df_check)
+    base_prazos = montar_base(cab_prazos, chaves_prazos(df_prazos), serializar_prazos(df_prazos))
+    base_check = montar_base(cab_check, chaves_checklist(df_check), serializar_checklist(df_check))
+
+    if not df_prazos.empty: df_prazos = df_prazos[df_prazos['Unidade'] != ""].reset_index(drop=True)
+    if not df_check.empty: df_check = df_check[df_check['Tarefa'] != ""].reset_index(drop=True)
+    return df_prazos, df_check, base_prazos, base_check
+
+def sincronizar_na_base(bases, chave, ws, cabecalho, chaves, linhas):
+    # sincronizar_aba guardando a nova base em bases[chave]; se a aba ficou pela metade, a base sai
+    try: bases[chave], resumo = sincronizar_aba(ws, bases.get(chave), cabecalho, chaves, linhas)
+    except Exception as e:
+        if getattr(e, "escrita_parcial", False): bases.pop(chave, None)
+        raise
+    return resumo
+
+def enviar_planilhas(sh, df_prazos, df_checklist, bases):
+    # Atualiza `bases` no lugar aba a aba, para que uma falha na segunda não perca o retrato da primeira
+    resumos = {}
+    resumos[ABA_PRAZOS] = sincronizar_na_base(bases, ABA_PRAZOS, sh.worksheet(ABA_PRAZOS), COLUNAS_PRAZOS, chaves_prazos(df_prazos), serializar_prazos(df_prazos))
+    resumos[ABA_CHECKLIST] = sincronizar_na_base(bases, ABA_CHECKLIST, sh.worksheet(ABA_CHECKLIST), COLUNAS_CHECKLIST, chaves_checklist(df_checklist), serializar_checklist(df_checklist))
+    return resumos
@@ -0,0 +1,68 @@
+from datetime import date, timedelta
+import pandas as pd
+import pytest
+from agendador_alertas import EstadoAlertas, verificar_alertas
+from fakes_ntfy import ServidorNtfyFake
+from notificacoes import DespachanteNotificacoes
+
+HOJE = date(2026, 3, 10)
+
+def _prazos():
+    return pd.DataFrame([
+        {"Unidade": "U1", "Documento": "Alvara", "Status": "CRÍTICO", "Vencimento": HOJE + timedelta(days=2), "Progresso": 0, "ID_UNICO": "U1 - Alvara"},
+        {"Unidade": "U2", "Documento": "AVCB", "Status": "ALTO", "Vencimento": HOJE + timedelta(days=4), "Progresso": 0, "ID_UNICO": "U2 - AVCB"},
+        {"Unidade": "U3", "Documento": "Licenca", "Status": "CRÍTICO", "Vencimento": HOJE + timedelta(days=90), "Progresso": 0, "ID_UNICO": "U3 - Licenca"},
+    ])
+
+@pytest.fixture
+def estado(tmp_path):
+    return EstadoAlertas(str(tmp_path / "alertas.db"))
+
+def test_push_nao_entregue_nao_e_registrado(estado):
+    fake = ServidorNtfyFake(respostas=(500,)).iniciar()
+    try:
+        despachante = DespachanteNotificacoes(url_base=fake.url, backoff=0.01, max_tentativas=2)
+        canais = dict(enviar=despachante.enviar_agora, enfileirar=despachante.enviar)
+        # CRÍTICO (high) sai na hora e falha; ALTO vai para a fila e o worker também não entrega
+        assert verificar_alertas(_prazos(), estado, agora=1000.0, hoje=HOJE, **canais) == {"ALTO": 1}
+        assert despachante.aguardar(timeout=5)
+        for nivel in ("CRÍTICO", "ALTO"):
+            assert estado.avisados(nivel) == {} and estado.ultimo_push(nivel) is None
+        assert estado.na_fila == set()
+        # Entrega volta a funcionar: a próxima rodada avisa os mesmos documentos
+        fake.respostas = [200]
+        assert verificar_alertas(_prazos(), estado, agora=1060.0, hoje=HOJE, **canais) == {"CRÍTICO": 1, "ALTO": 1}
+        assert despachante.aguardar(timeout=5)
+        assert set(estado.avisados("CRÍTICO")) == {"U1 - Alvara"} and set(estado.avisados("ALTO")) == {"U2 - AVCB"}
+        assert despachante.metricas()["mensagens_entregues"] == 1
+    finally:
+        fake.parar()
+
+def _canais(enviados, fila):
+    enviar = lambda titulo, corpo, prioridade: enviados.append(titulo) or True
+    enfileirar = lambda titulo, corpo, prioridade, ao_entregar: fila.append(ao_entregar) or True
+    return dict(enviar=enviar, enfileirar=enfileirar)
+
+def test_sem_repeticao_dentro_do_intervalo(estado):
+    enviados, fila = [], []
+    canais = _canais(enviados, fila)
+    assert verificar_alertas(_prazos(), estado, agora=1000.0, hoje=HOJE, **canais) == {"CRÍTICO": 1, "ALTO": 1}
+    fila.pop()(True)
+    assert verificar_alertas(_prazos(), estado, agora=1000.0 + 61 * 60, hoje=HOJE, **canais) == {}
+    assert len(enviados) == 1 and fila == []
+
+def test_nivel_na_fila_nao_e_reenfileirado(estado):
+    enviados, fila = [], []
+    canais = _canais(enviados, fila)
+    assert verificar_alertas(_prazos(), estado, agora=1000.0, hoje=HOJE, **canais) == {"CRÍTICO": 1, "ALTO": 1}
+    # O worker ainda não postou: a rodada seguinte não põe o mesmo resumo na fila de novo
+    assert verificar_alertas(_prazos(), estado, agora=1060.0, hoje=HOJE, **canais) == {}
+    assert len(fila) == 1 and estado.ultimo_push("ALTO") is None
+    fila.pop()(True)
+    assert set(estado.avisados("ALTO")) == {"U2 - AVCB"} and estado.ultimo_push("ALTO") == 1000.0
+
+def test_metricas_do_despachante_gravadas_para_o_app(estado, tmp_path):
+    assert estado.metricas_push() is None
+    estado.registrar_metricas({"enviadas": 3, "falhas": 1}, 1234.0)
+    # O app abre o mesmo banco em outra conexão
+    assert EstadoAlertas(str(tmp_path / "alertas.db")).metricas_push() == ({"enviadas": 3, "falhas": 1}, 1234.0)
@@ -0,0 +1,128 @@
+import threading
+from armazem_local import ArmazemLocal, Replicador
+from fakes_gspread import PlanilhaFake
+from nucleo_dados import ABA_PRAZOS, ABA_CHECKLIST, COLUNAS_PRAZOS, COLUNAS_CHECKLIST
+
+def _planilha(n, latencia=0.0):
+    sh = PlanilhaFake(latencia=latencia)
+    sh.add_worksheet(ABA_PRAZOS).linhas = [list(COLUNAS_PRAZOS)] + [
+        [f"U{i}", "Adm", "Alvara", "", "01/01/2026", "01/06/2026", "NORMAL", 0, "False"] for i in range(n)]
+    sh.add_worksheet(ABA_CHECKLIST).linhas = [list(COLUNAS_CHECKLIST)]
+    return sh
+
+def _processos(tmp_path, sh):
+    # App e agendador: cada um com sua conexão ao mesmo banco e seu replicador
+    caminho = str(tmp_path / "local.db")
+    armazens = [ArmazemLocal(caminho), ArmazemLocal(caminho)]
+    return armazens, [Replicador(a, lambda: sh, cota=None, janela=0) for a in armazens]
+
+def test_lease_de_envio_exclusivo(tmp_path):
+    armazem = ArmazemLocal(str(tmp_path / "local.db"))
+    outro = ArmazemLocal(str(tmp_path / "local.db"))
+    assert armazem.tomar_envio("app")
+    assert not outro.tomar_envio("agendador")
+    assert armazem.tomar_envio("app")   # o dono pode renovar
+    armazem.liberar_envio("app")
+    assert outro.tomar_envio("agendador")
+    assert not armazem.tomar_envio("app")
+    outro.liberar_envio("agendador")
+
+def test_lease_expirado_e_retomado(tmp_path):
+    armazem = ArmazemLocal(str(tmp_path / "local.db"))
+    outro = ArmazemLocal(str(tmp_path / "local.db"))
+    assert armazem.tomar_envio("morto", duracao=-1)
+    assert outro.tomar_envio("agendador")
+
+def test_empurrar_espera_o_outro_processo(tmp_path):
+    sh = _planilha(5)
+    (app, agendador), (rep_app, rep_agendador) = _processos(tmp_path, sh)
+    rep_app.reconciliar()
+    df_p, df_c = app.ler()
+    app.gravar(df_p.iloc[1:], df_c)
+    assert agendador.tomar_envio("outro-processo")
+    assert rep_app.empurrar() is None
+    assert len(sh.abas[ABA_PRAZOS].linhas) == 6 and app.pendente()
+    agendador.liberar_envio("outro-processo")
+    assert rep_app.empurrar() is not None
+    assert len(sh.abas[ABA_PRAZOS].linhas) == 5 and not app.pendente()
+
+def test_dois_replicadores_nao_removem_em_dobro(tmp_path):
+    sh = _planilha(51, latencia=0.02)
+    (app, agendador), replicadores = _processos(tmp_path, sh)
+    replicadores[0].reconciliar()
+    df_p, df_c = app.ler()
+    app.gravar(df_p.iloc[1:], df_c)
+    threads = [threading.Thread(target=r.reconciliar) for r in replicadores]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    for r in replicadores: r.reconciliar()
+    assert len(sh.abas[ABA_PRAZOS].linhas) - 1 == 50
+    assert [l[0] for l in sh.abas[ABA_PRAZOS].linhas[1:]] == [f"U{i}" for i in range(1, 51)]
+
+def test_gravacao_local_replicada_e_lida_por_outra_instalacao(tmp_path):
+    sh = _planilha(3)
+    armazem = ArmazemLocal(str(tmp_path / "a.db"))
+    replicador = Replicador(armazem, lambda: sh, janela=0)
+    assert armazem.vazio()
+    replicador.reconciliar()
+    df_p, df_c = armazem.ler()
+    assert df_p['Unidade'].tolist() == ["U0", "U1", "U2"] and not armazem.pendente()
+
+    df_p.loc[1, 'Status'] = "CRÍTICO"
+    armazem.gravar(df_p, df_c)
+    assert armazem.pendente()
+    # Carga da nuvem não sobrescreve edição local ainda não enviada
+    assert replicador.puxar() is False and armazem.ler()[0].loc[1, 'Status'] == "CRÍTICO"
+    resumos = replicador.reconciliar()
+    assert resumos[ABA_PRAZOS]["modo"] == "delta" and resumos[ABA_PRAZOS]["atualizadas"] == 1
+    assert not armazem.pendente()
+
+    outro = ArmazemLocal(str(tmp_path / "b.db"))
+    Replicador(outro, lambda: sh, janela=0).reconciliar()
+    assert outro.ler()[0]['Status'].tolist() == ["NORMAL", "CRÍTICO", "NORMAL"]
+
+class _Resposta:
+    status_code = 429
+
+class _ErroCota(Exception):
+    response = _Resposta()
+
+def _falhar(erro):
+    def chamada(*args, **kwargs): raise erro
+    return chamada
+
+def _editado(tmp_path, sh):
+    armazem = ArmazemLocal(str(tmp_path / "local.db"))
+    replicador = Replicador(armazem, lambda: sh, janela=0)
+    replicador.reconciliar()
+    df_p, df_c = armazem.ler()
+    df_p.loc[1, 'Status'] = "CRÍTICO"
+    df_c = df_p[['ID_UNICO']].head(1).rename(columns={'ID_UNICO': 'Documento_Ref'}).assign(Tarefa="Protocolar", Feito=False)
+    armazem.gravar(df_p, df_c)
+    return armazem, replicador
+
+def test_cota_antes_da_primeira_escrita_mantem_as_bases(tmp_path):
+    sh = _planilha(3)
+    armazem, replicador = _editado(tmp_path, sh)
+    bases = armazem.bases()
+    sh.abas[ABA_PRAZOS].batch_update = _falhar(_ErroCota("429"))
+    assert replicador.reconciliar() is None
+    assert armazem.bases() == bases and replicador.cota.espera() > 0
+    del sh.abas[ABA_PRAZOS].batch_update
+    replicador.cota.bloqueado_ate = 0
+    resumos = replicador.empurrar()
+    assert resumos[ABA_PRAZOS]["modo"] == "delta" and resumos[ABA_CHECKLIST]["modo"] == "delta"
+
+def test_falha_no_meio_invalida_so_a_aba_incerta(tmp_path):
+    sh = _planilha(3)
+    armazem, replicador = _editado(tmp_path, sh)
+    # Prazos termina; o append do checklist cai sem resposta e pode ter sido aplicado
+    sh.abas[ABA_CHECKLIST].append_rows = _falhar(TimeoutError("sem resposta"))
+    assert replicador.reconciliar() is None
+    bases = armazem.bases()
+    assert ABA_CHECKLIST not in bases and bases[ABA_PRAZOS]["linhas"][1][6] == "CRÍTICO"
+    del sh.abas[ABA_CHECKLIST].append_rows
+    resumos = replicador.empurrar()
+    assert resumos[ABA_PRAZOS] == {"modo": "delta", "atualizadas": 0, "inseridas": 0, "removidas": 0, "chamadas_api": 0}
+    assert resumos[ABA_CHECKLIST]["modo"] == "completo"
+    assert sh.abas[ABA_CHECKLIST].linhas[1:] == [["U0 - Alvara", "Protocolar", "False"]]
@@ -0,0 +1,75 @@
+import glob
+import json
+import os
+import tempfile
+from datetime import date
+import pytest
+import benchmark
+from dados_sinteticos import gerar_carteira, gerar_vistoria
+from inteligencia_docs import DOC_INTELLIGENCE
+from nucleo_dados import normalizar_prazos, normalizar_checklist, chaves_prazos
+
+HOJE = date(2026, 3, 10)
+
+def test_carteira_sintetica():
+    df_p, df_c = gerar_carteira(500, semente=3, hoje=HOJE)
+    assert len(df_p) == 500 and (df_p.map(type) == str).all().all()
+    outra_p, outra_c = gerar_carteira(500, semente=3, hoje=HOJE)
+    assert df_p.equals(outra_p) and df_c.equals(outra_c)
+    assert not df_p.equals(gerar_carteira(500, semente=4, hoje=HOJE)[0])
+    assert (df_p.groupby("Unidade")["CNPJ"].nunique() == 1).all() and df_p["CNPJ"].str.fullmatch(r"\d{14}").all()
+    assert df_p["Documento"].value_counts().index[0] == next(iter(DOC_INTELLIGENCE))   # tipo mais pesado da distribuição
+    normalizado = normalizar_prazos(df_p)
+    ids = chaves_prazos(normalizado)
+    assert len(set(ids)) == 500 and set(normalizar_checklist(df_c)["Documento_Ref"]) <= set(ids)
+
+def test_progresso_bate_com_o_checklist():
+    df_p, df_c = gerar_carteira(200, semente=5, hoje=HOJE)
+    feitas = df_c.assign(Feito=df_c["Feito"] == "TRUE").groupby("Documento_Ref")["Feito"].agg(["sum", "count"])
+    ids = df_p["Unidade"] + " - " + df_p["Documento"]
+    esperado = (100 * feitas.loc[ids, "sum"] // feitas.loc[ids, "count"]).astype(str).tolist()
+    assert df_p["Progresso"].tolist() == esperado
+    assert (df_p["Concluido"] == (df_p["Progresso"] == "100").astype(str)).all()
+
+def test_vistoria_sintetica():
+    itens = gerar_vistoria(4, fotos_por_item=3, segundos_audio=1, largura=160, altura=120, fotos_distintas=5)
+    fotos = [f for item in itens for f in item["Fotos"]]
+    assert len(itens) == 4 and len(fotos) == 12 and len(set(fotos)) == 5
+    assert all(item["Audio_Bytes"][:4] == b"RIFF" and len(item["Audio_Bytes"]) == 44 + 32000 for item in itens)
+    assert all(item["Audio_Bytes"] is None for item in gerar_vistoria(2, segundos_audio=0, largura=16, altura=16))
+
+def test_medir_prepara_e_finaliza_cada_repeticao():
+    chamadas = []
+    r = benchmark.medir(lambda: chamadas.append("p") or len(chamadas), lambda e: chamadas.append(("x", e)), 3, lambda e: chamadas.append(("f", e)))
+    assert r["repeticoes"] == 3 and r["min_ms"] <= r["mediana_ms"] <= r["max_ms"]
+    assert chamadas == ["p", ("x", 1), ("f", 1), "p", ("x", 4), ("f", 4), "p", ("x", 7), ("f", 7)]
+    def falhar(estado): raise RuntimeError(estado)
+    finalizados = []
+    with pytest.raises(RuntimeError):
+        benchmark.medir(lambda: "estado", falhar, 2, finalizados.append)
+    assert finalizados == ["estado"]
+
+def test_comparar_com_a_execucao_anterior(tmp_path):
+    saida = tmp_path / "resultados.jsonl"
+    assert benchmark.ultima_execucao(str(saida)) is None
+    anterior = {"resultados": [{"caso": "busca", "tamanho": 1000, "mediana_ms": 10.0}, {"caso": "alertas", "tamanho": 1000, "mediana_ms": 4.0}]}
+    saida.write_text(json.dumps({"resultados": []}) + "\n" + json.dumps(anterior) + "\n\n")
+    assert benchmark.ultima_execucao(str(saida)) == anterior
+    resultados = [{"caso": "busca", "tamanho": 1000, "mediana_ms": 12.5}, {"caso": "alertas", "tamanho": 1000, "mediana_ms": 4.4},
+                  {"caso": "busca", "tamanho": 10000, "mediana_ms": 80.0}]
+    regressoes = benchmark.comparar(anterior, resultados)
+    assert [r["variacao"] for r in resultados] == [0.25, 0.1, None]
+    assert regressoes == [resultados[0]]
+    assert benchmark.comparar(anterior, resultados, limite=0.3) == []
+    assert benchmark.comparar(None, resultados) == []
+
+def test_casos_rodam_e_apagam_as_pastas_temporarias():
+    ctx = benchmark.contexto_carteira(120, semente=1)
+    ctx_vistoria = {"vistoria": gerar_vistoria(2, fotos_por_item=2, segundos_audio=1, largura=160, altura=120)}
+    pastas = lambda: set(glob.glob(os.path.join(tempfile.gettempdir(), "bench_*")))
+    antes = pastas()
+    for casos, contexto in ((benchmark.CASOS_CARTEIRA, ctx), (benchmark.CASOS_VISTORIA, ctx_vistoria)):
+        for nome, caso in casos.items():
+            preparar, executar, *finalizar = caso(contexto)
+            assert benchmark.medir(preparar, executar, 1, *finalizar)["repeticoes"] == 1, nome
+    assert pastas() == antes
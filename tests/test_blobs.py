@@ -0,0 +1,75 @@
+import gc
+import os
+import blobs
+from blobs import ArmazemBlobs, hash_blob
+
+def _dados(n, marca):
+    return bytes([marca]) * n
+
+def test_mesmo_conteudo_guardado_uma_vez(tmp_path):
+    armazem = ArmazemBlobs(str(tmp_path))
+    foto = _dados(1000, 1)
+    ref = armazem.guardar(foto, sessao="a")
+    assert armazem.guardar(bytes(foto), sessao="b") == ref == hash_blob(foto)
+    assert armazem.ler(ref) == foto and armazem.tamanho(ref) == 1000
+    assert [n for _, _, arqs in os.walk(tmp_path) for n in arqs] == [ref]
+    assert armazem.uso() == {"blobs": 1, "bytes": 1000, "limite_bytes": blobs.LIMITE_BLOBS, "orfaos": 0, "bytes_orfaos": 0, "sessoes": 2, "removidos": 0}
+
+def test_uso_conta_orfaos(tmp_path):
+    armazem = ArmazemBlobs(str(tmp_path))
+    r1 = armazem.guardar(_dados(100, 1), sessao="a")
+    armazem.guardar(_dados(200, 2), sessao="a")
+    armazem.guardar(_dados(300, 3))
+    uso = armazem.uso()
+    assert (uso["blobs"], uso["bytes"], uso["orfaos"], uso["bytes_orfaos"], uso["sessoes"]) == (3, 600, 1, 300, 1)
+    armazem.definir_refs("a", [r1])
+    uso = armazem.uso()
+    assert (uso["orfaos"], uso["bytes_orfaos"]) == (2, 500)
+
+def test_despejo_lru_so_de_orfaos(tmp_path):
+    armazem = ArmazemBlobs(str(tmp_path), limite_bytes=1000)
+    em_uso = armazem.guardar(_dados(400, 1), sessao="a")
+    velho = armazem.guardar(_dados(300, 2))
+    recente = armazem.guardar(_dados(300, 3))
+    armazem.ler(velho)                         # leitura conta como uso: `recente` passa a ser o menos usado
+    novo = armazem.guardar(_dados(200, 4))
+    assert not armazem.existe(recente) and not os.path.exists(armazem.caminho(recente))
+    assert all(armazem.existe(r) for r in (em_uso, velho, novo))
+    assert armazem.uso()["bytes"] == 900 and armazem.removidos == 1
+    # Referências em uso nunca saem, mesmo acima do limite
+    grande = armazem.guardar(_dados(2000, 5), sessao="a")
+    assert armazem.existe(em_uso) and armazem.existe(grande)
+    assert not any(armazem.existe(r) for r in (velho, novo))
+    assert armazem.uso()["bytes"] == 2400 and armazem.uso()["orfaos"] == 0
+
+def test_sessao_expirada_libera_referencias(tmp_path, monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(blobs.time, "time", lambda: agora[0])
+    armazem = ArmazemBlobs(str(tmp_path), limite_bytes=500, ttl_sessao=60)
+    parada = armazem.guardar(_dados(300, 1), sessao="parada")
+    ativa = armazem.guardar(_dados(100, 2), sessao="ativa")
+    agora[0] += 45
+    armazem.tocar("ativa")
+    agora[0] += 30                             # "parada" passou do TTL, "ativa" não
+    armazem.guardar(_dados(200, 3), sessao="ativa")
+    assert not armazem.existe(parada) and armazem.existe(ativa)
+    assert armazem.uso()["sessoes"] == 1
+
+def test_fim_da_sessao_solta_referencias(tmp_path):
+    armazem = ArmazemBlobs(str(tmp_path), limite_bytes=500)
+    class Dono: pass
+    dono = Dono()
+    armazem.vincular_sessao(dono, "s1")
+    ref = armazem.guardar(_dados(400, 1), sessao="s1")
+    assert armazem.uso()["orfaos"] == 0 and armazem.uso()["sessoes"] == 1
+    del dono
+    gc.collect()
+    assert armazem.uso()["sessoes"] == 0 and armazem.uso()["orfaos"] == 1
+    # Órfão, o blob é o primeiro a sair quando o total passa do limite
+    outro = armazem.guardar(_dados(200, 2))
+    assert not armazem.existe(ref) and armazem.existe(outro)
+
+def test_blobs_de_processo_anterior_entram_como_orfaos(tmp_path):
+    ref = ArmazemBlobs(str(tmp_path)).guardar(_dados(100, 1), sessao="a")
+    reaberto = ArmazemBlobs(str(tmp_path))
+    assert reaberto.existe(ref) and reaberto.uso()["orfaos"] == 1 and reaberto.total_bytes == 100
@@ -0,0 +1,47 @@
+import pandas as pd
+from busca import IndiceBusca
+
+def _df():
+    return pd.DataFrame({"Unidade": ["Gravataí Centro", "Canoas 123", "Canoas 12", "Porto Alegre", "Guaíba", "Canoas 12"],
+                         "Documento": ["Alvará de Funcionamento", "Licença Sanitária", "Alvará de Funcionamento", "AVCB", "CNES", "Habite-se"],
+                         "Setor": ["Adm", "VISA", "Adm", "Bombeiros", "Saúde", "Obras"],
+                         "CNPJ": ["11.222.333/0001-44", "", "55.666.777/0001-88", "", "", ""]},
+                        index=[10, 11, 12, 13, 14, 15])
+
+def test_sem_acento_e_sem_caixa():
+    indice = IndiceBusca(_df())
+    assert list(indice.buscar("GRAVATAI")) == [10]
+    assert list(indice.buscar("licenca sanitaria")) == [11]
+
+def test_tolera_erro_de_digitacao():
+    indice = IndiceBusca(_df())
+    assert list(indice.buscar("gravatia")) == [10]
+    assert list(indice.buscar("funcionameto")) == [10, 12]
+
+def test_ranking_exato_e_valor_mais_justo_primeiro():
+    indice = IndiceBusca(_df())
+    assert list(indice.buscar("canoas 12")) == [12, 15, 11]        # frase inteira e valor mais curto antes de Canoas 123
+    pontos = indice.pontuar("funcionamento")
+    assert pontos[0] > indice.pontuar("funcionameto")[0] > 0        # acerto exato vale mais que aproximado
+    assert list(indice.buscar("canoas", limite=2)) == [12, 15]
+    vizinhos = IndiceBusca(pd.DataFrame({"Unidade": ["Gravatal", "Gravataí"]}))
+    assert list(vizinhos.buscar("gravatai")) == [1, 0]               # exato antes do parecido
+
+def test_todas_as_palavras_precisam_aparecer():
+    indice = IndiceBusca(_df())
+    assert list(indice.buscar("canoas habite")) == [15]
+    assert len(indice.buscar("canoas avcb")) == 0
+
+def test_cnpj_so_por_substring():
+    indice = IndiceBusca(_df())
+    assert list(indice.buscar("333")) == [10]
+    assert list(indice.buscar("556667")) == []                       # dígitos não casam por trigrama
+    assert list(indice.buscar("666.777")) == [12]
+
+def test_termo_vazio_e_filtrar():
+    df = _df()
+    indice = IndiceBusca(df)
+    assert list(indice.buscar("  ")) == list(df.index)
+    recorte = df[df["Setor"] == "Adm"]
+    assert list(indice.filtrar(recorte, "alvara").index) == [10, 12]
+    assert indice.filtrar(recorte, "avcb").empty
@@ -0,0 +1,90 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from clientes_google import CamadaGoogle, MARGEM_RENOVACAO
+from fakes_gspread import ClienteFake, PlanilhaFake
+
+class CredenciaisFake:
+    def __init__(self, validade):
+        self.token = "t0"
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + validade
+        self.renovacoes = 0
+
+    def refresh(self, request):
+        self.renovacoes += 1
+        self.token = f"t{self.renovacoes}"
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+class _Resposta:
+    def __init__(self, conteudo):
+        self.content = conteudo
+
+class _SessaoHttp:
+    def request(self, method, url, *args, **kwargs):
+        return _Resposta(b"x" * 10)
+
+class ClienteInstrumentavel(ClienteFake):
+    # Com a sessão HTTP que a camada intercepta para contar chamadas e bytes
+    def __init__(self, *planilhas):
+        super().__init__(*planilhas)
+        self.http_client = type("HttpClient", (), {"session": _SessaoHttp()})()
+        self.aberturas = 0
+
+    def open(self, titulo):
+        self.aberturas += 1
+        return super().open(titulo)
+
+def _camada(validade=timedelta(hours=1)):
+    planilha = PlanilhaFake()
+    planilha.add_worksheet("Prazos")
+    cliente = ClienteInstrumentavel(planilha)
+    autorizacoes = []
+    camada = CamadaGoogle(CredenciaisFake(validade), autorizar=lambda creds: autorizacoes.append(creds) or cliente)
+    return camada, cliente, planilha, autorizacoes
+
+def test_cliente_planilha_e_abas_reaproveitados():
+    camada, cliente, planilha, autorizacoes = _camada()
+    for _ in range(3): camada.planilha().worksheet("Prazos")
+    assert len(autorizacoes) == 1 and cliente.aberturas == 1 and planilha.chamadas["worksheet"] == 1
+    camada.planilha("Outra")
+    assert cliente.aberturas == 2
+
+def test_invalidar_descarta_os_handles():
+    camada, cliente, planilha, _ = _camada()
+    camada.planilha().worksheet("Prazos")
+    camada.invalidar()
+    camada.planilha().worksheet("Prazos")
+    assert cliente.aberturas == 2 and planilha.chamadas["worksheet"] == 2
+
+def test_token_renovado_antes_de_expirar():
+    camada, *_ = _camada(validade=MARGEM_RENOVACAO - timedelta(seconds=30))
+    camada.planilha()
+    camada.planilha()
+    assert camada.credenciais.renovacoes == 1
+    assert camada.estatisticas()["sem_operacao"]["renovacoes_token"] == 1
+
+def test_token_valido_nao_e_renovado():
+    camada, *_ = _camada()
+    camada.planilha()
+    assert camada.credenciais.renovacoes == 0
+
+def test_chamadas_contadas_por_operacao_inclusive_em_threads():
+    camada, cliente, *_ = _camada()
+    sessao = camada.cliente().http_client.session
+    with camada.operacao("salvar") as op:
+        sessao.request("POST", "u", data=b"abc")
+        t = threading.Thread(target=camada.propagar(lambda: sessao.request("GET", "u")))
+        t.start()
+        t.join()
+    sessao.request("GET", "u")
+    assert (op["chamadas"], op["bytes"]) == (2, 23)
+    est = camada.estatisticas()
+    assert est["salvar"] == {"execucoes": 1, "chamadas": 2, "bytes": 23, "renovacoes_token": 0}
+    assert est["sem_operacao"]["chamadas"] == 1
+
+def test_operacoes_aninhadas_restauram_a_anterior():
+    camada, *_ = _camada()
+    sessao = camada.cliente().http_client.session
+    with camada.operacao("externa") as externa:
+        with camada.operacao("interna") as interna: sessao.request("GET", "u")
+        sessao.request("GET", "u")
+    assert interna["chamadas"] == 1 and externa["chamadas"] == 1
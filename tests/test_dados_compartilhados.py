@@ -0,0 +1,32 @@
+from datetime import date
+import pandas as pd
+from dados_compartilhados import Retrato, Sobreposicao
+from nucleo_dados import COLUNAS_CHECKLIST
+
+HOJE = date(2026, 3, 10)
+
+def _retrato():
+    df_p = pd.DataFrame({"Unidade": ["U1", "U1", "U2"], "Setor": ["Adm"] * 3, "Documento": ["Alvara", "AVCB", "Alvara"],
+                         "CNPJ": [""] * 3, "Data_Recebimento": [date(2026, 1, 1)] * 3,
+                         "Vencimento": [date(2026, 3, 12), date(2026, 6, 1), date(2026, 9, 1)],
+                         "Status": ["CRÍTICO", "ALTO", "NORMAL"], "Progresso": [0, 0, 0], "Concluido": ["False"] * 3})
+    df_p["ID_UNICO"] = df_p["Unidade"] + " - " + df_p["Documento"]
+    df_c = pd.DataFrame([["U1 - AVCB", "Protocolo", True], ["U1 - AVCB", "Vistoria", False]], columns=COLUNAS_CHECKLIST)
+    return Retrato(df_p, df_c, versao=1, hoje=HOJE)
+
+def test_visao_da_sessao_nao_altera_o_retrato():
+    retrato = _retrato()
+    antes_p, antes_c = retrato.prazos.copy(), retrato.checklist.copy()
+    sob = Sobreposicao()
+    sob.editar("U1 - Alvara", Status="NORMAL", Vencimento=date(2027, 1, 1), Setor="Novo Setor")
+    sob.definir_tarefas("U1 - AVCB", pd.DataFrame([["U1 - AVCB", "Protocolo", True]], columns=COLUNAS_CHECKLIST))
+    df_p, df_c = sob.aplicar(retrato)
+    assert df_p.loc[0, "Status"] == "NORMAL" and df_p.loc[0, "Setor"] == "Novo Setor"
+    assert df_p.loc[1, "Progresso"] == 100
+    pd.testing.assert_frame_equal(retrato.prazos, antes_p)
+    pd.testing.assert_frame_equal(retrato.checklist, antes_c)
+
+def test_sessao_sem_edicoes_devolve_o_proprio_retrato():
+    retrato = _retrato()
+    df_p, df_c = Sobreposicao().aplicar(retrato)
+    assert df_p is retrato.prazos and df_c is retrato.checklist
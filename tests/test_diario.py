@@ -0,0 +1,133 @@
+import random
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import armazem_local
+from armazem_local import ArmazemLocal
+from diario import compactar, codificar, decodificar
+from metricas import METRICAS
+from nucleo_dados import COLUNAS_PRAZOS, id_unico
+
+def _ops(*operacoes):
+    return [(seq, tipo, dados) for seq, (tipo, dados) in enumerate(operacoes, 1)]
+
+def _editar(id_doc, **campos):
+    return ("editar", {"id": id_doc, "campos": campos})
+
+def test_edicoes_da_mesma_linha_viram_uma():
+    ops = _ops(_editar("A", Status="ALTO"), _editar("B", Setor="VISA"), _editar("A", Status="CRÍTICO", Setor="Adm"))
+    assert compactar(ops) == [(1, "editar", {"id": "A", "campos": {"Status": "CRÍTICO", "Setor": "Adm"}}),
+                              (2, "editar", {"id": "B", "campos": {"Setor": "VISA"}})]
+    assert ops[0][2] == {"id": "A", "campos": {"Status": "ALTO"}}   # entrada não é alterada
+
+def test_edicao_segue_a_troca_de_id():
+    ops = _ops(_editar("A", Documento="AVCB", ID_UNICO="A2"), _editar("A2", Status="ALTO"), _editar("A", Status="NORMAL"))
+    assert compactar(ops) == [(1, "editar", {"id": "A", "campos": {"Documento": "AVCB", "ID_UNICO": "A2", "Status": "ALTO"}}),
+                              (3, "editar", {"id": "A", "campos": {"Status": "NORMAL"}})]
+
+def test_tarefas_valem_pela_ultima_definicao():
+    ops = _ops(("definir_tarefas", {"ref": "A", "tarefas": [["x", False]]}), ("definir_tarefas", {"ref": "B", "tarefas": []}),
+               ("definir_tarefas", {"ref": "A", "tarefas": [["x", True], ["y", False]]}))
+    assert compactar(ops) == [ops[1], ops[2]]
+
+def test_remover_e_adicionar_cortam_a_fusao():
+    ops = _ops(_editar("A", Status="ALTO"), ("definir_tarefas", {"ref": "A", "tarefas": [["x", False]]}), ("remover", {"id": "A"}),
+               ("adicionar", {"linha": {"ID_UNICO": "A", "Status": "NORMAL"}}), _editar("A", Status="CRÍTICO"))
+    assert [(seq, tipo) for seq, tipo, _ in compactar(ops)] == [(1, "editar"), (3, "remover"), (4, "adicionar"), (5, "editar")]
+
+def test_excluir_tudo_descarta_o_anterior():
+    ops = _ops(_editar("A", Status="ALTO"), ("definir_tarefas", {"ref": "A", "tarefas": []}), ("excluir_tudo", {}), _editar("A", Setor="X"))
+    assert compactar(ops) == [ops[2], ops[3]]
+    assert compactar([]) == []
+
+# --- APLICAÇÃO NO ARMAZÉM ---
+def _carteira(n=6):
+    df_p = pd.DataFrame([[f"U{i}", "Adm", "Alvara", "", "", "2026-06-01", "NORMAL", 0, "False"] for i in range(n)], columns=COLUNAS_PRAZOS)
+    df_p["ID_UNICO"] = [id_unico(u, d) for u, d in zip(df_p["Unidade"], df_p["Documento"])]
+    df_c = pd.DataFrame({"Documento_Ref": [df_p["ID_UNICO"][0]], "Tarefa": ["Renovação"], "Feito": [False]})
+    return df_p, df_c
+
+def _sorteio(semente, n=80):
+    # Operações válidas em sequência (IDs vivos, renomeações sem colisão), como a Gestão de Docs gera
+    rng = random.Random(semente)
+    vivos = [id_unico(f"U{i}", "Alvara") for i in range(6)]
+    tarefas = {vivos[0]: [["Renovação", False]]}
+    ops, novos = [], 0
+    for _ in range(n):
+        tipo = rng.choice(["editar"] * 5 + ["renomear", "definir_tarefas", "definir_tarefas", "adicionar", "remover"] + ["excluir_tudo"] * (rng.random() < 0.1))
+        if not vivos and tipo != "adicionar": tipo = "adicionar"
+        if tipo == "editar":
+            ops.append(_editar(rng.choice(vivos), **rng.choice([{"Status": rng.choice(["ALTO", "CRÍTICO"])}, {"Setor": rng.choice(["VISA", "Obras"])},
+                                                                {"Vencimento": f"2027-0{rng.randint(1, 9)}-10", "Progresso": rng.choice([0, 50])}])))
+        elif tipo == "renomear":
+            antigo = rng.choice(vivos)
+            novos += 1
+            novo = id_unico(antigo.split(" - ")[0], f"Doc {novos}")
+            ops.append(_editar(antigo, Documento=f"Doc {novos}", ID_UNICO=novo))
+            # Como Sobreposicao.mover_tarefas depois do "Salvar Tipo"
+            ops.append(("definir_tarefas", {"ref": novo, "tarefas": tarefas.pop(antigo, [])}))
+            ops.append(("definir_tarefas", {"ref": antigo, "tarefas": []}))
+            vivos[vivos.index(antigo)] = novo
+        elif tipo == "definir_tarefas":
+            ref = rng.choice(vivos)
+            tarefas[ref] = [[f"T{k}", rng.random() < 0.5] for k in range(rng.randint(0, 3))]
+            ops.append(("definir_tarefas", {"ref": ref, "tarefas": tarefas[ref]}))
+        elif tipo == "adicionar":
+            novos += 1
+            linha = {"Unidade": f"N{novos}", "Setor": "Adm", "Documento": "AVCB", "CNPJ": "", "Data_Recebimento": "", "Vencimento": "2026-12-01",
+                     "Status": "NORMAL", "Progresso": 0, "Concluido": "False", "ID_UNICO": id_unico(f"N{novos}", "AVCB")}
+            ops.append(("adicionar", {"linha": linha}))
+            vivos.append(linha["ID_UNICO"])
+        elif tipo == "remover":
+            alvo = rng.choice(vivos)
+            ops.append(("remover", {"id": alvo}))
+            vivos.remove(alvo)
+            tarefas.pop(alvo, None)
+        else:
+            ops.append(("excluir_tudo", {}))
+            vivos, tarefas = [], {}
+    return ops
+
+def _armazem(caminho):
+    armazem = ArmazemLocal(caminho)
+    armazem.gravar(*_carteira())
+    return armazem
+
+def test_aplicar_compactado_igual_a_aplicar_sem_compactar(tmp_path, monkeypatch):
+    # O Progresso é recalculado no fim de cada aplicação, então a referência é o mesmo lote sem compactar
+    lotes = [_sorteio(semente) for semente in range(6)]
+    assert all(len(compactar(_ops(*ops))) < len(ops) for ops in lotes)
+    compactados = []
+    for semente, ops in enumerate(lotes):
+        armazem = _armazem(str(tmp_path / f"lote{semente}.db"))
+        for tipo, dados in ops: armazem.registrar_operacao(tipo, dados)
+        assert armazem.diario_pendente() == len(ops)
+        assert armazem.aplicar_diario() == len(ops) and armazem.diario_pendente() == 0
+        assert armazem.aplicar_diario() == 0
+        compactados.append(armazem.ler())
+    monkeypatch.setattr(armazem_local, "compactar", lambda operacoes: operacoes)
+    for semente, ops in enumerate(lotes):
+        armazem = _armazem(str(tmp_path / f"cru{semente}.db"))
+        for tipo, dados in ops: armazem.registrar_operacao(tipo, dados)
+        armazem.aplicar_diario()
+        for a, b in zip(compactados[semente], armazem.ler()):
+            pd.testing.assert_frame_equal(a, b)
+
+def test_aplicar_diario_conta_compactadas_e_marca_pendente(tmp_path):
+    armazem = _armazem(str(tmp_path / "local.db"))
+    id_doc = id_unico("U1", "Alvara")
+    antes = METRICAS.contadores().get("diario.compactadas", 0)
+    versao = armazem.versao()
+    for status in ("ALTO", "CRÍTICO", "NORMAL", "ALTO"): armazem.registrar_operacao("editar", {"id": id_doc, "campos": {"Status": status}})
+    armazem.registrar_operacao("definir_tarefas", {"ref": id_doc, "tarefas": [["a", True], ["b", True], ["c", False], ["d", False]]})
+    assert armazem.aplicar_diario() == 5
+    assert METRICAS.contadores()["diario.compactadas"] - antes == 3
+    df_p, df_c = armazem.ler()
+    linha = df_p[df_p["ID_UNICO"] == id_doc].iloc[0]
+    assert linha["Status"] == "ALTO" and linha["Progresso"] == 50
+    assert df_c[df_c["Documento_Ref"] == id_doc]["Tarefa"].tolist() == ["a", "b", "c", "d"]
+    assert armazem.versao() == versao + 1 and armazem.pendente() and armazem.ler_com_diario()[2] == 5
+
+def test_codificar_datas_e_numpy():
+    texto = codificar({"a": date(2026, 1, 2), "b": datetime(2026, 1, 2, 10, 0), "c": np.int64(3), "d": pd.NaT, "e": "Licença"})
+    assert decodificar(texto) == {"a": "2026-01-02", "b": "2026-01-02", "c": 3, "d": None, "e": "Licença"}
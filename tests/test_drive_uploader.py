@@ -0,0 +1,98 @@
+import threading
+import pytest
+from drive_uploader import ServicoUploadDrive
+from fakes_drive import ServicoDriveFake
+
+def _uploader(drive, **kwargs):
+    return ServicoUploadDrive(lambda: drive, "pasta", backoff=0.001, **kwargs)
+
+def test_erros_transitorios_sao_repetidos():
+    drive = ServicoDriveFake(falhas=[503, 429, 403])
+    up = _uploader(drive)
+    st = up.aguardar(up.enviar(b"foto", "a.jpg"), timeout=5)
+    assert st["estado"] == "concluido" and st["tentativas"] == 4 and st["link"]
+    assert [a["nome"] for a in drive.arquivos.values()] == ["a.jpg"]
+
+def test_erro_definitivo_nao_repete():
+    drive = ServicoDriveFake(falhas=[400])
+    up = _uploader(drive)
+    st = up.aguardar(up.enviar(b"foto", "a.jpg"), timeout=5)
+    assert st["estado"] == "erro" and st["tentativas"] == 1 and not drive.arquivos
+
+def test_tentativas_esgotadas():
+    drive = ServicoDriveFake(falhas=[503] * 10)
+    up = _uploader(drive, max_tentativas=3)
+    st = up.aguardar(up.enviar(b"foto", "a.jpg"), timeout=5)
+    assert st["estado"] == "erro" and st["tentativas"] == 3 and drive.chamadas == 3
+
+def test_resumable_continua_apos_falha():
+    drive = ServicoDriveFake()
+    up = _uploader(drive, limite_resumable=10, tamanho_parte=256 * 1024)
+    dados = bytes(range(256)) * 4096   # 1 MB, 4 partes
+    drive.falhas = [None, None, 503]    # a terceira parte falha uma vez
+    st = up.aguardar(up.enviar(dados, "grande.jpg"), timeout=5)
+    assert st["estado"] == "concluido" and st["tentativas"] == 2
+    assert next(iter(drive.arquivos.values()))["conteudo"] == dados
+
+def test_mesma_chave_nao_sobe_duas_vezes():
+    drive = ServicoDriveFake(latencia=0.05)
+    up = _uploader(drive)
+    ids = [up.enviar(b"foto", f"a{i}.jpg", grupo="s1", chave="hash1") for i in range(3)]
+    assert len(set(ids)) == 1
+    up.aguardar(ids[0], timeout=5)
+    assert up.enviar(b"foto", "a9.jpg", grupo="s1", chave="hash1") == ids[0]
+    # Outra sessão (grupo) envia o próprio backup
+    up.aguardar(up.enviar(b"foto", "b.jpg", grupo="s2", chave="hash1"), timeout=5)
+    assert len(drive.arquivos) == 2
+
+def test_chave_com_erro_pode_ser_reenviada():
+    drive = ServicoDriveFake(falhas=[400])
+    up = _uploader(drive)
+    primeiro = up.enviar(b"foto", "a.jpg", grupo="s1", chave="hash1")
+    assert up.aguardar(primeiro, timeout=5)["estado"] == "erro"
+    segundo = up.enviar(b"foto", "a.jpg", grupo="s1", chave="hash1")
+    assert segundo != primeiro and up.aguardar(segundo, timeout=5)["estado"] == "concluido"
+
+def test_limpar_concluidas_mantem_o_registro_da_chave():
+    drive = ServicoDriveFake()
+    up = _uploader(drive)
+    up.aguardar(up.enviar(b"foto", "a.jpg", grupo="s1", chave="hash1"), timeout=5)
+    up.limpar_concluidas("s1")
+    assert up.listar("s1") == [] and up.resumo("s1")["total"] == 0
+    assert up.enviar(b"foto", "a.jpg", grupo="s1", chave="hash1") is None
+    assert len(drive.arquivos) == 1
+
+def test_poda_por_tempo():
+    drive = ServicoDriveFake()
+    up = _uploader(drive, retencao_tarefas=0, retencao_enviados=0)
+    up.aguardar(up.enviar(b"foto", "a.jpg", grupo="s1", chave="hash1"), timeout=5)
+    assert up.resumo("s1")["total"] == 0 and not up._tarefas and not up._chaves
+    # Depois da retenção a chave é esquecida e um novo clique envia de novo
+    up.aguardar(up.enviar(b"foto", "a.jpg", grupo="s1", chave="hash1"), timeout=5)
+    assert len(drive.arquivos) == 2
+
+class _DriveTravado(ServicoDriveFake):
+    # Segura o envio até `liberar` ser sinalizado
+    def __init__(self):
+        super().__init__()
+        self.liberar = threading.Event()
+
+    def files(self):
+        self.liberar.wait(5)
+        return super().files()
+
+def test_tarefas_em_andamento_nao_sao_podadas():
+    drive = _DriveTravado()
+    up = _uploader(drive, retencao_tarefas=0)
+    id_tarefa = up.enviar(b"foto", "a.jpg", grupo="s1", chave="hash1")
+    up.limpar_concluidas()
+    assert up.resumo("s1")["total"] == 1
+    assert up.enviar(b"foto", "a.jpg", grupo="s1", chave="hash1") == id_tarefa
+    drive.liberar.set()
+    assert up.aguardar(id_tarefa, timeout=5)["estado"] == "concluido"
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_5xx_transitorio(status):
+    drive = ServicoDriveFake(falhas=[status])
+    up = _uploader(drive)
+    assert up.aguardar(up.enviar(b"foto", "a.jpg"), timeout=5)["estado"] == "concluido"
@@ -0,0 +1,118 @@
+import pandas as pd
+from armazem_local import ArmazemLocal, Replicador
+from fakes_gspread import PlanilhaFake, ClienteFake
+from fragmentos import Fragmentacao, ABA_MANIFESTO, BASE_MANIFESTO, nome_aba
+from nucleo_dados import ABA_PRAZOS, ABA_CHECKLIST, COLUNAS_PRAZOS, COLUNAS_CHECKLIST, NOME_PLANILHA
+
+def _linha(unidade, documento="Alvara", status="NORMAL"):
+    return [unidade, "Adm", documento, "", "01/01/2026", "01/06/2026", status, 0, "False"]
+
+def _cliente(n):
+    # Planilha ainda no formato de duas abas
+    principal = PlanilhaFake(NOME_PLANILHA)
+    principal.add_worksheet(ABA_PRAZOS).linhas = [list(COLUNAS_PRAZOS)] + [_linha(f"U{i}") for i in range(n)]
+    principal.add_worksheet(ABA_CHECKLIST).linhas = [list(COLUNAS_CHECKLIST)] + [[f"U{i} - Alvara", "Protocolar", "False"] for i in range(n)]
+    cliente = ClienteFake(principal)
+    return cliente, lambda nome=None: cliente.open(nome or NOME_PLANILHA)
+
+def _instalacao(tmp_path, nome, abrir, n=4, **kwargs):
+    armazem = ArmazemLocal(str(tmp_path / f"{nome}.db"))
+    return armazem, Replicador(armazem, abrir, fragmentacao=Fragmentacao(n, **kwargs), janela=0)
+
+def _manifesto(cliente):
+    return {l[0]: l for l in cliente.open(NOME_PLANILHA).abas[ABA_MANIFESTO].linhas[1:]}
+
+def _unidades(cliente, fragmento):
+    return [l[0] for l in cliente.open(NOME_PLANILHA).abas[nome_aba(ABA_PRAZOS, fragmento)].linhas[1:]]
+
+def test_migracao_do_formato_de_duas_abas(tmp_path):
+    cliente, abrir = _cliente(20)
+    armazem, replicador = _instalacao(tmp_path, "a", abrir, por_planilha=2)
+    assert replicador.reconciliar() is True
+    df_p, df_c = armazem.ler()
+    assert sorted(df_p['Unidade']) == sorted(f"U{i}" for i in range(20)) and len(df_c) == 20
+    manifesto = _manifesto(cliente)
+    frag = replicador.fragmentacao
+    assert list(manifesto) == frag.nomes() and sum(int(m[4]) for m in manifesto.values()) == 20
+    assert {m[1] for m in manifesto.values()} == {NOME_PLANILHA, f"{NOME_PLANILHA}_1"}
+    for f, m in manifesto.items():
+        planilha = cliente.open(m[1])
+        unidades = [l[0] for l in planilha.abas[nome_aba(ABA_PRAZOS, f)].linhas[1:]]
+        assert all(frag.fragmento(u) == f for u in unidades) and len(unidades) == int(m[4])
+        # O checklist mora no fragmento do seu documento
+        assert [l[0] for l in planilha.abas[nome_aba(ABA_CHECKLIST, f)].linhas[1:]] == [f"{u} - Alvara" for u in unidades]
+
+def test_manifesto_compativel_so_com_os_mesmos_fragmentos_e_chave(tmp_path):
+    cliente, abrir = _cliente(8)
+    _instalacao(tmp_path, "a", abrir)[1].reconciliar()
+    manifesto = Fragmentacao(4).ler_manifesto(cliente.open(NOME_PLANILHA))
+    assert Fragmentacao(4)._compativel(manifesto)
+    assert not Fragmentacao(8)._compativel(manifesto)
+    assert not Fragmentacao(4, chave="cnpj")._compativel(manifesto)
+    assert not Fragmentacao(4)._compativel(None)
+    # Outra instalação com 8 fragmentos reparte tudo de novo e baixa o resultado inteiro
+    armazem, replicador = _instalacao(tmp_path, "b", abrir, n=8)
+    replicador.reconciliar()
+    df_p, _ = armazem.ler()
+    df_p.loc[0, 'Status'] = "ALTO"
+    armazem.gravar(df_p, armazem.ler()[1])
+    replicador.reconciliar()
+    assert list(_manifesto(cliente)) == replicador.fragmentacao.nomes()
+    assert sum(len(_unidades(cliente, f)) for f in replicador.fragmentacao.nomes()) == 8
+
+def test_envio_e_carga_pulam_fragmentos_sem_mudanca(tmp_path):
+    cliente, abrir = _cliente(20)
+    a, rep_a = _instalacao(tmp_path, "a", abrir)
+    b, rep_b = _instalacao(tmp_path, "b", abrir)
+    rep_a.reconciliar()
+    rep_b.reconciliar()
+    df_p, df_c = a.ler()
+    df_p.loc[df_p['Unidade'] == "U3", 'Status'] = "CRÍTICO"
+    a.gravar(df_p, df_c)
+    resumos = rep_a.reconciliar()
+    alvo = rep_a.fragmentacao.fragmento("U3")
+    assert list(resumos) == [nome_aba(ABA_PRAZOS, alvo)] and resumos[nome_aba(ABA_PRAZOS, alvo)]["atualizadas"] == 1
+    assert {f: int(m[3]) for f, m in _manifesto(cliente).items()} == {f: 2 if f == alvo else 1 for f in rep_a.fragmentacao.nomes()}
+    # A outra instalação baixa só o fragmento cuja revisão subiu
+    for p in cliente.planilhas.values(): p.chamadas.clear()
+    assert rep_b.reconciliar() is True
+    lidas = sum(p.chamadas.get("get_all_records", 0) for p in cliente.planilhas.values())
+    assert lidas == 1 + 2   # manifesto + as duas abas do fragmento alterado
+    assert b.ler()[0].set_index('Unidade').loc["U3", 'Status'] == "CRÍTICO"
+    assert b.bases()[BASE_MANIFESTO][alvo] == 2
+    # Nada mudou desde então: só o manifesto é lido
+    for p in cliente.planilhas.values(): p.chamadas.clear()
+    assert rep_b.reconciliar() is True
+    assert sum(p.total_chamadas() for p in cliente.planilhas.values()) == 2   # worksheet + get_all_records do manifesto
+
+def test_fragmento_revisado_por_outro_processo_nao_perde_as_linhas_dele(tmp_path):
+    cliente, abrir = _cliente(20)
+    a, rep_a = _instalacao(tmp_path, "a", abrir)
+    b, rep_b = _instalacao(tmp_path, "b", abrir)
+    rep_a.reconciliar()
+    rep_b.reconciliar()
+    frag = rep_a.fragmentacao
+    alvo = frag.fragmento("U0")
+    vizinha = next(f"U{i}" for i in range(1, 20) if frag.fragmento(f"U{i}") == alvo)
+
+    # A inclui um documento no fragmento e sobe a revisão
+    df_p, df_c = a.ler()
+    nova = dict(zip(COLUNAS_PRAZOS, _linha("U0", "AVCB")), ID_UNICO="U0 - AVCB")
+    a.gravar(pd.concat([df_p, pd.DataFrame([nova])], ignore_index=True), df_c)
+    rep_a.reconciliar()
+    assert "U0" in _unidades(cliente, alvo) and _unidades(cliente, alvo).count("U0") == 2
+
+    # B, sem ter carregado essa revisão, edita outro documento do mesmo fragmento
+    df_p, df_c = b.ler()
+    df_p.loc[df_p['Unidade'] == vizinha, 'Status'] = "ALTO"
+    b.gravar(df_p, df_c)
+    resumos = rep_b.reconciliar()
+    assert resumos[nome_aba(ABA_PRAZOS, alvo)]["modo"] == "delta"
+    linhas = cliente.open(NOME_PLANILHA).abas[nome_aba(ABA_PRAZOS, alvo)].linhas[1:]
+    assert ["U0", "AVCB"] in [l[0:3:2] for l in linhas]
+    assert [l[6] for l in linhas if l[0] == vizinha] == ["ALTO"]
+    # A revisão vista por B não avança: a próxima carga traz o documento de A
+    assert b.bases()[BASE_MANIFESTO][alvo] == 1
+    assert rep_b.reconciliar() is True
+    assert "U0 - AVCB" in set(b.ler()[0]['ID_UNICO'])
+    assert b.bases()[BASE_MANIFESTO][alvo] == int(_manifesto(cliente)[alvo][3]) == 3
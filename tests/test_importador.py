@@ -0,0 +1,38 @@
+import io
+from datetime import date
+from armazem_local import ArmazemLocal, Replicador
+from fakes_gspread import PlanilhaFake
+from importador import importar_arquivo
+from nucleo_dados import ABA_PRAZOS, ABA_CHECKLIST, COLUNAS_PRAZOS, COLUNAS_CHECKLIST, normalizar_prazos, serializar_prazos
+
+def _csv(n):
+    linhas = ["Nome da unidade;CNPJ;Documento"] + [f"Unidade {i};12.345.678/0001-{i:02d};Alvará de Funcionamento" for i in range(n)]
+    return io.BytesIO("\n".join(linhas).encode("utf-8"))
+
+def test_id_importado_igual_ao_da_carga():
+    df_novos, resumo = importar_arquivo(_csv(3), None, hoje=date(2026, 1, 10))
+    assert resumo["novas"] == 3
+    recarregado = normalizar_prazos(df_novos[COLUNAS_PRAZOS].astype(str))
+    assert df_novos['ID_UNICO'].tolist() == recarregado['ID_UNICO'].tolist() == [f"Unidade {i} - Alvará de Funcionamento" for i in range(3)]
+
+def test_importar_empurrar_editar_segue_em_delta(tmp_path):
+    sh = PlanilhaFake()
+    sh.add_worksheet(ABA_PRAZOS).linhas = [list(COLUNAS_PRAZOS), ["Matriz", "Adm", "Alvará de Funcionamento", "", "01/01/2026", "01/06/2026", "NORMAL", 0, "False"]]
+    sh.add_worksheet(ABA_CHECKLIST).linhas = [list(COLUNAS_CHECKLIST)]
+    armazem = ArmazemLocal(str(tmp_path / "local.db"))
+    replicador = Replicador(armazem, lambda: sh, janela=0)
+    replicador.reconciliar()
+
+    df_p, _ = armazem.ler()
+    df_novos, _ = importar_arquivo(_csv(51), df_p, hoje=date(2026, 1, 10))
+    armazem.anexar(df_novos)
+    resumos = replicador.reconciliar()
+    assert resumos[ABA_PRAZOS]["modo"] == "delta" and resumos[ABA_PRAZOS]["inseridas"] == 51
+
+    df_p, df_c = armazem.ler()
+    df_p.loc[8, 'Setor'] = "Farmácia"
+    armazem.gravar(df_p, df_c)
+    resumos = replicador.reconciliar()
+    assert resumos[ABA_PRAZOS]["modo"] == "delta" and resumos[ABA_PRAZOS]["atualizadas"] == 1
+    assert sh.abas[ABA_PRAZOS].linhas[9][0] == "Unidade 7" and sh.abas[ABA_PRAZOS].linhas[9][1] == "Farmácia"
+    assert sh.abas[ABA_PRAZOS].linhas[1:] == serializar_prazos(armazem.ler()[0])
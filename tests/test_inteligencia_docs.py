@@ -0,0 +1,76 @@
+from datetime import date
+import random
+import pandas as pd
+import pytest
+from inteligencia_docs import (aplicar_inteligencia_doc, aplicar_inteligencia_lote, classificar_documento, ClassificadorDocumentos,
+                              CLASSIFICADOR, DOC_INTELLIGENCE)
+
+DOCUMENTOS = ["Alvará de Funcionamento", "AVCB", "Licença Sanitária", "Documento qualquer", "PGRSS"]
+
+def _unico(documento, base):
+    return aplicar_inteligencia_doc(documento, base)
+
+@pytest.mark.parametrize("base", [date(2026, 1, 15), None, pd.NaT, ""])
+def test_lote_igual_ao_item_unico(base):
+    bases = pd.Series([base] * len(DOCUMENTOS), dtype=object)
+    lote = aplicar_inteligencia_lote(pd.Series(DOCUMENTOS), bases)
+    for i, documento in enumerate(DOCUMENTOS):
+        risco, vencimento, link, tarefas = _unico(documento, base)
+        assert (lote.loc[i, "Status"], lote.loc[i, "Vencimento"], lote.loc[i, "Link"], lote.loc[i, "Tarefas"]) == (risco, vencimento, link, tarefas)
+
+def test_lote_com_datas_mistas():
+    bases = pd.Series([date(2026, 1, 15), None, "30/13/2026", date(2025, 6, 1), pd.NaT], dtype=object)
+    lote = aplicar_inteligencia_lote(pd.Series(DOCUMENTOS), bases)
+    assert lote["Vencimento"].notna().all()
+    for i, documento in enumerate(DOCUMENTOS):
+        base = bases[i] if isinstance(bases[i], date) else None   # texto inválido: o item único não recebe string
+        assert lote.loc[i, "Vencimento"] == _unico(documento, base)[1]
+
+@pytest.mark.parametrize("base", [None, date(2026, 3, 1)])
+def test_lote_com_data_unica(base):
+    lote = aplicar_inteligencia_lote(DOCUMENTOS, base)
+    assert [lote.loc[i, "Vencimento"] for i in range(len(DOCUMENTOS))] == [_unico(d, base)[1] for d in DOCUMENTOS]
+
+def test_regras_conhecidas():
+    assert set(aplicar_inteligencia_lote(DOCUMENTOS)["Regra"]) <= set(DOC_INTELLIGENCE)
+
+# --- CLASSIFICADOR (maior chave contida no nome) ---
+NOMES = ["Alvará de Funcionamento e Licença Sanitária Serviço (CME)", "Renovação Licença Sanitária Serviço (UTI Neonatal) 2026",
+         "licença sanitária", "Licença Sanitária - matriz", "Protocolo Licença Sanitária Serviço (Equipamento 12) sala 2",
+         "Licença Sanitária Serviço (Equipamento 2) anexo", "Licença Sanitária Serviço (Equipamento) geral", "SDR e SMOP",
+         "Habite-se", "CNES", "Conselho de Biomedicina (CRBM) Serviço - Laboratório (2025)", "Nada a ver", ""]
+
+def _forca_bruta(nome):
+    if nome in DOC_INTELLIGENCE: return nome
+    contidas = [k for k in DOC_INTELLIGENCE if k != "DEFAULT" and k in nome]
+    if not contidas: return "DEFAULT"
+    return min(contidas, key=lambda k: (-len(k), nome.index(k) + len(k)))
+
+def test_maior_chave_vence_a_primeira():
+    assert classificar_documento(NOMES[0]) == "Licença Sanitária Serviço (CME)"
+    assert classificar_documento("SDR e SMOP") == "SMOP"   # mais longa que SDR, que aparece antes
+    assert classificar_documento(NOMES[10]) == "Conselho de Biomedicina (CRBM) Serviço - Laboratório"
+    assert [classificar_documento(n) for n in NOMES] == [_forca_bruta(n) for n in NOMES]
+
+def test_chave_especifica_vence_licenca_sanitaria_generica():
+    assert classificar_documento(NOMES[1]) == "Licença Sanitária Serviço (UTI Neonatal)"
+    assert aplicar_inteligencia_doc(NOMES[1], date(2026, 1, 1))[3] == DOC_INTELLIGENCE["Licença Sanitária Serviço (UTI Neonatal)"]["tarefas"]
+    assert classificar_documento("Licença Sanitária - matriz") == "Licença Sanitária"
+    assert classificar_documento("licença sanitária") == "DEFAULT"   # comparação sensível a maiúsculas
+
+def test_chaves_de_equipamento_numeradas():
+    for i in (1, 2, 12, 22):
+        assert classificar_documento(f"Licença Sanitária Serviço (Equipamento {i})") == f"Licença Sanitária Serviço (Equipamento {i})"
+    assert classificar_documento(NOMES[4]) == "Licença Sanitária Serviço (Equipamento 12)"
+    assert classificar_documento(NOMES[5]) == "Licença Sanitária Serviço (Equipamento 2)"
+    assert classificar_documento(NOMES[6]) == "Licença Sanitária Serviço (Equipamento)"
+    assert aplicar_inteligencia_doc(NOMES[4])[0] == "MÉDIO"
+
+@pytest.mark.parametrize("semente", range(5))
+def test_resultado_nao_depende_da_ordem_das_chaves(semente):
+    chaves = list(DOC_INTELLIGENCE)
+    random.Random(semente).shuffle(chaves)
+    embaralhado = ClassificadorDocumentos({k: DOC_INTELLIGENCE[k] for k in chaves})
+    invertido = ClassificadorDocumentos({k: DOC_INTELLIGENCE[k] for k in reversed(list(DOC_INTELLIGENCE))})
+    for nome in NOMES:
+        assert embaralhado.chave_para(nome) == invertido.chave_para(nome) == CLASSIFICADOR.chave_para(nome) == _forca_bruta(nome)
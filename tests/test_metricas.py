@@ -0,0 +1,51 @@
+import json
+import numpy as np
+import pytest
+from metricas import Metricas, percentil
+
+def test_percentil_igual_ao_numpy():
+    rng = np.random.default_rng(3)
+    for n in (1, 2, 7, 100, 1001):
+        amostras = sorted(rng.exponential(0.2, n).tolist())
+        for p in (0, 25, 50, 90, 99, 100):
+            assert percentil(amostras, p) == pytest.approx(np.percentile(amostras, p))
+    assert percentil([], 50) == 0.0
+    assert percentil([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+
+def test_resumo_por_etapa():
+    m = Metricas()
+    for ms in range(1, 101): m.registrar("sheets.puxar", ms / 1000, chamadas=2, bytes=10)
+    m.registrar("dados.retrato", 0.5, erro=True)
+    linhas = {l["etapa"]: l for l in m.resumo()}
+    assert [l["etapa"] for l in m.resumo()] == ["dados.retrato", "sheets.puxar"]
+    puxar = linhas["sheets.puxar"]
+    assert (puxar["n"], puxar["p50_ms"], puxar["p90_ms"], puxar["p99_ms"], puxar["max_ms"]) == (100, 50.5, 90.1, 99.01, 100.0)
+    assert (puxar["total_s"], puxar["erros"], puxar["chamadas"], puxar["bytes"]) == (5.05, 0, 200, 1000)
+    assert linhas["dados.retrato"]["erros"] == 1 and "chamadas" not in linhas["dados.retrato"]
+
+def test_percentis_das_ultimas_amostras():
+    m = Metricas(max_amostras=10)
+    for s in [10.0] * 50 + [0.001] * 10: m.registrar("etapa", s)
+    linha = m.resumo()[0]
+    assert linha["n"] == 60 and linha["max_ms"] == 1.0 and linha["total_s"] == 500.01
+
+def test_medir_registra_erro_e_atributos():
+    m = Metricas()
+    with m.medir("busca.filtrar", linhas=10) as atributos: atributos["achados"] = 3
+    with pytest.raises(ValueError):
+        with m.medir("busca.filtrar"): raise ValueError("x")
+    eventos = m.eventos("busca.filtrar")
+    assert eventos[0]["linhas"] == 10 and eventos[0]["achados"] == 3 and "erro" not in eventos[0]
+    assert eventos[1]["erro"] is True and m.resumo()[0]["erros"] == 1
+
+def test_contadores_exportar_e_desligar():
+    m = Metricas(max_eventos=3)
+    m.contar("blobs.removidos"); m.contar("blobs.removidos", 4)
+    for i in range(5): m.registrar("e", 0.001, i=i)
+    assert m.contadores() == {"blobs.removidos": 5}
+    assert [json.loads(l)["i"] for l in m.exportar_jsonl().splitlines()] == [2, 3, 4]
+    m.ativo = False
+    m.registrar("e", 1.0); m.contar("blobs.removidos")
+    assert m.resumo()[0]["n"] == 5 and m.contadores() == {"blobs.removidos": 5}
+    m.limpar()
+    assert m.resumo() == [] and m.contadores() == {} and m.eventos() == []
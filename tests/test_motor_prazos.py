@@ -0,0 +1,49 @@
+from datetime import date
+import pandas as pd
+from motor_prazos import calcular_prazos, garantir_prazos, alertas_pendentes, mensagens_alerta, REGRAS_ALERTA
+
+HOJE = date(2026, 3, 10)
+
+def _df(linhas):
+    return pd.DataFrame(linhas, columns=["Unidade", "Documento", "Status", "Progresso", "Vencimento"])
+
+def _nivel(status, dias, progresso=0, documento="Alvará"):
+    df = _df([("U1", documento, status, progresso, pd.Timestamp(HOJE) + pd.Timedelta(days=dias))])
+    return calcular_prazos(df, HOJE).loc[0, "nivel_alerta"]
+
+def test_limite_de_antecedencia_por_nivel():
+    for risco, regra in REGRAS_ALERTA.items():
+        limite = regra["dias_antecedencia"]
+        assert _nivel(risco, limite) == risco
+        assert _nivel(risco, limite + 1) == ""
+        assert _nivel(risco, 0) == risco and _nivel(risco, -30) == risco   # vencido continua alertando
+    assert _nivel("NORMAL", 0) == "" and _nivel("MÉDIO", -1) == ""
+
+def test_concluidos_e_placeholders_nao_alertam():
+    assert _nivel("CRÍTICO", 1, progresso=100) == ""
+    assert _nivel("CRÍTICO", 1, progresso=99) == "CRÍTICO"
+    assert _nivel("CRÍTICO", 1, documento="PENDENTE - definir") == ""
+    assert _nivel("ALTO", 1, documento="SELECIONE") == ""
+
+def test_dias_e_vencido():
+    df = _df([("U1", "A", "CRÍTICO", 0, "2026-03-09"), ("U1", "B", "ALTO", 100, "2026-03-01"),
+              ("U1", "C", "NORMAL", 0, "2026-03-10"), ("U1", "D", "CRÍTICO", "", None), ("U1", "E", "ALTO", 50, "data ruim")])
+    saida = calcular_prazos(df, HOJE)
+    assert saida["dias_para_vencer"].tolist()[:3] == [-1, -9, 0]
+    assert saida["dias_para_vencer"].iloc[3:].isna().all()
+    assert saida["vencido"].tolist() == [True, False, False, False, False]
+    assert saida["nivel_alerta"].tolist() == ["CRÍTICO", "", "", "", ""]
+    assert list(saida.columns[:5]) == list(df.columns)
+
+def test_vazio_e_garantir():
+    vazio = calcular_prazos(_df([]), HOJE)
+    assert vazio.empty and {"dias_para_vencer", "vencido", "nivel_alerta"} <= set(vazio.columns)
+    calculado = calcular_prazos(_df([("U1", "A", "CRÍTICO", 0, "2026-03-12")]), HOJE)
+    assert garantir_prazos(calculado) is calculado
+
+def test_alertas_do_mais_urgente_e_limite():
+    df = _df([(f"U{i}", f"Doc {i}", "CRÍTICO", 0, pd.Timestamp(HOJE) + pd.Timedelta(days=d)) for i, d in enumerate([4, -2, 1, 3, 9])])
+    df = calcular_prazos(df, HOJE)
+    assert alertas_pendentes(df, "CRÍTICO")["Documento"].tolist() == ["Doc 1", "Doc 2", "Doc 3", "Doc 0"]
+    mensagens = mensagens_alerta(df, "CRÍTICO", limite=2)
+    assert mensagens == ["🏥 U1\n📄 Doc 1\n⏳ Vence em -2 dias", "🏥 U2\n📄 Doc 2\n⏳ Vence em 1 dias"]
@@ -0,0 +1,90 @@
+import pytest
+from fakes_ntfy import ServidorNtfyFake
+from notificacoes import DespachanteNotificacoes
+
+@pytest.fixture
+def servidor(request):
+    fake = ServidorNtfyFake(respostas=getattr(request, "param", (200,))).iniciar()
+    yield fake
+    fake.parar()
+
+def _despachante(servidor, **kwargs):
+    return DespachanteNotificacoes(url_base=servidor.url, backoff=0.01, **kwargs)
+
+def test_envio_entregue_na_primeira(servidor):
+    d = _despachante(servidor)
+    assert d.enviar_agora("Título", "corpo", "high", topico="t1")
+    assert [(r["topico"], r["prioridade"], r["corpo"]) for r in servidor.recebidas] == [("t1", "high", "corpo")]
+    m = d.metricas()
+    assert (m["enviadas"], m["falhas"], m["tentativas_extras"]) == (1, 0, 0)
+
+@pytest.mark.parametrize("servidor", [(500, 503, 200)], indirect=True)
+def test_erro_do_servidor_repete_ate_entregar(servidor):
+    d = _despachante(servidor)
+    assert d.enviar_agora("Título", "corpo", topico="t1")
+    assert [r["status"] for r in servidor.recebidas] == [500, 503, 200]
+    m = d.metricas()
+    assert (m["enviadas"], m["falhas"], m["tentativas_extras"]) == (1, 0, 2)
+
+@pytest.mark.parametrize("servidor", [(500,)], indirect=True)
+def test_tentativas_esgotadas_contam_uma_falha(servidor):
+    d = _despachante(servidor, max_tentativas=3)
+    assert not d.enviar_agora("Título", "corpo", topico="t1")
+    assert len(servidor.recebidas) == 3
+    m = d.metricas()
+    assert (m["enviadas"], m["falhas"], m["tentativas_extras"]) == (0, 1, 2)
+
+@pytest.mark.parametrize("servidor", [(400, 200)], indirect=True)
+def test_erro_do_cliente_nao_repete(servidor):
+    d = _despachante(servidor)
+    assert not d.enviar_agora("Título", "corpo", topico="t1")
+    assert len(servidor.recebidas) == 1
+    assert d.metricas()["falhas"] == 1
+
+@pytest.mark.parametrize("servidor", [(429, 200)], indirect=True)
+def test_limite_de_taxa_repete(servidor):
+    d = _despachante(servidor)
+    assert d.enviar_agora("Título", "corpo", topico="t1")
+    assert [r["status"] for r in servidor.recebidas] == [429, 200]
+
+def test_fila_agrupa_mensagens_do_mesmo_topico(servidor):
+    d = _despachante(servidor)
+    d._iniciar = lambda: None   # segura o worker até as três mensagens estarem na fila
+    assert all(d.enviar("Aviso", f"m{i}", p, topico="t1") for i, p in enumerate(["low", "high", "default"]))
+    del d._iniciar
+    d._iniciar()
+    assert d.aguardar(timeout=5)
+    assert len(servidor.recebidas) == 1
+    r = servidor.recebidas[0]
+    assert r["titulo"] == "Aviso (+2)" and r["prioridade"] == "high" and r["corpo"].count("m") == 3
+    m = d.metricas()
+    assert (m["enfileiradas"], m["agrupadas"], m["mensagens_entregues"]) == (1, 2, 3)
+
+def test_fila_cheia_descarta(servidor):
+    d = _despachante(servidor, max_fila=1)
+    d._iniciar = lambda: None   # sem worker: a fila não esvazia
+    assert d.enviar("A", "1", topico="t1")
+    assert not d.enviar("B", "2", topico="t2")
+    assert d.metricas()["descartadas"] == 1
+
+def test_fila_avisa_quem_enviou_do_resultado(servidor):
+    d = _despachante(servidor)
+    resultados = []
+    d._iniciar = lambda: None
+    assert d.enviar("A", "1", topico="t1", ao_entregar=resultados.append)
+    assert d.enviar("B", "2", topico="t1", ao_entregar=lambda ok: 1 / 0)   # erro de quem enviou não derruba o worker
+    assert d.enviar("C", "3", topico="t1", ao_entregar=resultados.append)
+    del d._iniciar
+    d._iniciar()
+    assert d.aguardar(timeout=5)
+    assert resultados == [True, True] and len(servidor.recebidas) == 1
+    assert d.enviar("D", "4", topico="t2") and d.aguardar(timeout=5)
+    assert len(servidor.recebidas) == 2
+
+@pytest.mark.parametrize("servidor", [(500,)], indirect=True)
+def test_fila_avisa_falha_de_entrega(servidor):
+    d = _despachante(servidor, max_tentativas=2)
+    resultados = []
+    assert d.enviar("A", "1", topico="t1", ao_entregar=resultados.append)
+    assert d.aguardar(timeout=5)
+    assert resultados == [False] and d.metricas()["falhas"] == 1
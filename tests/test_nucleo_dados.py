@@ -0,0 +1,15 @@
+import pandas as pd
+from nucleo_dados import agregar_checklist, progresso_tarefas
+
+def test_progresso_da_tela_igual_ao_agregado():
+    # O editor do checklist compara o progresso que calcula com o agregado; se diferirem, o app regrava e reroda sem fim
+    for total in range(1, 30):
+        for feitas in range(total + 1):
+            df_p = pd.DataFrame({"ID_UNICO": ["d"], "Progresso": [0]})
+            df_c = pd.DataFrame({"Documento_Ref": ["d"] * total, "Feito": [True] * feitas + [False] * (total - feitas)})
+            assert agregar_checklist(df_p, df_c)["Progresso"][0] == progresso_tarefas(feitas, total)
+
+def test_documento_sem_tarefas_mantem_progresso_gravado():
+    df_p = pd.DataFrame({"ID_UNICO": ["a", "b"], "Progresso": [40, 0]})
+    df_c = pd.DataFrame({"Documento_Ref": ["b", "b", "b"], "Feito": [True, False, False]})
+    assert agregar_checklist(df_p, df_c)["Progresso"].tolist() == [40, 33]
@@ -0,0 +1,72 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+from painel import calcular_agregados, ordem_coluna, selecionar_pagina
+
+def _df(n=57, semente=11):
+    rng = np.random.default_rng(semente)
+    unidades = rng.choice(["Canoas", "Gravataí", "Alvorada", "", None], n).tolist()
+    dias = rng.integers(-20, 200, n).astype(float)
+    dias[rng.choice(n, 6, replace=False)] = np.nan
+    venc = [None if np.isnan(d) else date(2026, 3, 10) + pd.Timedelta(days=int(d)) for d in dias]
+    return pd.DataFrame({"Unidade": unidades, "Setor": rng.choice(["Adm", "VISA"], n), "Documento": [f"Doc {i}" for i in range(n)],
+                         "Vencimento": venc, "dias_para_vencer": pd.array([None if np.isnan(d) else int(d) for d in dias], dtype="Int64"),
+                         "Progresso": rng.choice([0, 50, 100], n), "Status": pd.Categorical(rng.choice(["NORMAL", "CRÍTICO", "ALTO"], n))},
+                        index=rng.permutation(np.arange(500, 500 + n)))
+
+def _vazio(v):
+    return pd.isna(v) or v == ""
+
+def _valores(pagina, coluna):
+    return [None if _vazio(v) else v for v in pagina[coluna]]
+
+def test_ordem_crescente_com_vazios_no_fim():
+    df = _df()
+    for coluna in ["Unidade", "Vencimento", "dias_para_vencer", "Progresso", "Status"]:
+        ordem, n_validos = ordem_coluna(df, coluna)
+        assert sorted(ordem.tolist()) == list(range(len(df)))
+        valores = df[coluna].iloc[ordem].tolist()
+        assert n_validos == sum(not _vazio(v) for v in valores)
+        assert all(_vazio(v) for v in valores[n_validos:]) and not any(_vazio(v) for v in valores[:n_validos])
+        chave = str if coluna == "Status" else (lambda v: v)
+        assert [chave(v) for v in valores[:n_validos]] == sorted(chave(v) for v in valores[:n_validos])
+
+def test_decrescente_mantem_vazios_no_fim():
+    df = _df()
+    ordem, n_validos = ordem_coluna(df, "dias_para_vencer")
+    pagina, total, n_paginas, efetiva = selecionar_pagina(df, ordem, n_validos, crescente=False, tamanho=len(df))
+    valores = _valores(pagina, "dias_para_vencer")
+    assert total == len(df) and n_paginas == 1 and efetiva == 1
+    assert valores[:n_validos] == sorted(valores[:n_validos], reverse=True) and all(v is None for v in valores[n_validos:])
+    ordem_u, validos_u = ordem_coluna(df, "Unidade")
+    unidades = _valores(selecionar_pagina(df, ordem_u, validos_u, crescente=False, tamanho=len(df))[0], "Unidade")
+    assert unidades[:validos_u] == sorted(unidades[:validos_u], reverse=True) and all(v is None for v in unidades[validos_u:])
+
+def test_paginas_iguais_ao_recorte_completo():
+    df = _df()
+    ordem, n_validos = ordem_coluna(df, "Vencimento")
+    completo = selecionar_pagina(df, ordem, n_validos, crescente=False, tamanho=len(df))[0]
+    paginas = [selecionar_pagina(df, ordem, n_validos, crescente=False, pagina=p, tamanho=25) for p in (1, 2, 3)]
+    assert [p[2] for p in paginas] == [3, 3, 3] and [len(p[0]) for p in paginas] == [25, 25, 7]
+    assert pd.concat([p[0] for p in paginas]).index.tolist() == completo.index.tolist()
+    assert selecionar_pagina(df, ordem, n_validos, pagina=99, tamanho=25)[3] == 3
+    assert selecionar_pagina(df, ordem, n_validos, pagina=0, tamanho=25)[3] == 1
+
+def test_mascara_filtra_antes_de_paginar():
+    df = _df()
+    ordem, n_validos = ordem_coluna(df, "dias_para_vencer")
+    mascara = (df["Setor"] == "VISA").to_numpy()
+    pagina, total, n_paginas, _ = selecionar_pagina(df, ordem, n_validos, crescente=False, mascara=mascara, tamanho=10)
+    assert total == mascara.sum() and n_paginas == -(-total // 10) and len(pagina) == min(10, total)
+    assert (pagina["Setor"] == "VISA").all()
+    inteiro = selecionar_pagina(df, ordem, n_validos, crescente=False, tamanho=len(df))[0]
+    assert pagina.index.tolist() == inteiro[inteiro["Setor"] == "VISA"].index[:10].tolist()
+    vazia = selecionar_pagina(df, ordem, n_validos, mascara=np.zeros(len(df), dtype=bool), pagina=4)
+    assert vazia[0].empty and vazia[1:] == (0, 1, 1)
+
+def test_agregados():
+    df = _df()
+    agregados = calcular_agregados(df)
+    assert agregados["total"] == len(df) and sum(agregados["por_status"].values()) == len(df)
+    assert agregados["por_setor"] == df["Setor"].value_counts().to_dict()
+    assert calcular_agregados(df.iloc[:0])["total"] == 0
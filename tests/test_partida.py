@@ -0,0 +1,65 @@
+import sys
+import threading
+import pytest
+import partida
+from partida import MedidorRerun, carregar, precarregar, arquivo_bytes, registrar_rerun, relatorio_partida
+
+@pytest.fixture
+def modulos(tmp_path, monkeypatch):
+    # Módulos novos num diretório temporário, fora de sys.modules no fim do teste
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(partida, "_importacoes", {})
+    criados = []
+    def criar(nome, codigo="VALOR = 1\n"):
+        (tmp_path / f"{nome}.py").write_text(codigo)
+        criados.append(nome)
+        return nome
+    yield criar
+    for nome in criados: sys.modules.pop(nome, None)
+
+def test_carregar_mede_so_a_primeira_importacao(modulos):
+    nome = modulos("mod_partida_a")
+    modulo = carregar(nome)
+    assert modulo.VALOR == 1 and sys.modules[nome] is modulo
+    assert set(partida._importacoes) == {nome} and partida._importacoes[nome] >= 0
+    medido = partida._importacoes[nome]
+    assert carregar(nome) is modulo and partida._importacoes == {nome: medido}
+    assert carregar("json") is sys.modules["json"] and "json" not in partida._importacoes   # já importado antes
+
+def test_carregar_biblioteca_ausente(modulos):
+    assert carregar("modulo_que_nao_existe_xyz") is None
+    assert partida._importacoes == {}
+
+def test_precarregar_uma_vez_por_processo(modulos, monkeypatch):
+    monkeypatch.setattr(partida, "_precarregado", False)
+    nomes = [modulos("mod_partida_b"), modulos("mod_partida_c")]
+    precarregar(nomes)
+    precarregar([modulos("mod_partida_d")])    # segunda chamada não faz nada
+    for t in threading.enumerate():
+        if t.name == "precarregar": t.join(5)
+    assert set(partida._importacoes) == set(nomes)
+
+def test_arquivo_bytes(tmp_path):
+    caminho = tmp_path / "loading.gif"
+    caminho.write_bytes(b"GIF89a")
+    assert arquivo_bytes(str(caminho)) == b"GIF89a"
+    caminho.write_bytes(b"outro")
+    assert arquivo_bytes(str(caminho)) == b"GIF89a"   # lido uma vez por processo
+    assert arquivo_bytes(str(tmp_path / "sumiu.gif")) == b""
+
+def test_medidor_e_relatorio(monkeypatch):
+    monkeypatch.setattr(partida, "_primeiro_rerun", None)
+    monkeypatch.setattr(partida, "_importacoes", {"plotly.express": 0.5, "relatorio": 0.25})
+    tempos = iter([10.0, 10.1, 10.4, 20.0, 20.05])
+    monkeypatch.setattr(partida.time, "perf_counter", lambda: next(tempos))
+    primeiro = MedidorRerun()
+    primeiro.marcar("importações"); primeiro.marcar("estilo")
+    registrar_rerun(primeiro)
+    segundo = MedidorRerun()
+    segundo.marcar("importações")
+    registrar_rerun(segundo)
+    assert primeiro.total() == pytest.approx(0.4) and segundo.total() == pytest.approx(0.05)
+    linhas = [(l["Grupo"], l["Etapa"], l["ms"]) for l in relatorio_partida(segundo)]
+    assert linhas == [("primeiro rerun", "importações", 100.0), ("primeiro rerun", "estilo", 300.0),
+                      ("último rerun", "importações", 50.0), ("último rerun", "TOTAL", 50.0),
+                      ("import tardio", "plotly.express", 500.0), ("import tardio", "relatorio", 250.0)]
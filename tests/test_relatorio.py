@@ -0,0 +1,117 @@
+import io
+import re
+import zipfile
+import zlib
+from datetime import datetime
+import numpy as np
+import pytest
+from PIL import Image
+import relatorio
+from blobs import ArmazemBlobs
+
+ITENS = [{"Local": "Recepção", "Item": "Piso", "Situação": "❌ Não Conforme", "Gravidade": "Alto", "Obs": "trinca", "Fotos": [], "Audio": None}]
+
+@pytest.fixture(autouse=True)
+def cache_vazio():
+    relatorio._cache_relatorios.clear()
+    yield
+    for caminho in relatorio._cache_relatorios.values():
+        try: relatorio.os.unlink(caminho)
+        except OSError: pass
+    relatorio._cache_relatorios.clear()
+
+def _texto_pdf(dados_zip):
+    with zipfile.ZipFile(io.BytesIO(dados_zip)) as z:
+        nome = next(n for n in z.namelist() if n.endswith(".pdf"))
+        pdf = z.read(nome)
+    textos = []
+    for stream in re.findall(rb"stream\r?\n(.*?)\r?\nendstream", pdf, re.S):
+        try: textos.append(zlib.decompress(stream).decode("latin-1"))
+        except zlib.error: pass
+    return nome, "".join(textos)
+
+def test_cache_reaproveita_no_mesmo_minuto(monkeypatch):
+    chamadas = []
+    original = relatorio.escrever_pacote_zip
+    monkeypatch.setattr(relatorio, "escrever_pacote_zip", lambda *a, **k: chamadas.append(1) or original(*a, **k))
+    agora = datetime(2026, 2, 1, 9, 30, 5)
+    primeiro = relatorio.gerar_pacote_zip_cacheado(ITENS, "Hospital", "Cliente", "Rua 1", agora=agora)
+    segundo = relatorio.gerar_pacote_zip_cacheado(ITENS, "Hospital", "Cliente", "Rua 1", agora=agora.replace(second=50))
+    assert isinstance(primeiro, bytes) and primeiro == segundo and len(chamadas) == 1
+
+def test_download_posterior_sai_com_a_data_nova():
+    ontem = relatorio.gerar_pacote_zip_cacheado(ITENS, "Hospital", "Cliente", "Rua 1", agora=datetime(2026, 2, 1, 9, 30))
+    hoje = relatorio.gerar_pacote_zip_cacheado(ITENS, "Hospital", "Cliente", "Rua 1", agora=datetime(2026, 2, 2, 14, 0))
+    nome_ontem, texto_ontem = _texto_pdf(ontem)
+    nome_hoje, texto_hoje = _texto_pdf(hoje)
+    assert "Data: 01/02/2026 09:30" in texto_ontem and nome_ontem == "Relatorio_Vistoria_01-02.pdf"
+    assert "Data: 02/02/2026 14:00" in texto_hoje and nome_hoje == "Relatorio_Vistoria_02-02.pdf"
+
+def test_cache_limitado_remove_os_arquivos(monkeypatch):
+    monkeypatch.setattr(relatorio, "MAX_RELATORIOS_CACHE", 2)
+    for minuto in range(4):
+        relatorio.gerar_pacote_zip_cacheado(ITENS, "Hospital", "Cliente", "Rua 1", agora=datetime(2026, 2, 1, 9, minuto))
+    assert len(relatorio._cache_relatorios) == 2
+    assert all(relatorio.os.path.exists(c) for c in relatorio._cache_relatorios.values())
+
+# --- MINIATURAS DAS FOTOS ---
+def _jpeg(largura, altura, semente):
+    pixels = np.random.default_rng(semente).integers(0, 256, (altura, largura, 3), dtype=np.uint8)
+    saida = io.BytesIO()
+    Image.fromarray(pixels).save(saida, format="JPEG", quality=95)
+    return saida.getvalue()
+
+def test_miniaturas_deduplicadas(monkeypatch):
+    foto_a, foto_b = _jpeg(1600, 1200, 1), _jpeg(1200, 1600, 2)
+    reduzidas = []
+    original = relatorio.reduzir_foto
+    monkeypatch.setattr(relatorio, "reduzir_foto", lambda dados, *a, **k: reduzidas.append(dados) or original(dados, *a, **k))
+    itens = [{"Fotos": [foto_a, foto_b]}, {"Fotos": [bytes(foto_a)]}, {"Fotos": []}, {}]
+    minis = relatorio.preparar_miniaturas(itens)
+    assert set(minis) == {relatorio.hash_foto(foto_a), relatorio.hash_foto(foto_b)}
+    assert sorted(map(len, reduzidas)) == sorted([len(foto_a), len(foto_b)])
+    assert relatorio.preparar_miniaturas([{"Fotos": []}]) == {}
+
+def test_miniatura_no_tamanho_da_celula():
+    foto = _jpeg(3000, 2000, 3)
+    mini = relatorio.preparar_miniaturas([{"Fotos": [foto]}])[relatorio.hash_foto(foto)]
+    lado = round(relatorio.MM_MINIATURA / 25.4 * relatorio.DPI_MINIATURA)
+    img = Image.open(io.BytesIO(mini))
+    assert img.format == "JPEG" and img.size == (lado, lado)
+    assert len(mini) < len(foto) // 10
+    assert Image.open(io.BytesIO(relatorio.preparar_miniaturas([{"Fotos": [foto]}], mm=20, dpi=100)[relatorio.hash_foto(foto)])).size == (79, 79)
+
+def test_miniaturas_de_blobs_e_fotos_invalidas(tmp_path):
+    armazem = ArmazemBlobs(str(tmp_path))
+    foto = _jpeg(800, 600, 4)
+    ref = armazem.guardar(foto)
+    minis = relatorio.preparar_miniaturas([{"Fotos": [ref, "f" * 64, b"nao e imagem"]}, {"Fotos": [ref]}], blobs=armazem)
+    assert len(minis) == 3 and minis[ref] is not None
+    assert minis["f" * 64] is None and minis[relatorio.hash_foto(b"nao e imagem")] is None
+
+# --- PACOTE ZIP ---
+def test_compressao_por_extensao():
+    for nome in ("Relatorio.pdf", "foto.JPG", "x.png", "audio.webm", "a.m4a", "lote.zip"):
+        assert relatorio.compressao_para(nome) == zipfile.ZIP_STORED
+    for nome in ("Audio_Item_1.wav", "dados.csv", "leia.txt", "sem_extensao"):
+        assert relatorio.compressao_para(nome) == zipfile.ZIP_DEFLATED
+
+def test_entradas_do_zip(tmp_path):
+    armazem = ArmazemBlobs(str(tmp_path))
+    wav = b"RIFF" + bytes(20000)
+    itens = [dict(ITENS[0], Audio=wav), dict(ITENS[0], Audio=armazem.guardar(wav + b"blob")), dict(ITENS[0], Audio="0" * 64)]
+    with zipfile.ZipFile(io.BytesIO(relatorio.gerar_pacote_zip_completo(itens, "Hospital", "Cliente", "Rua 1", blobs=armazem))) as z:
+        infos = {i.filename: i for i in z.infolist()}
+        assert len(infos) == 3 and {"Audio_Item_1.wav", "Audio_Item_2.wav"} < set(infos)   # blob sumido sai do ZIP
+        pdf = next(i for n, i in infos.items() if n.endswith(".pdf"))
+        assert pdf.compress_type == zipfile.ZIP_STORED and pdf.compress_size == pdf.file_size
+        assert infos["Audio_Item_1.wav"].compress_type == zipfile.ZIP_DEFLATED and infos["Audio_Item_1.wav"].compress_size < len(wav) // 10
+        assert z.read("Audio_Item_1.wav") == wav and z.read("Audio_Item_2.wav") == wav + b"blob"
+
+@pytest.mark.parametrize("limite, em_disco", [(relatorio.LIMITE_ZIP_MEMORIA, False), (1024, True)])
+def test_zip_vai_para_disco_acima_do_limite(monkeypatch, limite, em_disco):
+    monkeypatch.setattr(relatorio, "LIMITE_ZIP_MEMORIA", limite)
+    itens = [dict(ITENS[0], Audio=np.random.default_rng(5).bytes(4096))]
+    with relatorio.gerar_pacote_zip_arquivo(itens, "Hospital", "Cliente", "Rua 1") as arquivo:
+        assert arquivo._rolled == em_disco and arquivo.tell() == 0
+        assert zipfile.ZipFile(arquivo).read("Audio_Item_1.wav") == itens[0]["Audio"]
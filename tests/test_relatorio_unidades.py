@@ -0,0 +1,76 @@
+import gc
+import io
+import os
+import zipfile
+from datetime import date
+import pandas as pd
+from relatorio_unidades import gerar_relatorios_unidades, gerar_relatorios_unidades_arquivo, ler_manifesto, nome_arquivo_unidade
+
+HOJE = date(2026, 3, 10)
+
+def _prazos(n=3):
+    return pd.DataFrame([{"Unidade": f"Unidade {i}", "Setor": "Adm", "Documento": "Alvará", "CNPJ": f"{i}", "Data_Recebimento": HOJE,
+                          "Vencimento": date(2026, 9, 1), "Status": "NORMAL", "Progresso": 0, "Concluido": "False",
+                          "ID_UNICO": f"Unidade {i} - Alvará"} for i in range(n)])
+
+def _checklist():
+    return pd.DataFrame([{"Documento_Ref": "Unidade 0 - Alvará", "Tarefa": "Protocolar", "Feito": False}])
+
+def _gerar(pasta, df_p, **kwargs):
+    destino = io.BytesIO()
+    resumo = gerar_relatorios_unidades(destino, df_p, _checklist(), pasta=str(pasta), hoje=HOJE, max_workers=1, **kwargs)
+    with zipfile.ZipFile(destino) as z: return resumo, z.namelist()
+
+def _pdfs(pasta):
+    return sorted(p.name for p in pasta.glob("*.pdf"))
+
+def test_unidade_sem_mudanca_e_reaproveitada(tmp_path):
+    resumo, nomes = _gerar(tmp_path, _prazos())
+    assert (resumo["gerados"], resumo["reaproveitados"]) == (3, 0)
+    assert sorted(nomes) == sorted([nome_arquivo_unidade(f"Unidade {i}") for i in range(3)] + ["Indice_Conformidade.csv"])
+    antes = {p.name: p.stat().st_mtime_ns for p in tmp_path.glob("*.pdf")}
+    resumo, _ = _gerar(tmp_path, _prazos())
+    assert (resumo["gerados"], resumo["reaproveitados"], resumo["removidos"]) == (0, 3, 0)
+    assert {p.name: p.stat().st_mtime_ns for p in tmp_path.glob("*.pdf")} == antes
+
+def test_unidade_alterada_e_renderizada_de_novo(tmp_path):
+    _gerar(tmp_path, _prazos())
+    antes = ler_manifesto(str(tmp_path))["unidades"]
+    df = _prazos()
+    df.loc[1, 'Status'] = "CRÍTICO"
+    resumo, _ = _gerar(tmp_path, df)
+    assert (resumo["gerados"], resumo["reaproveitados"], resumo["removidos"]) == (1, 2, 1)
+    depois = ler_manifesto(str(tmp_path))["unidades"]
+    assert [u for u in depois if depois[u]["hash"] != antes[u]["hash"]] == ["Unidade 1"]
+    assert _pdfs(tmp_path) == sorted(f"{v['hash']}.pdf" for v in depois.values())
+
+def test_lote_filtrado_mantem_o_manifesto(tmp_path):
+    _gerar(tmp_path, _prazos())
+    antes = ler_manifesto(str(tmp_path))["unidades"]
+    df = _prazos()
+    df.loc[df['Unidade'] != "Unidade 2", 'Status'] = "ALTO"
+    resumo, nomes = _gerar(tmp_path, df, unidades=["Unidade 0"])
+    assert (resumo["unidades"], resumo["gerados"], resumo["removidos"]) == (1, 1, 0)
+    assert sorted(nomes) == [nome_arquivo_unidade("Unidade 0"), "Indice_Conformidade.csv"]
+    depois = ler_manifesto(str(tmp_path))["unidades"]
+    # As outras unidades continuam no manifesto e com os PDFs na pasta
+    assert set(depois) == set(antes) and depois["Unidade 2"] == antes["Unidade 2"] and depois["Unidade 1"] == antes["Unidade 1"]
+    assert len(_pdfs(tmp_path)) == 4
+    resumo, _ = _gerar(tmp_path, df)
+    assert (resumo["gerados"], resumo["reaproveitados"], resumo["removidos"]) == (1, 2, 2)
+
+def test_arquivo_do_lote_apagado_ao_descartar(tmp_path):
+    arquivo, resumo = gerar_relatorios_unidades_arquivo(_prazos(2), _checklist(), pasta=str(tmp_path), hoje=HOJE, max_workers=1)
+    assert resumo["unidades"] == 2 and arquivo.existe()
+    with zipfile.ZipFile(io.BytesIO(arquivo.ler())) as z: assert len(z.namelist()) == 3
+    arquivo.descartar()
+    assert not arquivo.existe()
+
+def test_arquivo_do_lote_apagado_com_o_dono(tmp_path):
+    # O app guarda o ArquivoLote no session_state: quando a sessão é descartada, o ZIP sai do /tmp
+    estado = {"lote_unidades": gerar_relatorios_unidades_arquivo(_prazos(1), _checklist(), pasta=str(tmp_path), hoje=HOJE, max_workers=1)}
+    caminho = estado["lote_unidades"][0].caminho
+    assert os.path.exists(caminho)
+    del estado
+    gc.collect()
+    assert not os.path.exists(caminho)
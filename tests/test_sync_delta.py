@@ -0,0 +1,74 @@
+import pandas as pd
+from fakes_gspread import PlanilhaFake
+from nucleo_dados import ABA_PRAZOS, ABA_CHECKLIST, COLUNAS_PRAZOS, COLUNAS_CHECKLIST, chaves_prazos, serializar_prazos
+from sync_delta import baixar_planilhas, enviar_planilhas, sincronizar_aba
+
+def _linha(unidade, documento, status="NORMAL", progresso=0):
+    return [unidade, "Adm", documento, "", "01/01/2026", "01/06/2026", status, progresso, "False"]
+
+def _planilha(linhas):
+    sh = PlanilhaFake()
+    sh.add_worksheet(ABA_PRAZOS).linhas = [list(COLUNAS_PRAZOS)] + [list(l) for l in linhas]
+    sh.add_worksheet(ABA_CHECKLIST).linhas = [list(COLUNAS_CHECKLIST)]
+    return sh
+
+def _documentos(sh):
+    return [(l[0], l[2], l[6]) for l in sh.abas[ABA_PRAZOS].linhas[1:]]
+
+def _salvar(sh, df, bases):
+    ws = sh.worksheet(ABA_PRAZOS)
+    bases[ABA_PRAZOS], resumo = sincronizar_aba(ws, bases[ABA_PRAZOS], COLUNAS_PRAZOS, chaves_prazos(df), serializar_prazos(df))
+    return resumo
+
+def test_sem_mudanca_externa_continua_delta():
+    sh = _planilha([_linha("U1", "Alvara"), _linha("U1", "AVCB"), _linha("U2", "Alvara")])
+    df, df_check, bases = baixar_planilhas(sh)
+    df.loc[df['ID_UNICO'] == "U1 - AVCB", 'Status'] = "ALTO"
+    resumo = _salvar(sh, df, bases)
+    assert resumo["modo"] == "delta" and resumo["atualizadas"] == 1
+    assert _documentos(sh) == [("U1", "Alvara", "NORMAL"), ("U1", "AVCB", "ALTO"), ("U2", "Alvara", "NORMAL")]
+
+def test_linha_inserida_por_fora_nao_desloca_a_edicao():
+    sh = _planilha([_linha("U1", "Alvara"), _linha("U1", "AVCB"), _linha("U2", "Alvara")])
+    df, df_check, bases = baixar_planilhas(sh)
+    # Outro usuário insere uma linha no topo: as linhas da base descem uma posição
+    sh.abas[ABA_PRAZOS].linhas.insert(1, _linha("U9", "Externo"))
+    df.loc[df['ID_UNICO'] == "U1 - AVCB", 'Status'] = "ALTO"
+    df = df[df['ID_UNICO'] != "U2 - Alvara"]
+    resumo = _salvar(sh, df, bases)
+    assert resumo["modo"] == "delta"
+    assert _documentos(sh) == [("U9", "Externo", "NORMAL"), ("U1", "Alvara", "NORMAL"), ("U1", "AVCB", "ALTO")]
+
+def test_aba_ordenada_por_fora():
+    sh = _planilha([_linha("U1", "Alvara"), _linha("U2", "AVCB"), _linha("U3", "Licenca")])
+    df, df_check, bases = baixar_planilhas(sh)
+    aba = sh.abas[ABA_PRAZOS]
+    aba.linhas[1:] = sorted(aba.linhas[1:], key=lambda l: l[2])
+    df.loc[df['ID_UNICO'] == "U1 - Alvara", 'Status'] = "CRÍTICO"
+    df = df[df['ID_UNICO'] != "U3 - Licenca"]
+    _salvar(sh, df, bases)
+    assert _documentos(sh) == [("U2", "AVCB", "NORMAL"), ("U1", "Alvara", "CRÍTICO")]
+    # A nova base segue a ordem atual da aba: o próximo salvamento não precisa remapear
+    df.loc[df['ID_UNICO'] == "U2 - AVCB", 'Status'] = "ALTO"
+    _salvar(sh, df, bases)
+    assert _documentos(sh) == [("U2", "AVCB", "ALTO"), ("U1", "Alvara", "CRÍTICO")]
+
+def test_linha_da_base_removida_por_fora_reescreve_tudo():
+    sh = _planilha([_linha("U1", "Alvara"), _linha("U1", "AVCB"), _linha("U2", "Alvara")])
+    df, df_check, bases = baixar_planilhas(sh)
+    # Outro usuário apaga a linha 2 da aba; a edição não pode cair na linha vizinha
+    del sh.abas[ABA_PRAZOS].linhas[1]
+    df.loc[df['ID_UNICO'] == "U1 - AVCB", 'Status'] = "ALTO"
+    resumo = _salvar(sh, df, bases)
+    assert resumo["modo"] == "completo"
+    assert _documentos(sh) == [("U1", "Alvara", "NORMAL"), ("U1", "AVCB", "ALTO"), ("U2", "Alvara", "NORMAL")]
+
+def test_somente_insercao_nao_relê_a_aba():
+    sh = _planilha([_linha("U1", "Alvara")])
+    df, df_check, bases = baixar_planilhas(sh)
+    novo = pd.DataFrame([dict(zip(COLUNAS_PRAZOS, _linha("U2", "AVCB")))])
+    df = pd.concat([df, novo], ignore_index=True)
+    resumos = enviar_planilhas(sh, df, df_check, bases)
+    assert sh.chamadas.get("values_get", 0) == 0
+    assert resumos[ABA_PRAZOS]["inseridas"] == 1
+    assert _documentos(sh)[-1] == ("U2", "AVCB", "NORMAL")
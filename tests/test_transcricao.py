@@ -0,0 +1,32 @@
+from transcricao import ServicoTranscricao, MotorFixo
+
+class MotorInstavel(MotorFixo):
+    # Falha nas primeiras `falhas` chamadas
+    def __init__(self, falhas):
+        super().__init__()
+        self.falhas = falhas
+        self.chamadas = 0
+
+    def transcrever(self, dados):
+        self.chamadas += 1
+        if self.chamadas <= self.falhas: raise RuntimeError("rede indisponível")
+        return super().transcrever(dados)
+
+def test_erro_so_volta_para_a_fila_com_repetir_erro():
+    motor = MotorInstavel(falhas=1)
+    servico = ServicoTranscricao(motor)
+    assert servico.transcrever(b"audio", timeout=5)["estado"] == "erro"
+    # Rerun comum pede de novo o mesmo áudio: não repete
+    chave = servico.solicitar(b"audio")
+    assert servico.resultado(chave)["estado"] == "erro" and motor.chamadas == 1
+    # "Tentar novamente"
+    servico.solicitar(b"audio", repetir_erro=True)
+    r = servico.transcrever(b"audio", timeout=5)
+    assert r["estado"] == "concluido" and r["texto"].startswith("transcricao") and motor.chamadas == 2
+
+def test_concluido_nao_e_transcrito_de_novo():
+    motor = MotorInstavel(falhas=0)
+    servico = ServicoTranscricao(motor)
+    servico.transcrever(b"audio", timeout=5)
+    servico.solicitar(b"audio", repetir_erro=True)
+    assert servico.transcrever(b"audio", timeout=5)["estado"] == "concluido" and motor.chamadas == 1
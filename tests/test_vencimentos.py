@@ -0,0 +1,107 @@
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from vencimentos import IndiceVencimentos, _dobrar, _escapar, gerar_ics, gravar_feeds, nome_feed_unidade, nome_feed_risco
+
+HOJE = date(2026, 3, 10)
+
+def _carteira(n=300, semente=7):
+    rng = np.random.default_rng(semente)
+    venc = [HOJE + timedelta(days=int(d)) for d in rng.integers(-60, 400, n)]
+    for i in rng.choice(n, n // 10, replace=False): venc[i] = None   # sem vencimento: fora do índice
+    return pd.DataFrame({"Unidade": [f"U{i % 12}" for i in range(n)], "Documento": [f"Doc {i}" for i in range(n)],
+                         "Setor": "Adm", "CNPJ": "", "Status": rng.choice(["CRÍTICO", "ALTO", "NORMAL"], n),
+                         "Progresso": rng.choice([0, 50, 100], n), "Vencimento": venc, "ID_UNICO": [f"U{i % 12} - Doc {i}" for i in range(n)]},
+                        index=rng.permutation(np.arange(1000, 1000 + n)))
+
+def _forca_bruta(df, inicio=None, fim=None):
+    venc = pd.to_datetime(df['Vencimento'], errors='coerce')
+    sel = venc.notna()
+    if inicio is not None: sel &= venc >= pd.Timestamp(inicio)
+    if fim is not None: sel &= venc <= pd.Timestamp(fim)
+    return venc[sel].sort_values(kind="stable")
+
+def _pares(indice):
+    return sorted(zip(indice.dias.tolist(), indice.rotulos.tolist()))
+
+def test_entre_vencendo_e_vencidos_batem_com_forca_bruta():
+    df = _carteira()
+    indice = IndiceVencimentos(df)
+    assert len(indice) == df['Vencimento'].notna().sum()
+    for inicio, fim in [(None, None), (HOJE, HOJE + timedelta(days=30)), (HOJE, HOJE), (None, HOJE - timedelta(days=1)), (HOJE + timedelta(days=500), None)]:
+        esperado = _forca_bruta(df, inicio, fim)
+        obtido = indice.entre(inicio, fim)
+        assert sorted(obtido.tolist()) == sorted(esperado.index.tolist())
+        assert pd.to_datetime(df.loc[obtido, 'Vencimento']).is_monotonic_increasing
+    assert sorted(indice.vencendo(HOJE, 15).tolist()) == sorted(_forca_bruta(df, HOJE, HOJE + timedelta(days=15)).index.tolist())
+    assert sorted(indice.vencidos(HOJE).tolist()) == sorted(_forca_bruta(df, None, HOJE - timedelta(days=1)).index.tolist())
+
+def test_proximos_com_e_sem_filtro():
+    df = _carteira()
+    indice = IndiceVencimentos(df)
+    futuros = _forca_bruta(df, HOJE)
+    assert pd.to_datetime(df.loc[indice.proximos(10, HOJE), 'Vencimento']).tolist() == futuros.head(10).tolist()
+    criticos = lambda rotulos: (df.loc[rotulos, 'Status'] == "CRÍTICO").to_numpy()
+    obtido = indice.proximos(25, HOJE, filtro=criticos)
+    esperado = futuros[df.loc[futuros.index, 'Status'] == "CRÍTICO"]
+    assert len(obtido) == 25 and (df.loc[obtido, 'Status'] == "CRÍTICO").all()
+    assert pd.to_datetime(df.loc[obtido, 'Vencimento']).tolist() == esperado.head(25).tolist()
+    assert len(indice.proximos(10, filtro=lambda r: np.zeros(len(r), dtype=bool))) == 0
+
+def test_atualizado_igual_a_reconstruir_depois_das_edicoes():
+    df = _carteira()
+    indice = IndiceVencimentos(df)
+    editado = df.copy()
+    removidos = list(editado.index[:15])
+    editado = editado.drop(removidos)
+    mudados = list(editado.index[:20])
+    editado.loc[mudados, 'Vencimento'] = [HOJE + timedelta(days=i * 7) for i in range(20)]
+    editado.loc[mudados[:3], 'Vencimento'] = None
+    novos = pd.DataFrame({**{c: editado[c].iloc[:5].tolist() for c in editado.columns},
+                          "Vencimento": [HOJE + timedelta(days=d) for d in (0, 3, 3, 90, -10)]}, index=[5000, 5001, 5002, 5003, 5004])
+    editado = pd.concat([editado, novos])
+    atualizado = indice.atualizado(editado, remover=removidos + mudados, inserir=mudados + list(novos.index))
+    reconstruido = IndiceVencimentos(editado)
+    assert atualizado.dias.tolist() == reconstruido.dias.tolist()
+    assert _pares(atualizado) == _pares(reconstruido)
+    assert sorted(atualizado.entre(HOJE, HOJE + timedelta(days=30)).tolist()) == sorted(reconstruido.entre(HOJE, HOJE + timedelta(days=30)).tolist())
+    # O índice original não muda
+    assert _pares(indice) == _pares(IndiceVencimentos(df))
+
+def test_indice_vazio():
+    indice = IndiceVencimentos(pd.DataFrame())
+    assert len(indice) == 0 and len(indice.entre(HOJE, None)) == 0 and len(indice.proximos(5)) == 0
+
+def test_escapar_texto_ics():
+    assert _escapar("a;b,c\\d\ne\r\nf") == "a\\;b\\,c\\\\d\\ne\\nf"
+
+def test_dobrar_linhas_longas_sem_partir_utf8():
+    assert _dobrar("SUMMARY:curta") == "SUMMARY:curta"
+    linha = "DESCRIPTION:" + "Licença Sanitária – Vigilância ção " * 12
+    dobrada = _dobrar(linha)
+    fisicas = dobrada.split("\r\n")
+    assert len(fisicas) > 1 and all(len(l.encode("utf-8")) <= 75 for l in fisicas)
+    assert all(l.startswith(" ") for l in fisicas[1:])
+    assert "".join([fisicas[0]] + [l[1:] for l in fisicas[1:]]) == linha
+
+def test_calendario_gerado():
+    df = _carteira(20)
+    df['Progresso'] = 0
+    texto = gerar_ics(df[df['Vencimento'].notna()].head(3), "Vencimentos - U1", agora=datetime(2026, 3, 10, 12, tzinfo=timezone.utc))
+    linhas = texto.split("\r\n")
+    assert linhas[0] == "BEGIN:VCALENDAR" and texto.endswith("END:VCALENDAR\r\n")
+    assert linhas.count("BEGIN:VEVENT") == 3 and "DTSTAMP:20260310T120000Z" in linhas
+    assert all(len(l.encode("utf-8")) <= 75 for l in linhas)
+
+def test_gravar_feeds_apaga_so_os_proprios(tmp_path):
+    df = _carteira(60)
+    (tmp_path / "feriados.ics").write_text("BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n")
+    (tmp_path / "unidade_Antiga_abc123.ics").write_text("velho")
+    resumo = gravar_feeds(str(tmp_path), df, IndiceVencimentos(df), HOJE)
+    arquivos = {p.name for p in tmp_path.glob("*.ics")}
+    assert "feriados.ics" in arquivos and "unidade_Antiga_abc123.ics" not in arquivos
+    assert nome_feed_unidade("U1") in arquivos and nome_feed_risco("CRÍTICO") in arquivos
+    assert resumo["removidos"] == 1 and resumo["gravados"] == resumo["feeds"] == len(arquivos) - 1
+    # Sem mudança nos eventos, nada é regravado (só o DTSTAMP mudaria)
+    depois = gravar_feeds(str(tmp_path), df, IndiceVencimentos(df), HOJE, agora=datetime(2030, 1, 1, tzinfo=timezone.utc))
+    assert depois["gravados"] == 0 and depois["removidos"] == 0
@@ -0,0 +1,117 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from metricas import METRICAS, medir
+
+# --- SERVIÇO DE TRANSCRIÇÃO DAS NOTAS DE VOZ ---
+# O áudio é identificado pelo sha256 do conteúdo: o mesmo áudio nunca é transcrito duas vezes
+# (nem entre reruns, nem entre sessões). O reconhecimento roda num pool em segundo plano e a
+# página só consulta o estado. O motor é plugável: "google" (rede, padrão), "sphinx" (offline,
+# pocketsphinx instalado) ou "fixo" (determinístico, para testes e ambientes sem internet).
+
+MAX_WORKERS_TRANSCRICAO = 2
+MAX_TRANSCRICOES_CACHE = 256
+IDIOMA_TRANSCRICAO = "pt-BR"
+
+def hash_audio(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+class MotorGoogle:
+    nome = "google"
+    def __init__(self, idioma=IDIOMA_TRANSCRICAO):
+        import speech_recognition as sr
+        self.sr = sr
+        self.idioma = idioma
+
+    def _audio(self, dados):
+        # AudioFile aceita arquivo em memória: nada de WAV temporário em disco
+        with self.sr.AudioFile(io.BytesIO(dados)) as fonte:
+            return self.sr.Recognizer().record(fonte)
+
+    def transcrever(self, dados):
+        try: return self.sr.Recognizer().recognize_google(self._audio(dados), language=self.idioma)
+        except self.sr.UnknownValueError: return ""  # áudio sem fala reconhecível não é erro
+
+class MotorSphinx(MotorGoogle):
+    nome = "sphinx"
+    def transcrever(self, dados):
+        try: return self.sr.Recognizer().recognize_sphinx(self._audio(dados), language=self.idioma)
+        except self.sr.UnknownValueError: return ""
+
+class MotorFixo:
+    # Resposta previsível a partir do conteúdo (ou de um dicionário hash -> texto)
+    nome = "fixo"
+    def __init__(self, respostas=None):
+        self.respostas = respostas or {}
+
+    def transcrever(self, dados):
+        chave = hash_audio(dados)
+        return self.respostas.get(chave, f"transcricao {chave[:8]}")
+
+MOTORES = {"google": MotorGoogle, "sphinx": MotorSphinx, "fixo": MotorFixo}
+
+def criar_motor(nome=None):
+    nome = nome or os.environ.get("LEGALIZA_TRANSCRICAO", "google")
+    if nome not in MOTORES: raise ValueError(f"Motor de transcrição desconhecido: {nome}")
+    return MOTORES[nome]()
+
+class ServicoTranscricao:
+    def __init__(self, motor, max_workers=MAX_WORKERS_TRANSCRICAO, max_cache=MAX_TRANSCRICOES_CACHE):
+        self.motor = motor
+        self.max_cache = max_cache
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcricao")
+        self._lock = threading.Lock()
+        self._resultados = OrderedDict()   # hash -> {"estado", "texto", "erro"} (LRU dos concluídos)
+
+    # --- API ---
+    def solicitar(self, dados, repetir_erro=False):
+        # Retorna o hash na hora; só enfileira se o áudio ainda não foi (nem está sendo) transcrito
+        chave = hash_audio(dados)
+        with self._lock:
+            atual = self._resultados.get(chave)
+            if atual is not None and (atual["estado"] != "erro" or not repetir_erro):
+                self._resultados.move_to_end(chave)
+                METRICAS.contar("transcricao.reaproveitada")
+                return chave
+            self._resultados[chave] = {"estado": "na_fila", "texto": "", "erro": ""}
+        self._pool.submit(self._executar, chave, dados)
+        return chave
+
+    def resultado(self, chave):
+        with self._lock:
+            atual = self._resultados.get(chave)
+            return dict(atual) if atual else None
+
+    def transcrever(self, dados, timeout=None):
+        # Versão bloqueante (scripts e testes)
+        chave = self.solicitar(dados)
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            r = self.resultado(chave)
+            if r is None or r["estado"] in ("concluido", "erro"): return r
+            if limite is not None and time.monotonic() > limite: return r
+            time.sleep(0.05)
+
+    def estatisticas(self):
+        with self._lock:
+            por_estado = {}
+            for r in self._resultados.values(): por_estado[r["estado"]] = por_estado.get(r["estado"], 0) + 1
+            return {"motor": self.motor.nome, "em_cache": len(self._resultados), "por_estado": por_estado}
+
+    # --- WORKER ---
+    def _executar(self, chave, dados):
+        with self._lock: self._resultados[chave]["estado"] = "transcrevendo"
+        try:
+            with medir("transcricao", motor=self.motor.nome, bytes=len(dados)):
+                final = {"estado": "concluido", "texto": self.motor.transcrever(dados) or "", "erro": ""}
+        except Exception as e:
+            final = {"estado": "erro", "texto": "", "erro": str(e)}  # só volta para a fila com repetir_erro=True
+        with self._lock:
+            self._resultados[chave] = final
+            self._resultados.move_to_end(chave)
+            concluidos = [k for k, r in self._resultados.items() if r["estado"] in ("concluido", "erro")]
+            for k in concluidos[:max(0, len(self._resultados) - self.max_cache)]: del self._resultados[k]
@@ -0,0 +1,190 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from nucleo_dados import texto_arquivo
+from motor_prazos import REGRAS_ALERTA, DOCUMENTOS_IGNORADOS
+
+# --- ÍNDICE DE VENCIMENTOS (ordenado por data) ---
+# Os vencimentos ficam em um array ordenado de dias (inteiros desde 1970) alinhado aos rótulos das
+# linhas. "O que vence entre X e Y" e "os K mais próximos" são buscas binárias (np.searchsorted) em
+# vez de calcular (Vencimento - hoje) em todas as linhas. O índice do retrato é compartilhado; a
+# sessão com edições ajusta só as linhas que criou, removeu ou cujo vencimento mudou (`atualizado`).
+# O mesmo índice alimenta os calendários .ics por unidade e por nível de risco.
+
+ICS_DIAS_PASSADOS = 30     # vencimentos já passados que ainda aparecem no calendário
+ICS_DIAS_FUTUROS = 730
+PRODID_ICS = "-//Legaliza Health//Vencimentos//PT-BR"
+DOMINIO_UID = "legaliza-health"
+PREFIXOS_FEED = ("unidade_", "risco_")   # gravar_feeds só apaga da pasta os .ics com estes nomes
+
+def _dia(valor):
+    return (pd.Timestamp(valor).normalize() - pd.Timestamp(0)).days
+
+def _chaves(df_prazos, rotulos=None):
+    # (dias, rótulos) das linhas com vencimento válido, em ordem de data
+    sub = df_prazos if rotulos is None else df_prazos.loc[rotulos]
+    venc = pd.to_datetime(sub['Vencimento'], errors='coerce')
+    validos = venc.notna().to_numpy()
+    dias = venc.to_numpy(dtype="datetime64[ns]")[validos].astype("datetime64[D]").astype(np.int64)
+    rotulos = sub.index.to_numpy()[validos]
+    ordem = np.argsort(dias, kind="stable")
+    return dias[ordem], rotulos[ordem]
+
+class IndiceVencimentos:
+    def __init__(self, df_prazos):
+        self.dias, self.rotulos = _chaves(df_prazos) if not df_prazos.empty and 'Vencimento' in df_prazos.columns else (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.dias)
+
+    def entre(self, inicio=None, fim=None):
+        # Rótulos com inicio <= Vencimento <= fim (None = sem limite), do vencimento mais próximo ao mais distante
+        a = 0 if inicio is None else np.searchsorted(self.dias, _dia(inicio), side="left")
+        b = len(self.dias) if fim is None else np.searchsorted(self.dias, _dia(fim), side="right")
+        return self.rotulos[a:max(a, b)]
+
+    def vencendo(self, hoje, dias):
+        return self.entre(hoje, hoje + timedelta(days=dias))
+
+    def vencidos(self, hoje):
+        return self.entre(None, hoje - timedelta(days=1))
+
+    def proximos(self, k, a_partir=None, filtro=None):
+        # Os k primeiros a partir da data. `filtro(bloco de rótulos) -> máscara` é aplicado em blocos
+        # crescentes, então só a parte do índice necessária para achar os k é examinada.
+        inicio = 0 if a_partir is None else int(np.searchsorted(self.dias, _dia(a_partir), side="left"))
+        if filtro is None: return self.rotulos[inicio:inicio + k]
+        achados, n, passo = [], 0, max(4 * k, 64)
+        while inicio < len(self.rotulos) and n < k:
+            bloco = self.rotulos[inicio:inicio + passo]
+            bloco = bloco[np.asarray(filtro(bloco), dtype=bool)]
+            achados.append(bloco)
+            n += len(bloco)
+            inicio += passo
+            passo *= 2
+        return np.concatenate(achados)[:k] if achados else self.rotulos[:0]
+
+    def atualizado(self, df_prazos, remover=(), inserir=()):
+        # Novo índice sem as linhas `remover` e com as `inserir` (lidas de df_prazos), sem reordenar o resto
+        dias, rotulos = self.dias, self.rotulos
+        if len(remover):
+            manter = ~np.isin(rotulos, np.asarray(list(remover)))
+            dias, rotulos = dias[manter], rotulos[manter]
+        if len(inserir):
+            novos_dias, novos_rotulos = _chaves(df_prazos, list(inserir))
+            posicoes = np.searchsorted(dias, novos_dias, side="right")
+            dias, rotulos = np.insert(dias, posicoes, novos_dias), np.insert(rotulos, posicoes, novos_rotulos)
+        novo = IndiceVencimentos.__new__(IndiceVencimentos)
+        novo.dias, novo.rotulos = dias, rotulos
+        return novo
+
+# --- CALENDÁRIO (iCalendar / RFC 5545) ---
+def pendentes(df_prazos, rotulos):
+    # Máscara dos rótulos que ainda contam como prazo: não concluídos e com tipo de documento definido
+    sel = df_prazos.loc[rotulos]
+    manter = pd.to_numeric(sel['Progresso'], errors='coerce').fillna(0) < 100
+    doc = sel['Documento'].astype(str)
+    for marcador in DOCUMENTOS_IGNORADOS: manter &= ~doc.str.contains(marcador, regex=False)
+    return manter.to_numpy()
+
+def selecionar_feed(df_prazos, indice, hoje, unidade=None, risco=None):
+    # Documentos pendentes na janela do calendário, em ordem de vencimento
+    rotulos = indice.entre(hoje - timedelta(days=ICS_DIAS_PASSADOS), hoje + timedelta(days=ICS_DIAS_FUTUROS))
+    sel = df_prazos.loc[rotulos[pendentes(df_prazos, rotulos)]]
+    if unidade is not None: sel = sel[sel['Unidade'].astype(str) == unidade]
+    if risco is not None: sel = sel[sel['Status'].astype(str) == risco]
+    return sel
+
+def _escapar(texto):
+    return str(texto).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+def _dobrar(linha):
+    # Linhas de no máximo 75 octetos; as continuações começam com um espaço (sem partir caracteres UTF-8)
+    dados = linha.encode("utf-8")
+    if len(dados) <= 75: return linha
+    partes, inicio, limite = [], 0, 75
+    while inicio < len(dados):
+        fim = min(inicio + limite, len(dados))
+        while fim < len(dados) and dados[fim] & 0xC0 == 0x80: fim -= 1
+        partes.append(dados[inicio:fim].decode("utf-8"))
+        inicio, limite = fim, 74
+    return "\r\n ".join(partes)
+
+def eventos_ics(sel, carimbo):
+    # Texto de cada VEVENT (já dobrado, com CRLF), na ordem das linhas de `sel`
+    venc = pd.to_datetime(sel['Vencimento'], errors='coerce')
+    inicio, fim = venc.dt.strftime("%Y%m%d").tolist(), (venc + pd.Timedelta(days=1)).dt.strftime("%Y%m%d").tolist()
+    progresso = pd.to_numeric(sel['Progresso'], errors='coerce').fillna(0).astype(int).tolist()
+    colunas = [sel[c].astype(str).tolist() for c in ('ID_UNICO', 'Unidade', 'Documento', 'Setor', 'CNPJ', 'Status')]
+    eventos = []
+    for id_doc, unidade, documento, setor, cnpj, status, d_ini, d_fim, prog in zip(*colunas, inicio, fim, progresso):
+        descricao = f"Unidade: {unidade}\nDocumento: {documento}\nSetor: {setor}\nCNPJ: {cnpj}\nRisco: {status}\nProgresso: {prog}%"
+        linhas = [
+            "BEGIN:VEVENT",
+            f"UID:{hashlib.sha1(id_doc.encode('utf-8')).hexdigest()[:20]}@{DOMINIO_UID}",
+            f"DTSTAMP:{carimbo}",
+            f"DTSTART;VALUE=DATE:{d_ini}",
+            f"DTEND;VALUE=DATE:{d_fim}",
+            f"SUMMARY:{_escapar(f'Vence: {documento} - {unidade}')}",
+            f"DESCRIPTION:{_escapar(descricao)}",
+            f"CATEGORIES:{_escapar(status)}",
+            "TRANSP:TRANSPARENT",
+        ]
+        regra = REGRAS_ALERTA.get(status)
+        if regra:
+            linhas += ["BEGIN:VALARM", f"TRIGGER:-P{regra['dias_antecedencia']}D", "ACTION:DISPLAY", f"DESCRIPTION:{_escapar(regra['titulo'])}", "END:VALARM"]
+        linhas.append("END:VEVENT")
+        eventos.append("".join(_dobrar(l) + "\r\n" for l in linhas))
+    return eventos
+
+def _carimbo(agora=None):
+    return (agora or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+
+def _calendario(nome, eventos):
+    cabecalho = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID_ICS}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH",
+                 f"X-WR-CALNAME:{_escapar(nome)}", "X-WR-TIMEZONE:America/Sao_Paulo"]
+    return "".join(_dobrar(l) + "\r\n" for l in cabecalho) + "".join(eventos) + "END:VCALENDAR\r\n"
+
+def gerar_ics(sel, nome, agora=None):
+    return _calendario(nome, eventos_ics(sel, _carimbo(agora)))
+
+def nome_feed_unidade(unidade):
+    return f"unidade_{texto_arquivo(unidade) or 'sem_nome'}_{hashlib.sha1(unidade.encode('utf-8')).hexdigest()[:6]}.ics"
+
+def nome_feed_risco(risco):
+    return f"risco_{texto_arquivo(risco).lower() or 'sem_risco'}.ics"
+
+def _sem_carimbo(texto):
+    return "\r\n".join(l for l in texto.split("\r\n") if not l.startswith("DTSTAMP:"))
+
+def gravar_feeds(pasta, df_prazos, indice, hoje, agora=None):
+    # Um .ics por unidade e por nível de risco na pasta (para publicar em um servidor estático). Cada
+    # evento é montado uma vez e reaproveitado nos dois calendários em que aparece; o arquivo só é
+    # regravado se algum evento mudou, para os calendários assinados não baixarem tudo de novo à toa.
+    # Feeds que sumiram (unidade sem prazos na janela) são apagados; outros arquivos da pasta ficam.
+    os.makedirs(pasta, exist_ok=True)
+    janela = selecionar_feed(df_prazos, indice, hoje)
+    eventos = eventos_ics(janela, _carimbo(agora))
+    feeds = {}
+    for coluna, nomear, titulo in (("Unidade", nome_feed_unidade, "{}"), ("Status", nome_feed_risco, "risco {}")):
+        for valor, posicoes in janela.groupby(janela[coluna].astype(str), sort=False).indices.items():
+            if valor: feeds[nomear(valor)] = (f"Vencimentos - {titulo.format(valor)}", posicoes)
+    gravados = 0
+    for arquivo, (nome, posicoes) in feeds.items():
+        texto = _calendario(nome, [eventos[i] for i in posicoes])
+        caminho = os.path.join(pasta, arquivo)
+        try:
+            with open(caminho, encoding="utf-8", newline="") as f: atual = f.read()
+        except OSError: atual = None
+        if atual is not None and _sem_carimbo(atual) == _sem_carimbo(texto): continue
+        with open(caminho + ".tmp", "w", encoding="utf-8", newline="") as f: f.write(texto)
+        os.replace(caminho + ".tmp", caminho)
+        gravados += 1
+    removidos = 0
+    for arquivo in os.listdir(pasta):
+        if arquivo.startswith(PREFIXOS_FEED) and arquivo.endswith(".ics") and arquivo not in feeds:
+            os.unlink(os.path.join(pasta, arquivo))
+            removidos += 1
+    return {"feeds": len(feeds), "gravados": gravados, "removidos": removidos}